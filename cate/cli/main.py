@@ -1143,7 +1143,9 @@ class DataSourceCommand(SubCommandCommand):
         list_parser.add_argument('--name', '-n', metavar='NAME',
                                  help="List only data sources named NAME or "
                                       "that have NAME in their name. "
-                                      "The comparison is case insensitive.")
+                                      "The comparison is case insensitive. "
+                                      "For the ODP data store, NAME may also comprise filters such as "
+                                      "\"ecv:SST time_frequency:day time:2010-01-01,2010-12-31\".")
         list_parser.add_argument('--all', '-a', action='store_false',
                                  help="Show also data sources that can not be opened in Cate")
         list_parser.add_argument('--coverage', '-c', action='store_true',
@@ -28,7 +28,12 @@ from typing import Any, Dict, Optional, Sequence, Union
 
 from .defaults import GLOBAL_CONF_FILE, LOCAL_CONF_FILE, LOCATION_FILE, VERSION_CONF_FILE, \
     VARIABLE_DISPLAY_SETTINGS, DEFAULT_DATA_PATH, DEFAULT_VERSION_DATA_PATH, DEFAULT_COLOR_MAP, DEFAULT_RES_PATTERN, \
-    WEBAPI_USE_WORKSPACE_IMAGERY_CACHE, DEFAULT_VARIABLES, DATASET_PERSISTENCE_FORMAT, USER_PREFERENCES_FILE
+    WEBAPI_USE_WORKSPACE_IMAGERY_CACHE, DEFAULT_VARIABLES, DATASET_PERSISTENCE_FORMAT, USER_PREFERENCES_FILE, \
+    WORKFLOW_MAX_WORKERS, WORKSPACE_USE_STEP_CACHE, WORKSPACE_STEP_CACHE_CAPACITY, WORKSPACE_LAZY_OPEN, \
+    DATASET_FILE_INDEX_FILE, DATASET_USE_REFERENCE_INDEX, DATASET_OPEN_PARALLEL_MIN_FILES, HTTP_DOWNLOAD_MAX_WORKERS, \
+    OPENDAP_SYNC_MAX_WORKERS, WEBAPI_TILE_MAX_WORKERS, \
+    WEBAPI_PYRAMID_REGISTRY_CAPACITY, WEBAPI_USE_WORKSPACE_OVERVIEW_CACHE, \
+    WEBAPI_TILE_FORMAT, WEBAPI_MEMORY_CACHE_CAPACITY, WEBAPI_MAX_RSS, WEBAPI_USE_TILE_PREFETCHING
 
 _CONFIG = None
 
@@ -76,10 +81,144 @@ def get_dataset_persistence_format() -> str:
     return get_config_value('dataset_persistence_format', DATASET_PERSISTENCE_FORMAT)
 
 
+def get_dataset_file_index_file() -> Optional[str]:
+    """
+    Get the path of the file that stores the metadata of individual dataset files.
+
+    :return: Effectively reads the value of the configuration parameter ``dataset_file_index_file``, if any.
+             Otherwise return the default value ``None``, which means, no index is used.
+    """
+    return get_config_path('dataset_file_index_file', DATASET_FILE_INDEX_FILE)
+
+
+def get_use_dataset_reference_index() -> bool:
+    """
+    Get whether multi-file datasets of local data sources are opened using an index of the chunk references
+    of their files.
+
+    :return: Effectively reads the value of the configuration parameter ``use_dataset_reference_index``, if any.
+             Otherwise return the default value ``False``.
+    """
+    return get_config_value('use_dataset_reference_index', DATASET_USE_REFERENCE_INDEX)
+
+
+def get_dataset_open_parallel_min_files() -> int:
+    return get_config_value('dataset_open_parallel_min_files', DATASET_OPEN_PARALLEL_MIN_FILES)
+
+
+def get_http_download_max_workers() -> int:
+    """
+    Get the maximum number of files downloaded concurrently when synchronizing remote data sources.
+
+    :return: Effectively reads the value of the configuration parameter ``http_download_max_workers``, if any.
+             Otherwise return the default value ``4``.
+    """
+    return _get_max_workers('http_download_max_workers', HTTP_DOWNLOAD_MAX_WORKERS)
+
+
+def get_opendap_sync_max_workers() -> int:
+    """
+    Get the maximum number of worker processes that subset remote OPeNDAP datasets and write the subsets
+    to local files when synchronizing remote data sources.
+
+    :return: Effectively reads the value of the configuration parameter ``opendap_sync_max_workers``, if any.
+             Otherwise return the default value ``4``.
+    """
+    return _get_max_workers('opendap_sync_max_workers', OPENDAP_SYNC_MAX_WORKERS)
+
+
+def get_workflow_max_workers() -> int:
+    """
+    Get the maximum number of workspace workflow steps that may be executed concurrently.
+
+    :return: Effectively reads the value of the configuration parameter ``workflow_max_workers``, if any.
+             Otherwise return the default value ``1``, that is, steps are executed one after the other.
+    """
+    return _get_max_workers('workflow_max_workers', WORKFLOW_MAX_WORKERS)
+
+
+def get_webapi_tile_max_workers() -> int:
+    """
+    Get the maximum number of image tiles computed concurrently by the WebAPI service.
+
+    :return: Effectively reads the value of the configuration parameter ``webapi_tile_max_workers``, if any.
+             Otherwise return the default value ``4``.
+    """
+    return _get_max_workers('webapi_tile_max_workers', WEBAPI_TILE_MAX_WORKERS)
+
+
+def get_webapi_tile_format() -> str:
+    """
+    Get the comma-separated names of the encoders of image tiles in the order of preference.
+    The first one whose format is accepted by a client is used, unless the client requests a specific encoder.
+
+    :return: Effectively reads the value of the configuration parameter ``webapi_tile_format``, if any.
+             Otherwise return the default value ``"png-fast"``.
+    """
+    return get_config_value('webapi_tile_format', WEBAPI_TILE_FORMAT)
+
+
+def get_webapi_memory_cache_capacity() -> Optional[int]:
+    """
+    Get the number of bytes all in-memory caches of the WebAPI service, e.g. of image tiles, may hold together.
+
+    :return: Effectively reads the value of the configuration parameter ``webapi_memory_cache_capacity``, if any.
+             Otherwise return the default value ``None``, which means unlimited.
+    """
+    return get_config_value('webapi_memory_cache_capacity', WEBAPI_MEMORY_CACHE_CAPACITY)
+
+
+def get_webapi_max_rss() -> Optional[int]:
+    """
+    Get the resident set size (RSS) of the WebAPI service process in bytes above which in-memory caches are trimmed.
+
+    :return: Effectively reads the value of the configuration parameter ``webapi_max_rss``, if any.
+             Otherwise return the default value ``None``, which means unlimited.
+    """
+    return get_config_value('webapi_max_rss', WEBAPI_MAX_RSS)
+
+
+def get_webapi_pyramid_registry_capacity() -> int:
+    """
+    Get the number of bytes the image pyramids of dataset variables may occupy in the WebAPI service.
+    Least recently used pyramids are dropped if the capacity is exceeded.
+
+    :return: Effectively reads the value of the configuration parameter ``webapi_pyramid_registry_capacity``, if any.
+             Otherwise return the default value ``512 * 1024 * 1024``.
+    """
+    return get_config_value('webapi_pyramid_registry_capacity', WEBAPI_PYRAMID_REGISTRY_CAPACITY)
+
+
+def get_lazy_workspace_open() -> bool:
+    return get_config_value('lazy_workspace_open', WORKSPACE_LAZY_OPEN)
+
+
+def get_use_workspace_step_cache() -> bool:
+    return get_config_value('use_workspace_step_cache', WORKSPACE_USE_STEP_CACHE)
+
+
+def get_workspace_step_cache_capacity() -> int:
+    return get_config_value('workspace_step_cache_capacity', WORKSPACE_STEP_CACHE_CAPACITY)
+
+
 def get_use_workspace_imagery_cache() -> bool:
     return get_config_value('use_workspace_imagery_cache', WEBAPI_USE_WORKSPACE_IMAGERY_CACHE)
 
 
+def get_use_workspace_overview_cache() -> bool:
+    return get_config_value('use_workspace_overview_cache', WEBAPI_USE_WORKSPACE_OVERVIEW_CACHE)
+
+
+def get_use_tile_prefetching() -> bool:
+    """
+    Get whether the WebAPI service computes image tiles likely to be requested next in the background.
+
+    :return: Effectively reads the value of the configuration parameter ``use_tile_prefetching``, if any.
+             Otherwise return the default value ``False``.
+    """
+    return get_config_value('use_tile_prefetching', WEBAPI_USE_TILE_PREFETCHING)
+
+
 def get_default_res_pattern() -> str:
     """
     Get the default prefix for names generated for new workspace resources originating from opening data sources
@@ -155,6 +294,16 @@ def get_config() -> dict:
     return _CONFIG
 
 
+def _get_max_workers(name: str, default_value: int) -> int:
+    max_workers = get_config_value(name, default_value)
+    try:
+        max_workers = int(max_workers)
+    except (TypeError, ValueError):
+        _LOG.warning('invalid configuration: %s = %r' % (name, max_workers))
+        return default_value
+    return max(1, max_workers)
+
+
 def _init_config(config_files: Sequence[str], config_dirs, template_module: str = 'cate.conf.template') -> None:
     """
     Initialize the Cate configuration.
@@ -44,6 +44,7 @@ DEFAULT_WORKSPACES_PATH = os.path.join(DEFAULT_DATA_PATH, WORKSPACES_DIR_NAME)
 WORKSPACE_CACHE_DIR_NAME = '.cate-cache'
 WORKSPACE_DATA_DIR_NAME = '.cate-workspace'
 WORKSPACE_WORKFLOW_FILE_NAME = 'workflow.json'
+WORKSPACE_RESOURCES_FILE_NAME = 'resources.json'
 
 DEFAULT_RES_PATTERN = 'res_{index}'
 
@@ -55,6 +56,37 @@ _ONE_GIB = 1024 * _ONE_MIB
 #: The data format to be used when persisting datasets in the workspace.
 DATASET_PERSISTENCE_FORMAT = 'netcdf4'
 
+#: Where metadata of individual dataset files is stored, see cate.core.ds.open_xarray_dataset().
+#: None means, no index is used.
+DATASET_FILE_INDEX_FILE = None
+
+#: Open multi-file datasets of local data sources as a single virtual Zarr dataset using an index of
+#: the chunk references of their files, see cate.core.refindex
+DATASET_USE_REFERENCE_INDEX = False
+
+#: The minimum number of files of a multi-file dataset to be opened and preprocessed in parallel
+DATASET_OPEN_PARALLEL_MIN_FILES = 16
+
+#: The maximum number of files downloaded concurrently when synchronizing remote data sources
+HTTP_DOWNLOAD_MAX_WORKERS = 4
+
+#: The maximum number of worker processes that subset remote OPeNDAP datasets and write the subsets to local files
+#: when synchronizing remote data sources
+OPENDAP_SYNC_MAX_WORKERS = 4
+
+#: The maximum number of workspace workflow steps that may be executed concurrently.
+#: A value of 1 executes steps one after the other.
+WORKFLOW_MAX_WORKERS = 1
+
+#: Open workspaces lazily, that is, restore and compute resources only when they are requested
+WORKSPACE_LAZY_OPEN = False
+
+#: Use a per-workspace persistent cache for workflow step results
+WORKSPACE_USE_STEP_CACHE = False
+
+#: The number of bytes in a workspace's step result cache
+WORKSPACE_STEP_CACHE_CAPACITY = 8 * _ONE_GIB
+
 #: Use a per-workspace file imagery cache, see REST "/res/tile/" API
 WEBAPI_USE_WORKSPACE_IMAGERY_CACHE = False
 
@@ -64,6 +96,30 @@ WEBAPI_WORKSPACE_FILE_TILE_CACHE_CAPACITY = 1 * _ONE_GIB
 # The number of bytes in a workspace's image in-memory cache
 WEBAPI_WORKSPACE_MEM_TILE_CACHE_CAPACITY = 256 * _ONE_MIB
 
+#: Use per-workspace, precomputed overviews of dataset variables for the low resolution levels of their imagery,
+#: see REST "/res/tile/" API
+WEBAPI_USE_WORKSPACE_OVERVIEW_CACHE = False
+
+#: Compute image tiles likely to be requested next in the background, see REST "/res/tile/" API
+WEBAPI_USE_TILE_PREFETCHING = False
+
+#: The maximum number of image tiles computed concurrently, see REST "/res/tile/" API
+WEBAPI_TILE_MAX_WORKERS = 4
+
+#: The number of bytes all in-memory caches of the WebAPI service may hold together, None means unlimited,
+#: see cate.util.cache.MemoryBudget
+WEBAPI_MEMORY_CACHE_CAPACITY = None
+
+#: The resident set size of the WebAPI service process in bytes above which in-memory caches are trimmed,
+#: None means unlimited, see cate.util.cache.MemoryBudget
+WEBAPI_MAX_RSS = None
+
+#: Comma-separated names of the encoders of image tiles in the order of preference, see REST "/res/tile/" API
+WEBAPI_TILE_FORMAT = 'png-fast'
+
+#: The number of bytes the image pyramids of dataset variables may occupy, see REST "/res/tile/" API
+WEBAPI_PYRAMID_REGISTRY_CAPACITY = 512 * _ONE_MIB
+
 #: where the information about a running WebAPI service is stored
 WEBAPI_INFO_FILE = os.path.join(DEFAULT_VERSION_DATA_PATH, 'webapi.json')
 
@@ -23,15 +23,89 @@
 # data_stores_path = '~/.cate/data_stores'
 
 # 'dataset_persistence_format' names the data format to be used when persisting datasets in the workspace.
-# Possible values are 'netcdf4' or 'zarr'.
+# Possible values are 'netcdf4' or 'zarr'. Using 'zarr', the chunks of datasets are written in parallel.
+# In both cases, only resources that have changed since the workspace has last been saved or opened are written.
 # dataset_persistence_format = 'netcdf4'
 
+# 'dataset_file_index_file' is the file in which Cate stores the variables, coordinates, time coverage and chunking
+# of individual dataset files, so that files need not be normalized again when they are opened next time.
+# By default, no index is used.
+# dataset_file_index_file = '~/.cate/VERSION/dataset-file-index.json'
+
+# If 'use_dataset_reference_index' is True, data sources of the local data store maintain an index of the chunk
+# references of their NetCDF4/HDF5 files. Multi-file data sources are then opened as a single virtual Zarr dataset
+# without opening the individual files. The index is updated when a data source is opened.
+# use_dataset_reference_index = False
+
+# Multi-file datasets comprising at least 'dataset_open_parallel_min_files' files are opened and normalized
+# in parallel.
+# dataset_open_parallel_min_files = 16
+
+# 'http_download_max_workers' is the maximum number of files downloaded concurrently when remote data sources
+# are synchronized with local copies, e.g. using "cate ds copy".
+# http_download_max_workers = 4
+
+# When only subsets of remote data sources are synchronized with local copies, up to
+# 'opendap_sync_max_workers' worker processes open and subset remote datasets via OPeNDAP and write
+# the subsets to local files concurrently.
+# opendap_sync_max_workers = 4
+
+# 'workflow_max_workers' is the maximum number of workspace workflow steps that are executed concurrently.
+# Independent steps, e.g. separate "open_dataset" -> "subset_spatial" branches, are then computed at the same time.
+# The default value 1 executes steps one after the other.
+# workflow_max_workers = 4
+
+# If 'lazy_workspace_open' is True, opening a workspace will neither read its persistent resources nor compute
+# its workflow. Instead, resources are restored or computed when they are first requested, e.g. for display.
+#
+# lazy_workspace_open = False
+
+# If 'use_workspace_step_cache' is True, Cate will maintain a per-workspace cache for the results of workflow steps
+# that compute datasets. Results are reused if a step with the same operation and inputs is computed again,
+# e.g. after reopening a workspace. 'workspace_step_cache_capacity' is the maximum cache size in bytes.
+#
+# use_workspace_step_cache = False
+# workspace_step_cache_capacity = 8 * 1024 * 1024 * 1024
+
 # If 'use_workspace_imagery_cache' is True, Cate will maintain a per-workspace
 # cache for imagery generated from dataset variables. Such cache can accelerate
 # image display, however at the cost of disk space.
 #
 # use_workspace_imagery_cache = False
 
+# If 'use_workspace_overview_cache' is True, Cate will compute overviews of dataset variables in the background,
+# when they are displayed for the first time, and store them in the workspace's cache directory.
+# Low resolution imagery is then read from the overviews rather than from the full resolution data.
+# Overviews of classifications take the most frequent value, otherwise the mean of valid values.
+#
+# use_workspace_overview_cache = False
+
+# If 'use_tile_prefetching' is True, Cate will compute image tiles in the background that are likely to be
+# displayed next, that is, the neighbours of displayed tiles and the tiles of the next coarser and finer levels.
+# Prefetching pauses while tiles that are actually displayed are computed.
+#
+# use_tile_prefetching = False
+
+# 'webapi_tile_max_workers' is the maximum number of image tiles computed concurrently for display in Cate App.
+# Tiles are computed in the background, so other requests are served while heavy tiles render.
+# webapi_tile_max_workers = 4
+
+# 'webapi_memory_cache_capacity' is the maximum number of bytes held by all in-memory caches of the WebAPI service
+# together, e.g. of image tiles. 'webapi_max_rss' is the resident set size of the WebAPI service process in bytes
+# above which the in-memory caches are trimmed. Use these to cap the memory used on shared hosts.
+# By default, both are unlimited.
+# webapi_memory_cache_capacity = 1024 * 1024 * 1024
+# webapi_max_rss = 4 * 1024 * 1024 * 1024
+
+# 'webapi_tile_format' lists the encoders of image tiles in the order of preference. The first one whose format is
+# accepted by Cate App is used. Possible encoders are "png" (default zlib level), "png-fast" (fast zlib level,
+# palette images for categorical color maps), "webp" (lossless WebP), and "webp-lossy".
+# webapi_tile_format = 'png-fast'
+
+# 'webapi_pyramid_registry_capacity' is the maximum number of bytes occupied by the image pyramids that are kept
+# for the display of dataset variables. Least recently used pyramids are dropped if it is exceeded.
+# webapi_pyramid_registry_capacity = 512 * 1024 * 1024
+
 # Default prefix for names generated for new workspace resources originating from opening data sources
 # or executing workflow steps.
 # This prefix is used only if no specific prefix is defined for a given operation.
@@ -78,10 +78,12 @@ Components
 ==========
 """
 
+import concurrent.futures
 import datetime
 import glob
 import itertools
 import logging
+import os
 import re
 from abc import ABCMeta, abstractmethod
 from enum import Enum
@@ -90,8 +92,10 @@ from typing import Sequence, Optional, Union, Any, Dict, Set, List, AbstractSet
 import xarray as xr
 
 from .cdm import Schema, get_lon_dim_name, get_lat_dim_name
+from .dsindex import get_dataset_file_index
 from .opimpl import normalize_missing_time, normalize_coord_vars, normalize_impl, subset_spatial_impl
 from .types import PolygonLike, TimeRange, TimeRangeLike, VarNamesLike, ValidationError
+from ..conf import conf
 from ..util.monitor import Monitor
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH), " \
@@ -735,6 +739,15 @@ def open_xarray_dataset(paths,
     else:
         concat_dim = 'time'
 
+    index_file = conf.get_dataset_file_index_file()
+    file_index = get_dataset_file_index(index_file) if index_file else None
+    file_entries = [file_index.get_entry(file) for file in files] if file_index else [None] * len(files)
+    # Files with current entries, which need not be indexed again
+    indexed_files = {os.path.abspath(file) for file, entry in zip(files, file_entries) if entry}
+    # Files whose entries indicate that they don't need to be normalized
+    normalized_files = {os.path.abspath(file) for file, entry in zip(files, file_entries)
+                        if entry and entry.get('normalized')}
+
     if 'chunks' in kwargs:
         chunks = kwargs.pop('chunks')
     elif len(files) > 1:
@@ -747,39 +760,60 @@ def open_xarray_dataset(paths,
         # parallel processing.
         #
         # Hence we open the first file of the dataset and detect the maximum chunk sizes
-        # used in the spatial dimensions.
+        # used in the spatial dimensions, unless we already know them.
         #
         # If no such sizes could be found, we use xarray's default chunking.
-        chunks = get_spatial_ext_chunk_sizes(files[0])
+        if file_entries[0]:
+            chunks = file_entries[0].get('chunk_sizes')
+        else:
+            chunks = get_spatial_ext_chunk_sizes(files[0])
     else:
         chunks = None
 
+    if isinstance(var_names, str):
+        var_names = VarNamesLike.convert(var_names)
+    if var_names and 'drop_variables' not in kwargs and len(normalized_files) == len(files):
+        # All files are known, so we don't need to decode variables that will be dropped anyway
+        kwargs['drop_variables'] = sorted({var_name
+                                           for entry in file_entries
+                                           for var_name in entry.get('variables', [])
+                                           if var_name not in var_names})
+
     def preprocess(raw_ds: xr.Dataset):
-        # Add a time dimension if attributes "time_coverage_start" and "time_coverage_end" are found.
-        norm_ds = normalize_missing_time(normalize_coord_vars(raw_ds))
+        source = raw_ds.encoding.get('source')
+        if source and os.path.abspath(source) in normalized_files:
+            norm_ds = raw_ds
+        else:
+            # Add a time dimension if attributes "time_coverage_start" and "time_coverage_end" are found.
+            norm_ds = normalize_missing_time(normalize_coord_vars(raw_ds))
+            if source and file_index and os.path.abspath(source) not in indexed_files:
+                file_index.put_entry(source, raw_ds, norm_ds)
         monitor.progress(work=1)
         return norm_ds
 
+    # Opening and preprocessing files in parallel is only beneficial for larger numbers of files
+    parallel = len(files) >= conf.get_dataset_open_parallel_min_files()
+
     with monitor.starting('Opening dataset', len(files)):
-        # autoclose ensures that we can open datasets consisting of a number of
-        # files that exceeds OS open file limit.
-        # TODO (Suvi): - might need 2 versions ( one with combine=nested, coords=concat_dim and
-        #  other with combine='by_coords' to support opening most datasets
-        #  - we can eleminate unnecessary preprocess on datasets that already have time coordinate,
-        #  this can be when creating datasource.
-        #  - enable parallel=True to open files parallely to preprocess only when number of files
-        #  are more, otherwise it is determental to perforamnce.
-
-        ds = xr.open_mfdataset(files,
-                               coords='minimal',
-                               chunks=chunks,
-                               preprocess=preprocess,
-                               # Future behaviour will be
-                               combine='by_coords',
-                               #combine='nested',
-                               #parallel=True,
-                               compat='override',
-                               **kwargs)
+        if parallel:
+            ds = _open_mfdataset_parallel(files, chunks, preprocess, **kwargs)
+        else:
+            # autoclose ensures that we can open datasets consisting of a number of
+            # files that exceeds OS open file limit.
+            # TODO (Suvi): - might need 2 versions ( one with combine=nested, coords=concat_dim and
+            #  other with combine='by_coords' to support opening most datasets
+            ds = xr.open_mfdataset(files,
+                                   coords='minimal',
+                                   chunks=chunks,
+                                   preprocess=preprocess,
+                                   # Future behaviour will be
+                                   combine='by_coords',
+                                   #combine='nested',
+                                   compat='override',
+                                   **kwargs)
+
+    if file_index:
+        file_index.save()
 
     if var_names:
         ds = ds.drop_vars([var_name for var_name in ds.data_vars.keys() if var_name not in var_names])
@@ -792,6 +826,44 @@ def open_xarray_dataset(paths,
     return ds
 
 
+#: Keyword arguments of xarray.open_mfdataset() that are passed to xarray.combine_by_coords()
+_COMBINE_KWARG_NAMES = {'data_vars', 'join', 'combine_attrs', 'fill_value'}
+
+
+def _open_mfdataset_parallel(files: List[str], chunks, preprocess, **kwargs) -> xr.Dataset:
+    """
+    Like ``xarray.open_mfdataset(files, parallel=True, combine='by_coords', ...)``, but files are opened and
+    preprocessed by a thread pool owned by this call. xarray would use dask's global scheduler instead,
+    which must not be reconfigured here, because it is shared with concurrent callers and may be a distributed client.
+    """
+    combine_kwargs = {name: value for name, value in kwargs.items() if name in _COMBINE_KWARG_NAMES}
+    open_kwargs = {name: value for name, value in kwargs.items() if name not in _COMBINE_KWARG_NAMES}
+
+    def open_file(file: str) -> xr.Dataset:
+        return preprocess(xr.open_dataset(file, chunks=chunks or {}, **open_kwargs))
+
+    # Opening files is I/O-bound, so use more threads than CPUs, like concurrent.futures.ThreadPoolExecutor does
+    num_workers = min(len(files), (os.cpu_count() or 1) + 4)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='cate-open') as executor:
+        futures = [executor.submit(open_file, file) for file in files]
+    datasets = [future.result() for future in futures if future.exception() is None]
+    try:
+        if len(datasets) < len(files):
+            raise next(future.exception() for future in futures if future.exception() is not None)
+        combined_ds = xr.combine_by_coords(datasets, coords='minimal', compat='override', **combine_kwargs)
+    except BaseException:
+        for ds in datasets:
+            ds.close()
+        raise
+
+    def close():
+        for ds in datasets:
+            ds.close()
+
+    combined_ds.set_close(close)
+    return combined_ds
+
+
 def get_spatial_ext_chunk_sizes(ds_or_path: Union[xr.Dataset, str]) -> Dict[str, int]:
     """
     Get the spatial, external chunk sizes for the latitude and longitude dimensions
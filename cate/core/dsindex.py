@@ -0,0 +1,124 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module defines the :py:class:`DatasetFileIndex` class, a persistent index of metadata of
+individual dataset files, such as their variables, coordinates, time coverage and chunking.
+
+The index is used by :py:func:`cate.core.ds.open_xarray_dataset` to avoid opening and normalizing
+every single file of a multi-file dataset again and again. Entries are invalidated if
+a file's modification time or size changes.
+
+Components
+==========
+"""
+
+from threading import RLock
+from typing import Any, Dict, Optional
+
+import pandas as pd
+import xarray as xr
+
+from .fileindex import FileIndex, stat_file
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+#: Increment, if the format of index entries changes
+_INDEX_VERSION = 1
+
+
+class DatasetFileIndex(FileIndex):
+    """
+    A persistent index of dataset file metadata. Only local files are indexed.
+    Instances are thread-safe.
+
+    :param index_file: The path of the JSON file that holds the index.
+    """
+
+    def __init__(self, index_file: str):
+        super().__init__(index_file, _INDEX_VERSION, 'dataset file index')
+
+    def get_entry(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the metadata entry for the file given by *path*.
+
+        :param path: The file path.
+        :return: The entry or ``None``, if the file has not been indexed yet or if it has changed since.
+        """
+        stat = stat_file(path)
+        if stat is None:
+            return None
+        entry = self._get_entry(path)
+        if entry is None or [entry.get('mtime'), entry.get('size')] != stat:
+            return None
+        return entry
+
+    def put_entry(self, path: str, raw_ds: xr.Dataset, norm_ds: xr.Dataset) -> None:
+        """
+        Create and store the metadata entry for the file given by *path*.
+        The index is only modified, if the entry differs from the current one.
+
+        :param path: The file path.
+        :param raw_ds: The dataset as opened from *path*.
+        :param norm_ds: The dataset after normalisation.
+        """
+        stat = stat_file(path)
+        if stat is None:
+            return
+        # Imported here to avoid circular imports
+        from .ds import get_spatial_ext_chunk_sizes
+        entry = dict(mtime=stat[0],
+                     size=stat[1],
+                     normalized=norm_ds is raw_ds,
+                     variables=[str(var_name) for var_name in norm_ds.data_vars],
+                     coords={str(coord_name): dict(dims=[str(dim) for dim in coord.dims], shape=list(coord.shape))
+                             for coord_name, coord in norm_ds.coords.items()},
+                     time_coverage=_get_time_coverage(norm_ds),
+                     chunk_sizes=get_spatial_ext_chunk_sizes(raw_ds))
+        self._set_entry(path, entry)
+
+
+_INDEXES = dict()
+_INDEXES_LOCK = RLock()
+
+
+def get_dataset_file_index(index_file: str) -> DatasetFileIndex:
+    """Get the shared dataset file index for the given *index_file*."""
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(index_file)
+        if index is None:
+            index = DatasetFileIndex(index_file)
+            _INDEXES[index_file] = index
+        return index
+
+
+def _get_time_coverage(ds: xr.Dataset):
+    time = ds.coords.get('time')
+    if time is None or time.ndim != 1 or time.size == 0:
+        return None
+    # noinspection PyBroadException
+    try:
+        return [pd.Timestamp(time.values.min()).isoformat(), pd.Timestamp(time.values.max()).isoformat()]
+    except Exception:
+        return None
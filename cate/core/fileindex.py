@@ -0,0 +1,137 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Description
+===========
+
+This module defines the :py:class:`FileIndex` class, the base class of persistent indexes of
+individual local files, such as :py:class:`cate.core.dsindex.DatasetFileIndex` and
+:py:class:`cate.core.refindex.ReferenceIndex`.
+
+An index is a JSON file which maps absolute file paths to entries. Entries record the modification time
+and size of their files, see :py:func:`stat_file`, so that they can be invalidated if a file changes.
+
+Components
+==========
+"""
+
+import json
+import logging
+import os
+import os.path
+import uuid
+from threading import RLock
+from typing import Any, Dict, List, Optional
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+
+class FileIndex:
+    """
+    A persistent index of entries for individual local files. Instances are thread-safe.
+    The index is read on first access and written by :py:meth:`save` only, if entries
+    have been added, changed or removed since.
+
+    :param index_file: The path of the JSON file that holds the index.
+    :param version: The version of the format of index entries. Index files of other versions are ignored.
+    :param title: The title of the index used in log messages.
+    """
+
+    def __init__(self, index_file: str, version: int, title: str):
+        self._index_file = index_file
+        self._version = version
+        self._title = title
+        self._entries = None
+        self._is_modified = False
+        self._lock = RLock()
+
+    @property
+    def index_file(self) -> str:
+        return self._index_file
+
+    def save(self) -> None:
+        """Write the index, if it has been modified."""
+        with self._lock:
+            if not self._is_modified:
+                return
+            index_json = json.dumps(dict(version=self._version, entries=self._entries))
+            self._is_modified = False
+        temp_file = '%s.%s.tmp' % (self._index_file, uuid.uuid4().hex)
+        # noinspection PyBroadException
+        try:
+            os.makedirs(os.path.dirname(self._index_file) or '.', exist_ok=True)
+            with open(temp_file, 'w') as fp:
+                fp.write(index_json)
+            os.replace(temp_file, self._index_file)
+        except Exception:
+            _LOG.exception('writing %s "%s" failed' % (self._title, self._index_file))
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def _get_entry(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._get_entries().get(os.path.abspath(path))
+
+    def _set_entry(self, path: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            entries = self._get_entries()
+            path = os.path.abspath(path)
+            if entries.get(path) != entry:
+                entries[path] = entry
+                self._is_modified = True
+
+    def _remove_entry(self, path: str) -> None:
+        with self._lock:
+            if self._get_entries().pop(os.path.abspath(path), None) is not None:
+                self._is_modified = True
+
+    def _get_entries(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._entries is None:
+                self._entries = dict()
+                if os.path.isfile(self._index_file):
+                    # noinspection PyBroadException
+                    try:
+                        with open(self._index_file) as fp:
+                            index = json.load(fp)
+                        if index.get('version') == self._version:
+                            self._entries = index.get('entries') or dict()
+                    except Exception:
+                        _LOG.exception('reading %s "%s" failed' % (self._title, self._index_file))
+            return self._entries
+
+
+def stat_file(path: str) -> Optional[List[int]]:
+    """
+    Get the modification time in nanoseconds and the size of the local file given by *path*.
+
+    :param path: The file path.
+    :return: The list [mtime, size] or ``None``, if *path* is not a local file.
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
@@ -0,0 +1,419 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module defines the :py:class:`ReferenceIndex` class, a persistent index that maps the chunks of the variables
+of NetCDF4/HDF5 files to their byte ranges within these files.
+
+The references of multiple files are combined into a single virtual Zarr dataset, which is opened
+using the "reference" file system of the ``fsspec`` package. This way, a multi-file dataset is opened
+as a single lazy dataset without opening the individual files.
+
+The reference format is the one used by the ``kerchunk`` package, version 1.
+
+Components
+==========
+"""
+
+import base64
+import json
+import logging
+import os
+import os.path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import xarray as xr
+
+from .fileindex import FileIndex, stat_file
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+#: Increment, if the format of index entries changes
+_INDEX_VERSION = 1
+
+#: Attributes used by netCDF4/HDF5 to describe dimensions and other internals
+_INTERNAL_ATTR_NAMES = {'CLASS', 'NAME', 'DIMENSION_LIST', 'REFERENCE_LIST', '_Netcdf4Dimid', '_Netcdf4Coordinates',
+                        '_NCProperties', '_nc3_strict', '_FillValue'}
+
+#: Variables encoding times with more elements are not recorded by value
+_MAX_TIME_VALUES = 100000
+
+
+class ReferenceIndex(FileIndex):
+    """
+    A persistent index of chunk references for NetCDF4/HDF5 files.
+    Entries are updated incrementally, that is, only new or modified files are read.
+
+    :param index_file: The path of the JSON file that holds the index.
+    """
+
+    def __init__(self, index_file: str):
+        super().__init__(index_file, _INDEX_VERSION, 'reference index')
+
+    def update(self, paths: Sequence[str]) -> None:
+        """
+        Read the references of files given by *paths*, if they are not yet indexed or have changed since.
+
+        :param paths: File paths.
+        """
+        for path in paths:
+            stat = stat_file(path)
+            if stat is None:
+                continue
+            entry = self._get_entry(path)
+            if entry is not None and entry['stat'] == stat:
+                continue
+            try:
+                file_refs = get_file_references(path)
+            except (OSError, ValueError) as e:
+                # Don't try again until the file changes
+                _LOG.info('cannot create references for "%s": %s' % (path, e))
+                file_refs = None
+            self._set_entry(path, dict(stat=stat, refs=file_refs))
+
+    def remove(self, paths: Sequence[str]) -> None:
+        """Remove the entries of the files given by *paths*."""
+        for path in paths:
+            self._remove_entry(path)
+
+    def get_references(self, paths: Sequence[str], concat_dim: str = 'time') -> Optional[Dict[str, Any]]:
+        """
+        Get the combined references of the files given by *paths*.
+
+        :param paths: File paths.
+        :param concat_dim: The name of the dimension along which the files are concatenated.
+        :return: The combined references or ``None``, if any of the files are not indexed,
+                 have changed since, or cannot be combined.
+        """
+        file_refs_list = []
+        for path in paths:
+            entry = self._get_entry(path)
+            if entry is None or entry['refs'] is None or entry['stat'] != stat_file(path):
+                return None
+            file_refs_list.append(entry['refs'])
+        if not file_refs_list:
+            return None
+        try:
+            return combine_file_references(file_refs_list, concat_dim=concat_dim)
+        except ValueError as e:
+            _LOG.info('cannot combine references: %s' % e)
+            return None
+
+    def open_dataset(self, paths: Sequence[str], concat_dim: str = 'time') -> Optional[xr.Dataset]:
+        """
+        Open the files given by *paths* as a single lazy dataset.
+
+        :param paths: File paths.
+        :param concat_dim: The name of the dimension along which the files are concatenated.
+        :return: The dataset or ``None``, if the files cannot be opened using references.
+        """
+        refs = self.get_references(paths, concat_dim=concat_dim)
+        return open_references(refs) if refs is not None else None
+
+
+def get_file_references(path: str) -> Dict[str, Any]:
+    """
+    Get the references of the chunks of all variables of the NetCDF4/HDF5 file given by *path*.
+
+    :param path: The file path.
+    :return: A dictionary comprising the references of the virtual Zarr dataset in the key "refs" and
+             the raw values of variables encoding times in the key "time_values".
+    :raise ValueError: If the file uses features that cannot be expressed by references.
+    :raise OSError: If the file cannot be read.
+    """
+    import h5py
+
+    path = os.path.abspath(path)
+    refs = {'.zgroup': json.dumps(dict(zarr_format=2))}
+    time_values = dict()
+    with h5py.File(path, 'r') as h5_file:
+        refs['.zattrs'] = json.dumps(_get_attrs(h5_file))
+        variables = {name: item for name, item in h5_file.items() if isinstance(item, h5py.Dataset)}
+        time_units = _get_time_units(variables)
+        for var_name, variable in variables.items():
+            if _is_dimension_without_variable(variable):
+                continue
+            var_attrs = _get_attrs(variable)
+            var_attrs['_ARRAY_DIMENSIONS'] = _get_dim_names(var_name, variable)
+            refs[var_name + '/.zattrs'] = json.dumps(var_attrs)
+            refs[var_name + '/.zarray'] = json.dumps(_get_zarray(var_name, variable))
+            refs.update(_get_chunk_refs(path, var_name, variable))
+            if var_name in time_units and variable.size <= _MAX_TIME_VALUES:
+                time_values[var_name] = dict(values=variable[()].tolist(), **time_units[var_name])
+    return dict(refs=refs, time_values=time_values)
+
+
+def combine_file_references(file_refs_list: List[Dict[str, Any]], concat_dim: str = 'time') -> Dict[str, Any]:
+    """
+    Combine the references of multiple files into the references of a single virtual Zarr dataset.
+    Variables having the dimension *concat_dim* are concatenated, other variables and global attributes
+    are taken from the first file.
+
+    :param file_refs_list: List of file references as returned by :py:func:`get_file_references`.
+    :param concat_dim: The name of the dimension along which the files are concatenated.
+    :return: The references in the format understood by the ``fsspec`` "reference" file system.
+    :raise ValueError: If the file references cannot be combined.
+    """
+    first_refs = file_refs_list[0]['refs']
+    combined_refs = {key: value for key, value in first_refs.items() if not _is_chunk_key(key)}
+    var_names = [key[0: -len('/.zarray')] for key in first_refs if key.endswith('/.zarray')]
+    var_dims = {var_name: json.loads(first_refs[var_name + '/.zattrs'])['_ARRAY_DIMENSIONS']
+                for var_name in var_names}
+    if not any(concat_dim in dims for dims in var_dims.values()):
+        raise ValueError('dimension "%s" not found' % concat_dim)
+    for var_name in var_names:
+        zarray = json.loads(first_refs[var_name + '/.zarray'])
+        dims = var_dims[var_name]
+        if concat_dim not in dims:
+            combined_refs.update({key: value for key, value in first_refs.items()
+                                  if _is_chunk_key(key, var_name)})
+            continue
+        axis = dims.index(concat_dim)
+        if len(file_refs_list) == 1:
+            combined_refs.update({key: value for key, value in first_refs.items()
+                                  if _is_chunk_key(key, var_name)})
+            continue
+        has_time_values = _has_time_values(file_refs_list, var_name)
+        if _are_equal(file_refs_list, var_name + '/.zattrs') \
+                and (not has_time_values or _has_regular_chunks(file_refs_list, var_name, axis)):
+            combined_refs.update(_concat_chunk_refs(file_refs_list, var_name, zarray, axis))
+        elif has_time_values:
+            # Times are encoded using different units, e.g. "days since <file's date>", or are chunked irregularly,
+            # e.g. unlimited variables holding a single time per file but using the default chunk size of 512
+            combined_refs.update(_concat_time_values(file_refs_list, var_name, zarray))
+        else:
+            raise ValueError('attributes of variable "%s" differ' % var_name)
+    return dict(version=1, refs=combined_refs)
+
+
+def open_references(refs: Dict[str, Any], chunks: Any = None) -> xr.Dataset:
+    """
+    Open a virtual Zarr dataset given by references.
+
+    :param refs: The references as returned by :py:func:`combine_file_references`.
+    :param chunks: Chunk sizes passed to ``xarray.open_zarr()``.
+           Defaults to the chunking of the referenced files.
+    :return: A lazy dataset.
+    """
+    return xr.open_zarr('reference://',
+                        consolidated=False,
+                        chunks={} if chunks is None else chunks,
+                        storage_options=dict(fo=refs, remote_protocol='file'))
+
+
+def _concat_chunk_refs(file_refs_list, var_name, zarray, axis):
+    chunk_size = zarray['chunks'][axis]
+    shape = list(zarray['shape'])
+    shape[axis] = 0
+    chunk_refs = dict()
+    num_files = len(file_refs_list)
+    for i, file_refs in enumerate(file_refs_list):
+        refs = file_refs['refs']
+        if var_name + '/.zarray' not in refs:
+            raise ValueError('variable "%s" not found in all files' % var_name)
+        file_zarray = json.loads(refs[var_name + '/.zarray'])
+        length = file_zarray['shape'][axis]
+        if _zarray_without_shape(file_zarray, axis) != _zarray_without_shape(zarray, axis):
+            raise ValueError('shape, chunking or encoding of variable "%s" differ' % var_name)
+        if length % chunk_size != 0 and i < num_files - 1:
+            # Zarr requires all chunks but the last one to be of the same size
+            raise ValueError('irregular chunks of variable "%s"' % var_name)
+        chunk_offset = shape[axis] // chunk_size
+        for key, value in refs.items():
+            if _is_chunk_key(key, var_name):
+                chunk_index = key[len(var_name) + 1:].split('.')
+                chunk_index[axis] = str(int(chunk_index[axis]) + chunk_offset)
+                chunk_refs[var_name + '/' + '.'.join(chunk_index)] = value
+        shape[axis] += length
+    concat_zarray = dict(zarray, shape=shape)
+    chunk_refs[var_name + '/.zarray'] = json.dumps(concat_zarray)
+    return chunk_refs
+
+
+def _has_time_values(file_refs_list, var_name) -> bool:
+    return all(var_name in file_refs['time_values'] for file_refs in file_refs_list)
+
+
+def _has_regular_chunks(file_refs_list, var_name, axis) -> bool:
+    """Test whether the lengths of all files but the last one are multiples of the chunk size along *axis*."""
+    for file_refs in file_refs_list[:-1]:
+        zarray_json = file_refs['refs'].get(var_name + '/.zarray')
+        if zarray_json is None:
+            return False
+        file_zarray = json.loads(zarray_json)
+        if file_zarray['shape'][axis] % file_zarray['chunks'][axis] != 0:
+            return False
+    return True
+
+
+def _concat_time_values(file_refs_list, var_name, zarray):
+    from xarray.coding.times import decode_cf_datetime, encode_cf_datetime
+
+    first_time_values = file_refs_list[0]['time_values'][var_name]
+    units = first_time_values['units']
+    calendar = first_time_values.get('calendar')
+    times = [decode_cf_datetime(np.array(file_refs['time_values'][var_name]['values']),
+                                file_refs['time_values'][var_name]['units'],
+                                calendar=file_refs['time_values'][var_name].get('calendar'))
+             for file_refs in file_refs_list]
+    values, _, _ = encode_cf_datetime(np.concatenate(times), units=units, calendar=calendar)
+    values = np.ascontiguousarray(values)
+    concat_zarray = dict(zarray,
+                         shape=list(values.shape),
+                         chunks=list(values.shape),
+                         dtype=values.dtype.str,
+                         compressor=None,
+                         filters=None)
+    chunk_key = var_name + '/' + _first_chunk_index(values.ndim)
+    return {var_name + '/.zarray': json.dumps(concat_zarray),
+            chunk_key: 'base64:' + base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def _first_chunk_index(ndim: int) -> str:
+    return '.'.join(['0'] * ndim) if ndim else '0'
+
+
+def _zarray_without_shape(zarray, axis):
+    zarray = dict(zarray)
+    shape = list(zarray.pop('shape'))
+    shape.pop(axis)
+    return zarray, shape
+
+
+def _are_equal(file_refs_list, key):
+    first_value = file_refs_list[0]['refs'].get(key)
+    return all(file_refs['refs'].get(key) == first_value for file_refs in file_refs_list)
+
+
+def _is_chunk_key(key: str, var_name: str = None) -> bool:
+    if '/' not in key:
+        return False
+    key_var_name, chunk_key = key.rsplit('/', 1)
+    return not chunk_key.startswith('.') and (var_name is None or key_var_name == var_name)
+
+
+def _get_zarray(var_name, variable):
+    dtype = variable.dtype
+    if dtype.kind not in 'biufS':
+        raise ValueError('data type "%s" of variable "%s" is not supported' % (dtype, var_name))
+    if variable.fletcher32 or variable.scaleoffset is not None:
+        raise ValueError('filters of variable "%s" are not supported' % var_name)
+    compressor = None
+    if variable.compression == 'gzip':
+        compressor = dict(id='zlib', level=variable.compression_opts)
+    elif variable.compression is not None:
+        raise ValueError('compression "%s" of variable "%s" is not supported' % (variable.compression, var_name))
+    filters = [dict(id='shuffle', elementsize=dtype.itemsize)] if variable.shuffle else None
+    fill_value = variable.attrs.get('_FillValue')
+    if fill_value is not None:
+        fill_value = _to_json_value(np.asarray(fill_value).reshape(-1)[0]) if dtype.kind != 'S' else None
+        if isinstance(fill_value, float) and not np.isfinite(fill_value):
+            fill_value = 'NaN' if np.isnan(fill_value) else ('Infinity' if fill_value > 0 else '-Infinity')
+    return dict(zarr_format=2,
+                shape=list(variable.shape),
+                chunks=list(variable.chunks or variable.shape),
+                dtype=dtype.str,
+                compressor=compressor,
+                filters=filters,
+                fill_value=fill_value,
+                order='C')
+
+
+def _get_chunk_refs(path, var_name, variable):
+    chunk_refs = dict()
+    if variable.chunks is None:
+        # Contiguous or compact storage, so there is a single chunk
+        chunk_key = var_name + '/' + _first_chunk_index(variable.ndim)
+        offset = variable.id.get_offset()
+        if offset is not None:
+            chunk_refs[chunk_key] = [path, offset, variable.id.get_storage_size()]
+        elif variable.size > 0:
+            # Compact storage, data is stored in the object header
+            data = np.ascontiguousarray(variable[()])
+            chunk_refs[chunk_key] = 'base64:' + base64.b64encode(data.tobytes()).decode('ascii')
+        return chunk_refs
+    for i in range(variable.id.get_num_chunks()):
+        chunk_info = variable.id.get_chunk_info(i)
+        if chunk_info.filter_mask != 0:
+            raise ValueError('partially filtered chunks of variable "%s" are not supported' % var_name)
+        chunk_index = [str(offset // size) for offset, size in zip(chunk_info.chunk_offset, variable.chunks)]
+        chunk_refs[var_name + '/' + '.'.join(chunk_index)] = [path, chunk_info.byte_offset, chunk_info.size]
+    return chunk_refs
+
+
+def _get_dim_names(var_name, variable) -> List[str]:
+    import h5py
+
+    if variable.ndim == 1 and h5py.h5ds.is_scale(variable.id):
+        return [var_name]
+    dim_names = []
+    for dim in variable.dims:
+        if len(dim) == 0:
+            raise ValueError('dimensions of variable "%s" are unknown' % var_name)
+        dim_names.append(dim[0].name.split('/')[-1])
+    return dim_names
+
+
+def _is_dimension_without_variable(variable) -> bool:
+    name = variable.attrs.get('NAME')
+    if isinstance(name, bytes):
+        name = name.decode('utf-8', errors='replace')
+    return isinstance(name, str) and name.startswith('This is a netCDF dimension but not a netCDF variable')
+
+
+def _get_time_units(variables) -> Dict[str, Dict[str, str]]:
+    """Get units and calendar of variables that encode times, including their bounds variables."""
+    time_units = dict()
+    for var_name, variable in variables.items():
+        units = _to_json_value(variable.attrs.get('units'))
+        if isinstance(units, str) and ' since ' in units:
+            calendar = _to_json_value(variable.attrs.get('calendar'))
+            time_units[var_name] = dict(units=units, calendar=calendar)
+            bounds_var_name = _to_json_value(variable.attrs.get('bounds'))
+            if bounds_var_name in variables and 'units' not in variables[bounds_var_name].attrs:
+                time_units[bounds_var_name] = dict(units=units, calendar=calendar)
+    return time_units
+
+
+def _get_attrs(h5_object) -> Dict[str, Any]:
+    attrs = dict()
+    for name, value in h5_object.attrs.items():
+        if name not in _INTERNAL_ATTR_NAMES:
+            attrs[name] = _to_json_value(value)
+    return attrs
+
+
+def _to_json_value(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if isinstance(value, np.ndarray):
+        if value.size == 1:
+            return _to_json_value(value.reshape(-1)[0])
+        return [_to_json_value(item) for item in value.tolist()]
+    if isinstance(value, np.generic):
+        return _to_json_value(value.item())
+    return value
@@ -0,0 +1,258 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module defines the :py:class:`StepCache` class, a persistent, size-bounded cache for the
+results of workflow steps.
+
+Results are keyed by a step's fingerprint, see :py:meth:`cate.core.workflow.Node.get_fingerprint`,
+which is computed from the qualified operation name, the operation version, the constant input values and
+the fingerprints of the steps that provide the other input values. Therefore a result can be reused after
+reopening a workspace, after renaming a step, or after re-creating a step with the same inputs.
+
+Currently, only dataset results are cached. They are stored as NetCDF or Zarr files and the stored datasets
+are used as step results, so that lazily computed results are computed only once. Files of evicted results are
+removed only after all datasets opened from them have been released.
+
+Components
+==========
+"""
+
+import logging
+import os
+import os.path
+import shutil
+import threading
+import uuid
+import weakref
+from typing import Any, Optional
+
+import xarray as xr
+
+from ..util.cache import Cache, CacheStore, POLICY_LRU
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+#: Maps a persistence format name to the tuple (filename extension, open function, write method name)
+_PERSISTENCE_FORMATS = dict(netcdf4=('nc', xr.open_dataset, 'to_netcdf'),
+                            zarr=('zarr', xr.open_zarr, 'to_zarr'))
+
+
+class DatasetFileCacheStore(CacheStore):
+    """
+    A cache store for datasets which are persisted as files (NetCDF) or directories (Zarr).
+    The size of a stored value is given in bytes.
+
+    The store keeps track of the datasets opened from its files. Discarding a value whose datasets
+    are still referenced, e.g. by resources of an open workspace, defers the removal of its file until
+    these datasets have been released.
+
+    :param cache_dir: The cache directory.
+    :param persistence_format: The persistence format, either "netcdf4" or "zarr".
+    """
+
+    def __init__(self, cache_dir: str, persistence_format: str = 'netcdf4'):
+        if persistence_format not in _PERSISTENCE_FORMATS:
+            raise ValueError('unknown persistence format "%s"' % persistence_format)
+        self.cache_dir = cache_dir
+        self.ext, self._open_dataset, self._write_attr = _PERSISTENCE_FORMATS[persistence_format]
+        self._lock = threading.Lock()
+        # Maps a key to the last dataset opened from its path, as long as it is referenced
+        self._open_datasets = weakref.WeakValueDictionary()
+        # Maps a key to the number of referenced datasets opened from its path
+        self._open_counts = dict()
+        # Keys whose paths are removed as soon as no dataset opened from them is referenced anymore
+        self._discarded_keys = set()
+
+    def list_keys(self):
+        """Return the keys of all values held by this store."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        suffix = '.' + self.ext
+        # Names of temporary files start with a dot
+        return [filename[0: -len(suffix)] for filename in sorted(os.listdir(self.cache_dir))
+                if filename.endswith(suffix) and not filename.startswith('.')]
+
+    def can_load_from_key(self, key) -> bool:
+        return os.path.exists(self._key_to_path(key))
+
+    def load_from_key(self, key):
+        path = self._key_to_path(key)
+        return path, _get_path_size(path)
+
+    def store_value(self, key, value):
+        """
+        Write the dataset *value* to a temporary path first and then move it to its final location,
+        so that concurrent readers never observe incomplete datasets.
+        """
+        path = self._key_to_path(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = os.path.join(self.cache_dir, '.%s-%s.%s' % (key, uuid.uuid4().hex, self.ext))
+        try:
+            getattr(value, self._write_attr)(temp_path)
+            _remove_path(path)
+            os.replace(temp_path, path)
+        finally:
+            _remove_path(temp_path)
+        return path, _get_path_size(path)
+
+    def restore_value(self, key, stored_value):
+        # Don't raise here, as the cache would remain locked
+        # noinspection PyBroadException
+        try:
+            dataset = self._open_dataset(self._key_to_path(key))
+        except Exception:
+            _LOG.exception('reading cached dataset "%s" failed' % key)
+            return None
+        with self._lock:
+            self._open_datasets[key] = dataset
+            self._open_counts[key] = self._open_counts.get(key, 0) + 1
+            self._discarded_keys.discard(key)
+        weakref.finalize(dataset, self._release_dataset, key)
+        return dataset
+
+    def discard_value(self, key, stored_value):
+        with self._lock:
+            if self._open_counts.get(key):
+                self._discarded_keys.add(key)
+                return
+        _remove_path(self._key_to_path(key))
+
+    def get_open_dataset(self, key) -> Optional[xr.Dataset]:
+        """Get a still referenced dataset opened from the path of the given *key*, if any."""
+        with self._lock:
+            return self._open_datasets.get(key)
+
+    def _release_dataset(self, key):
+        with self._lock:
+            open_count = self._open_counts.pop(key) - 1
+            if open_count > 0:
+                self._open_counts[key] = open_count
+                return
+            if key not in self._discarded_keys:
+                return
+            self._discarded_keys.remove(key)
+        _remove_path(self._key_to_path(key))
+
+    def _key_to_path(self, key):
+        return os.path.join(self.cache_dir, '%s.%s' % (key, self.ext))
+
+
+class StepCache:
+    """
+    A persistent, size-bounded cache for workflow step results that are keyed by step fingerprints.
+    The least recently used results are discarded first.
+
+    :param cache_dir: The cache directory.
+    :param capacity: The capacity of the cache in bytes.
+    :param persistence_format: The persistence format, either "netcdf4" or "zarr".
+    """
+
+    def __init__(self, cache_dir: str, capacity: int, persistence_format: str = 'netcdf4'):
+        self._store = DatasetFileCacheStore(cache_dir, persistence_format=persistence_format)
+        self._cache = Cache(self._store, capacity=capacity, threshold=0.75, policy=POLICY_LRU)
+        # Account for results stored by former sessions
+        self._cache.load_keys(self._store.list_keys())
+
+    @property
+    def cache_dir(self) -> str:
+        return self._store.cache_dir
+
+    @property
+    def size(self) -> int:
+        """The current size of this cache in bytes."""
+        return self._cache.size
+
+    def get_value(self, fingerprint: str) -> Optional[Any]:
+        """
+        Get a cached step result.
+
+        :param fingerprint: The fingerprint of the step.
+        :return: The cached result or ``None``.
+        """
+        value = self._store.get_open_dataset(fingerprint)
+        if value is not None:
+            # Still in use, even if it has been evicted meanwhile
+            return value
+        value = self._cache.get_value(fingerprint)
+        if value is None:
+            # Either not cached or not readable, so make sure it is recomputed and stored again
+            self._cache.remove_value(fingerprint)
+        return value
+
+    def put_value(self, fingerprint: str, value: Any) -> Any:
+        """
+        Cache a step result. Values other than datasets are ignored.
+
+        Writing a dataset computes it. Therefore the dataset opened from the cache is returned, which should
+        be used instead of *value*, so that a lazily computed *value* is not computed a second time.
+
+        :param fingerprint: The fingerprint of the step.
+        :param value: The step result.
+        :return: The value to be used as step result.
+        """
+        if not isinstance(value, xr.Dataset):
+            return value
+        open_value = self._store.get_open_dataset(fingerprint)
+        if open_value is not None:
+            # Equal fingerprints imply equal values, and the stored one must not be overwritten while in use
+            return open_value
+        # Write the dataset outside the cache's lock, as writing may take a while.
+        # noinspection PyBroadException
+        try:
+            self._store.store_value(fingerprint, value)
+        except Exception:
+            _LOG.exception('writing cached step result "%s" failed' % fingerprint)
+            return value
+        # Open the stored dataset before the cache may evict it
+        stored_value = self._store.restore_value(fingerprint, None)
+        self._cache.load_keys([fingerprint])
+        return stored_value if stored_value is not None else value
+
+    def clear(self) -> None:
+        """Remove all cached step results."""
+        self._cache.clear()
+
+
+def _get_path_size(path: str) -> int:
+    if os.path.isdir(path):
+        size = 0
+        for dir_path, _, filenames in os.walk(path):
+            for filename in filenames:
+                size += os.path.getsize(os.path.join(dir_path, filename))
+        return size
+    return os.path.getsize(path)
+
+
+def _remove_path(path: str) -> None:
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        # On some platforms, files cannot be removed while still opened
+        _LOG.warning('failed to remove "%s"' % path)
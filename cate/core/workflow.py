@@ -113,10 +113,16 @@ Components
 ==========
 """
 
+import hashlib
+import json
+import os
+import os.path
 from abc import ABCMeta, abstractmethod
 from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from io import IOBase
 from itertools import chain
+from threading import RLock
 from typing import Optional, Union, List, Dict
 
 from .op import OP_REGISTRY, Operation, Monitor, new_expression_op, new_subprocess_op
@@ -355,6 +361,25 @@ class Node(metaclass=ABCMeta):
         value_cache = context.get('value_cache')
         return value_cache if self.op_meta_info.can_cache else None
 
+    def _get_step_cache(self, context: Dict):
+        """
+        Get the 'step_cache' entry from context
+        only if this node is allowed to cache, otherwise return None.
+        """
+        step_cache = context.get('step_cache')
+        return step_cache if self.op_meta_info.can_cache else None
+
+    def get_fingerprint(self, fingerprints: Dict['Node', Optional[str]] = None) -> Optional[str]:
+        """
+        Compute a fingerprint that identifies the output values of this node by their origin rather than by
+        the node's ID, so that equal fingerprints imply equal output values.
+
+        :param fingerprints: An optional dictionary that memoizes the fingerprints of nodes computed so far.
+               Fingerprints found in it are not computed again, computed ones are added to it.
+        :return: A hexadecimal digest string or ``None``, if this node's outputs cannot be fingerprinted.
+        """
+        return None
+
     def set_input_values(self, input_values):
         for node_input in self.inputs[:]:
             node_input.value = input_values[node_input.name]
@@ -612,24 +637,75 @@ class Workflow(Node):
                      steps: List['Step'],
                      context: Dict = None,
                      monitor_label: str = None,
-                     monitor=Monitor.NONE) -> None:
+                     monitor=Monitor.NONE,
+                     max_workers: int = None) -> None:
         """
         Invoke just the given steps.
 
+        If *max_workers* is greater than one, steps are scheduled according to their dependencies:
+        a step is invoked as soon as all steps it requires have been invoked, so that independent
+        steps are executed concurrently by a pool of at most *max_workers* threads.
+        Otherwise, the steps are invoked one after the other in the given order.
+
         :param steps: Selected steps of this workflow.
         :param context: An optional execution context
         :param monitor_label: An optional label for the progress monitor.
         :param monitor: The progress monitor.
+        :param max_workers: The maximum number of steps that may be invoked concurrently.
         """
         context = _new_context(context, workflow=self)
+        # Each step's fingerprint, e.g. including file system stats, is computed at most once per invocation
+        context.setdefault('step_fingerprints', dict())
         step_count = len(steps)
         if step_count == 1:
             steps[0].invoke(context=context, monitor=monitor)
         elif step_count > 1:
             monitor_label = monitor_label or "Executing {step_count} workflow step(s)"
             with monitor.starting(monitor_label.format(step_count=step_count), step_count):
-                for step in steps:
-                    step.invoke(context=context, monitor=monitor.child(work=1))
+                if max_workers is not None and max_workers > 1:
+                    self._invoke_steps_concurrently(steps, context, monitor, max_workers)
+                else:
+                    for step in steps:
+                        step.invoke(context=context, monitor=monitor.child(work=1))
+
+    @classmethod
+    def _invoke_steps_concurrently(cls,
+                                   steps: List['Step'],
+                                   context: Dict,
+                                   monitor: Monitor,
+                                   max_workers: int) -> None:
+        # For each step, the set of other given steps it requires
+        pending_steps = OrderedDict()
+        for step in steps:
+            pending_steps[step] = {other_step for other_step in steps
+                                   if other_step is not step and step.requires(other_step)}
+
+        invoked_steps = set()
+        running_steps = dict()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cate-workflow') as executor:
+            try:
+                while pending_steps or running_steps:
+                    monitor.check_for_cancellation()
+                    ready_steps = [step for step, required_steps in pending_steps.items()
+                                   if required_steps <= invoked_steps]
+                    for step in ready_steps:
+                        del pending_steps[step]
+                        future = executor.submit(step.invoke, context=context, monitor=monitor.child(work=1))
+                        running_steps[future] = step
+                    if not running_steps:
+                        raise ValueError('cannot invoke steps %s, dependencies cannot be resolved'
+                                         % ', '.join(step.id for step in pending_steps))
+                    done_futures, _ = wait(running_steps, return_when=FIRST_COMPLETED)
+                    for future in done_futures:
+                        step = running_steps.pop(future)
+                        # Re-raise any exception, including a Cancellation, of the invoked step
+                        future.result()
+                        invoked_steps.add(step)
+            except BaseException:
+                # Don't start any steps not yet running. The executor waits for the running ones.
+                for future in running_steps:
+                    future.cancel()
+                raise
 
     @classmethod
     def load(cls, file_path_or_fp: Union[str, IOBase], registry=OP_REGISTRY) -> 'Workflow':
@@ -977,7 +1053,16 @@ class OpStepBase(Step, metaclass=ABCMeta):
         if value_cache is not None and self.id in value_cache and value_cache[self.id] is not UNDEFINED:
             return_value = value_cache[self.id]
         else:
-            return_value = self._op(monitor=monitor, **input_values)
+            step_cache = self._get_step_cache(context)
+            # Data read by input operations is not copied into the cache
+            fingerprint = self.get_fingerprint(context.get('step_fingerprints')) \
+                if step_cache is not None and not self._is_input_step else None
+            return_value = step_cache.get_value(fingerprint) if fingerprint else None
+            if return_value is None:
+                return_value = self._op(monitor=monitor, **input_values)
+                if fingerprint:
+                    # Continue with the stored value, so that lazy results are not computed again
+                    return_value = step_cache.put_value(fingerprint, return_value)
             if value_cache is not None:
                 value_cache[self.id] = return_value
 
@@ -987,6 +1072,58 @@ class OpStepBase(Step, metaclass=ABCMeta):
         else:
             self.outputs[OpMetaInfo.RETURN_OUTPUT_NAME].value = return_value
 
+    def get_fingerprint(self, fingerprints: Dict[Node, Optional[str]] = None) -> Optional[str]:
+        """
+        Compute a fingerprint from the qualified operation name, the operation version, the constant input values
+        and the fingerprints of the steps providing the other input values.
+
+        Steps of operations that read data (tag "input") are fingerprinted by their input values, e.g. data source
+        identifiers, time ranges, regions and variable names. If an input value names a local file or directory,
+        its modification time and size are included too.
+
+        Steps whose operation cannot cache or uses context inputs are not fingerprinted.
+
+        :param fingerprints: An optional dictionary that memoizes the fingerprints of nodes computed so far.
+               Fingerprints found in it are not computed again, computed ones are added to it.
+        :return: A hexadecimal digest string or ``None``, if this step's output cannot be fingerprinted.
+        """
+        if fingerprints is None:
+            return self._compute_fingerprint(None)
+        if self not in fingerprints:
+            fingerprints[self] = self._compute_fingerprint(fingerprints)
+        return fingerprints[self]
+
+    def _compute_fingerprint(self, fingerprints: Optional[Dict[Node, Optional[str]]]) -> Optional[str]:
+        op_meta_info = self.op_meta_info
+        if not op_meta_info.can_cache:
+            return None
+        is_input_step = self._is_input_step
+        input_fingerprints = []
+        for node_input in self.inputs[:]:
+            if op_meta_info.inputs[node_input.name].get('context'):
+                return None
+            if node_input.is_source or node_input.is_value:
+                input_fingerprint = _get_port_fingerprint(node_input, fingerprints)
+                if input_fingerprint is None:
+                    return None
+                input_fingerprints.append((node_input.name, input_fingerprint))
+                if is_input_step and node_input.is_value and isinstance(node_input.value, str) \
+                        and os.path.exists(node_input.value):
+                    path_stat = _get_path_stat(node_input.value)
+                    if path_stat is None:
+                        return None
+                    input_fingerprints.append((node_input.name + '#stat', path_stat))
+        fingerprint_json = json.dumps([op_meta_info.qualified_name,
+                                       op_meta_info.header.get('version'),
+                                       self._body_string(),
+                                       input_fingerprints])
+        return hashlib.sha256(fingerprint_json.encode('utf-8')).hexdigest()
+
+    @property
+    def _is_input_step(self) -> bool:
+        """Whether this step's operation reads data, e.g. from files or data sources."""
+        return 'input' in (self.op_meta_info.header.get('tags') or ())
+
     def __call__(self, monitor=Monitor.NONE, **input_values):
         """
         Make this class instance's callable.
@@ -1504,6 +1641,40 @@ class NodePort:
         return "NodePort(%s, %s)" % (repr(self.node_id), repr(self.name))
 
 
+def _get_port_fingerprint(port: NodePort, fingerprints: Optional[Dict[Node, Optional[str]]] = None) -> Optional[str]:
+    source = port.source
+    if source is not None:
+        if isinstance(source.node, Step):
+            node_fingerprint = source.node.get_fingerprint(fingerprints)
+            return '%s.%s' % (node_fingerprint, source.name) if node_fingerprint else None
+        return _get_port_fingerprint(source, fingerprints)
+    if not port.is_value:
+        return None
+    try:
+        return json.dumps(port.value, sort_keys=True)
+    except (TypeError, ValueError):
+        # Value is not JSON-serializable
+        return None
+
+
+def _get_path_stat(path: str) -> Optional[List[int]]:
+    # The modification time and size of a local file, or the latest modification time
+    # and the total size of the files in a local directory, e.g. a Zarr dataset
+    try:
+        stat = os.stat(path)
+        mtime, size = stat.st_mtime_ns, stat.st_size
+        if os.path.isdir(path):
+            size = 0
+            for dir_path, _, filenames in os.walk(path):
+                for filename in filenames:
+                    stat = os.stat(os.path.join(dir_path, filename))
+                    mtime, size = max(mtime, stat.st_mtime_ns), size + stat.st_size
+        return [mtime, size]
+    except OSError:
+        # File has been removed or is not accessible
+        return None
+
+
 def _wire_target_node_graph_nodes(target_node, graph_nodes):
     for _, target_port in target_node.inputs:
         _wire_target_port_graph_nodes(target_port, graph_nodes)
@@ -1533,6 +1704,8 @@ class ValueCache(dict):
         super(ValueCache, self).__init__()
         self._id_infos = dict()
         self._last_id = 0
+        # Steps of a workflow may be invoked concurrently, see Workflow.invoke_steps()
+        self._lock = RLock()
 
     def __del__(self):
         """Override the ``dict`` method to close any old values."""
@@ -1546,13 +1719,14 @@ class ValueCache(dict):
         Override the ``dict`` method to close any old value and generate a new ID,
         if *key* didn't exist before.
         """
-        old_value = self.get(key)
-        id_info = self._id_infos.get(key)
-        self._set(key, value)
-        if id_info:
-            self._id_infos[key] = id_info[0], id_info[1] + 1
-        else:
-            self._id_infos[key] = self._gen_id(), 0
+        with self._lock:
+            old_value = self.get(key)
+            id_info = self._id_infos.get(key)
+            self._set(key, value)
+            if id_info:
+                self._id_infos[key] = id_info[0], id_info[1] + 1
+            else:
+                self._id_infos[key] = self._gen_id(), 0
         if old_value is not value:
             self._close_value(old_value)
 
@@ -1561,9 +1735,10 @@ class ValueCache(dict):
 
     def __delitem__(self, key):
         """Override the ``dict`` method to close the value and remove its ID."""
-        old_value = self.get(key)
-        self._del(key)
-        del self._id_infos[key]
+        with self._lock:
+            old_value = self.get(key)
+            self._del(key)
+            del self._id_infos[key]
         if old_value is not None:
             self._close_value(old_value)
 
@@ -1592,9 +1767,10 @@ class ValueCache(dict):
     def child(self, key: str) -> 'ValueCache':
         """Return the child ``ValueCache`` for given *key*."""
         child_key = key + '._child'
-        if child_key not in self:
-            self._set(child_key, ValueCache())
-        return self[child_key]
+        with self._lock:
+            if child_key not in self:
+                self._set(child_key, ValueCache())
+            return self[child_key]
 
     def rename_key(self, key: str, new_key: str) -> None:
         """
@@ -1622,11 +1798,13 @@ class ValueCache(dict):
 
     def pop(self, key, default=None):
         """Override the ``dict`` method to close the value and remove its ID."""
-        existed_before = key in self
-        value = super(ValueCache, self).pop(key, default=default)
+        with self._lock:
+            existed_before = key in self
+            value = super(ValueCache, self).pop(key, default=default)
+            if existed_before:
+                del self._id_infos[key]
         if existed_before:
             self._close_value(value)
-            del self._id_infos[key]
         return value
 
     def clear(self) -> None:
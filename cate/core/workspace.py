@@ -23,20 +23,23 @@
 This module defines the ``Workspace`` class.
 """
 
+import json
 import logging
 import os
 import shutil
 from collections import OrderedDict
 from threading import RLock
-from typing import List, Any, Dict, Optional
+from typing import List, Any, Callable, Dict, Iterable, Optional
 
 import fiona
 import pandas as pd
 import xarray as xr
 
+from .stepcache import StepCache
 from .workflow import Workflow, OpStep, NodePort, ValueCache
 from ..conf import conf
-from ..conf.defaults import WORKSPACE_DATA_DIR_NAME, WORKSPACE_WORKFLOW_FILE_NAME, DEFAULT_SCRATCH_WORKSPACES_PATH
+from ..conf.defaults import WORKSPACE_DATA_DIR_NAME, WORKSPACE_WORKFLOW_FILE_NAME, DEFAULT_SCRATCH_WORKSPACES_PATH, \
+    WORKSPACE_CACHE_DIR_NAME, WORKSPACE_RESOURCES_FILE_NAME
 from ..core.cdm import get_tiling_scheme
 from ..core.op import OP_REGISTRY
 from ..core.types import GeoDataFrame, ValidationError
@@ -47,6 +50,7 @@ from ..util.namespace import Namespace
 from ..util.opmetainf import OpMetaInfo
 from ..util.safe import safe_eval
 from ..util.undefined import UNDEFINED
+from ..version import __version__
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH)"
 
@@ -55,6 +59,8 @@ _LOG = logging.getLogger('cate')
 _RESOURCE_PERSISTENCE_FORMATS = dict(netcdf4=('nc', xr.open_dataset, 'to_netcdf'),
                                      zarr=('zarr', xr.open_zarr, 'to_zarr'))
 
+_RESOURCE_FILE_EXTS = {'.' + format_props[0] for format_props in _RESOURCE_PERSISTENCE_FORMATS.values()}
+
 #: An JSON-serializable operation argument is a one-element dictionary taking two possible forms:
 #: 1. dict(value=Any):  a value which may be any constant Python object which must JSON-serializable
 #: 2. dict(source=str): a reference to a step port name
@@ -104,8 +110,18 @@ class Workspace:
         self._is_scratch = (base_dir or '').startswith(DEFAULT_SCRATCH_WORKSPACES_PATH)
         self._is_modified = is_modified
         self._is_closed = False
+        self._is_lazy = False
         self._resource_cache = ValueCache()
+        self._step_cache = None
+        # Names of persistent resources not yet read from file, see open(lazy=True)
+        self._unrestored_res_names = set()
+        # Resource descriptors read from file for resources not yet restored or computed, see open(lazy=True)
+        self._resource_descriptors = dict()
+        # Maps names of resources written to or read from file to their (ID, update count) at that time, see save()
+        self._saved_res_versions = dict()
         self._user_data = dict()
+        # Callables notified about invalidated resources, see add_resource_observer()
+        self._resource_observers = []
         self._lock = RLock()
 
     def __del__(self):
@@ -127,6 +143,19 @@ class Workspace:
         """The Workspace's resource cache."""
         return self._resource_cache
 
+    @property
+    def step_cache(self) -> Optional[StepCache]:
+        """
+        The Workspace's persistent step result cache or ``None``,
+        if the configuration parameter ``use_workspace_step_cache`` is not set.
+        """
+        with self._lock:
+            if self._step_cache is None and conf.get_use_workspace_step_cache():
+                self._step_cache = StepCache(self.workspace_step_cache_dir,
+                                             capacity=conf.get_workspace_step_cache_capacity(),
+                                             persistence_format=conf.get_dataset_persistence_format())
+            return self._step_cache
+
     @property
     def is_scratch(self) -> bool:
         return self._is_scratch
@@ -143,18 +172,49 @@ class Workspace:
     def is_modified(self) -> bool:
         return self._is_modified
 
+    @property
+    def is_lazy(self) -> bool:
+        """Whether resources are restored or computed only when they are requested, see :py:meth:`open`."""
+        return self._is_lazy
+
     @property
     def workspace_data_dir(self) -> str:
         return self.get_workspace_data_dir(self.base_dir)
 
+    @property
+    def workspace_step_cache_dir(self) -> str:
+        return os.path.join(self.base_dir, WORKSPACE_CACHE_DIR_NAME, 'v%s' % __version__, 'steps')
+
     @property
     def workflow_file(self) -> str:
         return self.get_workflow_file(self.base_dir)
 
+    @property
+    def resources_file(self) -> str:
+        return self.get_resources_file(self.base_dir)
+
     @property
     def user_data(self) -> dict:
         return self._user_data
 
+    def add_resource_observer(self, observer: Callable[['Workspace', str], None]) -> None:
+        """
+        Add an *observer* that is called as ``observer(workspace, res_name)`` whenever the value of a resource
+        becomes invalid, that is, after the resource or a resource it depends on has been set, after it has been
+        renamed or deleted, and when the workspace is closed. Observers are called without holding the
+        workspace's lock. Adding the same observer again has no effect.
+
+        :param observer: The observer.
+        """
+        with self._lock:
+            if observer not in self._resource_observers:
+                self._resource_observers.append(observer)
+
+    def remove_resource_observer(self, observer: Callable[['Workspace', str], None]) -> None:
+        with self._lock:
+            if observer in self._resource_observers:
+                self._resource_observers.remove(observer)
+
     @classmethod
     def get_workspace_data_dir(cls, base_dir) -> str:
         return os.path.join(base_dir, WORKSPACE_DATA_DIR_NAME)
@@ -163,6 +223,10 @@ class Workspace:
     def get_workflow_file(cls, base_dir) -> str:
         return os.path.join(cls.get_workspace_data_dir(base_dir), WORKSPACE_WORKFLOW_FILE_NAME)
 
+    @classmethod
+    def get_resources_file(cls, base_dir) -> str:
+        return os.path.join(cls.get_workspace_data_dir(base_dir), WORKSPACE_RESOURCES_FILE_NAME)
+
     @classmethod
     def new_workflow(cls, header: dict = None) -> Workflow:
         return Workflow(OpMetaInfo('workspace_workflow',
@@ -174,15 +238,32 @@ class Workspace:
         return Workspace(base_dir, Workspace.new_workflow(dict(description=description or '')))
 
     @classmethod
-    def open(cls, base_dir: str, monitor: Monitor = Monitor.NONE) -> 'Workspace':
+    def open(cls, base_dir: str, monitor: Monitor = Monitor.NONE, lazy: bool = False) -> 'Workspace':
+        """
+        Open an existing workspace.
+
+        :param base_dir: The workspace's base directory.
+        :param monitor: An optional progress monitor.
+        :param lazy: If ``True``, persistent resources are not read. Instead, they are read when they are
+               first requested, see :py:meth:`get_resource` and :py:meth:`execute_workflow`.
+               Until then, resources are described by the resource descriptors written by :py:meth:`save`.
+               Workspaces saved without resource descriptors are opened as if *lazy* were ``False``,
+               see :py:attr:`is_lazy`.
+        :return: The workspace.
+        """
         if not os.path.isdir(cls.get_workspace_data_dir(base_dir)):
             raise ValidationError('Not a valid workspace: %s' % base_dir)
         workflow_file = cls.get_workflow_file(base_dir)
         workflow = Workflow.load(workflow_file)
         workspace = Workspace(base_dir, workflow)
 
-        # Read resources for persistent steps
         persistent_steps = [step for step in workflow.steps if step.persistent]
+        if lazy and workspace._read_resource_descriptors():
+            workspace._unrestored_res_names = {step.id for step in persistent_steps}
+            workspace._is_lazy = True
+            return workspace
+
+        # Read resources for persistent steps
         if persistent_steps:
             with monitor.starting('Reading resources', len(persistent_steps)):
                 for step in persistent_steps:
@@ -195,19 +276,20 @@ class Workspace:
         if self._is_closed:
             return
         with self._lock:
+            res_names = [step.id for step in self._workflow.steps]
             self._resource_cache.close()
             # Remove all resource files that are no longer required
             if os.path.isdir(self.workspace_data_dir):
                 persistent_ids = {step.id for step in self.workflow.steps if step.persistent}
                 for filename in os.listdir(self.workspace_data_dir):
                     res_file = os.path.join(self.workspace_data_dir, filename)
-                    if os.path.isfile(res_file) and filename.endswith('.nc'):
-                        res_name = filename[0: -3]
-                        if res_name not in persistent_ids:
-                            try:
-                                os.remove(res_file)
-                            except OSError:
-                                _LOG.exception('closing workspace failed')
+                    res_name, ext = os.path.splitext(filename)
+                    if ext in _RESOURCE_FILE_EXTS and res_name not in persistent_ids:
+                        try:
+                            _remove_resource_file(res_file)
+                        except OSError:
+                            _LOG.exception('closing workspace failed')
+        self._notify_resource_observers(res_names)
 
     def save(self, monitor: Monitor = Monitor.NONE):
         self._assert_open()
@@ -228,6 +310,8 @@ class Workspace:
                         self._write_resource_to_file(step.id)
                         monitor.progress(1)
 
+            self._write_resource_descriptors()
+
             self._is_modified = False
 
     def _write_resource_to_file(self, res_name):
@@ -237,13 +321,29 @@ class Workspace:
             if format_props:
                 ext, _, write_attr = format_props
                 if hasattr(res_value, write_attr):
-                    write_method = getattr(res_value, write_attr)
+                    resource_file = os.path.join(self.workspace_data_dir, res_name + '.' + ext)
+                    res_version = self._get_res_version(res_name)
+                    if self._saved_res_versions.get(res_name) == res_version and os.path.exists(resource_file):
+                        # Resource has not changed since it has been written or read
+                        return
                     # noinspection PyBroadException
                     try:
-                        resource_file = os.path.join(self.workspace_data_dir, res_name + '.' + ext)
-                        write_method(resource_file)
+                        if ext == 'zarr':
+                            _write_dataset_to_zarr(res_value, resource_file)
+                        else:
+                            getattr(res_value, write_attr)(resource_file)
                     except Exception:
                         _LOG.exception('writing resource "%s" to file failed' % res_name)
+                        return
+                    self._saved_res_versions[res_name] = res_version
+                    # Remove outdated resource files written using another persistence format
+                    for other_ext in _RESOURCE_FILE_EXTS:
+                        other_resource_file = os.path.join(self.workspace_data_dir, res_name + other_ext)
+                        if other_ext != '.' + ext and os.path.exists(other_resource_file):
+                            try:
+                                _remove_resource_file(other_resource_file)
+                            except OSError:
+                                _LOG.exception('removing resource file "%s" failed' % other_resource_file)
 
     def _read_resource_from_file(self, res_name):
         for ext, open_dataset, _ in _RESOURCE_PERSISTENCE_FORMATS.values():
@@ -253,9 +353,61 @@ class Workspace:
                 try:
                     res_value = open_dataset(res_file)
                     self._resource_cache[res_name] = res_value
+                    self._saved_res_versions[res_name] = self._get_res_version(res_name)
                 except Exception:
                     _LOG.exception('reading resource "%s" from file failed' % res_name)
 
+    def _get_res_version(self, res_name):
+        # IDs are regenerated when resources are deleted and re-created, while update counts start again at zero
+        return self._resource_cache.get_id(res_name), self._resource_cache.get_update_count(res_name)
+
+    def _read_resource_descriptors(self) -> bool:
+        resources_file = self.resources_file
+        if not os.path.isfile(resources_file):
+            # E.g. workspaces saved by previous versions
+            return False
+        # noinspection PyBroadException
+        try:
+            with open(resources_file) as fp:
+                resource_descriptors = json.load(fp)
+        except Exception:
+            _LOG.exception('reading resource descriptors from "%s" failed' % resources_file)
+            return False
+        for step in self.workflow.steps:
+            resource_descriptor = resource_descriptors.get(step.id)
+            if resource_descriptor:
+                self._resource_descriptors[step.id] = resource_descriptor
+                # Assign a resource ID, the value is restored or computed on request
+                self._resource_cache[step.id] = UNDEFINED
+        return True
+
+    def _write_resource_descriptors(self):
+        resource_descriptors = OrderedDict()
+        for step in self.workflow.steps:
+            res_name = step.id
+            resource = self._resource_cache.get(res_name, UNDEFINED)
+            if resource is not UNDEFINED:
+                resource_descriptor = self._get_resource_descriptor(None, None, res_name, resource)
+                resource_descriptor.pop('id')
+                resource_descriptor.pop('updateCount')
+                resource_descriptors[res_name] = resource_descriptor
+            elif res_name in self._resource_descriptors:
+                resource_descriptors[res_name] = self._resource_descriptors[res_name]
+        # noinspection PyBroadException
+        try:
+            resource_descriptors_json = json.dumps(resource_descriptors)
+            with open(self.resources_file, 'w') as fp:
+                fp.write(resource_descriptors_json)
+        except Exception:
+            _LOG.exception('writing resource descriptors to "%s" failed' % self.resources_file)
+
+    def _restore_resources(self, res_names):
+        """Read persistent resources given by *res_names*, if they have not been read yet."""
+        for res_name in res_names:
+            if res_name in self._unrestored_res_names:
+                self._unrestored_res_names.discard(res_name)
+                self._read_resource_from_file(res_name)
+
     def set_resource_persistence(self, res_name: str, persistent: bool):
         with self._lock:
             self._assert_open()
@@ -265,6 +417,8 @@ class Workspace:
             if res_step.persistent == persistent:
                 return
             res_step.persistent = persistent
+            if not persistent:
+                self._restore_resources([res_name])
 
     @classmethod
     def from_json_dict(cls, json_dict):
@@ -294,7 +448,14 @@ class Workspace:
                 res_id = self._resource_cache.get_id(res_name)
                 res_update_count = self._resource_cache.get_update_count(res_name)
                 resource = resource_cache.pop(res_name)
-                resource_descriptor = self._get_resource_descriptor(res_id, res_update_count, res_name, resource)
+                if resource is UNDEFINED and res_name in self._resource_descriptors:
+                    # Resource not yet restored or computed, see open(lazy=True)
+                    resource_descriptor = dict(self._resource_descriptors[res_name],
+                                               id=res_id,
+                                               updateCount=res_update_count)
+                else:
+                    resource_descriptor = self._get_resource_descriptor(res_id, res_update_count, res_name,
+                                                                        resource)
                 resource_descriptors.append(resource_descriptor)
         if len(resource_cache) > 0:
             # We should not get here as all resources should have an associated workflow step!
@@ -495,6 +656,10 @@ class Workspace:
             self.workflow.remove_step(res_step)
             if res_name in self._resource_cache:
                 del self._resource_cache[res_name]
+            self._unrestored_res_names.discard(res_name)
+            self._resource_descriptors.pop(res_name, None)
+            self._saved_res_versions.pop(res_name, None)
+        self._notify_resource_observers([res_name])
 
     def rename_resource(self, res_name: str, new_res_name: str) -> None:
         Workspace._validate_res_name(new_res_name)
@@ -509,10 +674,18 @@ class Workspace:
                 raise ValidationError('Resource "%s" cannot be renamed to "%s", '
                                       'because "%s" is already in use.' % (res_name, new_res_name, new_res_name))
 
+            # Resource files are named after their resources
+            self._restore_resources([res_name])
+
             res_step.set_id(new_res_name)
 
             if res_name in self._resource_cache:
                 self._resource_cache.rename_key(res_name, new_res_name)
+            if res_name in self._resource_descriptors:
+                self._resource_descriptors[new_res_name] = self._resource_descriptors.pop(res_name)
+            # Resource files are not renamed, so the resource must be written again
+            self._saved_res_versions.pop(res_name, None)
+        self._notify_resource_observers([res_name])
 
     def set_resource(self,
                      op_name: str,
@@ -619,7 +792,10 @@ class Workspace:
             for key in ids_of_invalidated_steps:
                 if key in self._resource_cache:
                     self._resource_cache[key] = UNDEFINED
+                self._unrestored_res_names.discard(key)
+                self._resource_descriptors.pop(key, None)
 
+        self._notify_resource_observers(ids_of_invalidated_steps)
         return res_name
 
     def run_op(self, op_name: str, op_kwargs: OpKwArgs, monitor=Monitor.NONE):
@@ -634,6 +810,8 @@ class Workspace:
             if not op:
                 raise ValidationError('Unknown operation "%s"' % op_name)
 
+            self._restore_resources([step.id for step in self.workflow.steps])
+
             for input_name, input_value in op_kwargs.items():
                 if 'should_return' == input_name and 'value' in input_value:
                     returns = input_value['value']
@@ -649,9 +827,21 @@ class Workspace:
             if returns:
                 return return_value
 
-    def execute_workflow(self, res_name: str = None, monitor: Monitor = Monitor.NONE):
+    def execute_workflow(self, res_name: str = None, monitor: Monitor = Monitor.NONE, max_workers: int = None):
+        """
+        Execute the steps required to compute the resource named *res_name* or all steps, if *res_name* is not given.
+
+        :param res_name: An optional resource name.
+        :param monitor: An optional progress monitor.
+        :param max_workers: The maximum number of independent steps that may be executed concurrently.
+               If not given, the value of the configuration parameter ``workflow_max_workers`` is used.
+        :return: The value of the resource named *res_name* or of the last step executed.
+        """
         self._assert_open()
 
+        if max_workers is None:
+            max_workers = conf.get_workflow_max_workers()
+
         steps = None
 
         with self._lock:
@@ -663,20 +853,49 @@ class Workspace:
                     raise ValidationError('Resource "%s" not found' % res_name)
                 steps = self.workflow.find_steps_to_compute(res_step.id)
 
+            self._restore_resources([step.id for step in steps])
+            if res_name and self._resource_cache.get(res_step.id, UNDEFINED) is not UNDEFINED:
+                # Value is available, e.g. read from file, so there is no need to invoke the steps it requires
+                steps = [res_step]
+
         # Allow executing self.workflow.invoke_steps() out of the locked context so we can run tasks in parallel
         if steps and len(steps):
-            self.workflow.invoke_steps(steps, context=self._new_context(), monitor=monitor)
+            self.workflow.invoke_steps(steps, context=self._new_context(), monitor=monitor, max_workers=max_workers)
             return steps[-1].get_output_value()
         else:
             return None
 
+    def get_resource(self, res_name: str, monitor: Monitor = Monitor.NONE):
+        """
+        Get the value of the resource named *res_name*.
+        If the resource has not been restored or computed yet, this is done first.
+
+        :param res_name: The resource name.
+        :param monitor: An optional progress monitor.
+        :return: The resource value.
+        """
+        resource = self._resource_cache.get(res_name, UNDEFINED)
+        if resource is UNDEFINED:
+            resource = self.execute_workflow(res_name=res_name, monitor=monitor)
+        return resource
+
     def _new_context(self):
-        return dict(value_cache=self._resource_cache, workspace=self)
+        return dict(value_cache=self._resource_cache, step_cache=self.step_cache, workspace=self)
 
     def _assert_open(self):
         if self._is_closed:
             raise ValidationError('Workspace is already closed: ' + self._base_dir)
 
+    def _notify_resource_observers(self, res_names: Iterable[str]):
+        with self._lock:
+            observers = list(self._resource_observers)
+        for observer in observers:
+            for res_name in res_names:
+                try:
+                    observer(self, res_name)
+                except Exception:
+                    _LOG.exception('notifying resource observer failed')
+
     def _new_resource_name(self, res_pattern):
         return new_indexed_name({step.id for step in self.workflow.steps}, res_pattern)
 
@@ -691,3 +910,30 @@ class Workspace:
 
 def _to_json_scalar_value(value, nchars=1000):
     return to_scalar(value, ndigits=3, nchars=nchars, stringify=True)
+
+
+def _write_dataset_to_zarr(dataset: xr.Dataset, path: str):
+    """
+    Write *dataset* to a Zarr directory at *path*, replacing any existing one.
+    Chunks of dask arrays are computed and written in parallel.
+    """
+    dataset = dataset.copy()
+    for var in dataset.variables.values():
+        # Chunk encodings of the dataset's source, e.g. a NetCDF file, may not match the dask chunks
+        var.encoding.pop('chunks', None)
+        if var.chunks and not _has_uniform_chunks(var.chunks):
+            # Zarr requires uniform chunk sizes, except for the last chunk
+            var.data = var.data.rechunk(tuple(max(dim_chunks) for dim_chunks in var.chunks))
+    dataset.to_zarr(path, mode='w', consolidated=True)
+
+
+def _has_uniform_chunks(chunks) -> bool:
+    return all(len(set(dim_chunks[:-1])) <= 1 and (len(dim_chunks) == 1 or dim_chunks[-1] <= dim_chunks[0])
+               for dim_chunks in chunks)
+
+
+def _remove_resource_file(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
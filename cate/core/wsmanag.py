@@ -26,11 +26,13 @@ import pprint
 import shutil
 import uuid
 from abc import ABCMeta, abstractmethod
+from collections.abc import Mapping
 from typing import Dict, List, Optional, Tuple, Any
 
 from .objectio import write_object
 from .workflow import Workflow
 from .workspace import Workspace, OpKwArgs
+from ..conf import conf
 from ..conf.defaults import DEFAULT_SCRATCH_WORKSPACES_PATH, WORKSPACE_DATA_DIR_NAME, WORKSPACES_DIR_NAME, \
     DEFAULT_WORKSPACES_PATH, SCRATCH_WORKSPACES_DIR_NAME
 from ..core.types import ValidationError
@@ -322,10 +324,12 @@ class FSWorkspaceManager(WorkspaceManager):
         if workspace is not None:
             assert not workspace.is_closed
             return workspace
+        lazy = conf.get_lazy_workspace_open()
         with monitor.starting("Opening workspace", 100):
-            workspace = Workspace.open(workspace_dir, monitor=monitor.child(50))
+            workspace = Workspace.open(workspace_dir, monitor=monitor.child(50), lazy=lazy)
             assert workspace_dir not in self._open_workspaces
-            workspace.execute_workflow(monitor=monitor.child(50))
+            if not workspace.is_lazy:
+                workspace.execute_workflow(monitor=monitor.child(50))
         self._open_workspaces[workspace_dir] = workspace
         return workspace
 
@@ -557,10 +561,33 @@ class FSWorkspaceManager(WorkspaceManager):
         elif res_name_or_expr.isidentifier() and workspace.workflow.find_node(res_name_or_expr) is not None:
             value = workspace.execute_workflow(res_name=res_name_or_expr, monitor=monitor)
         if value is UNDEFINED:
-            value = safe_eval(res_name_or_expr, workspace.resource_cache)
+            value = safe_eval(res_name_or_expr, _ResourceNamespace(workspace, monitor))
         return value
 
 
+class _ResourceNamespace(Mapping):
+    """
+    The resources of a workspace as namespace for expressions.
+    Resources not yet restored or computed, see ``Workspace.open(lazy=True)``, are so when they are looked up.
+    """
+
+    def __init__(self, workspace: Workspace, monitor: Monitor):
+        self._workspace = workspace
+        self._monitor = monitor
+
+    def __getitem__(self, res_name: str) -> Any:
+        value = self._workspace.resource_cache[res_name]
+        if value is UNDEFINED:
+            value = self._workspace.get_resource(res_name, monitor=self._monitor)
+        return value
+
+    def __iter__(self):
+        return iter(self._workspace.resource_cache)
+
+    def __len__(self) -> int:
+        return len(self._workspace.resource_cache)
+
+
 def is_abs_windows_path(path: str) -> bool:
     """
     If normalized *path* an absolute path on Windows OS?
@@ -42,8 +42,11 @@ import contextlib
 import aiofiles
 import aiohttp
 import asyncio
+import concurrent.futures
+import hashlib
 import json
 import logging
+import multiprocessing
 import os
 import random
 import re
@@ -53,20 +56,23 @@ import urllib.parse
 import urllib.request
 import warnings
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import lxml.etree as etree
-from typing import Sequence, Tuple, Optional, Any, Dict, List, Union, AbstractSet
+from typing import Sequence, Tuple, Optional, Any, Dict, List, Union, AbstractSet, Callable
 from urllib.error import URLError, HTTPError
 
 import pandas as pd
 import xarray as xr
 
-from cate.conf import get_config_value, get_data_stores_path
+from cate.conf import get_config_value, get_data_stores_path, get_http_download_max_workers, \
+    get_opendap_sync_max_workers
 from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL
 from cate.core.ds import DATA_STORE_REGISTRY, NetworkError, DataStore, DataSource, Schema, open_xarray_dataset, \
     DataStoreNotice, DataAccessError, DataAccessWarning
 from cate.core.opimpl import subset_spatial_impl, normalize_impl, adjust_spatial_attrs_impl
 from cate.core.types import PolygonLike, TimeLike, TimeRange, TimeRangeLike, VarNamesLike
+from cate.ds.esa_cci_odp_index import OdpCatalogueIndex, OdpFileListIndex
 from cate.ds.local import add_to_data_store_registry, LocalDataSource, LocalDataStore
 from cate.util.monitor import Cancellation, Monitor
 
@@ -96,6 +102,12 @@ _RETRY_BACKOFF_BASE = 1.001
 
 _TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+_DOWNLOAD_NUM_ATTEMPTS = 3
+_DOWNLOAD_TEMP_FILE_SUFFIX = '.part'
+
+_OPENDAP_SYNC_NUM_ATTEMPTS = 3
+
 _RE_TO_DATETIME_FORMATS = patterns = [(re.compile(14 * '\\d'), '%Y%m%d%H%M%S'),
                                       (re.compile(12 * '\\d'), '%Y%m%d%H%M'),
                                       (re.compile(8 * '\\d'), '%Y%m%d'),
@@ -407,15 +419,7 @@ async def _load_or_fetch_json(fetch_json_function,
         cache_json_file = os.path.join(cache_dir, cache_json_filename)
         cache_timestamp_file = os.path.join(cache_dir, cache_timestamp_filename)
 
-        timestamp = datetime(year=2000, month=1, day=1)
-        if os.path.exists(cache_timestamp_file):
-            with open(cache_timestamp_file) as fp:
-                timestamp_text = fp.read()
-                timestamp = datetime.strptime(timestamp_text, _TIMESTAMP_FORMAT)
-
-        time_diff = datetime.now() - timestamp
-        time_diff_days = time_diff.days + time_diff.seconds / 3600. / 24.
-        if time_diff_days < cache_expiration_days:
+        if not _is_cache_expired(cache_timestamp_file, cache_expiration_days):
             if os.path.exists(cache_json_file):
                 with open(cache_json_file) as fp:
                     json_text = fp.read()
@@ -445,6 +449,18 @@ async def _load_or_fetch_json(fetch_json_function,
     return json_obj
 
 
+def _is_cache_expired(cache_timestamp_file: str, cache_expiration_days: float) -> bool:
+    timestamp = datetime(year=2000, month=1, day=1)
+    if os.path.exists(cache_timestamp_file):
+        with open(cache_timestamp_file) as fp:
+            timestamp_text = fp.read()
+            timestamp = datetime.strptime(timestamp_text, _TIMESTAMP_FORMAT)
+
+    time_diff = datetime.now() - timestamp
+    time_diff_days = time_diff.days + time_diff.seconds / 3600. / 24.
+    return time_diff_days >= cache_expiration_days
+
+
 async def _fetch_data_source_list_json(base_url, query_args, monitor: Monitor = Monitor.NONE) -> Sequence:
     feature_collection_list = await _fetch_opensearch_feature_list(base_url, query_args, monitor=monitor)
     catalogue = {}
@@ -597,7 +613,15 @@ def _extract_feature_info(feature: dict) -> List:
     urls = {}
     for related_link in related_links:
         urls[related_link.get("title")] = related_link.get("href")
-    return [filename, start_time, end_time, file_size, urls]
+    checksum = feature_props.get("checksum")
+    checksum_type = feature_props.get("checksum_type")
+    checksum_info = [checksum_type, checksum] if checksum and checksum_type else None
+    return [filename, start_time, end_time, file_size, urls, checksum_info]
+
+
+def _get_checksum_info(file_rec: List) -> Optional[List[str]]:
+    # File lists cached by former versions do not include checksums
+    return file_rec[5] if len(file_rec) > 5 else None
 
 
 class EsaCciOdpDataStore(DataStore):
@@ -622,6 +646,9 @@ class EsaCciOdpDataStore(DataStore):
         self._metadata_store_path = meta_data_store_path
         self._drs_ids = drs_ids
         self._data_sources = []
+        self._data_source_dict = {}
+        self._catalogue_index = OdpCatalogueIndex(os.path.join(meta_data_store_path,
+                                                               self._get_update_tag() + '-index'))
         self._dataset_states = {}
         loc = os.path.dirname(os.path.abspath(__file__))
         with open(f'{loc}/data/dataset_states.json', 'r') as fp:
@@ -701,10 +728,28 @@ class EsaCciOdpDataStore(DataStore):
 
     def query(self, ds_id: str = None, query_expr: str = None, monitor: Monitor = Monitor.NONE) \
             -> Sequence['DataSource']:
-        asyncio.run(self._init_data_sources())
-        if ds_id or query_expr:
-            return [ds for ds in self._data_sources if ds.matches(ds_id=ds_id, query_expr=query_expr)]
-        return self._data_sources
+        """
+        Retrieve data sources in this data store using the given constraints.
+
+        Data sources are looked up in the data store's catalogue index, see :py:mod:`cate.ds.esa_cci_odp_index`.
+        The (remote) catalogue is only read, if the index does not exist yet or has expired.
+
+        :param ds_id: Data source identifier.
+        :param query_expr: Query expression which may be used if *ìd* is unknown. Besides free text,
+               it may contain filters such as ``ecv:SST``, ``time_frequency:day``, ``processing_level:L4``,
+               ``bbox:<min_lon>,<min_lat>,<max_lon>,<max_lat>``, or ``time:<start>,<end>``.
+        :param monitor:  A progress monitor.
+        :return: Sequence of data sources.
+        """
+        if self._data_sources:
+            if not self._catalogue_index.exists:
+                # The index has been removed, e.g. by get_updates(reset=True)
+                self._update_catalogue_index()
+        elif not (self._index_cache_used
+                  and self._catalogue_index.is_up_to_date(self._index_cache_expiration_days)):
+            asyncio.run(self._init_data_sources())
+        return [self._get_indexed_data_source(drs_id, meta_info)
+                for drs_id, meta_info in self._catalogue_index.query(ds_id=ds_id, query_expr=query_expr)]
 
     def get_updates(self, reset=False) -> Dict:
         """
@@ -742,6 +787,7 @@ class EsaCciOdpDataStore(DataStore):
             frozen_file = os.path.join(self._metadata_store_path, self._get_update_tag() + '-freeze.json')
             if os.path.isfile(frozen_file):
                 os.remove(frozen_file)
+            self._catalogue_index.remove()
         return report
 
     def _repr_html_(self) -> str:
@@ -810,11 +856,21 @@ class EsaCciOdpDataStore(DataStore):
             meta_info['cci_project'] = meta_info['ecv']
             meta_info['fid'] = datasource_id
             meta_info['uuid'] = datasource_id
-            verification_flags = self._dataset_states.get(drs_id, {}).get('verification_flags', [])
-            type_specifier = self._dataset_states.get(drs_id).get('type_specifier', None)
-            data_source = EsaCciOdpDataSource(self, meta_info, datasource_id, drs_id,
-                                              verification_flags, type_specifier)
-            self._data_sources.append(data_source)
+            self._data_sources.append(self._new_data_source(drs_id, meta_info))
+
+    def _new_data_source(self, drs_id: str, meta_info: dict) -> 'EsaCciOdpDataSource':
+        verification_flags = self._dataset_states.get(drs_id, {}).get('verification_flags', [])
+        type_specifier = self._dataset_states.get(drs_id).get('type_specifier', None)
+        data_source = EsaCciOdpDataSource(self, meta_info, meta_info['fid'], drs_id,
+                                          verification_flags, type_specifier)
+        self._data_source_dict[(meta_info['fid'], drs_id)] = data_source
+        return data_source
+
+    def _get_indexed_data_source(self, drs_id: str, meta_info: dict) -> 'EsaCciOdpDataSource':
+        data_source = self._data_source_dict.get((meta_info['fid'], drs_id))
+        if data_source is None:
+            data_source = self._new_data_source(drs_id, meta_info)
+        return data_source
 
     def _adjust_json_dict(self, json_dict: dict, drs_id: str):
         values = drs_id.split('.')
@@ -918,6 +974,13 @@ class EsaCciOdpDataStore(DataStore):
                 with open(diff_file, 'w+') as json_out:
                     json.dump(diff_source, json_out)
 
+        self._update_catalogue_index()
+
+    def _update_catalogue_index(self):
+        # Only the shards of the catalogue index that contain new, removed or changed data sources are rewritten
+        # noinspection PyProtectedMember
+        self._catalogue_index.update([(ds.id, ds._json_dict) for ds in self._data_sources])
+
     def _freeze_source(self):
         """
         Freeze a dataset list when needed.
@@ -1031,7 +1094,7 @@ class EsaCciOdpDataSource(DataSource):
         self._data_store = data_store
         self._json_dict = json_dict
         self._schema = schema
-        self._file_list = None
+        self._file_list_index = None
         self._meta_info = None
         self._temporal_coverage = None
         if verification_flags:
@@ -1134,8 +1197,7 @@ class EsaCciOdpDataSource(DataSource):
         selected_file_list = self._find_files(None)
         if selected_file_list:
             dataset_dir = self.local_dataset_dir()
-            for filename, date_from, date_to, none, none \
-                    in selected_file_list:
+            for filename, date_from, date_to, *_ in selected_file_list:
                 if os.path.exists(os.path.join(dataset_dir, filename)):
                     if date_from in coverage.values():
                         for temp_date_from, temp_date_to in coverage.items():
@@ -1150,7 +1212,7 @@ class EsaCciOdpDataSource(DataSource):
         return coverage
 
     def update_file_list(self, monitor: Monitor = Monitor.NONE) -> None:
-        self._file_list = None
+        self._file_list_index = None
         asyncio.run(self._init_file_list(monitor))
 
     def local_dataset_dir(self):
@@ -1163,22 +1225,9 @@ class EsaCciOdpDataSource(DataSource):
         requested_start_date, requested_end_date = time_range if time_range else (None, None)
         asyncio.run(self._init_file_list())
         if requested_start_date or requested_end_date:
-            selected_file_list = []
-            for file_rec in self._file_list:
-                start_time = file_rec[1]
-                ok = False
-                if start_time:
-                    if requested_start_date and requested_end_date:
-                        ok = requested_start_date <= start_time <= requested_end_date
-                    elif requested_start_date:
-                        ok = requested_start_date <= start_time
-                    elif requested_end_date:
-                        ok = start_time <= requested_end_date
-                if ok:
-                    selected_file_list.append(file_rec)
-        else:
-            selected_file_list = self._file_list
-        return selected_file_list
+            # Files without start time are not selected
+            return self._file_list_index.find(requested_start_date or None, requested_end_date or None)
+        return self._file_list_index.find()
 
     def open_dataset(self,
                      time_range: TimeRangeLike.TYPE = None,
@@ -1220,7 +1269,7 @@ class EsaCciOdpDataSource(DataSource):
 
     def _update_local_ds(self, local_ds: LocalDataSource, time_range: TimeRangeLike.TYPE = None,
                          region: PolygonLike.TYPE = None, var_names: VarNamesLike.TYPE = None,
-                         monitor: Monitor = Monitor.NONE):
+                         monitor: Monitor = Monitor.NONE, compression_level: int = None):
         time_range = TimeRangeLike.convert(time_range)
         var_names = VarNamesLike.convert(var_names)
         local_path = os.path.join(local_ds.data_store.data_store_path, local_ds.id)
@@ -1231,185 +1280,154 @@ class EsaCciOdpDataSource(DataSource):
             raise self._empty_error(time_range)
         if region or var_names:
             self._update_ds_using_opendap(local_path, local_ds, selected_file_list, time_range, var_names, region,
-                                          monitor)
+                                          monitor, compression_level=compression_level)
         else:
             self._update_ds_using_http(local_path, local_ds, selected_file_list, time_range, region, var_names, monitor)
         local_ds.save(True)
 
     def _update_ds_using_opendap(self, local_path, local_ds, selected_file_list, time_range, var_names, region,
-                                 monitor):
-        do_update_of_verified_time_coverage_start_once = True
-        do_update_of_variables_meta_info_once = True
-        do_update_of_region_meta_info_once = True
-        verified_time_coverage_start = None
-        verified_time_coverage_end = None
-        compression_level = get_config_value('NETCDF_COMPRESSION_LEVEL', NETCDF_COMPRESSION_LEVEL)
-        compression_enabled = True if compression_level > 0 else False
+                                 monitor, compression_level: int = None):
+        if compression_level is None:
+            compression_level = get_config_value('NETCDF_COMPRESSION_LEVEL', NETCDF_COMPRESSION_LEVEL)
         encoding_update = dict()
-        if compression_enabled:
+        if compression_level > 0:
             encoding_update.update({'zlib': True, 'complevel': compression_level})
         files = self._get_urls_list(selected_file_list, _ODP_PROTOCOL_OPENDAP)
-        with monitor.starting('Sync ' + self.id, total_work=len(files)):
-            for idx, dataset_uri in enumerate(files):
-                child_monitor = monitor.child(work=1)
-                file_name = os.path.basename(dataset_uri)
-                local_filepath = os.path.join(local_path, file_name)
-                time_coverage_start = selected_file_list[idx][1]
-                time_coverage_end = selected_file_list[idx][2]
-                with child_monitor.starting(label=file_name, total_work=100):
-                    attempts = 0
-                    to_append = ''
-                    while attempts < 2:
+
+        # Remote datasets are opened, subsetted and written to local files by a pool of worker processes.
+        # Threads would not help here, because xarray serialises all netCDF4 (and so OPeNDAP) access
+        # within a process by a global lock, and HDF5 does the same for writing. Processes are spawned
+        # rather than forked, so they do not inherit the state of these libraries or locks held by other threads.
+        # Only the calling process updates local_ds and the monitor.
+        max_workers = min(get_opendap_sync_max_workers(), len(files))
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+        do_update_of_variables_meta_info_once = True
+        do_update_of_region_meta_info_once = True
+        synced_indexes = set()
+        errors = dict()
+        pending = dict()
+        next_index = 0
+        try:
+            with monitor.starting('Sync ' + self.id, total_work=len(files)):
+                while next_index < len(files) or pending:
+                    while next_index < len(files) and len(pending) < 2 * max_workers:
+                        file_path = os.path.join(local_path, os.path.basename(files[next_index]))
+                        future = executor.submit(_sync_opendap_file, files[next_index], var_names, region,
+                                                 file_path, encoding_update)
+                        pending[future] = next_index
+                        next_index += 1
+                    done, _ = concurrent.futures.wait(pending.keys(), timeout=0.25,
+                                                      return_when=concurrent.futures.FIRST_COMPLETED)
+                    monitor.check_for_cancellation()
+                    for future in done:
+                        idx = pending.pop(future)
+                        file_name = os.path.basename(files[idx])
                         try:
-                            attempts += 1
-                            remote_dataset = xr.open_dataset(dataset_uri + to_append)
-                            remote_dataset_root = remote_dataset
-                            child_monitor.progress(work=20)
-                            if var_names:
-                                remote_dataset = remote_dataset.drop_vars(
-                                    [var_name for var_name in remote_dataset.data_vars.keys()
-                                     if var_name not in var_names]
-                                )
-                            if region:
-                                remote_dataset = normalize_impl(remote_dataset)
-                                remote_dataset = subset_spatial_impl(remote_dataset, region)
-                                remote_dataset = adjust_spatial_attrs_impl(remote_dataset, allow_point=False)
-                                if do_update_of_region_meta_info_once:
-                                    local_ds.meta_info['bbox_minx'] = remote_dataset.attrs['geospatial_lon_min']
-                                    local_ds.meta_info['bbox_maxx'] = remote_dataset.attrs['geospatial_lon_max']
-                                    local_ds.meta_info['bbox_maxy'] = remote_dataset.attrs['geospatial_lat_max']
-                                    local_ds.meta_info['bbox_miny'] = remote_dataset.attrs['geospatial_lat_min']
-                                    do_update_of_region_meta_info_once = False
-                            if compression_enabled:
-                                for sel_var_name in remote_dataset.variables.keys():
-                                    remote_dataset.variables.get(sel_var_name).encoding.update(encoding_update)
-                            to_netcdf_attempts = 0
-                            format = 'NETCDF4'
-                            # format = 'NETCDF3_64BIT'
-                            engine = 'h5netcdf'
-                            # engine = None
-                            while to_netcdf_attempts < 2:
-                                try:
-                                    to_netcdf_attempts += 1
-                                    # Note: we are using engine='h5netcdf' here because the default engine='netcdf4'
-                                    # causes crashes in file "netCDF4/_netCDF4.pyx" with currently used netcdf4-1.4.2 conda
-                                    # package from conda-forge. This occurs whenever remote_dataset.to_netcdf() is called a
-                                    # second time in this loop.
-                                    # Probably related to https://github.com/pydata/xarray/issues/2560.
-                                    # And probably fixes Cate issues #823, #822, #818, #816, #783.
-                                    remote_dataset.to_netcdf(local_filepath, format=format, engine=engine)
-                                    break
-                                except AttributeError as e:
-                                    if to_netcdf_attempts == 1:
-                                        format = 'NETCDF3_64BIT'
-                                        engine = None
-                                        continue
-                                    raise self._cannot_access_error(time_range, region, var_names,
-                                                                    verb="synchronize", cause=e) from e
-                            child_monitor.progress(work=75)
-
-                            if do_update_of_variables_meta_info_once:
-                                variables_info = local_ds.meta_info.get('variables', [])
-                                local_ds.meta_info['variables'] = [var_info for var_info in variables_info
-                                                                   if var_info.get('name')
-                                                                   in remote_dataset.variables.keys()
-                                                                   and var_info.get('name')
-                                                                   not in remote_dataset.dims.keys()]
-                                do_update_of_variables_meta_info_once = False
-                            local_ds.add_dataset(os.path.join(local_ds.id, file_name),
-                                                 (time_coverage_start, time_coverage_end))
-                            if do_update_of_verified_time_coverage_start_once:
-                                verified_time_coverage_start = time_coverage_start
-                                do_update_of_verified_time_coverage_start_once = False
-                            verified_time_coverage_end = time_coverage_end
-                            child_monitor.progress(work=5)
-                            remote_dataset_root.close()
-                        except HTTPError as e:
-                            if attempts == 1:
-                                to_append = '#fillmismatch'
-                                continue
-                            raise self._cannot_access_error(time_range, region, var_names,
-                                                            verb="synchronize", cause=e) from e
-                        except (URLError, socket.timeout) as e:
-                            if attempts == 1:
-                                to_append = '#fillmismatch'
-                                continue
-                            raise self._cannot_access_error(time_range, region, var_names,
-                                                            verb="synchronize", cause=e,
-                                                            error_cls=NetworkError) from e
-                        except OSError as e:
-                            if attempts == 1:
-                                to_append = '#fillmismatch'
-                                continue
-                            raise self._cannot_access_error(time_range, region, var_names,
-                                                            verb="synchronize", cause=e) from e
+                            remote_dataset_info = future.result()
+                        except Exception as e:
+                            _LOG.warning(f'Failed to synchronize {files[idx]}: {e}')
+                            errors[idx] = e
+                            monitor.progress(work=1)
+                            continue
+                        if region and do_update_of_region_meta_info_once:
+                            attrs = remote_dataset_info['attrs']
+                            local_ds.meta_info['bbox_minx'] = attrs['geospatial_lon_min']
+                            local_ds.meta_info['bbox_maxx'] = attrs['geospatial_lon_max']
+                            local_ds.meta_info['bbox_maxy'] = attrs['geospatial_lat_max']
+                            local_ds.meta_info['bbox_miny'] = attrs['geospatial_lat_min']
+                            do_update_of_region_meta_info_once = False
+                        if do_update_of_variables_meta_info_once:
+                            variables_info = local_ds.meta_info.get('variables', [])
+                            local_ds.meta_info['variables'] = [var_info for var_info in variables_info
+                                                               if var_info.get('name')
+                                                               in remote_dataset_info['variables']
+                                                               and var_info.get('name')
+                                                               not in remote_dataset_info['dims']]
+                            do_update_of_variables_meta_info_once = False
+                        time_coverage_start = selected_file_list[idx][1]
+                        time_coverage_end = selected_file_list[idx][2]
+                        local_ds.add_dataset(os.path.join(local_ds.id, file_name),
+                                             (time_coverage_start, time_coverage_end))
+                        synced_indexes.add(idx)
+                        monitor.progress(work=1, msg=f'{len(synced_indexes)} of {len(files)} files')
+        finally:
+            for future in pending.keys():
+                future.cancel()
+            executor.shutdown(wait=True)
+
+        if errors and not synced_indexes:
+            e = errors[min(errors.keys())]
+            if isinstance(e, HTTPError):
+                raise self._cannot_access_error(time_range, region, var_names,
+                                                verb="synchronize", cause=e) from e
+            if isinstance(e, (URLError, socket.timeout)):
+                raise self._cannot_access_error(time_range, region, var_names,
+                                                verb="synchronize", cause=e,
+                                                error_cls=NetworkError) from e
+            if isinstance(e, (OSError, AttributeError)):
+                raise self._cannot_access_error(time_range, region, var_names,
+                                                verb="synchronize", cause=e) from e
+            raise e
+        if errors:
+            warnings.warn(f'Failed to synchronize {len(errors)} of {len(files)} files of {self.id}: '
+                          f'{", ".join(os.path.basename(files[idx]) for idx in sorted(errors.keys()))}',
+                          DataAccessWarning)
+
+        # The verified time coverage is that of the files synchronized without gaps,
+        # starting with the first one synchronized
+        first_index = min(synced_indexes)
+        last_index = first_index
+        while last_index + 1 in synced_indexes:
+            last_index += 1
+        verified_time_coverage_start = selected_file_list[first_index][1]
+        verified_time_coverage_end = selected_file_list[last_index][2]
         local_ds.meta_info['temporal_coverage_start'] = TimeLike.format(verified_time_coverage_start)
         local_ds.meta_info['temporal_coverage_end'] = TimeLike.format(verified_time_coverage_end)
 
     def _update_ds_using_http(self, local_path, local_ds, selected_file_list, time_range, region, var_names, monitor):
-        do_update_of_verified_time_coverage_start_once = True
-        verified_time_coverage_start = None
-        verified_time_coverage_end = None
-        outdated_file_list = []
-        for file_rec in selected_file_list:
-            filename, _, _, file_size, url = file_rec
-            dataset_file = os.path.join(local_path, filename)
-            # todo (forman, 20160915): must perform better checks on dataset_file if it is...
-            # ... outdated or incomplete or corrupted.
-            # JSON also includes "checksum" and "checksum_type" fields.
-            if not os.path.isfile(dataset_file) or (file_size and os.path.getsize(dataset_file) != file_size):
-                outdated_file_list.append(file_rec)
+        outdated_file_list = [file_rec for file_rec in selected_file_list
+                              if not _is_local_file_valid(os.path.join(local_path, file_rec[0]), file_rec)]
+        verified_time_coverages = []
         if outdated_file_list:
             with monitor.starting('Sync ' + self.id, len(outdated_file_list)):
                 bytes_to_download = sum([file_rec[3] for file_rec in outdated_file_list])
-                dl_stat = _DownloadStatistics(bytes_to_download)
-                file_number = 1
-                url_scheme = None
-                for filename, coverage_from, coverage_to, file_size, url in outdated_file_list:
-                    dataset_file = os.path.join(local_path, filename)
-                    child_monitor = monitor.child(work=1.0)
-
-                    # noinspection PyUnusedLocal
-                    def reporthook(block_number, read_size, total_file_size):
-                        dl_stat.handle_chunk(read_size)
-                        child_monitor.progress(work=read_size, msg=str(dl_stat))
-
-                    sub_monitor_msg = "file %d of %d" % (file_number, len(outdated_file_list))
-                    with child_monitor.starting(sub_monitor_msg, file_size):
-                        actual_url = url[_ODP_PROTOCOL_HTTP]
-
-                        if url_scheme:
-                            url_object = urllib.parse.urlparse(actual_url)
-                            url_object = url_object._replace(scheme=url_scheme)
-                            actual_url = urllib.parse.urlunparse(url_object)
-
-                    _LOG.info(f"Downloading {actual_url} to {dataset_file}")
-                    try:
-                        urllib.request.urlretrieve(actual_url, filename=dataset_file, reporthook=reporthook)
-                    except HTTPError as e:
-                        try:
-                            actual_url = e.headers['Location']
-                            urllib.request.urlretrieve(actual_url, filename=dataset_file, reporthook=reporthook)
-                            # the following presumption has been made in order to save runtime: if a HTTP Error 308
-                            # occurs, it's assumed to be due to protocol change and that for all downloads within this
-                            # download que the redirect will be true.
-                            url_scheme = urllib.parse.urlparse(actual_url).scheme
-                        except HTTPError as e:
-                            raise self._cannot_access_error(time_range, region, var_names,
-                                                            verb="synchronize", cause=e) from e
-                    except (URLError, socket.timeout) as e:
-                        raise self._cannot_access_error(time_range, region, var_names,
-                                                        verb="synchronize", cause=e,
-                                                        error_cls=NetworkError) from e
-                    except OSError as e:
-                        raise self._cannot_access_error(time_range, region, var_names,
-                                                        verb="synchronize", cause=e) from e
-                    file_number += 1
+                dl_stat = _DownloadStatistics(bytes_to_download, files_total=len(outdated_file_list))
+
+                def on_file_downloaded(file_rec):
+                    filename, coverage_from, coverage_to = file_rec[0:3]
                     local_ds.add_dataset(os.path.join(local_ds.id, filename), (coverage_from, coverage_to))
-                    if do_update_of_verified_time_coverage_start_once:
-                        verified_time_coverage_start = coverage_from
-                        do_update_of_verified_time_coverage_start_once = False
-                    verified_time_coverage_end = coverage_to
+                    verified_time_coverages.append((coverage_from, coverage_to))
+
+                downloads = [_Download(url=file_rec[4][_ODP_PROTOCOL_HTTP],
+                                       file_path=os.path.join(local_path, file_rec[0]),
+                                       file_size=file_rec[3],
+                                       checksum_info=_get_checksum_info(file_rec),
+                                       file_rec=file_rec)
+                             for file_rec in outdated_file_list]
+                try:
+                    asyncio.run(_download_files(downloads,
+                                                max_workers=get_http_download_max_workers(),
+                                                dl_stat=dl_stat,
+                                                monitor=monitor,
+                                                on_file_downloaded=on_file_downloaded))
+                except aiohttp.ClientResponseError as e:
+                    raise self._cannot_access_error(time_range, region, var_names,
+                                                    verb="synchronize", cause=e) from e
+                except (aiohttp.ClientError, asyncio.TimeoutError, socket.timeout) as e:
+                    raise self._cannot_access_error(time_range, region, var_names,
+                                                    verb="synchronize", cause=e,
+                                                    error_cls=NetworkError) from e
+                except OSError as e:
+                    raise self._cannot_access_error(time_range, region, var_names,
+                                                    verb="synchronize", cause=e) from e
+                _LOG.info(f"Downloaded {dl_stat.files_done} files of {self.id}: {dl_stat}")
+        if verified_time_coverages:
+            verified_time_coverage_start = min(coverage[0] for coverage in verified_time_coverages)
+            verified_time_coverage_end = max(coverage[1] for coverage in verified_time_coverages)
+        else:
+            verified_time_coverage_start = None
+            verified_time_coverage_end = None
         local_ds.meta_info['temporal_coverage_start'] = TimeLike.format(verified_time_coverage_start)
         local_ds.meta_info['temporal_coverage_end'] = TimeLike.format(verified_time_coverage_end)
 
@@ -1419,8 +1437,14 @@ class EsaCciOdpDataSource(DataSource):
                    time_range: TimeRangeLike.TYPE = None,
                    region: PolygonLike.TYPE = None,
                    var_names: VarNamesLike.TYPE = None,
-                   monitor: Monitor = Monitor.NONE) -> Optional[DataSource]:
+                   monitor: Monitor = Monitor.NONE,
+                   compression_level: int = None) -> Optional[DataSource]:
+        """
+        See :py:meth:`DataSource.make_local`.
 
+        :param compression_level: The NetCDF compression level (0 to 9) used when writing subsets of remote files.
+               If not given, the configuration parameter ``NETCDF_COMPRESSION_LEVEL`` is used, whose default is 9.
+        """
         time_range = TimeRangeLike.convert(time_range) if time_range else None
         region = PolygonLike.convert(region) if region else None
         var_names = VarNamesLike.convert(var_names) if var_names else None
@@ -1459,7 +1483,8 @@ class EsaCciOdpDataSource(DataSource):
         if local_ds:
             if not local_ds.is_complete:
                 try:
-                    self._update_local_ds(local_ds, time_range, region, var_names, monitor=monitor)
+                    self._update_local_ds(local_ds, time_range, region, var_names, monitor=monitor,
+                                          compression_level=compression_level)
                 except Cancellation as c:
                     local_store.remove_data_source(local_ds)
                     raise c
@@ -1478,13 +1503,26 @@ class EsaCciOdpDataSource(DataSource):
             return None
 
     async def _init_file_list(self, monitor: Monitor = Monitor.NONE):
-        if self._file_list:
+        if self._file_list_index is not None:
             return
+        cache_dir = self.local_metadata_dataset_dir()
+        cache_index_file = os.path.join(cache_dir, 'file-list-index.bin')
+        cache_json_file = os.path.join(cache_dir, 'file-list.json')
+        if self._data_store.index_cache_used \
+                and not _is_cache_expired(os.path.join(cache_dir, 'file-list-timestamp.txt'),
+                                          self._data_store.index_cache_expiration_days) \
+                and os.path.isfile(cache_index_file) and os.path.isfile(cache_json_file) \
+                and os.path.getmtime(cache_index_file) >= os.path.getmtime(cache_json_file):
+            file_list_index = OdpFileListIndex.load(cache_index_file)
+            if file_list_index is not None:
+                self._set_file_list_index(file_list_index)
+                return
+
         file_list = await _load_or_fetch_json(_fetch_file_list_json,
                                               fetch_json_args=[self._raw_id, self._datasource_id],
                                               fetch_json_kwargs=dict(monitor=monitor),
                                               cache_used=self._data_store.index_cache_used,
-                                              cache_dir=self.local_metadata_dataset_dir(),
+                                              cache_dir=cache_dir,
                                               cache_json_filename='file-list.json',
                                               cache_timestamp_filename='file-list-timestamp.txt',
                                               cache_expiration_days=self._data_store.index_cache_expiration_days)
@@ -1497,11 +1535,8 @@ class EsaCciOdpDataSource(DataSource):
         else:
             time_delta = timedelta(days=0)
 
-        data_source_start_date = datetime(3000, 1, 1)
-        data_source_end_date = datetime(1000, 1, 1)
         # Convert file_start_date from string to datetime object
         # Compute file_end_date from 'time_frequency' field
-        # Compute the data source's temporal coverage
         for file_rec in file_list:
             if file_rec[1]:
                 # check if time_format matches _TIMESTAMP_FORMAT e.g '1997-09-03T00:00:00'
@@ -1521,12 +1556,22 @@ class EsaCciOdpDataSource(DataSource):
                         raise ValueError(f"cannot extract date/time information from {file_rec[1]}.")
 
                 file_end_date = file_start_date + time_delta
-                data_source_start_date = min(data_source_start_date, file_start_date)
-                data_source_end_date = max(data_source_end_date, file_end_date)
                 file_rec[1] = file_start_date
                 file_rec[2] = file_end_date
-        self._temporal_coverage = data_source_start_date, data_source_end_date
-        self._file_list = file_list
+
+        # The file list is stored as a binary index, so it needs not be parsed again
+        file_list_index = OdpFileListIndex.from_file_list(file_list)
+        if self._data_store.index_cache_used:
+            try:
+                file_list_index.save(cache_index_file)
+            except OSError as e:
+                _LOG.warning(f'Failed to write file list index {cache_index_file}: {e}')
+        self._set_file_list_index(file_list_index)
+
+    def _set_file_list_index(self, file_list_index: OdpFileListIndex):
+        # Compute the data source's temporal coverage
+        self._temporal_coverage = file_list_index.temporal_coverage or (datetime(3000, 1, 1), datetime(1000, 1, 1))
+        self._file_list_index = file_list_index
 
     def __str__(self):
         return self.info_string
@@ -1538,24 +1583,310 @@ class EsaCciOdpDataSource(DataSource):
         return self.id
 
 
+def _fetch_opendap_subset(dataset_uri: str,
+                          var_names: Optional[VarNamesLike.TYPE],
+                          region: Optional[PolygonLike.TYPE]) -> xr.Dataset:
+    """
+    Open the remote dataset given by *dataset_uri* via OPeNDAP, subset it and load the subset into memory.
+    Attempts are repeated with increasing delays.
+    """
+    to_append = ''
+    for attempt in range(1, _OPENDAP_SYNC_NUM_ATTEMPTS + 1):
+        try:
+            remote_dataset_root = xr.open_dataset(dataset_uri + to_append)
+            try:
+                remote_dataset = remote_dataset_root
+                if var_names:
+                    remote_dataset = remote_dataset.drop_vars(
+                        [var_name for var_name in remote_dataset.data_vars.keys()
+                         if var_name not in var_names]
+                    )
+                if region:
+                    remote_dataset = normalize_impl(remote_dataset)
+                    remote_dataset = subset_spatial_impl(remote_dataset, region)
+                    remote_dataset = adjust_spatial_attrs_impl(remote_dataset, allow_point=False)
+                return remote_dataset.load()
+            finally:
+                remote_dataset_root.close()
+        except (HTTPError, URLError, socket.timeout, OSError) as e:
+            if attempt == _OPENDAP_SYNC_NUM_ATTEMPTS:
+                raise
+            _LOG.warning(f"Attempt {attempt} to open {dataset_uri} failed, retrying: {e}")
+            # Some datasets can only be opened if the mismatch of fill values and data types is tolerated
+            to_append = '#fillmismatch'
+            time.sleep(attempt - 1)
+
+
+def _write_opendap_subset(dataset: xr.Dataset, file_path: str, encoding_update: Dict[str, Any]) -> xr.Dataset:
+    """
+    Write a subset fetched by :py:func:`_fetch_opendap_subset` to the NetCDF file *file_path*.
+    The file is moved into place only after it has been written completely.
+    Attempts are repeated with increasing delays.
+    """
+    if encoding_update:
+        for var_name in dataset.variables.keys():
+            dataset.variables.get(var_name).encoding.update(encoding_update)
+    temp_file_path = file_path + _DOWNLOAD_TEMP_FILE_SUFFIX
+    for attempt in range(1, _OPENDAP_SYNC_NUM_ATTEMPTS + 1):
+        # Note: we are using engine='h5netcdf' here because the default engine='netcdf4'
+        # causes crashes in file "netCDF4/_netCDF4.pyx" with currently used netcdf4-1.4.2 conda
+        # package from conda-forge. This occurs whenever remote_dataset.to_netcdf() is called a
+        # second time in this loop.
+        # Probably related to https://github.com/pydata/xarray/issues/2560.
+        # And probably fixes Cate issues #823, #822, #818, #816, #783.
+        try:
+            try:
+                dataset.to_netcdf(temp_file_path, format='NETCDF4', engine='h5netcdf')
+            except AttributeError:
+                dataset.to_netcdf(temp_file_path, format='NETCDF3_64BIT')
+            os.replace(temp_file_path, file_path)
+            return dataset
+        except OSError as e:
+            if attempt == _OPENDAP_SYNC_NUM_ATTEMPTS:
+                raise
+            _LOG.warning(f"Attempt {attempt} to write {file_path} failed, retrying: {e}")
+            time.sleep(attempt - 1)
+        finally:
+            if os.path.exists(temp_file_path):
+                os.remove(temp_file_path)
+
+
+def _sync_opendap_file(dataset_uri: str,
+                       var_names: Optional[VarNamesLike.TYPE],
+                       region: Optional[PolygonLike.TYPE],
+                       file_path: str,
+                       encoding_update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Synchronize the local NetCDF file *file_path* with a subset of the remote dataset given by *dataset_uri*.
+    Called in worker processes, so only the information about the subset needed to update the
+    local data source's meta-information is returned: its global attributes, variable names and dimension names.
+    """
+    dataset = _fetch_opendap_subset(dataset_uri, var_names, region)
+    _write_opendap_subset(dataset, file_path, encoding_update)
+    return dict(attrs=dict(dataset.attrs),
+                variables=list(dataset.variables.keys()),
+                dims=list(dataset.dims.keys()))
+
+
+class _Download:
+    """
+    A file to be downloaded.
+
+    :param url: The file's URL.
+    :param file_path: The local file path.
+    :param file_size: The expected file size in bytes, or 0 if unknown.
+    :param checksum_info: Optional pair (checksum type, checksum), e.g. ("MD5", "ab12..."), used to verify the file.
+    :param file_rec: The file record of the data source's file list.
+    """
+
+    def __init__(self, url: str, file_path: str, file_size: int = 0, checksum_info: List[str] = None,
+                 file_rec: List = None):
+        self.url = url
+        self.file_path = file_path
+        self.file_size = file_size or 0
+        self.checksum_info = checksum_info
+        self.file_rec = file_rec
+        # The number of bytes of this file counted in the download statistics so far
+        self.bytes_done = 0
+
+    @property
+    def temp_file_path(self) -> str:
+        return self.file_path + _DOWNLOAD_TEMP_FILE_SUFFIX
+
+
+async def _download_files(downloads: Sequence[_Download],
+                          max_workers: int,
+                          dl_stat: '_DownloadStatistics',
+                          monitor: Monitor = Monitor.NONE,
+                          on_file_downloaded: Callable[[List], None] = None) -> None:
+    """
+    Download files concurrently using at most *max_workers* connections of a single HTTP session.
+
+    Files are first written to temporary files which are moved to their final location
+    once they have been completely downloaded and verified. Interrupted downloads are resumed using
+    HTTP range requests, also by later invocations.
+
+    :param downloads: The files to be downloaded.
+    :param max_workers: The maximum number of concurrent downloads.
+    :param dl_stat: Download statistics to be updated.
+    :param monitor: A progress monitor whose total work is the number of *downloads*.
+    :param on_file_downloaded: Called with the file record of each downloaded file.
+    """
+    queue = asyncio.Queue()
+    for download in downloads:
+        queue.put_nowait(download)
+
+    connector = aiohttp.TCPConnector(limit=max_workers)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, trust_env=True) as session:
+        async def worker():
+            while not queue.empty():
+                download = queue.get_nowait()
+                await _download_file(session, download, dl_stat, monitor.child(work=1))
+                dl_stat.handle_file()
+                if on_file_downloaded is not None:
+                    on_file_downloaded(download.file_rec)
+
+        tasks = [asyncio.ensure_future(worker()) for _ in range(min(max_workers, len(downloads)))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _download_file(session: aiohttp.ClientSession,
+                         download: _Download,
+                         dl_stat: '_DownloadStatistics',
+                         monitor: Monitor) -> None:
+    file_name = os.path.basename(download.file_path)
+    with monitor.starting(file_name, download.file_size or 1):
+        for attempt in range(1, _DOWNLOAD_NUM_ATTEMPTS + 1):
+            try:
+                await _download_to_temp_file(session, download, dl_stat, monitor)
+                break
+            except (aiohttp.ClientPayloadError, aiohttp.ServerDisconnectedError, aiohttp.ClientConnectionError,
+                    asyncio.TimeoutError) as e:
+                if attempt == _DOWNLOAD_NUM_ATTEMPTS:
+                    raise
+                # The next attempt resumes where this one stopped
+                _LOG.warning(f"Attempt {attempt} to download {download.url} failed, retrying: {e}")
+                await asyncio.sleep(attempt)
+        # Hash in a separate thread so that concurrent downloads are not blocked
+        if not await asyncio.get_running_loop().run_in_executor(None, _verify_checksum,
+                                                                download.temp_file_path, download.checksum_info):
+            os.remove(download.temp_file_path)
+            raise DataAccessError(f'Checksum of "{download.url}" does not match')
+        os.replace(download.temp_file_path, download.file_path)
+
+
+async def _download_to_temp_file(session: aiohttp.ClientSession,
+                                 download: _Download,
+                                 dl_stat: '_DownloadStatistics',
+                                 monitor: Monitor) -> None:
+    temp_file_path = download.temp_file_path
+    offset = os.path.getsize(temp_file_path) if os.path.isfile(temp_file_path) else 0
+    _LOG.info(f"Downloading {download.url} to {download.file_path}" + (f" from byte {offset}" if offset else ""))
+
+    url_object = urllib.parse.urlparse(download.url)
+    if url_object.scheme == 'file':
+        source_path = urllib.request.url2pathname(url_object.path)
+        if offset > os.path.getsize(source_path):
+            offset = 0
+        with open(source_path, 'rb') as source_fp:
+            source_fp.seek(offset)
+            if not offset:
+                _restart_download(download, dl_stat)
+            await _write_chunks(download, iter(lambda: source_fp.read(_DOWNLOAD_CHUNK_SIZE), b''),
+                                dl_stat, monitor)
+        return
+
+    headers = {'Range': f'bytes={offset}-'} if offset else None
+    async with session.get(download.url, headers=headers) as response:
+        if response.status == 416 and offset:
+            # Range not satisfiable: either the file is complete or it has changed, so start again
+            if response.headers.get('Content-Range') == f'bytes */{offset}':
+                return
+            os.remove(temp_file_path)
+            raise aiohttp.ClientPayloadError(f'cannot resume download of {download.url}')
+        response.raise_for_status()
+        expected_size = response.content_length
+        if response.status == 206:
+            if expected_size is not None:
+                expected_size += offset
+        else:
+            # Servers not supporting range requests send the entire file
+            _restart_download(download, dl_stat)
+        await _write_chunks(download, response.content.iter_chunked(_DOWNLOAD_CHUNK_SIZE), dl_stat, monitor)
+    if expected_size is not None and os.path.getsize(temp_file_path) != expected_size:
+        raise aiohttp.ClientPayloadError(f'incomplete download of {download.url}')
+
+
+def _restart_download(download: _Download, dl_stat: '_DownloadStatistics'):
+    """Truncate the temporary file of *download* and uncount the bytes of it downloaded so far."""
+    with open(download.temp_file_path, 'wb'):
+        pass
+    dl_stat.handle_chunk(-download.bytes_done)
+    download.bytes_done = 0
+
+
+async def _write_chunks(download: _Download, chunks, dl_stat: '_DownloadStatistics', monitor: Monitor):
+    # Chunks are appended, see _restart_download()
+    async with aiofiles.open(download.temp_file_path, 'ab') as fp:
+        if hasattr(chunks, '__aiter__'):
+            async for chunk in chunks:
+                await _write_chunk(fp, chunk, download, dl_stat, monitor)
+        else:
+            for chunk in chunks:
+                await _write_chunk(fp, chunk, download, dl_stat, monitor)
+
+
+async def _write_chunk(fp, chunk: bytes, download: _Download, dl_stat: '_DownloadStatistics', monitor: Monitor):
+    monitor.check_for_cancellation()
+    await fp.write(chunk)
+    download.bytes_done += len(chunk)
+    dl_stat.handle_chunk(len(chunk))
+    monitor.progress(work=len(chunk), msg=str(dl_stat))
+
+
+def _is_local_file_valid(file_path: str, file_rec: List) -> bool:
+    """
+    Test whether the local copy *file_path* of the file given by *file_rec* exists and is complete.
+    Its size and checksum are verified, if given, as the file may have been written by previous versions
+    or have been corrupted since.
+    """
+    if not os.path.isfile(file_path):
+        return False
+    file_size = file_rec[3]
+    if file_size and os.path.getsize(file_path) != file_size:
+        return False
+    return _verify_checksum(file_path, _get_checksum_info(file_rec))
+
+
+def _verify_checksum(file_path: str, checksum_info: Optional[List[str]]) -> bool:
+    if not checksum_info:
+        return True
+    checksum_type, checksum = checksum_info
+    try:
+        file_hash = hashlib.new(checksum_type.replace('-', '').lower())
+    except ValueError:
+        _LOG.warning(f'Cannot verify file "{file_path}", unknown checksum type "{checksum_type}"')
+        return True
+    with open(file_path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(_DOWNLOAD_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest().lower() == checksum.lower()
+
+
 class _DownloadStatistics:
-    def __init__(self, bytes_total):
+    def __init__(self, bytes_total, files_total: int = None):
         self.bytes_total = bytes_total
         self.bytes_done = 0
+        self.files_total = files_total
+        self.files_done = 0
         self.start_time = datetime.now()
 
     def handle_chunk(self, chunk_size: int):
         self.bytes_done += chunk_size
 
-    def __str__(self):
+    def handle_file(self):
+        self.files_done += 1
+
+    @property
+    def bytes_per_second(self) -> float:
+        """The aggregate throughput of all concurrent downloads."""
         seconds = (datetime.now() - self.start_time).seconds
-        if seconds > 0:
-            mb_per_sec = self._to_megas(self.bytes_done) / seconds
-        else:
-            mb_per_sec = 0.
-        percent = 100. * self.bytes_done / self.bytes_total
-        return "%d of %d MB @ %.3f MB/s, %.1f%% complete" % \
+        return self.bytes_done / seconds if seconds > 0 else 0.
+
+    def __str__(self):
+        mb_per_sec = self._to_megas(self.bytes_per_second)
+        percent = 100. * self.bytes_done / self.bytes_total if self.bytes_total else 100.
+        text = "%d of %d MB @ %.3f MB/s, %.1f%% complete" % \
                (self._to_megas(self.bytes_done), self._to_megas(self.bytes_total), mb_per_sec, percent)
+        if self.files_total is not None:
+            text += ", %d of %d files" % (self.files_done, self.files_total)
+        return text
 
     @staticmethod
     def _to_megas(bytes_count: int) -> float:
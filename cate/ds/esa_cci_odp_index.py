@@ -0,0 +1,597 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module defines the :py:class:`OdpCatalogueIndex` class, a compact on-disk index of the data sources
+of the ESA CCI Open Data Portal (ODP) data store.
+
+The index is sharded by ECV. Every shard is a directory of NumPy ``.npy`` column files, which are
+memory-mapped when read, namely data source identifiers, titles, ECVs, time frequencies, processing levels,
+bounding boxes and temporal coverages, plus a sorted token array used for prefix search. The complete
+meta-information of the data sources is stored as a single blob of JSON records per shard, so only the
+records of matching data sources are decoded.
+
+Query expressions comprise free text and optional filter terms of the form ``<name>:<value>``:
+
+* ``ecv:<ecv>``, ``time_frequency:<time-frequency>``, ``processing_level:<processing-level>`` match the
+  respective values case-insensitively;
+* ``bbox:<min_lon>,<min_lat>,<max_lon>,<max_lat>`` matches data sources whose bounding box intersects
+  the given one;
+* ``time:<start>,<end>`` matches data sources whose temporal coverage overlaps the given time range.
+
+Free text matches a data source if it is contained in its identifier or title, or if every word of it
+is the prefix of a word of its identifier or title.
+
+The module also defines the :py:class:`OdpFileListIndex` class, a binary file holding the file list of
+a single ODP data source. File start and end times, sizes and the offsets of the file names and URLs are stored
+as a typed array sorted by start time, so that files are selected by time range using binary search and the list
+is loaded without parsing JSON.
+
+Components
+==========
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import uuid
+from datetime import datetime
+from threading import RLock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+#: Increment, if the format of the index changes
+_INDEX_VERSION = 1
+
+_MANIFEST_FILENAME = 'index.json'
+_META_FILENAME = 'meta.json'
+
+_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+_STR_COLUMN_NAMES = ('id', 'fid', 'title', 'ecv', 'time_frequency', 'processing_level')
+_FILTER_NAMES = ('ecv', 'time_frequency', 'processing_level', 'bbox', 'time')
+
+_RE_TOKEN_SEPARATOR = re.compile('[^0-9a-z]+')
+
+_FILE_LIST_MAGIC = b'CATEODPF'
+_FILE_LIST_VERSION = 1
+# magic, version, number of files
+_FILE_LIST_HEADER = struct.Struct('<8sII')
+_FILE_LIST_DTYPE = np.dtype([('start', '<M8[us]'),
+                             ('end', '<M8[us]'),
+                             ('size', '<i8'),
+                             ('offset', '<i8'),
+                             ('length', '<i4')])
+
+
+class OdpCatalogueIndex:
+    """
+    A sharded, columnar, memory-mappable index of ODP data sources.
+    Instances are thread-safe.
+
+    :param index_dir: The directory that holds the index.
+    """
+
+    def __init__(self, index_dir: str):
+        self._index_dir = index_dir
+        self._manifest = None
+        self._shards = dict()
+        self._lock = RLock()
+
+    @property
+    def index_dir(self) -> str:
+        return self._index_dir
+
+    @property
+    def exists(self) -> bool:
+        """Whether the index exists."""
+        with self._lock:
+            return self._get_manifest() is not None
+
+    def is_up_to_date(self, expiration_days: float) -> bool:
+        """
+        Test whether the index exists and has been updated within the last *expiration_days*.
+
+        :param expiration_days: The number of days after which the index expires.
+        :return: True, if the index can be used.
+        """
+        with self._lock:
+            manifest = self._get_manifest()
+        if manifest is None:
+            return False
+        timestamp = datetime.strptime(manifest['timestamp'], _TIMESTAMP_FORMAT)
+        time_diff = datetime.utcnow() - timestamp
+        return time_diff.days + time_diff.seconds / 3600. / 24. < expiration_days
+
+    def update(self, records: Sequence[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Update the index so that it comprises exactly the given *records*.
+        Only shards whose records have changed are rewritten.
+
+        :param records: Pairs of data source identifiers and the data sources' meta-information.
+                The latter must contain the raw ODP dataset identifier ``fid``.
+        """
+        shard_records = dict()
+        for ds_id, meta_info in records:
+            shard_records.setdefault(_get_shard_name(meta_info.get('ecv')), []).append((ds_id, meta_info))
+
+        with self._lock:
+            manifest = self._get_manifest() or dict(version=_INDEX_VERSION, shards=dict())
+            old_shards = manifest['shards']
+            new_shards = dict()
+            for shard_name, recs in shard_records.items():
+                recs = sorted(recs, key=lambda rec: (rec[0], rec[1].get('fid', '')))
+                fingerprint = hashlib.sha256(json.dumps(recs, sort_keys=True).encode('utf-8')).hexdigest()
+                old_shard = old_shards.get(shard_name)
+                if old_shard and old_shard['fingerprint'] == fingerprint \
+                        and os.path.isdir(os.path.join(self._index_dir, old_shard['dir'])):
+                    new_shards[shard_name] = old_shard
+                    continue
+                shard_dir = '%s-%s' % (shard_name, fingerprint[:16])
+                _write_shard(os.path.join(self._index_dir, shard_dir), recs)
+                new_shards[shard_name] = dict(dir=shard_dir, fingerprint=fingerprint, size=len(recs))
+
+            new_manifest = dict(version=_INDEX_VERSION,
+                                timestamp=datetime.utcnow().strftime(_TIMESTAMP_FORMAT),
+                                shards=new_shards)
+            _write_json(os.path.join(self._index_dir, _MANIFEST_FILENAME), new_manifest)
+            self._manifest = new_manifest
+            self._shards = {shard_name: shard for shard_name, shard in self._shards.items()
+                            if shard_name in new_shards and shard.shard_dir.endswith(new_shards[shard_name]['dir'])}
+
+            obsolete_dirs = (set(shard['dir'] for shard in old_shards.values())
+                             - set(shard['dir'] for shard in new_shards.values()))
+        for shard_dir in obsolete_dirs:
+            # Shards may still be memory-mapped by other readers, so this may fail on some platforms
+            shutil.rmtree(os.path.join(self._index_dir, shard_dir), ignore_errors=True)
+
+    def query(self, ds_id: str = None, query_expr: str = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Find data sources in the index.
+
+        :param ds_id: A data source identifier.
+        :param query_expr: A query expression, see module description.
+        :return: Pairs of data source identifiers and the data sources' meta-information
+                 for all data sources that match *ds_id* or *query_expr*. If neither is given, all data sources.
+        """
+        text, filters = parse_query_expr(query_expr)
+        results = []
+        with self._lock:
+            manifest = self._get_manifest()
+            if manifest is None:
+                return results
+            shard_names = sorted(manifest['shards'].keys())
+            if 'ecv' in filters and not ds_id:
+                shard_names = [shard_name for shard_name in shard_names
+                               if shard_name == _get_shard_name(filters['ecv'])]
+            shards = [self._get_shard(shard_name) for shard_name in shard_names]
+        for shard in shards:
+            if ds_id or query_expr:
+                rows = shard.find(ds_id, text, filters)
+            else:
+                rows = range(shard.size)
+            results.extend(shard.get_records(rows))
+        return results
+
+    def remove(self) -> None:
+        """Remove the index from disk."""
+        with self._lock:
+            self._manifest = None
+            self._shards = dict()
+            shutil.rmtree(self._index_dir, ignore_errors=True)
+
+    def _get_manifest(self) -> Optional[Dict[str, Any]]:
+        if self._manifest is None:
+            manifest_file = os.path.join(self._index_dir, _MANIFEST_FILENAME)
+            if os.path.isfile(manifest_file):
+                # noinspection PyBroadException
+                try:
+                    with open(manifest_file) as fp:
+                        manifest = json.load(fp)
+                    if manifest.get('version') == _INDEX_VERSION:
+                        self._manifest = manifest
+                except Exception:
+                    _LOG.exception('reading catalogue index "%s" failed' % manifest_file)
+        return self._manifest
+
+    def _get_shard(self, shard_name: str) -> '_Shard':
+        shard = self._shards.get(shard_name)
+        if shard is None:
+            shard = _Shard(os.path.join(self._index_dir, self._manifest['shards'][shard_name]['dir']))
+            self._shards[shard_name] = shard
+        return shard
+
+
+def parse_query_expr(query_expr: Optional[str]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Split a query expression into its free text and its filters.
+
+    :param query_expr: A query expression, see module description.
+    :return: A pair comprising the free text and a dictionary of filters. Filter values of ``bbox`` are
+             tuples of four floats, values of ``time`` are pairs of ``numpy.datetime64`` which may be ``NaT``,
+             all other values are strings.
+    """
+    if not query_expr:
+        return '', dict()
+    words = []
+    filters = dict()
+    for word in query_expr.split():
+        name, sep, value = word.partition(':')
+        if not sep or name.lower() not in _FILTER_NAMES:
+            words.append(word)
+            continue
+        name = name.lower()
+        if name == 'bbox':
+            try:
+                bbox = tuple(float(v) for v in value.split(','))
+            except ValueError:
+                bbox = ()
+            if len(bbox) != 4:
+                raise ValueError('bbox filter must have the form "bbox:<min_lon>,<min_lat>,<max_lon>,<max_lat>"')
+            filters[name] = bbox
+        elif name == 'time':
+            start, _, end = value.partition(',')
+            filters[name] = (_to_datetime64(start), _to_datetime64(end))
+        else:
+            filters[name] = value
+    return ' '.join(words), filters
+
+
+class OdpFileListIndex:
+    """
+    The file list of an ODP data source, sorted by start time.
+    Files without start time are placed at the end of the list.
+
+    Use :py:meth:`from_file_list` or :py:meth:`load` to create instances.
+
+    :param rows: Typed array of type ``_FILE_LIST_DTYPE``.
+    :param file_path: The file holding the records referred to by *rows*.
+    :param records: The records referred to by *rows*, if not read from *file_path*.
+    :param records_offset: The position of the records in *file_path*.
+    """
+
+    def __init__(self, rows: np.ndarray, file_path: str = None, records: bytes = None, records_offset: int = 0):
+        self._rows = rows
+        self._file_path = file_path
+        self._records = records
+        self._records_offset = records_offset
+        valid_starts = ~np.isnat(rows['start'])
+        self._num_timed_files = int(np.count_nonzero(valid_starts))
+
+    @classmethod
+    def from_file_list(cls, file_list: Sequence[Sequence[Any]]) -> 'OdpFileListIndex':
+        """
+        Create an index from a file list.
+
+        :param file_list: Records of the form ``[file_name, start_time, end_time, file_size, urls, checksum_info]``.
+               Start and end times are ``datetime`` objects or empty strings.
+        """
+        starts = np.array([np.datetime64(file_rec[1] if file_rec[1] else 'NaT', 'us') for file_rec in file_list],
+                          dtype='M8[us]')
+        # NaT is sorted to the end
+        order = np.argsort(starts, kind='stable')
+        rows = np.zeros(len(file_list), dtype=_FILE_LIST_DTYPE)
+        records = bytearray()
+        for row, index in enumerate(order):
+            file_rec = file_list[index]
+            record = json.dumps([file_rec[0], file_rec[4], file_rec[5] if len(file_rec) > 5 else None])
+            record = record.encode('utf-8')
+            rows[row] = (starts[index],
+                         np.datetime64(file_rec[2], 'us') if file_rec[1] and file_rec[2]
+                         else np.datetime64('NaT', 'us'),
+                         int(file_rec[3] or 0),
+                         len(records),
+                         len(record))
+            records += record
+        return OdpFileListIndex(rows, records=bytes(records))
+
+    @classmethod
+    def load(cls, file_path: str) -> Optional['OdpFileListIndex']:
+        """
+        Load an index from *file_path*. The file is memory-mapped.
+
+        :return: The index or ``None``, if the file does not exist or has an unknown format.
+        """
+        try:
+            with open(file_path, 'rb') as fp:
+                magic, version, size = _FILE_LIST_HEADER.unpack(fp.read(_FILE_LIST_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if magic != _FILE_LIST_MAGIC or version != _FILE_LIST_VERSION:
+            return None
+        if size == 0:
+            rows = np.zeros(0, dtype=_FILE_LIST_DTYPE)
+        else:
+            rows = np.memmap(file_path, dtype=_FILE_LIST_DTYPE, mode='r', offset=_FILE_LIST_HEADER.size,
+                             shape=(size,))
+        return OdpFileListIndex(rows, file_path=file_path,
+                                records_offset=_FILE_LIST_HEADER.size + size * _FILE_LIST_DTYPE.itemsize)
+
+    def save(self, file_path: str) -> None:
+        """Write this index to *file_path*."""
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        temp_file = '%s.%s.tmp' % (file_path, uuid.uuid4().hex)
+        try:
+            with open(temp_file, 'wb') as fp:
+                fp.write(_FILE_LIST_HEADER.pack(_FILE_LIST_MAGIC, _FILE_LIST_VERSION, len(self._rows)))
+                fp.write(np.ascontiguousarray(self._rows).tobytes())
+                fp.write(self._read_all_records())
+            os.replace(temp_file, file_path)
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def temporal_coverage(self) -> Optional[Tuple[datetime, datetime]]:
+        """The minimum start time and the maximum end time of all files, or ``None``."""
+        if self._num_timed_files == 0:
+            return None
+        timed_rows = self._rows[0:self._num_timed_files]
+        end = timed_rows['end'][~np.isnat(timed_rows['end'])]
+        return (timed_rows['start'][0].item(),
+                (end.max() if end.size else timed_rows['start'][-1]).item())
+
+    def find(self, start: datetime = None, end: datetime = None) -> List[List[Any]]:
+        """
+        Get the records of the files whose start time is within the given time range.
+        If neither *start* nor *end* are given, all files are returned, including files without start time.
+
+        :param start: Optional minimum start time.
+        :param end: Optional maximum start time.
+        :return: Records of the form ``[file_name, start_time, end_time, file_size, urls, checksum_info]``.
+                 Times are ``datetime`` objects, or empty strings if a file has no start time.
+        """
+        if start is None and end is None:
+            return self._get_records(0, len(self._rows))
+        starts = self._rows['start'][0:self._num_timed_files]
+        lo = int(np.searchsorted(starts, np.datetime64(start, 'us'), side='left')) if start is not None else 0
+        hi = int(np.searchsorted(starts, np.datetime64(end, 'us'), side='right')) if end is not None \
+            else self._num_timed_files
+        return self._get_records(lo, max(lo, hi))
+
+    def _get_records(self, lo: int, hi: int) -> List[List[Any]]:
+        if lo >= hi:
+            return []
+        rows = self._rows[lo:hi]
+        records_start = int(rows['offset'].min())
+        records_end = int((rows['offset'] + rows['length']).max())
+        records = self._read_records(records_start, records_end)
+        file_list = []
+        for row in rows:
+            offset = int(row['offset']) - records_start
+            file_name, urls, checksum_info = json.loads(records[offset:offset + int(row['length'])].decode('utf-8'))
+            if np.isnat(row['start']):
+                start_time, end_time = '', ''
+            else:
+                start_time = row['start'].item()
+                end_time = row['end'].item() if not np.isnat(row['end']) else start_time
+            file_list.append([file_name, start_time, end_time, int(row['size']), urls, checksum_info])
+        return file_list
+
+    def _read_records(self, start: int, end: int) -> bytes:
+        if self._records is not None:
+            return self._records[start:end]
+        with open(self._file_path, 'rb') as fp:
+            fp.seek(self._records_offset + start)
+            return fp.read(end - start)
+
+    def _read_all_records(self) -> bytes:
+        if self._records is not None:
+            return self._records
+        with open(self._file_path, 'rb') as fp:
+            fp.seek(self._records_offset)
+            return fp.read()
+
+
+class _Shard:
+    """
+    A shard of the index. Column arrays are memory-mapped on first access.
+    """
+
+    def __init__(self, shard_dir: str):
+        self.shard_dir = shard_dir
+        self._columns = dict()
+
+    @property
+    def size(self) -> int:
+        return self._column('id').shape[0]
+
+    def find(self, ds_id: Optional[str], text: str, filters: Dict[str, Any]) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        if ds_id:
+            mask |= np.char.lower(self._column('id')) == ds_id.lower()
+        if text or filters:
+            if text:
+                text_mask = self._find_text(text)
+            else:
+                text_mask = np.ones(self.size, dtype=bool)
+            for name, value in filters.items():
+                text_mask &= self._find_filter(name, value)
+            mask |= text_mask
+        return np.nonzero(mask)[0]
+
+    def get_records(self, rows) -> List[Tuple[str, Dict[str, Any]]]:
+        ids = self._column('id')
+        offsets = self._column('meta_offsets')
+        records = []
+        with open(os.path.join(self.shard_dir, _META_FILENAME), 'rb') as fp:
+            for row in rows:
+                start, end = int(offsets[row]), int(offsets[row + 1])
+                fp.seek(start)
+                records.append((str(ids[row]), json.loads(fp.read(end - start).decode('utf-8'))))
+        return records
+
+    def _find_text(self, text: str) -> np.ndarray:
+        text = text.lower()
+        # Substring search, as in DataSource.matches()
+        mask = np.char.find(self._column('text'), text) >= 0
+        words = _tokenize(text)
+        if words:
+            # Every word must be the prefix of some token of a row
+            tokens = self._column('tokens')
+            token_rows = self._column('token_rows')
+            words_mask = np.ones(self.size, dtype=bool)
+            for word in set(words):
+                start = np.searchsorted(tokens, word, side='left')
+                end = np.searchsorted(tokens, word + '\uffff', side='left')
+                word_mask = np.zeros(self.size, dtype=bool)
+                word_mask[token_rows[start:end]] = True
+                words_mask &= word_mask
+            mask |= words_mask
+        return mask
+
+    def _find_filter(self, name: str, value: Any) -> np.ndarray:
+        if name == 'bbox':
+            min_lon, min_lat, max_lon, max_lat = value
+            bbox = self._column('bbox')
+            with np.errstate(invalid='ignore'):
+                intersects = ((bbox[:, 0] <= max_lon) & (bbox[:, 2] >= min_lon)
+                              & (bbox[:, 1] <= max_lat) & (bbox[:, 3] >= min_lat))
+            # Data sources without bounding box are not excluded
+            return intersects | np.any(np.isnan(bbox), axis=1)
+        if name == 'time':
+            start, end = value
+            time_coverage = self._column('time_coverage')
+            mask = np.ones(self.size, dtype=bool)
+            if not np.isnat(start):
+                mask &= np.isnat(time_coverage[:, 1]) | (time_coverage[:, 1] >= start)
+            if not np.isnat(end):
+                mask &= np.isnat(time_coverage[:, 0]) | (time_coverage[:, 0] <= end)
+            return mask
+        return np.char.lower(self._column(name)) == value.lower()
+
+    def _column(self, name: str) -> np.ndarray:
+        column = self._columns.get(name)
+        if column is None:
+            column = np.load(os.path.join(self.shard_dir, name + '.npy'), mmap_mode='r')
+            self._columns[name] = column
+        return column
+
+
+def _write_shard(shard_dir: str, records: Sequence[Tuple[str, Dict[str, Any]]]) -> None:
+    temp_dir = '%s.%s.tmp' % (shard_dir, uuid.uuid4().hex)
+    os.makedirs(temp_dir)
+    try:
+        str_columns = {name: [] for name in _STR_COLUMN_NAMES}
+        texts = []
+        bboxes = []
+        time_coverages = []
+        tokens = []
+        meta_offsets = [0]
+        with open(os.path.join(temp_dir, _META_FILENAME), 'wb') as fp:
+            for row, (ds_id, meta_info) in enumerate(records):
+                values = dict(id=ds_id,
+                              fid=meta_info.get('fid'),
+                              title=meta_info.get('title'),
+                              ecv=meta_info.get('ecv'),
+                              time_frequency=meta_info.get('time_frequency'),
+                              processing_level=meta_info.get('processing_level'))
+                for name in _STR_COLUMN_NAMES:
+                    str_columns[name].append(_to_str(values[name]))
+                text = (str_columns['id'][-1] + '\n' + str_columns['title'][-1]).lower()
+                texts.append(text)
+                tokens.extend((token, row) for token in set(_tokenize(text)))
+                bboxes.append([_to_float(meta_info.get(name))
+                               for name in ('bbox_minx', 'bbox_miny', 'bbox_maxx', 'bbox_maxy')])
+                time_coverages.append([_to_datetime64(meta_info.get('temporal_coverage_start')),
+                                       _to_datetime64(meta_info.get('temporal_coverage_end'))])
+                meta_offsets.append(meta_offsets[-1] + fp.write(json.dumps(meta_info).encode('utf-8')))
+        tokens.sort()
+        for name, values in str_columns.items():
+            np.save(os.path.join(temp_dir, name + '.npy'), _to_str_array(values))
+        np.save(os.path.join(temp_dir, 'text.npy'), _to_str_array(texts))
+        np.save(os.path.join(temp_dir, 'tokens.npy'), _to_str_array([token for token, _ in tokens]))
+        np.save(os.path.join(temp_dir, 'token_rows.npy'), np.array([row for _, row in tokens], dtype=np.int32))
+        np.save(os.path.join(temp_dir, 'bbox.npy'), np.array(bboxes, dtype=np.float64).reshape((-1, 4)))
+        np.save(os.path.join(temp_dir, 'time_coverage.npy'),
+                np.array(time_coverages, dtype='datetime64[s]').reshape((-1, 2)))
+        np.save(os.path.join(temp_dir, 'meta_offsets.npy'), np.array(meta_offsets, dtype=np.int64))
+        if os.path.isdir(shard_dir):
+            shutil.rmtree(shard_dir)
+        os.replace(temp_dir, shard_dir)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def _write_json(file_path: str, obj: Any) -> None:
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    temp_file = '%s.%s.tmp' % (file_path, uuid.uuid4().hex)
+    try:
+        with open(temp_file, 'w') as fp:
+            json.dump(obj, fp)
+        os.replace(temp_file, file_path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def _get_shard_name(ecv: Optional[str]) -> str:
+    return _RE_TOKEN_SEPARATOR.sub('_', _to_str(ecv).lower()) or '_'
+
+
+def _tokenize(text: str) -> List[str]:
+    return [token for token in _RE_TOKEN_SEPARATOR.split(text) if token]
+
+
+def _to_str(value: Any) -> str:
+    if isinstance(value, list):
+        value = value[0] if len(value) == 1 else ' '.join(str(v) for v in value)
+    return str(value) if value is not None else ''
+
+
+def _to_str_array(values: List[str]) -> np.ndarray:
+    return np.array(values, dtype='U%d' % max([1] + [len(value) for value in values]))
+
+
+def _to_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def _to_datetime64(value: Any) -> np.datetime64:
+    if value:
+        # noinspection PyBroadException
+        try:
+            return pd.Timestamp(value).to_datetime64().astype('datetime64[s]')
+        except Exception:
+            pass
+    return np.datetime64('NaT', 's')
@@ -38,6 +38,7 @@ Components
 """
 
 import json
+import logging
 import os
 import re
 import shutil
@@ -55,11 +56,12 @@ import shapely.geometry
 import xarray as xr
 from dateutil import parser
 
-from cate.conf import get_config_value, get_data_stores_path, GLOBAL_CONF_FILE
+from cate.conf import get_config_value, get_data_stores_path, get_use_dataset_reference_index, GLOBAL_CONF_FILE
 from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL
 from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, NetworkError, DataAccessWarning, DataSourceStatus, \
     DataStore, DataSource, open_xarray_dataset, DataStoreNotice
-from cate.core.opimpl import subset_spatial_impl, normalize_impl, adjust_spatial_attrs_impl
+from cate.core.opimpl import subset_spatial_impl, normalize_impl, adjust_spatial_attrs_impl, normalize_coord_vars
+from cate.core.refindex import ReferenceIndex
 from cate.core.types import PolygonLike, TimeRange, TimeRangeLike, VarNames, VarNamesLike, ValidationError
 from cate.util.monitor import Monitor
 
@@ -68,6 +70,8 @@ __author__ = "Norman Fomferra (Brockmann Consult GmbH), " \
              "Chris Bernat (Telespazio VEGA UK Ltd), " \
              "Paolo Pesciullesi (Telespazio VEGA UK Ltd)"
 
+_LOG = logging.getLogger('cate')
+
 _REFERENCE_DATA_SOURCE_TYPE = "FILE_PATTERN"
 
 _NAMESPACE = uuid.UUID(bytes=b"1234567890123456", version=3)
@@ -140,10 +144,73 @@ class LocalDataSource(DataSource):
                  } for var_name in self._variables]
 
         self._status = status if status else DataSourceStatus.READY
+        self._reference_index = None
 
     def _resolve_file_path(self, path) -> Sequence:
         return glob(os.path.join(self._data_store.data_store_path, path))
 
+    @property
+    def reference_index(self) -> ReferenceIndex:
+        """The index of chunk references of this data source's files, see :py:class:`ReferenceIndex`."""
+        if self._reference_index is None:
+            self._reference_index = ReferenceIndex(self._data_store.get_reference_index_file(self.id))
+        return self._reference_index
+
+    def _update_reference_index(self, paths: Sequence[str]) -> bool:
+        # noinspection PyBroadException
+        try:
+            self.reference_index.update(paths)
+            self.reference_index.save()
+            return True
+        except Exception:
+            _LOG.exception('updating reference index of data source "%s" failed' % self.id)
+            return False
+
+    def _open_dataset_using_references(self,
+                                       paths: Sequence[str],
+                                       region: Optional[shapely.geometry.Polygon],
+                                       var_names: Optional[VarNames],
+                                       drop_variables: Optional[VarNames],
+                                       monitor: Monitor) -> Optional[xr.Dataset]:
+        """
+        Open the files given by *paths* as a single dataset using the reference index, that is,
+        without opening the files individually.
+
+        :return: The dataset or ``None``, if the reference index is not used or the files cannot be opened
+                 using it.
+        """
+        if not get_use_dataset_reference_index():
+            return None
+        # Files are indexed when they are opened for the first time, or after they have been modified
+        if not self._update_reference_index(paths):
+            return None
+        with monitor.starting('Opening dataset', 1):
+            # noinspection PyBroadException
+            try:
+                ds = self.reference_index.open_dataset(paths)
+            except Exception:
+                # E.g. references of files that have been replaced meanwhile, so open the files instead
+                _LOG.exception('opening data source "%s" using references failed' % self.id)
+                ds = None
+            monitor.progress(work=1)
+        if ds is None:
+            return None
+
+        ds = normalize_coord_vars(ds)
+        if 'time' in ds.indexes and not ds.indexes['time'].is_monotonic_increasing:
+            ds = ds.sortby('time')
+        if drop_variables:
+            ds = ds.drop_vars([var_name for var_name in drop_variables if var_name in ds.variables])
+        if var_names:
+            ds = ds.drop_vars([var_name for var_name in ds.data_vars.keys() if var_name not in var_names])
+
+        ds = normalize_impl(ds)
+
+        if region:
+            ds = subset_spatial_impl(ds, region)
+
+        return ds
+
     def open_dataset(self,
                      time_range: TimeRangeLike.TYPE = None,
                      region: PolygonLike.TYPE = None,
@@ -179,6 +246,13 @@ class LocalDataSource(DataSource):
                 drop_variables = [variable.get('name') for variable in excluded_variables]
             else:
                 drop_variables = None
+            dataset = self._open_dataset_using_references(paths,
+                                                          region=PolygonLike.convert(region) if region else None,
+                                                          var_names=var_names,
+                                                          drop_variables=drop_variables,
+                                                          monitor=monitor)
+            if dataset is not None:
+                return dataset
             # TODO: combine var_names and drop_variables
             return open_xarray_dataset(paths,
                                        region=region,
@@ -427,6 +501,10 @@ class LocalDataSource(DataSource):
         for file in files_to_remove:
             os.remove(os.path.join(self._data_store.data_store_path, file))
             del self._files[file]
+        if files_to_remove:
+            self.reference_index.remove([os.path.join(self._data_store.data_store_path, file)
+                                         for file in files_to_remove])
+            self.reference_index.save()
         if time_range_to_be_removed:
             self._reduce_temporal_coverage(time_range_to_be_removed)
 
@@ -635,6 +713,9 @@ class LocalDataStore(DataStore):
         lock_file = os.path.join(self._store_dir, data_source.id + '.lock')
         if os.path.isfile(lock_file):
             os.remove(lock_file)
+        reference_index_file = self.get_reference_index_file(data_source.id)
+        if os.path.isfile(reference_index_file):
+            os.remove(reference_index_file)
         if remove_files:
             data_source_path = os.path.join(self._store_dir, data_source.id)
             if os.path.isdir(data_source_path):
@@ -646,6 +727,13 @@ class LocalDataStore(DataStore):
         data_source.set_completed(True)
         self._data_sources.append(data_source)
 
+    def get_reference_index_file(self, data_source_id: str) -> str:
+        """
+        Get the path of the file that stores the chunk references of a data source's files.
+        Note, the file must not end with ".json", which is used for data source configurations.
+        """
+        return os.path.join(self._store_dir, data_source_id + '.refs')
+
     @classmethod
     def generate_uuid(cls, ref_id: str,
                       time_range: Optional[TimeRange] = None,
@@ -54,7 +54,7 @@ from .aggregate import long_term_average, temporal_aggregation, reduce
 from .animate import animate_map
 from .anomaly import anomaly_internal, anomaly_external
 from .arithmetics import ds_arithmetics, diff
-from .coregistration import coregister
+from .coregistration import coregister, regrid
 from .correlation import pearson_correlation_scalar, pearson_correlation
 from .data_frame import data_frame_min, data_frame_max, data_frame_query
 from .index import enso, enso_nino34, oni
@@ -87,6 +87,7 @@ __all__ = [
     'select_var',
     # .coregistration
     'coregister',
+    'regrid',
     # .subset
     'subset_spatial',
     'subset_temporal',
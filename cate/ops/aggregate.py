@@ -28,11 +28,19 @@ This module provides aggregation operations
 Components
 ==========
 """
+import functools
+import itertools
 from datetime import timezone
+from typing import Optional, Tuple
 
+import dask
+import dask.array as da
 import numpy as np
 import pandas as pd
 import xarray as xr
+from dask.base import tokenize
+from dask.highlevelgraph import HighLevelGraph
+from dask.utils import parse_bytes
 from xarray.core.resample import DatasetResample as resampler
 
 from cate.core.op import op, op_input, op_return
@@ -108,17 +116,10 @@ def _lta_monthly(ds: xr.Dataset, monitor: Monitor):
     """
     time_min = pd.Timestamp(ds.time.values[0], tzinfo=timezone.utc)
     time_max = pd.Timestamp(ds.time.values[-1], tzinfo=timezone.utc)
-    total_work = 100
-    retset = ds
 
-    with monitor.starting('LTA', total_work=total_work):
-        monitor.progress(work=0)
-        step = total_work / 12
-        kwargs = {'monitor': monitor, 'step': step}
-        retset = retset.groupby('time.month', squeeze=False).apply(_mean, **kwargs)
+    retset = _mean_over_years(ds, ds.time.dt.month.values, 'time', monitor)
 
     # Make the return dataset CF compliant
-    retset = retset.rename({'month': 'time'})
     retset['time'] = pd.date_range('{}-01-01'.format(time_min.year),
                                    freq='MS',
                                    periods=12)
@@ -141,18 +142,6 @@ def _lta_monthly(ds: xr.Dataset, monitor: Monitor):
     return retset
 
 
-def _groupby_day(ds: xr.Dataset, monitor: Monitor, step: float):
-    """
-    Groupby the given dataset by day of month and apply mean to it
-
-    :param ds: Dataset to aggregate
-    :param monitor: Progress monitor
-    :param step: Progress step
-    """
-    kwargs = {'monitor': monitor, 'step': step}
-    return ds.groupby('time.day', squeeze=False).apply(_mean, **kwargs)
-
-
 def _lta_daily(ds: xr.Dataset):
     """
     Carry out a long term average of a daily dataset
@@ -161,7 +150,7 @@ def _lta_daily(ds: xr.Dataset):
     :return: Aggregated dataset
     """
 
-    retset = ds.groupby('time.dayofyear', squeeze=False).mean('time')
+    retset = _mean_over_years(ds, ds.time.dt.dayofyear.values, 'dayofyear', keep_attrs=False)
 
     for var in retset.data_vars:
         try:
@@ -184,8 +173,6 @@ def _lta_general(ds: xr.Dataset, monitor: Monitor):
     """
     time_min = pd.Timestamp(ds.time.values[0], tzinfo=timezone.utc)
     time_max = pd.Timestamp(ds.time.values[-1], tzinfo=timezone.utc)
-    total_work = 100
-    retset = ds
 
     # The dataset should feature time periods consistent over years
     # and denoted with the same dates each year
@@ -204,18 +191,11 @@ def _lta_general(ds: xr.Dataset, monitor: Monitor):
             rep_year = group[1].time
             break
 
-    with monitor.starting('LTA', total_work=total_work):
-        monitor.progress(work=0)
-        step = total_work / len(rep_year.time)
-        kwargs = {'monitor': monitor, 'step': step}
-        retset = retset.groupby('time.month', squeeze=False).apply(_groupby_day, **kwargs)
+    # Group by (month, day) dates, which sort like the dates of the representative year
+    dates = ds.time.dt.month.values * 100 + ds.time.dt.day.values
+    retset = _mean_over_years(ds, dates, 'time', monitor)
 
     # Make the return dataset CF compliant
-    retset = retset.stack(time=('month', 'day'))
-
-    # Turn month, day coordinates to time
-    retset = retset.reset_index('time')
-    retset = retset.drop(['month', 'day'])
     retset['time'] = rep_year.time
 
     climatology_bounds = xr.DataArray(data=np.tile([time_min, time_max],
@@ -277,22 +257,363 @@ def _is_seasonal(time: xr.DataArray):
     return True
 
 
-def _mean(ds: xr.Dataset, monitor: Monitor, step: float):
+def _mean_over_years(ds: xr.Dataset,
+                     keys: np.ndarray,
+                     dim: str,
+                     monitor: Monitor = Monitor.NONE,
+                     keep_attrs: bool = True) -> xr.Dataset:
     """
-    Calculate mean of the given dataset and update the given monitor.
+    Average all time steps of the given dataset that share the same key, e.g. the same month.
+    The result equals ``ds.groupby(keys).mean('time')``, but all group means are computed
+    in a single pass over the time chunks. Groups are split into chunks, see :py:func:`_get_group_chunks`,
+    so that the means of different chunks of groups are computed in parallel.
 
-    :param ds: Dataset to take the mean of
-    :param monitor: Monitor to update
-    :param step: Work step
+    :param ds: Dataset to aggregate
+    :param keys: Group key for each time step
+    :param dim: Name of the resulting group dimension, which replaces time
+    :param monitor: Progress monitor
+    :param keep_attrs: Whether to keep the dataset's and its variables' attributes
+    :return: Dataset with one mean per group. If *dim* is not 'time', it has a *dim* coordinate
+             holding the group keys
     """
-    retset = ds.mean(dim='time', keep_attrs=True)
-    monitor.progress(work=step)
+    groups, labels = np.unique(keys, return_inverse=True)
+    group_chunks = _get_group_chunks(ds, len(groups), _MEAN_ACC_ITEM_SIZE)
+    retset = _aggregate_groups(ds, labels, len(groups), 'mean', dim=dim, group_chunks=group_chunks,
+                               keep_attrs=keep_attrs, monitor=monitor, label='LTA')
+    if dim != 'time':
+        retset[dim] = groups
     return retset
 
 
-@op(tags=['aggregate', 'temporal'], version='1.5')
+def _get_group_chunks(ds: xr.Dataset, num_groups: int, acc_item_size: int) -> Tuple[int, ...]:
+    """
+    Get chunk sizes along the group dimension, so that the accumulator of each chunk of groups of any
+    spatial chunk of the dataset's variables does not exceed dask's configured chunk size ``array.chunk-size``.
+
+    :param ds: Dataset to aggregate
+    :param num_groups: Number of groups
+    :param acc_item_size: Number of bytes accumulated per group and data item
+    :return: Chunk sizes along the group dimension
+    """
+    max_block_size = 1
+    for var in ds.data_vars.values():
+        if 'time' in var.dims:
+            chunks = var.chunks or tuple((size,) for size in var.shape)
+            block_size = 1
+            for var_dim, dim_chunks in zip(var.dims, chunks):
+                if var_dim != 'time':
+                    block_size *= max(dim_chunks)
+            max_block_size = max(max_block_size, block_size)
+    max_acc_size = parse_bytes(dask.config.get('array.chunk-size'))
+    num_chunk_groups = max(1, min(num_groups, max_acc_size // (acc_item_size * max_block_size)))
+    return tuple(min(num_chunk_groups, num_groups - start) for start in range(0, num_groups, num_chunk_groups))
+
+
+def _aggregate_groups(ds: xr.Dataset,
+                      labels: np.ndarray,
+                      num_groups: int,
+                      method: str,
+                      dim: str = 'time',
+                      group_chunks: Tuple[int, ...] = None,
+                      keep_attrs: bool = True,
+                      monitor: Monitor = Monitor.NONE,
+                      label: str = 'aggregate dataset') -> xr.Dataset:
+    """
+    Aggregate all time steps of the given dataset that share the same group label
+    in a single pass over the time chunks, see :py:func:`_reduce_groups`.
+
+    Like ``Dataset.mean()``, non-numeric variables and coordinates along time are dropped.
+    Variables without a time dimension are repeated for each group.
+
+    :param ds: Dataset to aggregate
+    :param labels: Group label in the range 0 to *num_groups* - 1 for each time step
+    :param num_groups: Number of groups
+    :param method: Aggregation method, one of the keys of ``_AGGREGATORS``
+    :param dim: Name of the resulting group dimension, which replaces time
+    :param group_chunks: Chunk sizes of dask arrays along the group dimension
+    :param keep_attrs: Whether to keep the dataset's and its variables' attributes
+    :param monitor: Progress monitor
+    :param label: Label of the monitored task
+    :return: Aggregated dataset, variables keep their order of dimensions
+    """
+    accumulate, finalize = _AGGREGATORS[method]
+    has_empty_groups = np.unique(labels).size < num_groups
+
+    var_names = [var_name for var_name, var in ds.data_vars.items() if _is_numeric(var)]
+    coords = {coord_name: coord for coord_name, coord in ds.coords.items() if 'time' not in coord.dims}
+
+    data_vars = dict()
+    with monitor.starting(label, total_work=100):
+        monitor.progress(work=0)
+        step = 100 / len(var_names) if var_names else 0
+        for var_name in var_names:
+            var = ds[var_name].variable
+            attrs = dict(var.attrs) if keep_attrs else None
+            if 'time' in var.dims:
+                dtype = _get_aggregation_dtype(method, var.dtype, has_empty_groups)
+                data = _reduce_groups(var.data, var.get_axis_num('time'), labels, num_groups,
+                                      accumulate, finalize, dtype, group_chunks=group_chunks)
+                dims = (dim,) + tuple(d for d in var.dims if d != 'time')
+                data_vars[var_name] = xr.Variable(dims, data, attrs=attrs).transpose(
+                    *(dim if d == 'time' else d for d in var.dims))
+            else:
+                data_vars[var_name] = xr.Variable(var.dims, var.data, attrs=attrs).set_dims(
+                    {dim: num_groups, **dict(zip(var.dims, var.shape))})
+            monitor.progress(work=step)
+
+    return xr.Dataset(data_vars, coords=coords, attrs=dict(ds.attrs) if keep_attrs else None)
+
+
+def _is_numeric(var: xr.DataArray) -> bool:
+    return np.issubdtype(var.dtype, np.number) or var.dtype == np.bool_
+
+
+def _get_aggregation_dtype(method: str, dtype: np.dtype, has_empty_groups: bool) -> np.dtype:
+    """Get the data type of aggregated values, empty groups are NaN."""
+    if method in ('mean', 'std', 'var') or has_empty_groups:
+        return dtype if np.issubdtype(dtype, np.floating) else np.dtype(np.float64)
+    if method in ('sum', 'prod'):
+        # Like numpy, integer sums and products use at least the platform's integer
+        return np.zeros(0, dtype=dtype).sum().dtype
+    return dtype
+
+
+def _reduce_groups(data, axis: int, labels: np.ndarray, num_groups: int,
+                   accumulate, finalize, dtype, group_chunks: Tuple[int, ...] = None):
+    """
+    Reduce the slices of *data* along *axis* that share the same group label in a single pass over the
+    chunks of *axis*. Each group's reduction is defined by a pair of functions:
+
+    * ``accumulate(acc, block, block_labels, num_groups) -> acc`` adds the slices of *block*, whose first axis
+      is *axis*, to the accumulator *acc* of *num_groups* groups. *acc* is ``None`` for the first block,
+      *block_labels* are the group labels relative to the first group of the accumulator.
+    * ``finalize(acc) -> array`` computes the groups' results from *acc*, the first axis indexes the groups.
+
+    If *data* is a dask array, the result is a dask array, whose chunks along the groups axis are given by
+    *group_chunks*. Each output chunk folds the input chunks that contain its groups one after the other,
+    so memory is bound by the output chunk size rather than by the number of time steps.
+    Groups without any slices are NaN.
+
+    :param data: numpy or dask array
+    :param axis: The axis to be reduced
+    :param labels: Group label in the range 0 to *num_groups* - 1 for each index of *axis*
+    :param num_groups: Number of groups
+    :param accumulate: The accumulator function
+    :param finalize: The finalizer function
+    :param dtype: The result's data type
+    :param group_chunks: Chunk sizes along the groups axis, defaults to a single chunk
+    :return: Array of the reduced groups, the first axis indexes the groups, the others follow in the
+             order of *data*'s remaining axes
+    """
+    if group_chunks is None:
+        group_chunks = (num_groups,)
+    group_offsets = np.cumsum((0,) + tuple(group_chunks))
+
+    if not isinstance(data, da.Array):
+        data = np.moveaxis(np.asarray(data), axis, 0)
+        results = []
+        for start, stop in zip(group_offsets[:-1], group_offsets[1:]):
+            selected = (labels >= start) & (labels < stop)
+            acc = None
+            if selected.any():
+                acc = accumulate(None, data[selected], labels[selected] - start, stop - start)
+            results.append(_finalize_groups(finalize, acc, (stop - start,) + data.shape[1:], dtype))
+        return np.concatenate(results)
+
+    data = da.moveaxis(data, axis, 0)
+    name = 'reduce-groups-' + tokenize(data, labels, group_chunks, accumulate, finalize, dtype)
+
+    # Find the input chunks contributing to each output chunk
+    time_offsets = np.cumsum((0,) + data.chunks[0])
+    label_chunk_indexes = np.searchsorted(group_offsets, labels, side='right') - 1
+    contributions = [[] for _ in group_chunks]
+    for i, (t_start, t_stop) in enumerate(zip(time_offsets[:-1], time_offsets[1:])):
+        block_chunk_indexes = label_chunk_indexes[t_start:t_stop]
+        for j in np.unique(block_chunk_indexes):
+            selected = block_chunk_indexes == j
+            block_labels = labels[t_start:t_stop][selected] - group_offsets[j]
+            contributions[j].append((i, None if selected.all() else selected, block_labels))
+
+    dsk = dict()
+    for spatial_index in itertools.product(*(range(len(chunks)) for chunks in data.chunks[1:])):
+        spatial_shape = tuple(chunks[k] for chunks, k in zip(data.chunks[1:], spatial_index))
+        for j, num_chunk_groups in enumerate(group_chunks):
+            acc_key = None
+            for i, selected, block_labels in contributions[j]:
+                key = (name + '-acc', j, i) + spatial_index
+                dsk[key] = (_accumulate_groups, accumulate, acc_key, (data.name, i) + spatial_index,
+                            selected, block_labels, num_chunk_groups)
+                acc_key = key
+            dsk[(name, j) + spatial_index] = (_finalize_groups, finalize, acc_key,
+                                              (num_chunk_groups,) + spatial_shape, dtype)
+
+    graph = HighLevelGraph.from_collections(name, dsk, dependencies=[data])
+    return da.Array(graph, name, chunks=(tuple(group_chunks),) + data.chunks[1:], dtype=dtype)
+
+
+def _accumulate_groups(accumulate, acc, block: np.ndarray, selected: Optional[np.ndarray],
+                       block_labels: np.ndarray, num_groups: int):
+    if selected is not None:
+        block = block[selected]
+    return accumulate(acc, block, block_labels, num_groups)
+
+
+def _finalize_groups(finalize, acc, shape: Tuple[int, ...], dtype) -> np.ndarray:
+    if acc is None:
+        return np.full(shape, np.nan, dtype=dtype)
+    return finalize(acc).astype(dtype, copy=False)
+
+
+#: Number of bytes accumulated per group and data item by :py:func:`_accumulate_mean`,
+#: a float64 sum and an int64 count
+_MEAN_ACC_ITEM_SIZE = 16
+
+
+def _accumulate_mean(acc, block: np.ndarray, block_labels: np.ndarray, num_groups: int):
+    if acc is None:
+        acc = (np.zeros((num_groups,) + block.shape[1:], dtype=np.float64),
+               np.zeros((num_groups,) + block.shape[1:], dtype=np.int64))
+    sums, counts = acc
+    is_float = np.issubdtype(block.dtype, np.floating)
+    for group in np.unique(block_labels):
+        values = block[block_labels == group]
+        if is_float:
+            sums[group] += np.nansum(values, axis=0)
+            counts[group] += np.count_nonzero(~np.isnan(values), axis=0)
+        else:
+            sums[group] += values.sum(axis=0, dtype=np.float64)
+            counts[group] += values.shape[0]
+    # The accumulator is updated in place, it is only passed on to the next block's accumulation
+    return acc
+
+
+def _finalize_mean(acc) -> np.ndarray:
+    sums, counts = acc
+    with np.errstate(invalid='ignore'):
+        # Groups without any valid values become NaN
+        return sums / counts
+
+
+def _accumulate_reduction(acc, block: np.ndarray, block_labels: np.ndarray, num_groups: int,
+                          reduce_func=None, merge_func=None):
+    """
+    Accumulate by a reduction ignoring NaN, whose partial results are combined by *merge_func*,
+    e.g. ``np.nansum`` and ``np.add``.
+    """
+    if acc is None:
+        acc = [None, np.zeros(num_groups, dtype=np.bool_)]
+    seen = acc[1]
+    for group in np.unique(block_labels):
+        result = np.asarray(reduce_func(block[block_labels == group], axis=0))
+        if acc[0] is None:
+            acc[0] = np.zeros((num_groups,) + result.shape, dtype=result.dtype)
+        values = acc[0]
+        values[group] = merge_func(values[group], result) if seen[group] else result
+        seen[group] = True
+    return acc
+
+
+def _finalize_reduction(acc) -> np.ndarray:
+    values, seen = acc
+    if seen.all():
+        return values
+    values = values.astype(np.float64)
+    values[~seen] = np.nan
+    return values
+
+
+def _accumulate_first(acc, block: np.ndarray, block_labels: np.ndarray, num_groups: int, last: bool = False):
+    """Accumulate the first or *last* valid value of each group, blocks are given in time order."""
+    if acc is None:
+        acc = (np.zeros((num_groups,) + block.shape[1:], dtype=block.dtype),
+               np.zeros((num_groups,) + block.shape[1:], dtype=np.bool_))
+    values, found = acc
+    is_float = np.issubdtype(block.dtype, np.floating)
+    for group in np.unique(block_labels):
+        group_values = block[block_labels == group]
+        if last:
+            group_values = group_values[::-1]
+        valid = ~np.isnan(group_values) if is_float else np.ones(group_values.shape, dtype=np.bool_)
+        index = np.argmax(valid, axis=0)
+        candidates = np.take_along_axis(group_values, index[np.newaxis], axis=0)[0]
+        update = valid.any(axis=0)
+        if not last:
+            # Later blocks only replace the last value
+            update &= ~found[group]
+        values[group][update] = candidates[update]
+        found[group] |= update
+    return acc
+
+
+def _finalize_first(acc) -> np.ndarray:
+    values, found = acc
+    if found.all():
+        return values
+    values = values.astype(np.result_type(values.dtype, np.float32))
+    values[~found] = np.nan
+    return values
+
+
+def _accumulate_moments(acc, block: np.ndarray, block_labels: np.ndarray, num_groups: int):
+    """
+    Accumulate counts, means and sums of squared deviations from the mean. The moments of each block
+    are merged into the running ones using Welford's online algorithm generalised to batches
+    by Chan et al., which, unlike summing squares, is numerically stable.
+    """
+    if acc is None:
+        shape = (num_groups,) + block.shape[1:]
+        acc = (np.zeros(shape, dtype=np.int64),
+               np.zeros(shape, dtype=np.float64),
+               np.zeros(shape, dtype=np.float64))
+    counts, means, m2s = acc
+    for group in np.unique(block_labels):
+        values = block[block_labels == group].astype(np.float64)
+        block_counts = np.count_nonzero(~np.isnan(values), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            block_means = np.nansum(values, axis=0) / block_counts
+            block_m2s = np.nansum((values - block_means) ** 2, axis=0)
+            total_counts = counts[group] + block_counts
+            weights = np.where(total_counts > 0, block_counts / total_counts, 0.)
+        deltas = np.where(block_counts > 0, block_means - means[group], 0.)
+        means[group] += deltas * weights
+        m2s[group] += block_m2s + deltas ** 2 * counts[group] * weights
+        counts[group] = total_counts
+    return acc
+
+
+def _finalize_var(acc) -> np.ndarray:
+    counts, _, m2s = acc
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Population variance like numpy's default, groups without any valid values become NaN
+        return np.where(counts > 0, m2s / counts, np.nan)
+
+
+def _finalize_std(acc) -> np.ndarray:
+    return np.sqrt(_finalize_var(acc))
+
+
+#: Pairs of accumulator and finalizer functions of the aggregation methods,
+#: that can be computed in a single pass over time, see :py:func:`_reduce_groups`.
+_AGGREGATORS = {
+    'mean': (_accumulate_mean, _finalize_mean),
+    'sum': (functools.partial(_accumulate_reduction, reduce_func=np.nansum, merge_func=np.add),
+            _finalize_reduction),
+    'prod': (functools.partial(_accumulate_reduction, reduce_func=np.nanprod, merge_func=np.multiply),
+             _finalize_reduction),
+    'min': (functools.partial(_accumulate_reduction, reduce_func=np.fmin.reduce, merge_func=np.fmin),
+            _finalize_reduction),
+    'max': (functools.partial(_accumulate_reduction, reduce_func=np.fmax.reduce, merge_func=np.fmax),
+            _finalize_reduction),
+    'first': (_accumulate_first, _finalize_first),
+    'last': (functools.partial(_accumulate_first, last=True), _finalize_first),
+    'std': (_accumulate_moments, _finalize_std),
+    'var': (_accumulate_moments, _finalize_var),
+}
+
+
+@op(tags=['aggregate', 'temporal'], version='1.6')
 @op_input('ds', data_type=DatasetLike)
-@op_input('method', value_set=['mean', 'max', 'median', 'prod', 'sum', 'std',
+@op_input('method', value_set=['mean', 'min', 'max', 'median', 'prod', 'sum', 'std',
                                'var', 'argmax', 'argmin', 'first', 'last'])
 @op_input('output_resolution', value_set=['month', 'season'])
 @op_return(add_history=True)
@@ -305,6 +626,12 @@ def temporal_aggregation(ds: DatasetLike.TYPE,
     Perform aggregation of dataset according to the given
     method and output resolution.
 
+    The methods 'mean', 'min', 'max', 'sum', 'prod', 'std', 'var', 'first' and 'last'
+    are computed by a single pass over the time steps of the dataset, that emits each
+    output period as soon as it is complete. Memory usage therefore depends on the
+    spatial size of the dataset's chunks rather than on the length of its time series.
+    Like the other methods, they skip missing values.
+
     Note that the operation does not perform weighting. Depending on the
     combination of input and output resolutions, as well as aggregation
     method, the resulting dataset might yield unexpected results.
@@ -356,11 +683,18 @@ def temporal_aggregation(ds: DatasetLike.TYPE,
 
     _validate_freq(in_freq, freq)
 
-    with monitor.observing("resample dataset"):
-        try:
-            retset = getattr(resampler, method)(ds.resample(time=freq, keep_attrs=True))
-        except AttributeError:
-            raise ValidationError(f'Provided aggregation method {method} is not valid.')
+    if method in _AGGREGATORS and all(_is_numeric(var) for var in ds.data_vars.values() if 'time' in var.dims):
+        periods, labels = _get_periods(ds.time, freq)
+        # One chunk per period, so that each period is computed as soon as its time steps have been read
+        retset = _aggregate_groups(ds, labels, len(periods), method,
+                                   group_chunks=(1,) * len(periods), monitor=monitor)
+        retset['time'] = periods
+    else:
+        with monitor.observing("resample dataset"):
+            try:
+                retset = getattr(resampler, method)(ds.resample(time=freq, keep_attrs=True))
+            except AttributeError:
+                raise ValidationError(f'Provided aggregation method {method} is not valid.')
 
     for var in retset.data_vars:
         try:
@@ -373,6 +707,23 @@ def temporal_aggregation(ds: DatasetLike.TYPE,
     return adjust_temporal_attrs(retset)
 
 
+def _get_periods(time: xr.DataArray, freq: str) -> Tuple[pd.DatetimeIndex, np.ndarray]:
+    """
+    Get the periods of the given frequency the time steps fall into, like ``resample()`` does.
+
+    :param time: Time coordinate
+    :param freq: Offset alias of the periods
+    :return: The periods' labels, including periods without any time steps, and the index
+             of the period for each time step
+    """
+    resampled = pd.Series(np.arange(time.size), index=time.to_index()).resample(freq)
+    periods = resampled.count().index
+    labels = np.empty(time.size, dtype=np.int64)
+    for period, indices in resampled.indices.items():
+        labels[indices] = periods.get_loc(period)
+    return periods, labels
+
+
 def _validate_freq(in_res: str, out_res: str) -> None:
     """
     Validate the aggregation step
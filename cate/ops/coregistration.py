@@ -31,9 +31,15 @@ Operations
 coregister - coregister two datasets that are defined on pixel-registered grids that are
 equidistant in lat/lon coordinates.
 
+regrid - resample a dataset that is defined on a pixel-registered grid that is equidistant
+in lat/lon coordinates onto a global grid of a given resolution.
+
 """
 from typing import Tuple
 
+import dask
+import dask.array as da
+from dask.utils import parse_bytes
 import numpy as np
 import xarray as xr
 import math
@@ -42,7 +48,7 @@ from cate.core.op import op_input, op, op_return
 from cate.core.types import ValidationError
 from cate.util.monitor import Monitor
 
-from cate.ops import resampling
+from cate.ops.regridding import Regridder, get_regridder
 from cate.ops.normalize import adjust_spatial_attrs
 
 
@@ -144,6 +150,42 @@ def coregister(ds_master: xr.Dataset,
     return _resample_dataset(ds_master, ds_replica, methods_us[method_us], methods_ds[method_ds], monitor)
 
 
+@op(tags=['geometric', 'coregistration'],
+    version='1.0')
+@op_input('resolution', units='degrees', value_range=[0, 180])
+@op_input('method_us', value_set=['nearest', 'linear'])
+@op_input('method_ds', value_set=['first', 'last', 'mean', 'mode', 'var', 'std'])
+@op_return(add_history=True)
+def regrid(ds: xr.Dataset,
+           resolution: float = 1.0,
+           method_us: str = 'linear',
+           method_ds: str = 'mean',
+           monitor: Monitor = Monitor.NONE) -> xr.Dataset:
+    """
+    Resample the given dataset onto a global pixel-registered grid with the given
+    resolution in degrees. Like the coregister operation, upsampling is achieved using
+    interpolation and downsampling by aggregating pixels of the dataset.
+
+    The returned dataset covers the spatial extent of the given dataset.
+
+    :param ds: The dataset that will be resampled
+    :param resolution: The resolution of the new grid in degrees. It must divide 180 degrees into an integer number of pixels.
+    :param method_us: Interpolation method to use for upsampling.
+    :param method_ds: Interpolation method to use for downsampling.
+    :param monitor: a progress monitor.
+    :return: The dataset resampled on the new grid
+    """
+    height = 180. / resolution if resolution > 0 else 0
+    if height < 1 or not math.isclose(height, round(height), rel_tol=1e-6):
+        raise ValidationError('The resolution must divide 180 degrees into an integer'
+                              ' number of pixels, but it is {}'.format(resolution))
+    height = int(round(height))
+    lat = np.linspace(-90. + resolution / 2, 90. - resolution / 2, height)
+    lon = np.linspace(-180. + resolution / 2, 180. - resolution / 2, 2 * height)
+    ds_master = xr.Dataset(coords={'lat': lat, 'lon': lon})
+    return coregister(ds_master, ds, method_us=method_us, method_ds=method_ds, monitor=monitor)
+
+
 def _is_equidistant(array: np.ndarray) -> bool:
     """
     Check if the given 1D array is equidistant. E.g. the
@@ -197,40 +239,20 @@ def _within_bounds(array: np.ndarray, low_bound) -> bool:
     return (array[0] >= low_bound and array[-1] <= abs(low_bound))
 
 
-def _resample_slice(arr_slice: xr.DataArray, w: int, h: int, ds_method: int, us_method: int,
-                    parent_monitor: Monitor) -> xr.DataArray:
-    """
-    Resample a single time slice of a larger xr.DataArray
-
-    :param arr_slice: xr.DataArray single slice
-    :param w: The desired new width (amount of longitudes)
-    :param h: The desired new height (amount of latitudes)
-    :param ds_method: Downsampling method, see resampling.py
-    :param us_method: Upsampling method, see resampling.py
-    :param parent_monitor: the parent progress monitor.
-    :return: resampled slice
-    """
-    monitor = parent_monitor.child(1)
-    with monitor.observing("resample slice"):
-        # In some cases the grouped dimension is not automatically squeezed out
-        result = resampling.resample_2d(np.ma.masked_invalid(arr_slice.squeeze().values),
-                                        w,
-                                        h,
-                                        ds_method,
-                                        us_method)
-        return xr.DataArray(result)
-
-
-def _resample_array(array: xr.DataArray, lon: xr.DataArray, lat: xr.DataArray, method_us: int,
-                    method_ds: int, parent_monitor: Monitor) -> xr.DataArray:
+def _resample_array(array: xr.DataArray, lon: xr.DataArray, lat: xr.DataArray,
+                    regridder: Regridder, parent_monitor: Monitor) -> xr.DataArray:
     """
     Resample the given xr.DataArray to a new grid defined by lat and lon
 
+    The array is resampled lazily, each chunk holding complete lat/lon slices
+    is resampled in parallel once computed. The leading dimensions are chunked so
+    that neither the array's nor the resampled chunks exceed dask's configured
+    chunk size ``array.chunk-size``.
+
     :param array: xr.DataArray with lat,lon and time coordinates
     :param lat: 'lat' xr.DataArray attribute for the new grid
     :param lon: 'lon' xr.DataArray attribute for the new grid
-    :param method_us: Interpolation method to use for upsampling, see resampling.py
-    :param method_ds: Interpolation method to use for downsampling, see resampling.py
+    :param regridder: Regridder from the array's grid to the new grid, see regridding.py
     :param parent_monitor: the parent progress monitor.
     :return: The resampled array
     """
@@ -240,41 +262,43 @@ def _resample_array(array: xr.DataArray, lon: xr.DataArray, lat: xr.DataArray, m
 
     monitor = parent_monitor.child(1)
 
-    kwargs = {'w': width, 'h': height, 'ds_method': method_ds, 'us_method': method_us, 'parent_monitor': monitor}
-
-    groupby_list = list(array.dims)
-    for dim in ['lon', 'lat']:
-        groupby_list.remove(dim)
-
-    if 0 == len(groupby_list):
-        # a 2d dataset, can't do groupby => do a simple slice resample
-        with monitor.starting("coregister dataarray", total_work=1):
-            temp_array = _resample_slice(array, **kwargs)
-            coords = {'lat': lat, 'lon': lon}
-            return xr.DataArray(temp_array.values,
-                                name=array.name,
-                                dims=array.dims,
-                                coords=coords,
-                                attrs=array.attrs).chunk()
-
-    num_steps = 1
-    for dim in groupby_list:
-        num_steps = num_steps * len(array[dim])
-
-    with monitor.starting("coregister dataarray", total_work=num_steps):
-        temp_array = _nested_groupby_apply(array, groupby_list, _resample_slice, kwargs)
-        chunks = {'lat': height, 'lon': width}
-        coords = {'lat': lat, 'lon': lon}
-        for dim in groupby_list:
-            coords[dim] = array[dim]
+    with monitor.starting("coregister dataarray", total_work=1):
+        other_dims = [dim for dim in array.dims if dim not in ('lat', 'lon')]
+        data = array.transpose(*other_dims, 'lat', 'lon').data
+        if isinstance(data, da.Array):
+            slice_size = data.dtype.itemsize * max(data.shape[-2] * data.shape[-1], height * width)
+            max_num_slices = parse_bytes(dask.config.get('array.chunk-size')) // slice_size
+            data = data.rechunk(_get_leading_chunks(data.shape[:-2], max_num_slices) + (-1, -1))
+        else:
             # One spatial slice is one dask chunk, e.g. chunking is
             # (1,1,1..1,len(lat),len(lon))
-            chunks[dim] = 1
-        return xr.DataArray(temp_array.values,
-                            name=array.name,
-                            dims=array.dims,
-                            coords=coords,
-                            attrs=array.attrs).chunk(chunks=chunks)
+            data = da.from_array(data, chunks=(1,) * len(other_dims) + data.shape[-2:])
+        resampled = data.map_blocks(regridder.regrid,
+                                    chunks=data.chunks[:-2] + ((height,), (width,)),
+                                    dtype=data.dtype)
+        coords = {'lat': lat, 'lon': lon}
+        for dim in other_dims:
+            coords[dim] = array[dim]
+        monitor.progress(work=1)
+
+    return xr.DataArray(resampled,
+                        name=array.name,
+                        dims=other_dims + ['lat', 'lon'],
+                        coords=coords,
+                        attrs=array.attrs).transpose(*array.dims)
+
+
+def _get_leading_chunks(shape: Tuple[int, ...], max_num_slices: int) -> Tuple[int, ...]:
+    """
+    Get the chunk sizes of the leading dimensions of an array, given by *shape*, whose chunks hold
+    at most *max_num_slices* complete spatial slices, but at least one.
+    """
+    chunks = []
+    for size in reversed(shape):
+        chunk_size = max(1, min(size, max_num_slices))
+        chunks.append(chunk_size)
+        max_num_slices = max_num_slices // size if chunk_size == size else 1
+    return tuple(reversed(chunks))
 
 
 def _resample_dataset(ds_master: xr.Dataset, ds_replica: xr.Dataset, method_us: int, method_ds: int, monitor: Monitor) -> xr.Dataset:
@@ -318,8 +342,12 @@ def _resample_dataset(ds_master: xr.Dataset, ds_replica: xr.Dataset, method_us:
     if _grids_equal(ds_master, ds_replica):
         return ds_replica
 
+    # Source indexes and weights are the same for all variables and are shared for equal grid sizes
+    regridder = get_regridder((ds_replica['lat'].size, ds_replica['lon'].size), (lat.size, lon.size),
+                              method_ds, method_us)
+
     with monitor.starting("coregister dataset", len(ds_replica.data_vars)):
-        kwargs = {'lon': lon, 'lat': lat, 'method_us': method_us, 'method_ds': method_ds, 'parent_monitor': monitor}
+        kwargs = {'lon': lon, 'lat': lat, 'regridder': regridder, 'parent_monitor': monitor}
         retset = ds_replica.apply(_resample_array, keep_attrs=True, **kwargs)
 
     return adjust_spatial_attrs(retset)
@@ -400,25 +428,3 @@ def _find_intersection(first: np.ndarray,
                               ' coregistration on')
 
     return (minimum, maximum)
-
-
-def _nested_groupby_apply(array: xr.DataArray,
-                          groupby: list,
-                          apply_fn: object,
-                          kwargs: dict):
-    """
-    Perform a nested groupby over given dimensions and apply a function on the
-    last 'slice'
-
-    :param array: xr.DataArray to perform groupby on
-    :param groupby: a list of coordinate labels over which to perform groupby
-    :param apply_fn: The function to apply
-    :return: groupby-split-appy result
-    """
-    if len(groupby) == 1:
-        return array.groupby(groupby[0], squeeze=True).apply(apply_fn, **kwargs)
-    else:
-        return array.groupby(groupby[0], squeeze=True).apply(_nested_groupby_apply,
-                                                             groupby=groupby[1:],
-                                                             apply_fn=apply_fn,
-                                                             kwargs=kwargs)
@@ -30,9 +30,11 @@ Functions
 """
 
 
+import dask.array as da
 import numpy as np
 import pandas as pd
 import xarray as xr
+from numba import jit
 
 # If CTRL-C is pressed on console on Windows, we get
 #   forrtl: error (200): program aborting due to control-C event
@@ -236,8 +238,13 @@ def _pearsonr(x: xr.DataArray, y: xr.DataArray, monitor: Monitor) -> xr.Dataset:
     as the one computed from these datasets. The p-values are not entirely
     reliable but are probably reasonable for datasets larger than 500 or so.
 
-    :param x: lon/lat/time xr.DataArray
-    :param y: xr.DataArray of the same spatiotemporal extents and resolution as x.
+    The sums, sums of squares and cross-products of both time series are computed
+    by a single pass over time for each pixel. For dask arrays, this is done for
+    each chunk in parallel, the sums of the time chunks are then added up.
+    The result is a dask array, if any of the inputs is one.
+
+    :param x: lon/lat/time xr.DataArray or a time series
+    :param y: xr.DataArray of the same spatiotemporal extents and resolution as x, or a time series.
     :param monitor: Monitor to use for monitoring the calculation
     :return: A dataset containing the correlation coefficients and p_values on
     the lon/lat grid of x and y.
@@ -246,47 +253,33 @@ def _pearsonr(x: xr.DataArray, y: xr.DataArray, monitor: Monitor) -> xr.Dataset:
     ----------
     http://www.statsoft.com/textbook/glosp.html#Pearson%20Correlation
     """
-    with monitor.starting("Calculate Pearson correlation", total_work=6):
+    with monitor.starting("Calculate Pearson correlation", total_work=2):
+        # The time coordinates of x and y may differ, so work on the time-first arrays
+        template = x if x.ndim >= y.ndim else y
+        spatial_dims = [dim for dim in template.dims if dim != 'time']
+        x_data = x.transpose('time', *[dim for dim in spatial_dims if dim in x.dims]).data
+        y_data = y.transpose('time', *[dim for dim in spatial_dims if dim in y.dims]).data
+
+        if isinstance(x_data, da.Array) or isinstance(y_data, da.Array):
+            moments = _pearson_moments_dask(da.asarray(x_data), da.asarray(y_data))
+        else:
+            moments = _pearson_moments(x_data, y_data, x_data[0], y_data[0])[0]
+        monitor.progress(work=1)
+
+        dtype = np.result_type(x.dtype, y.dtype, np.float32)
         n = len(x['time'])
-
-        xm, ym = x - x.mean(dim='time'), y - y.mean(dim='time')
-        xm['time'] = [i for i in range(0, len(xm.time))]
-        ym['time'] = [i for i in range(0, len(ym.time))]
-        xm_ym = xm * ym
-        r_num = xm_ym.sum(dim='time')
-        xm_squared = np.square(xm)
-        ym_squared = np.square(ym)
-        r_den = np.sqrt(xm_squared.sum(dim='time') * ym_squared.sum(dim='time'))
-        r_den = r_den.where(r_den != 0)
-        r = r_num / r_den
-
-        # Presumably, if abs(r) > 1, then it is only some small artifact of floating
-        # point arithmetic.
-        # At this point r should be a lon/lat dataArray, so it should be safe to
-        # load it in memory explicitly. This may take time as it will kick-start
-        # deferred processing.
-        # Comparing with NaN produces warnings that can be safely ignored
-        default_warning_settings = np.seterr(invalid='ignore')
-        with monitor.child(1).observing("task 1"):
-            negativ_r = r.values < -1.0
-        with monitor.child(1).observing("task 2"):
-            r.values[negativ_r] = -1.0
-        with monitor.child(1).observing("task 3"):
-            positiv_r = r.values > 1.0
-        with monitor.child(1).observing("task 4"):
-            r.values[positiv_r] = 1.0
-        np.seterr(**default_warning_settings)
+        if isinstance(moments, da.Array):
+            result = moments.map_blocks(_pearson_result, n, dtype,
+                                        chunks=((2,),) + moments.chunks[1:], dtype=dtype)
+        else:
+            result = _pearson_result(moments, n, dtype)
+        monitor.progress(work=1)
+
+        coords = {name: coord for name, coord in template.coords.items() if 'time' not in coord.dims}
+        r = xr.DataArray(result[0], dims=spatial_dims, coords=coords)
         r.attrs = {'description': 'Correlation coefficients between'
                    ' {} and {}.'.format(x.name, y.name)}
-
-        df = n - 2
-        t_squared = np.square(r) * (df / ((1.0 - r.where(r != 1)) * (1.0 + r.where(r != -1))))
-
-        prob = df / (df + t_squared)
-        with monitor.child(1).observing("task 5"):
-            prob_values_in = prob.values
-        with monitor.child(1).observing("task 6"):
-            prob.values = betainc(0.5 * df, 0.5, prob_values_in)
+        prob = xr.DataArray(result[1], dims=spatial_dims, coords=coords)
         prob.attrs = {'description': 'Rough indicator of probability of an'
                       ' uncorrelated system producing datasets that have a Pearson'
                       ' correlation at least as extreme as the one computed from'
@@ -296,3 +289,115 @@ def _pearsonr(x: xr.DataArray, y: xr.DataArray, monitor: Monitor) -> xr.Dataset:
         retset = xr.Dataset({'corr_coef': r,
                              'p_value': prob})
     return retset
+
+
+#: Number of sums computed by :py:func:`_pearson_moments`
+_NUM_MOMENTS = 10
+
+
+def _pearson_moments_dask(x: da.Array, y: da.Array) -> da.Array:
+    """
+    Compute the sums of :py:func:`_pearson_moments` for each chunk of the time-first arrays *x* and *y*
+    and add up the sums of all time chunks. Either array may be a time series only.
+    """
+    x_index = 'tij'[:x.ndim]
+    y_index = 'tij'[:y.ndim]
+    out_index = 'tm' + ('ij'[:max(x.ndim, y.ndim) - 1])
+    # The first time step of each pixel, by which values are shifted to keep the sums small
+    x_shift, y_shift = x[0], y[0]
+    partial_moments = da.blockwise(_pearson_moments, out_index,
+                                   x, x_index, y, y_index,
+                                   x_shift, x_index[1:], y_shift, y_index[1:],
+                                   new_axes={'m': _NUM_MOMENTS},
+                                   adjust_chunks={'t': 1},
+                                   dtype=np.float64)
+    return partial_moments.sum(axis=0)
+
+
+def _pearson_moments(x: np.ndarray, y: np.ndarray, x_shift: np.ndarray, y_shift: np.ndarray) -> np.ndarray:
+    """
+    Compute the sums of :py:func:`_accumulate_pearson_moments` for the time-first arrays *x* and *y*.
+
+    :return: Array of shape (1, 10, ...), where the trailing dimensions are the spatial ones of *x* or *y*
+    """
+    spatial_shape = x.shape[1:] if x.ndim >= y.ndim else y.shape[1:]
+    num_pixels = int(np.prod(spatial_shape))
+    moments = np.zeros((_NUM_MOMENTS, num_pixels), dtype=np.float64)
+    _accumulate_pearson_moments(x.reshape((x.shape[0], -1)),
+                                y.reshape((y.shape[0], -1)),
+                                np.asarray(x_shift, dtype=np.float64).reshape(-1),
+                                np.asarray(y_shift, dtype=np.float64).reshape(-1),
+                                moments)
+    return moments.reshape((1, _NUM_MOMENTS) + spatial_shape)
+
+
+@jit(nopython=True, nogil=True)
+def _accumulate_pearson_moments(x, y, x_shift, y_shift, moments):
+    """
+    For each pixel, accumulate the counts, sums and sums of squares of the valid values of *x* and *y*
+    and the count, sums and cross-product of the time steps where both are valid. Values are shifted
+    by the given per-pixel values, which makes the sums numerically stable and the variance of
+    constant time series exactly zero.
+
+    A time series of a single pixel is broadcast to all pixels of the other array.
+    """
+    num_times = x.shape[0]
+    num_pixels = moments.shape[1]
+    # Pixel index steps, zero for a single time series
+    x_step = 1 if x.shape[1] > 1 else 0
+    y_step = 1 if y.shape[1] > 1 else 0
+    kx = np.zeros(num_pixels)
+    ky = np.zeros(num_pixels)
+    for p in range(num_pixels):
+        if not np.isnan(x_shift[p * x_step]):
+            kx[p] = x_shift[p * x_step]
+        if not np.isnan(y_shift[p * y_step]):
+            ky[p] = y_shift[p * y_step]
+    # The arrays are time-first, so pixels are iterated in the inner loop to access them contiguously
+    for t in range(num_times):
+        for p in range(num_pixels):
+            xv = x[t, p * x_step] - kx[p]
+            yv = y[t, p * y_step] - ky[p]
+            x_valid = not np.isnan(xv)
+            y_valid = not np.isnan(yv)
+            if x_valid:
+                moments[0, p] += 1.
+                moments[1, p] += xv
+                moments[2, p] += xv * xv
+            if y_valid:
+                moments[3, p] += 1.
+                moments[4, p] += yv
+                moments[5, p] += yv * yv
+            if x_valid and y_valid:
+                moments[6, p] += 1.
+                moments[7, p] += xv
+                moments[8, p] += yv
+                moments[9, p] += xv * yv
+
+
+def _pearson_result(moments: np.ndarray, n: int, dtype) -> np.ndarray:
+    """
+    Compute correlation coefficients and p-values from the sums of :py:func:`_pearson_moments`.
+    Like ``xarray``'s reductions, means and sums of squares of x and y skip their own missing values,
+    the cross-products skip time steps where either is missing.
+
+    :return: Array of shape (2, ...) holding the correlation coefficients and the p-values
+    """
+    n_x, s_x, s_xx, n_y, s_y, s_yy, n_xy, s_x_xy, s_y_xy, s_xy = moments
+    # Comparing with NaN and dividing by zero produces warnings that can be safely ignored
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = s_x / n_x
+        y_mean = s_y / n_y
+        r_num = s_xy - y_mean * s_x_xy - x_mean * s_y_xy + n_xy * x_mean * y_mean
+        r_den = np.sqrt(np.maximum(s_xx - s_x * x_mean, 0.) * np.maximum(s_yy - s_y * y_mean, 0.))
+        r = np.where(r_den != 0, r_num / r_den, np.nan)
+        # Presumably, if abs(r) > 1, then it is only some small artifact of floating
+        # point arithmetic.
+        r = np.clip(r, -1.0, 1.0)
+
+        df = n - 2
+        one_minus_r = 1.0 - np.where(r != 1, r, np.nan)
+        one_plus_r = 1.0 + np.where(r != -1, r, np.nan)
+        t_squared = np.square(r) * (df / (one_minus_r * one_plus_r))
+        prob = betainc(0.5 * df, 0.5, df / (df + t_squared))
+    return np.stack([r, prob]).astype(dtype, copy=False)
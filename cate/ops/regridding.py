@@ -0,0 +1,124 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Description
+===========
+
+Provides regridders, which resample stacks of 2-D grids of a given size to a new resolution.
+The source indexes and weights of a regridder are computed once and can be reused for any number of
+variables and time steps. The most recently used regridders are shared for equal grid sizes and
+resampling methods.
+
+Components
+==========
+"""
+
+from collections import OrderedDict
+from threading import RLock
+from typing import Tuple
+
+import numpy as np
+
+from cate.ops import resampling
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+
+class Regridder:
+    """
+    Resamples stacks of 2-D grids of size *src_shape* to grids of size *shape*.
+    Use :py:func:`get_regridder` to get a shared regridder.
+
+    Regridding releases the GIL, so that a regridder may be used in parallel threads,
+    e.g. for the chunks of a dask array.
+
+    :param src_shape: The (height, width) of source grids
+    :param shape: The (height, width) of target grids
+    :param ds_method: one of the *DS_* constants of :py:mod:`cate.ops.resampling`
+    :param us_method: one of the *US_* constants of :py:mod:`cate.ops.resampling`
+    """
+
+    def __init__(self, src_shape: Tuple[int, int], shape: Tuple[int, int],
+                 ds_method: int = resampling.DS_MEAN, us_method: int = resampling.US_LINEAR):
+        (src_h, src_w), (h, w) = src_shape, shape
+        self._tables = resampling.get_resampling_tables(src_w, src_h, w, h, ds_method, us_method)
+
+    @property
+    def tables(self) -> resampling.ResamplingTables:
+        """The source indexes and weights, see :py:func:`cate.ops.resampling.get_resampling_tables`."""
+        return self._tables
+
+    @property
+    def src_shape(self) -> Tuple[int, int]:
+        """The (height, width) of source grids."""
+        return self._tables.src_shape
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """The (height, width) of target grids."""
+        return self._tables.shape
+
+    def regrid(self, src: np.ndarray, fill_value=np.nan, mode_rank: int = 1) -> np.ndarray:
+        """
+        Resample a stack of 2-D grids. Invalid values are the non-finite values of *src*,
+        grid cells without any valid values are set to *fill_value*.
+
+        :param src: *ndarray* whose last two dimensions are the grids' height and width
+        :param fill_value: *scalar*, optional
+            Value of grid cells without any valid values, ignored for integer grids.
+        :param mode_rank: *scalar*, optional
+            The rank of the frequency determined by the *ds_method* ``DS_MODE``.
+        :return: A resampled version of the *src* array.
+        """
+        return resampling.resample_3d(src, self._tables, fill_value=fill_value, mode_rank=mode_rank)
+
+
+#: Maximum number of shared regridders, the least recently used ones are dropped
+_MAX_NUM_REGRIDDERS = 8
+
+_REGRIDDERS = OrderedDict()
+_REGRIDDERS_LOCK = RLock()
+
+
+def get_regridder(src_shape: Tuple[int, int], shape: Tuple[int, int],
+                  ds_method: int = resampling.DS_MEAN, us_method: int = resampling.US_LINEAR) -> Regridder:
+    """
+    Get the shared regridder for the given grid sizes and methods. As grids are expected to be
+    equidistant and to cover the same area, a regridder only depends on the sizes of the grids.
+    Only the most recently used regridders are kept.
+
+    :param src_shape: The (height, width) of source grids
+    :param shape: The (height, width) of target grids
+    :param ds_method: one of the *DS_* constants of :py:mod:`cate.ops.resampling`
+    :param us_method: one of the *US_* constants of :py:mod:`cate.ops.resampling`
+    :return: The regridder.
+    """
+    key = tuple(src_shape), tuple(shape), ds_method, us_method
+    with _REGRIDDERS_LOCK:
+        regridder = _REGRIDDERS.pop(key, None)
+        if regridder is None:
+            regridder = Regridder(src_shape, shape, ds_method, us_method)
+        _REGRIDDERS[key] = regridder
+        while len(_REGRIDDERS) > _MAX_NUM_REGRIDDERS:
+            _REGRIDDERS.popitem(last=False)
+        return regridder
@@ -31,6 +31,8 @@ Components
 # http://stackoverflow.com/questions/7075082/what-is-future-in-python-used-for-and-how-when-to-use-it-and-how-it-works
 from __future__ import division
 
+from collections import namedtuple
+
 import numpy as np
 from numba import jit
 
@@ -66,6 +68,13 @@ _NOMASK2D = np.ma.getmaskarray(np.ma.array([[0]], mask=[[0]]))
 
 _EPS = 1e-10
 
+#: Source indexes and weights of the grid cells contributing to each target grid cell for resampling
+#: 2-D grids of a given size to a new resolution, see :py:func:`get_resampling_tables`.
+#: *ds_y*, *ds_x* are the tables of a downsampling step, *us_y*, *us_x* the ones of a subsequent
+#: upsampling step, either may be ``None``.
+ResamplingTables = namedtuple('ResamplingTables', ['src_shape', 'shape', 'ds_method', 'us_method',
+                                                   'ds_y', 'ds_x', 'us_y', 'us_x'])
+
 
 def resample_2d(src, w, h, ds_method=DS_MEAN, us_method=US_LINEAR, fill_value=None, mode_rank=1, out=None):
     """
@@ -162,6 +171,112 @@ def downsample_2d(src, w, h, method=DS_MEAN, fill_value=None, mode_rank=1, out=N
     return _mask_or_not(_downsample_2d(src, mask, use_mask, method, fill_value, mode_rank, out), src, fill_value)
 
 
+def get_resampling_tables(src_w, src_h, w, h, ds_method=DS_MEAN, us_method=US_LINEAR):
+    """
+    Compute the source indexes and weights for resampling 2-D grids to a new resolution, once for
+    all grids of the same size. Like :py:func:`resample_2d`, a grid that is smaller in one dimension and
+    larger in the other is first downsampled and then upsampled.
+
+    :param src_w: *int*
+        Source grid width
+    :param src_h: *int*
+        Source grid height
+    :param w: *int*
+        New grid width
+    :param h: *int*
+        New grid height
+    :param ds_method: one of the *DS_* constants, optional
+        Grid cell aggregation method for a possible downsampling
+    :param us_method: one of the *US_* constants, optional
+        Grid cell interpolation method for a possible upsampling
+    :return: The tables, see :py:class:`ResamplingTables`.
+    """
+    if us_method not in (US_NEAREST, US_LINEAR):
+        raise ValueError('invalid upsampling method')
+    if ds_method not in (DS_FIRST, DS_LAST, DS_MEAN, DS_MODE, DS_VAR, DS_STD):
+        raise ValueError('invalid downsampling method')
+    ds_y = ds_x = us_y = us_x = None
+    size_h, size_w = src_h, src_w
+    if w < src_w or h < src_h:
+        size_h, size_w = min(h, src_h), min(w, src_w)
+        ds_y = _get_downsampling_table(src_h, size_h, ds_method)
+        ds_x = _get_downsampling_table(src_w, size_w, ds_method)
+    if w > size_w or h > size_h:
+        us_y = _get_upsampling_table(size_h, h, us_method)
+        us_x = _get_upsampling_table(size_w, w, us_method)
+    return ResamplingTables((src_h, src_w), (h, w), ds_method, us_method, ds_y, ds_x, us_y, us_x)
+
+
+def resample_3d(src, tables, fill_value=np.nan, mode_rank=1):
+    """
+    Resample a stack of 2-D grids to a new resolution using precomputed tables.
+    The GIL is released while resampling, so that multiple stacks can be resampled
+    in parallel threads, e.g. the chunks of a dask array.
+
+    In contrast to :py:func:`resample_2d`, invalid values are not given by a mask but are
+    the non-finite values of *src*, and grid cells without any valid values are set to *fill_value*.
+
+    :param src: *ndarray* whose last two dimensions are the grids' height and width
+    :param tables: The resampling tables, see :py:func:`get_resampling_tables`
+    :param fill_value: *scalar*, optional
+        Value of grid cells without any valid values, ignored for integer grids.
+    :param mode_rank: *scalar*, optional
+        The rank of the frequency determined by the *ds_method* ``DS_MODE``.
+    :return: A resampled version of the *src* array.
+    """
+    if tables.ds_method == DS_MODE and mode_rank < 1:
+        raise ValueError('mode_rank must be >= 1')
+    if src.shape[-2:] != tables.src_shape:
+        raise ValueError("'src' and 'tables' are incompatible")
+    if tables.ds_y is None and tables.us_y is None:
+        return src
+    if not np.issubdtype(src.dtype, np.floating):
+        # Integer grids have no invalid values
+        fill_value = 0
+    leading_shape = src.shape[:-2]
+    data = src.reshape((-1,) + tables.src_shape)
+    if tables.ds_y is not None:
+        out = np.empty((data.shape[0], tables.ds_y[0].size, tables.ds_x[0].size), dtype=src.dtype)
+        data = _downsample_3d(data, tables.ds_y, tables.ds_x, tables.ds_method, fill_value, mode_rank, out)
+    if tables.us_y is not None:
+        out = np.empty((data.shape[0],) + tables.shape, dtype=src.dtype)
+        data = _upsample_3d(data, tables.us_y, tables.us_x, tables.us_method, fill_value, out)
+    return data.reshape(leading_shape + tables.shape)
+
+
+def _get_downsampling_table(src_size, size, method):
+    # Same arithmetic as in _downsample_2d()
+    scale = src_size / size
+    src_f0 = scale * np.arange(size)
+    src_f1 = src_f0 + scale
+    src_i0 = src_f0.astype(np.int64)
+    src_i1 = src_f1.astype(np.int64)
+    w0 = 1.0 - (src_f0 - src_i0)
+    w1 = src_f1 - src_i1
+    if method == DS_FIRST or method == DS_LAST:
+        src_i1[(src_i1 == src_f1) & (src_i1 > src_i0)] -= 1
+        # Rounding errors may otherwise let the last cell exceed the source grid
+        src_i1 = np.minimum(src_i1, src_size - 1)
+    else:
+        is_border = w1 < _EPS
+        w1[is_border] = 1.0
+        src_i1[is_border & (src_i1 > src_i0)] -= 1
+    return src_i0, src_i1, w0, w1
+
+
+def _get_upsampling_table(src_size, size, method):
+    # Same arithmetic as in _upsample_2d()
+    if method == US_NEAREST:
+        src_i0 = ((src_size / size) * np.arange(size)).astype(np.int64)
+        return src_i0, src_i0, np.zeros(size)
+    scale = (src_size - 1.0) / ((size - 1.0) if size > 1 else 1.0)
+    src_f = scale * np.arange(size)
+    src_i0 = src_f.astype(np.int64)
+    src_i1 = src_i0 + 1
+    src_i1[src_i1 >= src_size] = src_i0[src_i1 >= src_size]
+    return src_i0, src_i1, src_f - src_i0
+
+
 def _get_out(out, src, shape):
     if out is None:
         return np.zeros(shape, dtype=src.dtype)
@@ -534,3 +649,177 @@ def _downsample_2d(src, mask, use_mask, method, fill_value, mode_rank, out):
         raise ValueError('invalid downsampling method')
 
     return out
+
+
+# This function will be JIT-compiled by Numba with nopython=True,
+# therefore all arg types must be either primitive scalars, numpy arrays or tuples of them.
+# Key-value args are not allowed.
+#
+@jit(nopython=True, nogil=True)
+def _upsample_3d(src, table_y, table_x, method, fill_value, out):
+    src_y0s, src_y1s, wys = table_y
+    src_x0s, src_x1s, wxs = table_x
+    out_h = out.shape[-2]
+    out_w = out.shape[-1]
+
+    for i in range(out.shape[0] * out_h):
+        k = i // out_h
+        out_y = i % out_h
+        src_y0 = src_y0s[out_y]
+        src_y1 = src_y1s[out_y]
+        wy = wys[out_y]
+        for out_x in range(out_w):
+            src_x0 = src_x0s[out_x]
+            if method == US_NEAREST:
+                value = src[k, src_y0, src_x0]
+                if np.isfinite(value):
+                    out[k, out_y, out_x] = value
+                else:
+                    out[k, out_y, out_x] = fill_value
+                continue
+            src_x1 = src_x1s[out_x]
+            wx = wxs[out_x]
+            v00 = src[k, src_y0, src_x0]
+            v01 = src[k, src_y0, src_x1]
+            v10 = src[k, src_y1, src_x0]
+            v11 = src[k, src_y1, src_x1]
+            v00_ok = np.isfinite(v00)
+            v01_ok = np.isfinite(v01)
+            v10_ok = np.isfinite(v10)
+            v11_ok = np.isfinite(v11)
+            if v00_ok and v01_ok and v10_ok and v11_ok:
+                ok = True
+                v0 = v00 + wx * (v01 - v00)
+                v1 = v10 + wx * (v11 - v10)
+                value = v0 + wy * (v1 - v0)
+            elif wx < 0.5:
+                # NEAREST according to weight
+                if wy < 0.5:
+                    ok = v00_ok
+                    value = v00
+                else:
+                    ok = v10_ok
+                    value = v10
+            else:
+                # NEAREST according to weight
+                if wy < 0.5:
+                    ok = v01_ok
+                    value = v01
+                else:
+                    ok = v11_ok
+                    value = v11
+            if ok:
+                out[k, out_y, out_x] = value
+            else:
+                out[k, out_y, out_x] = fill_value
+
+    return out
+
+
+# This function will be JIT-compiled by Numba with nopython=True,
+# therefore all arg types must be either primitive scalars, numpy arrays or tuples of them.
+# Key-value args are not allowed.
+#
+@jit(nopython=True, nogil=True)
+def _downsample_3d(src, table_y, table_x, method, fill_value, mode_rank, out):
+    src_y0s, src_y1s, wy0s, wy1s = table_y
+    src_x0s, src_x1s, wx0s, wx1s = table_x
+    out_h = out.shape[-2]
+    out_w = out.shape[-1]
+    max_value_count = int(src.shape[-1] / out_w + 1) * int(src.shape[-2] / out_h + 1)
+
+    for i in range(out.shape[0] * out_h):
+        k = i // out_h
+        out_y = i % out_h
+        src_y0 = src_y0s[out_y]
+        src_y1 = src_y1s[out_y]
+        wy0 = wy0s[out_y]
+        wy1 = wy1s[out_y]
+        values = np.zeros((max_value_count,), dtype=src.dtype)
+        frequencies = np.zeros((max_value_count,), dtype=np.uint32)
+        for out_x in range(out_w):
+            src_x0 = src_x0s[out_x]
+            src_x1 = src_x1s[out_x]
+            wx0 = wx0s[out_x]
+            wx1 = wx1s[out_x]
+
+            if method == DS_FIRST or method == DS_LAST:
+                done = False
+                value = fill_value
+                for src_y in range(src_y0, src_y1 + 1):
+                    for src_x in range(src_x0, src_x1 + 1):
+                        v = src[k, src_y, src_x]
+                        if np.isfinite(v):
+                            value = v
+                            if method == DS_FIRST:
+                                done = True
+                                break
+                    if done:
+                        break
+                out[k, out_y, out_x] = value
+
+            elif method == DS_MODE:
+                value_count = 0
+                for src_y in range(src_y0, src_y1 + 1):
+                    wy = wy0 if (src_y == src_y0) else wy1 if (src_y == src_y1) else 1.0
+                    for src_x in range(src_x0, src_x1 + 1):
+                        wx = wx0 if (src_x == src_x0) else wx1 if (src_x == src_x1) else 1.0
+                        v = src[k, src_y, src_x]
+                        if np.isfinite(v):
+                            w = wx * wy
+                            found = False
+                            for j in range(value_count):
+                                if v == values[j]:
+                                    frequencies[j] += w
+                                    found = True
+                                    break
+                            if not found:
+                                values[value_count] = v
+                                frequencies[value_count] = w
+                                value_count += 1
+                w_max = -1.
+                value = fill_value
+                if mode_rank == 1:
+                    for j in range(value_count):
+                        w = frequencies[j]
+                        if w > w_max:
+                            w_max = w
+                            value = values[j]
+                elif mode_rank <= max_value_count:
+                    max_frequencies = np.full(mode_rank, -1.0, dtype=np.float64)
+                    indices = np.zeros(mode_rank, dtype=np.int64)
+                    for j in range(value_count):
+                        w = frequencies[j]
+                        for m in range(mode_rank):
+                            if w > max_frequencies[m]:
+                                max_frequencies[m] = w
+                                indices[m] = j
+                                break
+                    value = values[indices[mode_rank - 1]]
+                out[k, out_y, out_x] = value
+
+            else:
+                # DS_MEAN, DS_VAR, DS_STD
+                w_sum = 0.0
+                wv_sum = 0.0
+                wvv_sum = 0.0
+                for src_y in range(src_y0, src_y1 + 1):
+                    wy = wy0 if (src_y == src_y0) else wy1 if (src_y == src_y1) else 1.0
+                    for src_x in range(src_x0, src_x1 + 1):
+                        wx = wx0 if (src_x == src_x0) else wx1 if (src_x == src_x1) else 1.0
+                        v = src[k, src_y, src_x]
+                        if np.isfinite(v):
+                            w = wx * wy
+                            w_sum += w
+                            wv_sum += w * v
+                            wvv_sum += w * v * v
+                if w_sum < _EPS:
+                    out[k, out_y, out_x] = fill_value
+                elif method == DS_MEAN:
+                    out[k, out_y, out_x] = wv_sum / w_sum
+                else:
+                    out[k, out_y, out_x] = (wvv_sum * w_sum - wv_sum * wv_sum) / w_sum / w_sum
+                    if method == DS_STD:
+                        out[k, out_y, out_x] = np.sqrt(out[k, out_y, out_x])
+
+    return out
@@ -50,10 +50,14 @@ Components
 
 import os
 import os.path
+import random
 import sys
 import time
+import weakref
 from abc import ABCMeta, abstractmethod
-from threading import RLock
+from collections import OrderedDict, namedtuple
+from threading import Lock, RLock
+from typing import Optional
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH)"
 
@@ -113,12 +117,24 @@ class CacheStore(metaclass=ABCMeta):
         """
         pass
 
+    @property
+    def in_memory(self) -> bool:
+        """
+        Whether this store holds values in the memory of the process, so that its caches
+        share the process' memory budget, see :py:func:`set_memory_budget`.
+        """
+        return False
+
 
 class MemoryCacheStore(CacheStore):
     """
     Simple memory store.
     """
 
+    @property
+    def in_memory(self) -> bool:
+        return True
+
     def can_load_from_key(self, key) -> bool:
         # This store type does not maintain key-value pairs on its own
         return False
@@ -128,10 +144,11 @@ class MemoryCacheStore(CacheStore):
 
     def store_value(self, key, value):
         """
-        Return (value, 1).
+        Return ([key, value], size).
         :param key: the key
         :param value: the original value
-        :return: the tuple (stored value, size) where stored value is the sequence [key, value].
+        :return: the tuple (stored value, size) where stored value is the sequence [key, value]
+                 and size is the number of bytes held by value.
         """
         return [key, value], _compute_object_size(value)
 
@@ -226,11 +243,23 @@ POLICY_RR = _policy_rr
 
 _T0 = time.perf_counter()
 
+#: Number of locks that guard the store operations of a cache's keys
+_NUM_LOCK_STRIPES = 64
+
+#: Cache statistics, sizes are given in the units of the cache's store
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'evicted_size', 'count', 'size'])
+
 
 class Cache:
     """
     An implementation of a cache.
     See https://en.wikipedia.org/wiki/Cache_algorithms
+
+    The cache is thread-safe. Loading, storing, restoring and discarding values by the cache's store
+    is guarded by per-key locks, so that values of different keys are processed concurrently.
+    A single lock guards the cache's bookkeeping only, which takes constant time per access for the policies
+    :py:data:`POLICY_LRU`, :py:data:`POLICY_MRU`, :py:data:`POLICY_LFU`, and :py:data:`POLICY_RR`.
+    Other policies sort all items whenever the cache capacity is exceeded.
     """
 
     class Item:
@@ -238,47 +267,17 @@ class Cache:
         Cache-private class representing an item in the cache.
         """
 
-        def __init__(self):
-            self.key = None
-            self.stored_value = None
-            self.stored_size = 0
-            self.creation_time = 0
-            self.access_time = 0
-            self.access_count = 0
+        __slots__ = ('key', 'stored_value', 'stored_size', 'creation_time', 'access_time', 'access_count')
 
-        @staticmethod
-        def load_from_key(store, key):
-            if not store.can_load_from_key(key):
-                return None
-            item = Cache.Item()
-            item._load_from_key(store, key)
-            return item
-
-        def store(self, store, key, value):
+        def __init__(self, key, stored_value, stored_size):
             self.key = key
-            self.access_count = 0
-            self._access()
-            stored_value, stored_size = store.store_value(key, value)
             self.stored_value = stored_value
             self.stored_size = stored_size
+            self.creation_time = time.perf_counter() - _T0
+            self.access_time = self.creation_time
+            self.access_count = 1
 
-        def restore(self, store, key):
-            self._access()
-            return store.restore_value(key, self.stored_value)
-
-        def discard(self, store, key):
-            store.discard_value(key, self.stored_value)
-            self.__init__()
-
-        def _load_from_key(self, store, key):
-            self.key = key
-            self.access_count = 0
-            self._access()
-            stored_value, stored_size = store.load_from_key(key)
-            self.stored_value = stored_value
-            self.stored_size = stored_size
-
-        def _access(self):
+        def access(self):
             self.access_time = time.perf_counter() - _T0
             self.access_count += 1
 
@@ -301,8 +300,15 @@ class Cache:
         self._size = 0
         self._max_size = self._capacity * self._threshold
         self._item_dict = {}
-        self._item_list = []
-        self._lock = RLock()
+        self._item_order = _new_item_order(policy)
+        self._lock = Lock()
+        self._key_locks = [RLock() for _ in range(_NUM_LOCK_STRIPES)]
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._evicted_size = 0
+        if store.in_memory:
+            _register_memory_cache(self)
 
     @property
     def policy(self):
@@ -328,131 +334,551 @@ class Cache:
     def max_size(self):
         return self._max_size
 
+    @property
+    def stats(self) -> CacheStats:
+        """The statistics of this cache."""
+        with self._lock:
+            return CacheStats(hits=self._hits,
+                              misses=self._misses,
+                              evictions=self._evictions,
+                              evicted_size=self._evicted_size,
+                              count=len(self._item_dict),
+                              size=self._size)
+
     def get_value(self, key):
-        self._lock.acquire()
-        item = self._item_dict.get(key)
-        value = None
-        restored = False
-        if item:
-            value = item.restore(self._store, key)
-            restored = True
-            if _DEBUG_CACHE:
-                _debug_print('restored value for key "%s" from cache' % key)
-        elif self._parent_cache:
-            item = self._parent_cache.get_value(key)
-            if item:
-                value = item.restore(self._parent_cache.store, key)
-                restored = True
+        with self._get_key_lock(key):
+            with self._lock:
+                item = self._item_dict.get(key)
+                if item is not None:
+                    item.access()
+                    self._item_order.touch(item)
+                    self._hits += 1
+            if item is not None:
+                if _DEBUG_CACHE:
+                    _debug_print('restored value for key "%s" from cache' % key)
+                return self._store.restore_value(key, item.stored_value)
+
+        if self._parent_cache:
+            value = self._parent_cache.get_value(key)
+            if value is not None:
                 if _DEBUG_CACHE:
                     _debug_print('restored value for key "%s" from parent cache' % key)
-        if not restored:
-            item = Cache.Item.load_from_key(self._store, key)
-            if item:
-                self._add_item(item)
-                value = item.restore(self._store, key)
+                return value
+
+        value = None
+        with self._get_key_lock(key):
+            item = self._item_dict.get(key)
+            if item is None and self._store.can_load_from_key(key):
+                item = self._load_item(key)
+            if item is not None:
+                value = self._store.restore_value(key, item.stored_value)
                 if _DEBUG_CACHE:
-                    _debug_print('restored value for key "%s" from cache' % key)
-        self._lock.release()
+                    _debug_print('restored value for key "%s" from store' % key)
+        with self._lock:
+            if item is not None:
+                self._hits += 1
+            else:
+                self._misses += 1
+        if item is not None:
+            self._trim(keep_key=key)
+            self._relieve_memory_pressure(keep_key=key)
         return value
 
     def put_value(self, key, value):
-        self._lock.acquire()
         if self._parent_cache:
             # remove value from parent cache, because this cache will now take over
             self._parent_cache.remove_value(key)
-        item = self._item_dict.get(key)
-        if item:
-            self._remove_item(item)
-            item.discard(self._store, key)
+        with self._get_key_lock(key):
+            self._discard_item(key)
+            stored_value, stored_size = self._store.store_value(key, value)
+            self._add_item(Cache.Item(key, stored_value, stored_size))
             if _DEBUG_CACHE:
-                _debug_print('discarded value for key "%s" from cache' % key)
-        else:
-            item = Cache.Item()
-        item.store(self._store, key, value)
-        if _DEBUG_CACHE:
-            _debug_print('stored value for key "%s" in cache' % key)
-        self._add_item(item)
-        self._lock.release()
+                _debug_print('stored value for key "%s" in cache' % key)
+        self._trim(keep_key=key)
+        self._relieve_memory_pressure(keep_key=key)
+
+    def load_keys(self, keys):
+        """
+        Make this cache aware of values that its store already holds for the given *keys*,
+        e.g. values stored by a former session, so that they count towards the cache size.
+
+        :param keys: the keys
+        """
+        for key in keys:
+            with self._get_key_lock(key):
+                if key not in self._item_dict and self._store.can_load_from_key(key):
+                    self._load_item(key)
+        self._trim()
+        self._relieve_memory_pressure()
 
     def remove_value(self, key):
-        self._lock.acquire()
         if self._parent_cache:
             self._parent_cache.remove_value(key)
-        item = self._item_dict.get(key)
-        if item:
-            self._remove_item(item)
-            item.discard(self._store, key)
-            if _DEBUG_CACHE:
-                _debug_print('cate.util.im.cache.Cache: discarded value for key "%s" from parent cache' % key)
-        self._lock.release()
-
-    def _add_item(self, item):
-        self._item_dict[item.key] = item
-        self._item_list.append(item)
-        if self._size + item.stored_size > self._max_size:
-            self.trim(item.stored_size)
-        self._size += item.stored_size
-
-    def _remove_item(self, item):
-        self._item_dict.pop(item.key)
-        self._item_list.remove(item)
-        self._size -= item.stored_size
+        with self._get_key_lock(key):
+            if self._discard_item(key) and _DEBUG_CACHE:
+                _debug_print('discarded value for key "%s" from cache' % key)
 
     def trim(self, extra_size=0):
-        if _DEBUG_CACHE:
-            _debug_print('trimming...')
-        self._lock.acquire()
-        self._item_list.sort(key=self._policy)
-        keys = []
-        size = self._size
-        max_size = self._max_size
-        for item in self._item_list:
-            if size + extra_size > max_size:
-                keys.append(item.key)
-                size -= item.stored_size
-        self._lock.release()
-        # release lock to give another thread a chance then require lock again
-        self._lock.acquire()
-        for key in keys:
-            if self._parent_cache:
-                # Before discarding item fully, put its value into the parent cache
-                value = self.get_value(key)
-                self.remove_value(key)
-                if value:
-                    self._parent_cache.put_value(key, value)
-            else:
-                self.remove_value(key)
-        self._lock.release()
+        """
+        Discard items according to the cache's policy until its size plus *extra_size*
+        no longer exceeds its maximum size.
+
+        :param extra_size: extra size to make room for
+        """
+        self._trim(extra_size=extra_size)
 
     def clear(self, clear_parent=True):
-        self._lock.acquire()
         if self._parent_cache and clear_parent:
             self._parent_cache.clear(clear_parent)
-        keys = list(self._item_dict.keys())
-        self._lock.release()
+        with self._lock:
+            keys = list(self._item_dict.keys())
         for key in keys:
             if self._parent_cache and not clear_parent:
                 value = self.get_value(key)
-                if value:
+                if value is not None:
                     self._parent_cache.put_value(key, value)
-            self.remove_value(key)
+            with self._get_key_lock(key):
+                self._discard_item(key)
+
+    def _get_key_lock(self, key):
+        return self._key_locks[hash(key) % _NUM_LOCK_STRIPES]
+
+    def _load_item(self, key):
+        # Must be called while holding the key's lock
+        stored_value, stored_size = self._store.load_from_key(key)
+        item = Cache.Item(key, stored_value, stored_size)
+        self._add_item(item)
+        return item
+
+    def _add_item(self, item):
+        # Must be called while holding the item key's lock
+        with self._lock:
+            self._item_dict[item.key] = item
+            self._item_order.add(item)
+            self._size += item.stored_size
+
+    def _discard_item(self, key) -> bool:
+        # Must be called while holding the key's lock
+        with self._lock:
+            item = self._item_dict.pop(key, None)
+            if item is None:
+                return False
+            self._item_order.remove(item)
+            self._size -= item.stored_size
+        self._store.discard_value(key, item.stored_value)
+        return True
+
+    def _trim(self, extra_size=0, keep_key=None):
+        # Neither the key lock of keep_key nor any other key lock must be held here,
+        # as we acquire the key locks of the discarded items.
+        while self._size + extra_size > self._max_size:
+            if self._evict(keep_key=keep_key) is None:
+                return
+
+    def _relieve_memory_pressure(self, keep_key=None):
+        memory_budget = _MEMORY_BUDGET
+        if memory_budget is not None and self._store.in_memory:
+            memory_budget.relieve(keep_cache=self, keep_key=keep_key)
+
+    def _evict(self, keep_key=None):
+        """
+        Discard the next item according to the cache's policy, except the item of *keep_key*.
+        No key lock must be held by the caller.
+
+        :return: the size of the discarded item, zero if the item has been removed concurrently,
+                 or None, if there is no item to discard.
+        """
+        with self._lock:
+            item = next((item for item in self._item_order.victims() if item.key != keep_key), None)
+        if item is None:
+            return None
+        key = item.key
+        with self._get_key_lock(key):
+            if self._item_dict.get(key) is not item:
+                # Item has been replaced or removed in the meantime
+                return 0
+            value = None
+            if self._parent_cache:
+                # Before discarding item fully, put its value into the parent cache
+                value = self._store.restore_value(key, item.stored_value)
+            self._discard_item(key)
+            with self._lock:
+                self._evictions += 1
+                self._evicted_size += item.stored_size
+        if value is not None:
+            self._parent_cache.put_value(key, value)
+        if _DEBUG_CACHE:
+            _debug_print('evicted value for key "%s" from cache' % key)
+        return item.stored_size
+
+
+class _ItemOrder(metaclass=ABCMeta):
+    """
+    The order in which a cache's items are discarded.
+    Implementations are not thread-safe, the cache calls them while holding its lock.
+    """
+
+    @abstractmethod
+    def add(self, item):
+        """Add a new item."""
+
+    @abstractmethod
+    def remove(self, item):
+        """Remove an item."""
+
+    @abstractmethod
+    def touch(self, item):
+        """Notify that the item has been accessed."""
+
+    @abstractmethod
+    def victims(self):
+        """Iterate over the items in the order they should be discarded."""
+
+
+class _RecencyItemOrder(_ItemOrder):
+    """Discards least (or most) recently used items first."""
+
+    def __init__(self, most_recent_first=False):
+        self._items = OrderedDict()
+        self._most_recent_first = most_recent_first
+
+    def add(self, item):
+        self._items[item.key] = item
+
+    def remove(self, item):
+        del self._items[item.key]
+
+    def touch(self, item):
+        self._items.move_to_end(item.key)
+
+    def victims(self):
+        return reversed(self._items.values()) if self._most_recent_first else iter(self._items.values())
+
+
+class _FrequencyItemOrder(_ItemOrder):
+    """
+    Discards least frequently used items first, and the least recently used among equally frequently used items.
+    Items are kept in a list of buckets of increasing access counts, so all operations take constant time.
+    """
+
+    class _Bucket:
+        __slots__ = ('count', 'items', 'prev', 'next')
+
+        def __init__(self, count):
+            self.count = count
+            self.items = OrderedDict()
+            self.prev = self
+            self.next = self
+
+    def __init__(self):
+        # Sentinel of the circular list of buckets
+        self._head = _FrequencyItemOrder._Bucket(0)
+        self._buckets = {}
+
+    def add(self, item):
+        bucket = self._head.next
+        if bucket is self._head or bucket.count != 1:
+            bucket = self._insert_bucket(self._head, 1)
+        bucket.items[item.key] = item
+        self._buckets[item.key] = bucket
+
+    def remove(self, item):
+        bucket = self._buckets.pop(item.key)
+        del bucket.items[item.key]
+        if not bucket.items:
+            self._remove_bucket(bucket)
+
+    def touch(self, item):
+        bucket = self._buckets[item.key]
+        next_bucket = bucket.next
+        if next_bucket is self._head or next_bucket.count != bucket.count + 1:
+            next_bucket = self._insert_bucket(bucket, bucket.count + 1)
+        del bucket.items[item.key]
+        next_bucket.items[item.key] = item
+        self._buckets[item.key] = next_bucket
+        if not bucket.items:
+            self._remove_bucket(bucket)
+
+    def victims(self):
+        bucket = self._head.next
+        while bucket is not self._head:
+            yield from bucket.items.values()
+            bucket = bucket.next
+
+    @staticmethod
+    def _insert_bucket(prev_bucket, count):
+        bucket = _FrequencyItemOrder._Bucket(count)
+        bucket.prev = prev_bucket
+        bucket.next = prev_bucket.next
+        prev_bucket.next.prev = bucket
+        prev_bucket.next = bucket
+        return bucket
+
+    @staticmethod
+    def _remove_bucket(bucket):
+        bucket.prev.next = bucket.next
+        bucket.next.prev = bucket.prev
+
+
+class _RandomItemOrder(_ItemOrder):
+    """Discards randomly chosen items."""
+
+    def __init__(self):
+        self._items = []
+        self._indexes = {}
+
+    def add(self, item):
+        self._indexes[item.key] = len(self._items)
+        self._items.append(item)
+
+    def remove(self, item):
+        # Swap the item with the last one, so it can be removed in constant time
+        index = self._indexes.pop(item.key)
+        last_item = self._items.pop()
+        if last_item is not item:
+            self._items[index] = last_item
+            self._indexes[last_item.key] = index
+
+    def touch(self, item):
+        pass
+
+    def victims(self):
+        if self._items:
+            yield self._items[random.randrange(len(self._items))]
+            yield from self._items
+
+
+class _SortedItemOrder(_ItemOrder):
+    """Discards items in the order given by a policy function that maps items to numbers."""
+
+    def __init__(self, policy):
+        self._policy = policy
+        self._items = {}
+
+    def add(self, item):
+        self._items[item.key] = item
+
+    def remove(self, item):
+        del self._items[item.key]
+
+    def touch(self, item):
+        pass
+
+    def victims(self):
+        return iter(sorted(self._items.values(), key=self._policy))
+
+
+def _new_item_order(policy) -> _ItemOrder:
+    if policy is POLICY_LRU:
+        return _RecencyItemOrder()
+    if policy is POLICY_MRU:
+        return _RecencyItemOrder(most_recent_first=True)
+    if policy is POLICY_LFU:
+        return _FrequencyItemOrder()
+    if policy is POLICY_RR:
+        return _RandomItemOrder()
+    return _SortedItemOrder(policy)
+
+
+class MemoryBudget:
+    """
+    A memory budget shared by all caches whose stores hold values in the memory of the process,
+    such as :py:class:`MemoryCacheStore`. It becomes effective by passing it to :py:func:`set_memory_budget`.
+
+    Whenever a value has been put into one of these caches, the budget is checked. If the sum of the sizes of
+    all these caches exceeds *capacity*, or the resident set size (RSS) of the process exceeds *max_rss*,
+    values are discarded until the excess has been freed. Values are discarded according to the caches'
+    replacement policies, always from the cache under the highest pressure, that is, the cache with the largest
+    ratio of its size to its maximum size.
+
+    As the RSS may also exceed *max_rss* for reasons other than the caches, it is checked at most once
+    every *rss_check_interval* seconds, and no more than the sizes of the caches is discarded because of it.
+
+    :param capacity: the maximum number of bytes held by all in-memory caches, or None
+    :param max_rss: the maximum RSS of the process in bytes, or None. Requires the psutil package.
+    :param rss_check_interval: the minimum time in seconds between two checks of the RSS
+    """
+
+    def __init__(self, capacity: int = None, max_rss: int = None, rss_check_interval: float = 1.0):
+        self._capacity = capacity
+        self._max_rss = max_rss
+        self._rss_check_interval = rss_check_interval
+        self._rss_check_time = None
+        self._process = None
+        if max_rss is not None:
+            import psutil
+            self._process = psutil.Process()
+        self._lock = Lock()
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def max_rss(self):
+        return self._max_rss
+
+    def get_excess(self, size) -> int:
+        """
+        Get the number of bytes that exceed this budget.
+
+        :param size: the sum of the sizes of all in-memory caches
+        :return: the excess in bytes, zero if the budget is kept
+        """
+        excess = 0
+        if self._capacity is not None:
+            excess = max(excess, size - self._capacity)
+        if self._process is not None and self._is_rss_check_due():
+            # Only the values of the caches can be discarded, whatever else the RSS comprises
+            excess = max(excess, min(self._process.memory_info().rss - self._max_rss, size))
+        return excess
+
+    def _is_rss_check_due(self) -> bool:
+        now = time.monotonic()
+        if self._rss_check_time is not None and now - self._rss_check_time < self._rss_check_interval:
+            return False
+        self._rss_check_time = now
+        return True
+
+    def relieve(self, keep_cache=None, keep_key=None) -> int:
+        """
+        Discard values from the in-memory caches until the excess of this budget has been freed.
+
+        :param keep_cache: a cache whose value of *keep_key* must not be discarded
+        :param keep_key: the key of a value that must not be discarded, e.g. the one just stored
+        :return: the number of bytes freed
+        """
+        if not self._lock.acquire(blocking=False):
+            # Another thread is already relieving the pressure
+            return 0
+        try:
+            caches = _get_memory_caches()
+            excess = self.get_excess(sum(cache.size for cache in caches))
+            freed_size = 0
+            while freed_size < excess:
+                caches.sort(key=_get_cache_pressure, reverse=True)
+                for cache in caches:
+                    size = cache._evict(keep_key=keep_key if cache is keep_cache else None)
+                    if size is not None:
+                        freed_size += size
+                        break
+                else:
+                    # Nothing left to discard
+                    break
+            return freed_size
+        finally:
+            self._lock.release()
+
+
+_MEMORY_BUDGET = None
+_MEMORY_CACHES = weakref.WeakSet()
+_MEMORY_CACHES_LOCK = Lock()
+
+
+def set_memory_budget(memory_budget: Optional[MemoryBudget]):
+    """
+    Set the memory budget shared by all caches whose stores hold values in memory.
+
+    :param memory_budget: the memory budget, or None to remove a budget set before
+    """
+    global _MEMORY_BUDGET
+    _MEMORY_BUDGET = memory_budget
+
+
+def get_memory_budget() -> Optional[MemoryBudget]:
+    """
+    Get the memory budget shared by all caches whose stores hold values in memory.
+
+    :return: the memory budget, or None if none has been set
+    """
+    return _MEMORY_BUDGET
+
+
+def _register_memory_cache(cache):
+    with _MEMORY_CACHES_LOCK:
+        _MEMORY_CACHES.add(cache)
+
+
+def _get_memory_caches():
+    with _MEMORY_CACHES_LOCK:
+        return list(_MEMORY_CACHES)
+
+
+def _get_cache_pressure(cache):
+    return cache.size / cache.max_size if cache.max_size else float('inf')
 
 
 def _debug_print(msg):
     print("cate.util.cache.Cache:", msg)
 
 
-def _compute_object_size(obj):
+def _compute_object_size(obj) -> int:
+    """
+    Compute the number of bytes held by *obj*.
+
+    Numpy arrays account for the memory of the arrays they are views of, masked arrays for their masks,
+    PIL images for their pixel buffers, dask arrays for the chunks they hold in memory, e.g. after they have been
+    persisted, and xarray DataArrays and Variables for their data, if loaded.
+    """
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(obj, np.ndarray):
+        if isinstance(obj, np.ma.MaskedArray):
+            mask = np.ma.getmask(obj)
+            return _compute_ndarray_size(obj.data) + (_compute_ndarray_size(mask) if mask is not np.ma.nomask else 0)
+        return _compute_ndarray_size(obj)
+
+    pil_image = sys.modules.get('PIL.Image')
+    if pil_image is not None and isinstance(obj, pil_image.Image):
+        return _compute_pil_image_size(obj)
+
+    xr = sys.modules.get('xarray')
+    if xr is not None and isinstance(obj, (xr.DataArray, xr.Variable)):
+        if obj.chunks is not None:
+            return _compute_object_size(obj.data)
+        # noinspection PyProtectedMember
+        return _compute_object_size(obj.values) if obj.variable._in_memory else sys.getsizeof(obj)
+
+    da = sys.modules.get('dask.array')
+    if da is not None and isinstance(obj, da.Array):
+        return _compute_dask_array_size(obj)
+
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(_compute_object_size(item) for item in obj)
+
     if hasattr(obj, 'nbytes'):
-        # A numpy ndarray instance
-        return obj.nbytes
-    elif hasattr(obj, 'size') and hasattr(obj, 'mode'):
-        # A PIL Image instance
-        w, h = obj.size
-        m = obj.mode
-        return w * h * (4 if m in ('RGBA', 'RGBx', 'I', 'F') else
-                        3 if m in ('RGB', 'YCbCr', 'LAB', 'HSV') else
-                        1. / 8. if m == '1' else
-                        1)
-    else:
-        return sys.getsizeof(obj)
+        # E.g. cate.util.im.QuantizedTile
+        return int(obj.nbytes)
+
+    # E.g. encoded images given as bytes
+    return sys.getsizeof(obj)
+
+
+def _compute_ndarray_size(array) -> int:
+    # A view keeps the whole memory of the array it has been created from
+    base = array
+    while base.base is not None and hasattr(base.base, 'nbytes'):
+        base = base.base
+    return max(array.nbytes, int(base.nbytes))
+
+
+# Pillow stores pixels of these modes in one or two bytes, all other modes in four bytes
+_PIL_PIXEL_SIZES = {'1': 1, 'L': 1, 'P': 1, 'I;16': 2, 'I;16L': 2, 'I;16B': 2, 'I;16N': 2}
+
+
+def _compute_pil_image_size(image) -> int:
+    width, height = image.size
+    size = width * height * _PIL_PIXEL_SIZES.get(image.mode, 4)
+    if image.mode in ('P', 'PA'):
+        # 256 RGBA palette entries
+        size += 1024
+    return size
+
+
+def _compute_dask_array_size(array) -> int:
+    # Lazy arrays hold their task graphs only, persisted ones also hold their chunks
+    np = sys.modules.get('numpy')
+    size = sys.getsizeof(array)
+    for value in array.__dask_graph__().values():
+        if np is not None and isinstance(value, np.ndarray):
+            size += _compute_ndarray_size(value)
+    return size
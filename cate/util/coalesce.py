@@ -0,0 +1,111 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module provides the :py:class:`CoalescingExecutor` class which runs computations in a bounded thread pool
+and lets concurrent requests for the same computation share a single result.
+
+Components
+==========
+"""
+
+import concurrent.futures
+import threading
+from typing import Any, Callable, Dict, Hashable, List
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+
+class CoalescingExecutor:
+    """
+    Runs computations in a thread pool. Computations are identified by keys. While a computation is pending or
+    running, further requests for the same key are given the same future instead of starting a new computation.
+
+    Every call to :py:meth:`submit` must be balanced by a call to :py:meth:`release`, if the caller is no longer
+    interested in the result before it is available. If no interested callers are left, a computation that has
+    not started yet is cancelled.
+
+    :param max_workers: The maximum number of computations run concurrently.
+    :param thread_name_prefix: Prefix for the names of the worker threads.
+    """
+
+    def __init__(self, max_workers: int = None, thread_name_prefix: str = ''):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix=thread_name_prefix)
+        self._computations: Dict[Hashable, List] = dict()
+        self._lock = threading.RLock()
+
+    def submit(self, key: Hashable, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Get the future of the computation identified by *key*. If there is no pending or running computation
+        for *key*, a new one calling ``fn(*args, **kwargs)`` is submitted.
+
+        :param key: The computation's key.
+        :param fn: The callable that performs the computation.
+        :return: The computation's future.
+        """
+        with self._lock:
+            computation = self._computations.get(key)
+            if computation is None:
+                future = self._executor.submit(fn, *args, **kwargs)
+                computation = [future, 0]
+                self._computations[key] = computation
+                future.add_done_callback(lambda f: self._remove(key, f))
+            computation[1] += 1
+            return computation[0]
+
+    def release(self, key: Hashable, future: concurrent.futures.Future) -> bool:
+        """
+        Tell the executor that a caller of :py:meth:`submit` is no longer interested in the result of *future*.
+
+        :param key: The computation's key.
+        :param future: The future returned by :py:meth:`submit`.
+        :return: True, if the computation has been cancelled.
+        """
+        with self._lock:
+            computation = self._computations.get(key)
+            if computation is None or computation[0] is not future:
+                return False
+            computation[1] -= 1
+            if computation[1] > 0:
+                return False
+            # Running computations cannot be cancelled, their futures stay registered until they are done.
+            if not future.cancel():
+                return False
+            self._computations.pop(key, None)
+            return True
+
+    def get_num_computations(self) -> int:
+        """The number of pending or running computations."""
+        with self._lock:
+            return len(self._computations)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _remove(self, key: Hashable, future: Any):
+        with self._lock:
+            computation = self._computations.get(key)
+            if computation is not None and computation[0] is future:
+                del self._computations[key]
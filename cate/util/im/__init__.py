@@ -47,8 +47,11 @@ Components
 """
 
 from .cmaps import get_cmaps
+from .encoder import TileEncoder, get_tile_encoder, negotiate_tile_encoder
 from .geoextent import GeoExtent
 from .image import *
+from .prefetch import TilePrefetcher
+from .registry import PyramidRegistry
 from .tilingscheme import TilingScheme
 from .utils import *
 
@@ -0,0 +1,204 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import io
+from typing import Optional, Sequence
+
+import numpy as np
+from PIL import Image, features
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+FORMAT_PNG = 'PNG'
+FORMAT_WEBP = 'WEBP'
+
+_MIME_TYPES = {FORMAT_PNG: 'image/png', FORMAT_WEBP: 'image/webp'}
+
+
+class TileEncoder:
+    """
+    Encodes RGBA tiles into image bytes.
+
+    Tiles may be given either as RGBA arrays or as color indexes into a table of RGBA colors.
+    In the latter case, PNG tiles may be written as palette (P-mode) images, which are considerably
+    smaller and faster to encode. This is only possible if the color table has at most 256 distinct
+    colors, which is the case for categorical color maps such as "land_cover_cci". Otherwise
+    RGBA images are written.
+
+    :param format: Image format, either "PNG" or "WEBP".
+    :param compress_level: zlib compression level of PNG images from 0 (none) to 9 (best),
+           ``None`` means Pillow's default level 6. Level 1 is several times faster than the default,
+           at the cost of slightly larger images.
+    :param palette: Whether to write palette PNG images if possible.
+    :param quality: Quality of lossy WebP images from 0 to 100, ``None`` means lossless.
+    """
+
+    def __init__(self,
+                 format: str = FORMAT_PNG,
+                 compress_level: int = None,
+                 palette: bool = False,
+                 quality: int = None):
+        format = format.upper()
+        if format not in _MIME_TYPES:
+            raise ValueError('format must be one of %s' % ', '.join(map(repr, _MIME_TYPES.keys())))
+        if compress_level is not None and not 0 <= compress_level <= 9:
+            raise ValueError('compress_level must be in the range 0 to 9')
+        if quality is not None and not 0 <= quality <= 100:
+            raise ValueError('quality must be in the range 0 to 100')
+        self._format = format
+        self._compress_level = compress_level
+        self._palette = palette and format == FORMAT_PNG
+        self._quality = quality
+
+    @property
+    def id(self) -> str:
+        """An identifier that is unique for the encoder's settings, e.g. to be used in tile cache keys."""
+        if self._format == FORMAT_PNG:
+            parts = ['png']
+            if self._palette:
+                parts.append('p')
+            if self._compress_level is not None:
+                parts.append('z%d' % self._compress_level)
+        else:
+            parts = ['webp', 'q%d' % self._quality if self._quality is not None else 'lossless']
+        return '-'.join(parts)
+
+    @property
+    def format(self) -> str:
+        return self._format
+
+    @property
+    def mime_type(self) -> str:
+        return _MIME_TYPES[self._format]
+
+    @property
+    def ext(self) -> str:
+        """File name extension of the encoded images."""
+        return '.' + self._format.lower()
+
+    def encode(self, image: Image.Image, **kwargs) -> bytes:
+        """Encode the given PIL *image*. Keyword arguments are passed to the Pillow image writer."""
+        if self._format == FORMAT_PNG:
+            if self._compress_level is not None:
+                kwargs.update(compress_level=self._compress_level)
+        elif self._quality is not None:
+            kwargs.update(quality=self._quality)
+        else:
+            kwargs.update(lossless=True)
+        ostream = io.BytesIO()
+        image.save(ostream, format=self._format, **kwargs)
+        return ostream.getvalue()
+
+    def encode_rgba(self, rgba: np.ndarray) -> bytes:
+        """Encode an RGBA image given as uint8 array of shape (height, width, 4)."""
+        return self.encode(Image.fromarray(rgba, mode='RGBA'))
+
+    def encode_indexed(self, indexes: np.ndarray, colors: np.ndarray) -> bytes:
+        """
+        Encode an RGBA image given as color *indexes* into a color table.
+
+        :param indexes: integer array of shape (height, width)
+        :param colors: uint8 array of RGBA colors of shape (num_colors, 4)
+        """
+        if self._palette:
+            # Colors may repeat in the table, e.g. if a categorical color map has been resampled to 256 colors
+            palette_colors, palette_indexes = np.unique(colors, axis=0, return_inverse=True)
+            if len(palette_colors) <= 256:
+                image = Image.fromarray(palette_indexes.astype(np.uint8)[indexes], mode='P')
+                image.putpalette(palette_colors[:, 0:3].tobytes())
+                return self.encode(image, transparency=palette_colors[:, 3].tobytes())
+        return self.encode_rgba(colors[indexes])
+
+
+#: Predefined tile encoders by name, see :py:func:`get_tile_encoder`.
+TILE_ENCODERS = {
+    'png': TileEncoder(),
+    'png-fast': TileEncoder(compress_level=1, palette=True),
+    'webp': TileEncoder(FORMAT_WEBP),
+    'webp-lossy': TileEncoder(FORMAT_WEBP, quality=90),
+}
+
+
+def get_tile_encoder(name: str) -> Optional[TileEncoder]:
+    """
+    Get a predefined tile encoder by *name*.
+
+    :param name: One of "png" (Pillow's default settings), "png-fast" (fast zlib level and palette images
+           for categorical color maps), "webp" (lossless WebP) or "webp-lossy".
+    :return: The tile encoder or ``None``, if there is no such encoder or its format is not supported
+           by the installed Pillow.
+    """
+    encoder = TILE_ENCODERS.get(name)
+    if encoder is None or not is_format_supported(encoder.format):
+        return None
+    return encoder
+
+
+def negotiate_tile_encoder(name: Optional[str],
+                           accept: Optional[str],
+                           default_names: str = 'png') -> Optional[TileEncoder]:
+    """
+    Select a tile encoder for a client's request.
+
+    :param name: The name of the encoder requested by the client, e.g. by a query parameter, or ``None``.
+    :param accept: The value of the client's HTTP "Accept" header or ``None``.
+    :param default_names: Comma-separated names of encoders in the order of preference, used if the client
+           didn't request a specific one. The first one whose format is accepted by the client is selected.
+    :return: The tile encoder or ``None``, if the requested encoder is unknown.
+    """
+    if name:
+        return get_tile_encoder(name)
+    accepted_types = _parse_accept(accept)
+    for default_name in default_names.split(','):
+        encoder = get_tile_encoder(default_name.strip())
+        if encoder is not None and (not accepted_types or _is_accepted(encoder.mime_type, accepted_types)):
+            return encoder
+    # PNG is understood by every client
+    return TILE_ENCODERS['png']
+
+
+def is_format_supported(format: str) -> bool:
+    """Test whether the installed Pillow can write images of the given *format*."""
+    if format == FORMAT_WEBP:
+        return _is_webp_supported()
+    return format in _MIME_TYPES
+
+
+_WEBP_SUPPORTED = None
+
+
+def _is_webp_supported() -> bool:
+    global _WEBP_SUPPORTED
+    if _WEBP_SUPPORTED is None:
+        _WEBP_SUPPORTED = bool(features.check('webp'))
+    return _WEBP_SUPPORTED
+
+
+def _parse_accept(accept: Optional[str]) -> Sequence[str]:
+    if not accept:
+        return []
+    return [media_range.split(';')[0].strip().lower() for media_range in accept.split(',')]
+
+
+def _is_accepted(mime_type: str, accepted_types: Sequence[str]) -> bool:
+    main_type = mime_type.split('/')[0]
+    return any(accepted_type in (mime_type, main_type + '/*', '*/*') for accepted_type in accepted_types)
@@ -31,6 +31,7 @@ from PIL import Image
 from xarray import DataArray
 
 from .cmaps import ensure_cmaps_loaded
+from .encoder import TileEncoder
 from .geoextent import GeoExtent
 from .tilingscheme import TilingScheme
 from .utils import downsample_ndarray, aggregate_ndarray_first
@@ -316,6 +317,84 @@ class DecoratorImage(OpImage, metaclass=ABCMeta):
         pass
 
 
+class QuantizedTile:
+    """
+    A compact representation of a numeric array tile. Values are linearly quantized into unsigned 16-bit
+    integers *data*, so that ``value = offset + scale * data``. Integer tiles whose value range fits into
+    16 bits are represented exactly.
+
+    :param data: the quantized values as numpy array of type ``uint16``
+    :param mask: optional numpy boolean array, True for invalid values
+    :param offset: the value represented by 0
+    :param scale: the value difference between two subsequent quantized values
+    """
+
+    MAX_VALUE = 65535
+
+    def __init__(self, data: np.ndarray, mask: Optional[np.ndarray], offset: float, scale: float):
+        self.data = data
+        self.mask = mask
+        self.offset = offset
+        self.scale = scale
+
+    @classmethod
+    def from_array(cls, array) -> 'QuantizedTile':
+        """
+        Quantize a numpy (masked) array. Masked values as well as NaN and infinite values become invalid.
+
+        :param array: the numpy array
+        :return: a new quantized tile
+        """
+        is_float = np.issubdtype(array.dtype, np.floating)
+        if is_float:
+            array = np.ma.masked_invalid(array, copy=False)
+        else:
+            array = np.ma.asarray(array)
+        mask = np.ma.getmaskarray(array)
+        if not mask.any():
+            mask = None
+        elif mask.all():
+            return QuantizedTile(np.zeros(array.shape, dtype=np.uint16), mask, 0.0, 1.0)
+
+        value_min = array.min()
+        value_max = array.max()
+        value_range = float(value_max) - float(value_min)
+        if not is_float and value_range <= cls.MAX_VALUE:
+            scale = 1.0
+        elif value_range > 0.0:
+            scale = value_range / cls.MAX_VALUE
+        else:
+            scale = 1.0
+        offset = float(value_min)
+
+        values = array.filled(value_min) if mask is not None else array.data
+        data = np.rint((values - offset) * (1.0 / scale)).astype(np.uint16)
+        return QuantizedTile(data, mask, offset, scale)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.data.shape
+
+    @property
+    def ndim(self) -> int:
+        return self.data.ndim
+
+    @property
+    def nbytes(self) -> int:
+        """Number of bytes occupied by the tile's arrays, used by memory caches."""
+        return self.data.nbytes + (self.mask.nbytes if self.mask is not None else 0)
+
+    def to_array(self, dtype=np.float64) -> np.ma.MaskedArray:
+        """
+        Convert the tile into a numpy masked array.
+
+        :param dtype: the data type of the array
+        :return: a new masked array
+        """
+        values = self.offset + self.scale * self.data.astype(dtype)
+        return np.ma.masked_array(values, mask=self.mask if self.mask is not None else np.ma.nomask)
+
+
 class TransformArrayImage(DecoratorImage):
     """
     Performs basic (numpy) array tile transformations. Currently available: force_masked, flip_y.
@@ -326,6 +405,7 @@ class TransformArrayImage(DecoratorImage):
     :param flip_y: weather to flip pixels in y-direction
     :param force_masked: weather to force creation of masked arrays
     :param no_data_value: optional no-data value for mask creation
+    :param quantize: weather to provide tiles as compact :py:class:`QuantizedTile` objects
     :param tile_cache: optional tile cache
     """
 
@@ -337,6 +417,7 @@ class TransformArrayImage(DecoratorImage):
                  force_2d: bool = False,
                  no_data_value: Number = None,
                  valid_range: Tuple[Number, Number] = None,
+                 quantize: bool = False,
                  tile_cache: Cache = None):
         super().__init__(source_image, image_id=image_id, tile_cache=tile_cache)
         self._force_masked = force_masked
@@ -344,6 +425,7 @@ class TransformArrayImage(DecoratorImage):
         self._flip_y = flip_y
         self._no_data_value = no_data_value
         self._valid_range = valid_range
+        self._quantize = quantize
 
     @property
     def no_data_value(self) -> Optional[Number]:
@@ -391,6 +473,8 @@ class TransformArrayImage(DecoratorImage):
             elif np.issubdtype(tile.dtype, np.floating) or np.issubdtype(tile.dtype, np.complexfloating):
                 # and it is of float type, return a masked tile with a mask from invalids, i.e. NaN, -Inf, +Inf
                 tile = np.ma.masked_invalid(tile)
+        if self._quantize:
+            tile = QuantizedTile.from_array(tile)
         return tile
 
 
@@ -405,8 +489,9 @@ class ColorMappedRgbaImage(DecoratorImage):
     :param cmap_name: A Matplotlib color map name
     :param num_colors: Number of colors
     :param no_data_value: No-data value
-    :param encode: Whether to create tiles that are encoded image bytes according to *format*.
-    :param format: Image format, e.g. "JPEG", "PNG"
+    :param encode: Whether to create tiles that are encoded image bytes according to *format* or *encoder*.
+    :param format: Image format, e.g. "JPEG", "PNG". Ignored, if *encoder* is given.
+    :param encoder: optional tile encoder used if *encode* is set
     :param tile_cache: optional tile cache
     """
 
@@ -419,19 +504,47 @@ class ColorMappedRgbaImage(DecoratorImage):
                  no_data_value: Union[int, float] = None,
                  encode: bool = False,
                  format: str = None,
+                 encoder: TileEncoder = None,
                  tile_cache=None):
+        if encoder is not None:
+            format = encoder.format
         super().__init__(source_image, image_id=image_id, format=format, mode='RGBA', tile_cache=tile_cache)
         self._value_range = value_range
         self._cmap_name = cmap_name if cmap_name else 'jet'
         ensure_cmaps_loaded()
         self._cmap = cm.get_cmap(self._cmap_name, num_colors)
         self._cmap.set_bad('k', 0)
+        self._num_colors = num_colors
+        # RGBA colors of the color map followed by the color for invalid values, see _get_color_indexes()
+        self._colors = np.concatenate((self._cmap(np.arange(num_colors), bytes=True),
+                                       np.zeros((1, 4), dtype=np.uint8)))
         self._no_data_value = no_data_value
         self._encode = encode
+        self._encoder = encoder
 
     def compute_tile_from_source_tile(self,
                                       tile_x: int, tile_y: int,
                                       rectangle: Rectangle2D, source_tile: Tile) -> Tile:
+        if isinstance(source_tile, QuantizedTile):
+            indexes = self._get_quantized_color_indexes(source_tile)
+        else:
+            indexes = self._get_color_indexes(source_tile)
+
+        if self._encode and self._encoder is not None:
+            # Encoders may write the color indexes directly, e.g. as palette PNG
+            return self._encoder.encode_indexed(indexes, self._colors)
+
+        image = Image.fromarray(self._colors[indexes], mode=self.mode)
+        if self._encode and self.format:
+            ostream = io.BytesIO()
+            image.save(ostream, format=self.format)
+            encoded_image = ostream.getvalue()
+            ostream.close()
+            return encoded_image
+        else:
+            return image
+
+    def _get_color_indexes(self, source_tile: Tile) -> np.ndarray:
         value_min, value_max = self._value_range
         if not np.ma.is_masked(source_tile):
             if self._no_data_value is not None:
@@ -452,25 +565,44 @@ class ColorMappedRgbaImage(DecoratorImage):
             array = np.reshape(array, (height, width))
         else:
             # noinspection PyTypeChecker
-            index = [0] * (array.ndim - 2) + [slice(None), slice(None)]
+            index = tuple([0] * (array.ndim - 2) + [slice(None), slice(None)])
             array = array[index]
 
-        # check if we can optimize the following calls by using Numexpr
-        # see https://github.com/pydata/numexpr/wiki/Numexpr-Users-Guide
-        array -= value_min
-        if value_min != value_max:
-            array *= 1.0 / (value_max - value_min)
-        array = self._cmap(array, bytes=True)
-        image = Image.fromarray(array, mode=self.mode)
+        # Same as Matplotlib's color maps do: index = floor(num_colors * (value - value_min) / (value_max - value_min))
+        num_colors = self._num_colors
+        factor = num_colors / (value_max - value_min) if value_max != value_min else 0.0
+        indexes = np.ma.filled(array, fill_value=value_min).astype(np.float64)
+        indexes -= value_min
+        indexes *= factor
+        np.floor(indexes, out=indexes)
+        np.clip(indexes, 0, num_colors - 1, out=indexes)
+        invalid = np.ma.getmaskarray(array) | np.isnan(indexes)
+        indexes = indexes.astype(np.intp)
+        indexes[invalid] = num_colors
+        return indexes
+
+    def _get_quantized_color_indexes(self, source_tile: QuantizedTile) -> np.ndarray:
+        data = source_tile.data
+        mask = source_tile.mask
+        if data.ndim > 2:
+            # noinspection PyTypeChecker
+            index = tuple([0] * (data.ndim - 2) + [slice(None), slice(None)])
+            data = data[index]
+            mask = mask[index] if mask is not None else None
 
-        if self._encode and self.format:
-            ostream = io.BytesIO()
-            image.save(ostream, format=self.format)
-            encoded_image = ostream.getvalue()
-            ostream.close()
-            return encoded_image
-        else:
-            return image
+        # The color index of a value is floor(num_colors * (value - value_min) / (value_max - value_min)),
+        # where value = offset + scale * data. We compute it in one pass over the quantized data.
+        value_min, value_max = self._value_range
+        num_colors = self._num_colors
+        factor = num_colors / (value_max - value_min) if value_max != value_min else 0.0
+        indexes = data * np.float32(source_tile.scale * factor)
+        indexes += np.float32((source_tile.offset - value_min) * factor)
+        np.floor(indexes, out=indexes)
+        np.clip(indexes, 0, num_colors - 1, out=indexes)
+        indexes = indexes.astype(np.intp)
+        if mask is not None:
+            indexes[mask] = num_colors
+        return indexes
 
     def create_pyramid(self, **kwargs) -> 'ImagePyramid':
         if self._encode:
@@ -734,6 +866,7 @@ class ImagePyramid:
                           array: Union[np.ndarray, DataArray],
                           tiling_scheme: TilingScheme,
                           level_image_id_factory: LevelImageIdFactory = None,
+                          overviews: Sequence[Any] = None,
                           **kwargs) -> 'ImagePyramid':
 
         """
@@ -742,23 +875,30 @@ class ImagePyramid:
         For example, if array is a H5Py dataset object, the created pyramid will take advantage of
         the HDF-5 libraries's slicing.
 
+        If precomputed *overviews* are given, lower resolution levels are read from the overview of the
+        nearest resolution instead of the full resolution array.
+
         :param array: numpy-like array that supports stepping in it's subscript operator, e.g.
                       array[..., y::step, x:step]
         :param tiling_scheme:the tiling scheme
         :param level_image_id_factory: a factory function for unique image identifiers
+        :param overviews: optional numpy-like arrays, where the one with index ``k - 1`` has the shape of *array*
+                          reduced by the factor ``2 ** k``, see :py:func:`cate.util.im.overview.write_overviews`
         :param kwargs: keyword arguments passed to FastNdarrayDownsamplingImage constructor
         :return: a new ImagePyramid instance
         """
         tile_size = tiling_scheme.tile_size
         num_levels = tiling_scheme.num_levels
+        num_overviews = len(overviews) if overviews else 0
         level_images: List[Optional[TiledImage]] = [None] * num_levels
         z_index_max = num_levels - 1
         for i in range(0, num_levels):
             z_index = z_index_max - i
             image_id = level_image_id_factory(z_index) if level_image_id_factory else None
-            level_images[z_index] = FastNdarrayDownsamplingImage(array,
+            k = min(i, num_overviews)
+            level_images[z_index] = FastNdarrayDownsamplingImage(overviews[k - 1] if k > 0 else array,
                                                                  tile_size,
-                                                                 i,
+                                                                 i - k,
                                                                  image_id=image_id, **kwargs)
         return ImagePyramid(tiling_scheme, level_images)
 
@@ -0,0 +1,160 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import uuid
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import zarr
+
+from .utils import aggregate_ndarray_nanmean, aggregate_ndarray_mode, downsample_ndarray
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+AGGREGATION_MEAN = 'mean'
+AGGREGATION_MODE = 'mode'
+
+_OVERVIEWS_FORMAT_VERSION = 1
+_OVERVIEW_CHUNK_SIZE = 512
+_MIN_BLOCK_SIZE = 2048
+
+
+def write_overviews(array,
+                    path: str,
+                    num_overviews: int,
+                    aggregation: str = AGGREGATION_MEAN,
+                    no_data_value=None,
+                    valid_range: Tuple = None) -> None:
+    """
+    Compute the overviews of a 2D numpy-like *array* and write them as Zarr group to *path*.
+    The overview with index ``k - 1`` has a resolution reduced by the factor ``2 ** k``,
+    each of its pixels aggregates 2 x 2 pixels of the previous overview or of *array*.
+
+    The array is read block-wise, so it may be larger than the available memory.
+    The group is written to a temporary directory first and then moved to *path*.
+
+    :param array: numpy-like array that supports slicing, e.g. an xarray.DataArray.
+    :param path: The path of the Zarr group directory.
+    :param num_overviews: The number of overviews.
+    :param aggregation: ``"mean"`` computes the mean of valid values as 32-bit floats with NaN for invalid values,
+           ``"mode"`` takes the most frequent value and keeps the data type. The latter should be used
+           for classifications.
+    :param no_data_value: Optional value of invalid pixels.
+    :param valid_range: Optional (min, max) tuple, values outside are invalid.
+    """
+    if aggregation not in (AGGREGATION_MEAN, AGGREGATION_MODE):
+        raise ValueError('aggregation must be one of "%s" and "%s"' % (AGGREGATION_MEAN, AGGREGATION_MODE))
+    if num_overviews < 1:
+        raise ValueError('num_overviews must be greater than zero')
+    height, width = array.shape[-2:]
+    factor = 1 << num_overviews
+    if width < factor or height < factor:
+        raise ValueError('array is too small for %d overviews' % num_overviews)
+
+    if aggregation == AGGREGATION_MEAN:
+        dtype = np.dtype(np.float32)
+        fill_value = np.nan
+    else:
+        dtype = np.dtype(array.dtype)
+        fill_value = no_data_value
+
+    parent_dir = os.path.dirname(path)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+    temp_path = os.path.join(parent_dir, '.%s.tmp' % uuid.uuid4().hex)
+    try:
+        group = zarr.open_group(temp_path, mode='w')
+        overviews = [group.create_dataset(str(k),
+                                          shape=(height >> k, width >> k),
+                                          chunks=(_OVERVIEW_CHUNK_SIZE, _OVERVIEW_CHUNK_SIZE),
+                                          dtype=dtype,
+                                          fill_value=fill_value)
+                     for k in range(1, num_overviews + 1)]
+
+        # Blocks are aligned with the pixels of the coarsest overview
+        block_size = max(factor, (_MIN_BLOCK_SIZE // factor) * factor)
+        for y in range(0, height, block_size):
+            for x in range(0, width, block_size):
+                block = np.asarray(array[..., y:y + block_size, x:x + block_size])
+                if aggregation == AGGREGATION_MEAN:
+                    block = _mask_invalid(block, no_data_value, valid_range)
+                for k, overview in enumerate(overviews, start=1):
+                    h, w = block.shape[-2:]
+                    if h < 2 or w < 2:
+                        break
+                    block = _downsample(block[..., 0:h & ~1, 0:w & ~1], aggregation)
+                    overview[y >> k:(y >> k) + block.shape[-2], x >> k:(x >> k) + block.shape[-1]] = block
+
+        group.attrs.update(version=_OVERVIEWS_FORMAT_VERSION,
+                           num_overviews=num_overviews,
+                           aggregation=aggregation,
+                           shape=[height, width])
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(temp_path, path)
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+
+def open_overviews(path: str, shape: Sequence[int] = None) -> Optional[List[zarr.Array]]:
+    """
+    Open the overviews written by :py:func:`write_overviews`.
+
+    :param path: The path of the Zarr group directory.
+    :param shape: Optional shape of the original array the overviews must match.
+    :return: The list of overviews as Zarr arrays, or ``None`` if no valid overviews exist.
+    """
+    if not os.path.isdir(path):
+        return None
+    # noinspection PyBroadException
+    try:
+        group = zarr.open_group(path, mode='r')
+        attrs = group.attrs.asdict()
+        if attrs.get('version') != _OVERVIEWS_FORMAT_VERSION:
+            return None
+        if shape is not None and list(shape[-2:]) != attrs.get('shape'):
+            return None
+        return [group[str(k)] for k in range(1, attrs['num_overviews'] + 1)]
+    except Exception:
+        return None
+
+
+def _mask_invalid(block: np.ndarray, no_data_value, valid_range) -> np.ndarray:
+    block = block.astype(np.float64)
+    invalid = ~np.isfinite(block)
+    if no_data_value is not None:
+        invalid |= block == no_data_value
+    if valid_range is not None:
+        valid_min, valid_max = valid_range
+        if valid_min is not None:
+            invalid |= block < valid_min
+        if valid_max is not None:
+            invalid |= block > valid_max
+    block[invalid] = np.nan
+    return block
+
+
+def _downsample(block: np.ndarray, aggregation: str) -> np.ndarray:
+    if aggregation == AGGREGATION_MEAN:
+        return downsample_ndarray(block, aggregator=aggregate_ndarray_nanmean).astype(np.float32)
+    return downsample_ndarray(block, aggregator=aggregate_ndarray_mode)
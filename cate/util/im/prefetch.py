@@ -0,0 +1,230 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Hashable, List, Tuple
+
+from .image import ImagePyramid
+from ..coalesce import CoalescingExecutor
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+TileIndex = Tuple[int, int, int]
+
+#: Maximum number of pyramids whose most recent requests are remembered
+_MAX_NUM_HISTORIES = 64
+
+
+class TilePrefetcher:
+    """
+    Computes tiles of image pyramids in the background that are likely to be requested next,
+    so that they are already in the pyramid's tile caches when they are requested.
+
+    For every tile requested by a client, see :py:meth:`notify_request`, its neighbours at the same level
+    and the tiles covering it at the next coarser and finer levels are scheduled for prefetching.
+    Neighbours in the direction of the client's most recent movement come first. More recently scheduled
+    tiles are computed before older ones, and the oldest ones are dropped if more than *max_pending*
+    tiles are scheduled.
+
+    Prefetching has low priority: no new prefetch is started while tiles requested by clients are computed,
+    see :py:meth:`foreground`.
+
+    If an *executor* is given, tiles are computed by it using the keys ``(pyramid_key, tile_x, tile_y, z_index)``,
+    so that clients that request a tile with the same key while it is being prefetched share its computation.
+
+    :param max_workers: The number of threads prefetching tiles.
+    :param max_pending: The maximum number of scheduled tiles.
+    :param executor: An optional executor that also computes the tiles requested by clients.
+    """
+
+    def __init__(self, max_workers: int = 1, max_pending: int = 256, executor: CoalescingExecutor = None):
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._executor = executor
+        self._pending = OrderedDict()
+        self._histories = OrderedDict()
+        self._num_foreground = 0
+        self._num_prefetched = 0
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+
+    @property
+    def num_pending(self) -> int:
+        """The number of tiles scheduled for prefetching."""
+        with self._condition:
+            return len(self._pending)
+
+    @property
+    def num_prefetched(self) -> int:
+        """The number of tiles prefetched so far."""
+        with self._condition:
+            return self._num_prefetched
+
+    def notify_request(self, pyramid_key: Hashable, pyramid: ImagePyramid, tile_x: int, tile_y: int, z_index: int):
+        """
+        Notify the prefetcher about a tile requested by a client and schedule the tiles likely to be requested next.
+
+        :param pyramid_key: A key that identifies *pyramid*.
+        :param pyramid: The image pyramid.
+        :param tile_x: The requested tile's x index.
+        :param tile_y: The requested tile's y index.
+        :param z_index: The requested tile's level index.
+        """
+        tile_index = tile_x, tile_y, z_index
+        with self._condition:
+            if self._shutdown:
+                return
+            last_tile_index = self._histories.pop(pyramid_key, None)
+            self._histories[pyramid_key] = tile_index
+            if len(self._histories) > _MAX_NUM_HISTORIES:
+                self._histories.popitem(last=False)
+
+            # The client computes this tile itself
+            self._pending.pop((pyramid_key, tile_index), None)
+
+            # Schedule in reverse order of priority, as the most recently scheduled tiles are computed first
+            for candidate in reversed(_get_candidates(pyramid, tile_index, last_tile_index)):
+                if candidate == last_tile_index:
+                    # Has been requested just before
+                    continue
+                key = pyramid_key, candidate
+                self._pending.pop(key, None)
+                self._pending[key] = pyramid
+            while len(self._pending) > self._max_pending:
+                self._pending.popitem(last=False)
+
+            self._ensure_workers_started()
+            self._condition.notify_all()
+
+    @contextmanager
+    def foreground(self):
+        """
+        Get a context manager that must enclose the computation of tiles requested by clients.
+        No prefetches are started while it is entered.
+        """
+        with self._condition:
+            self._num_foreground += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._num_foreground -= 1
+                self._condition.notify_all()
+
+    def cancel(self, pyramid_key: Hashable = None) -> None:
+        """
+        Drop all scheduled tiles of the pyramid identified by *pyramid_key*, e.g. because it has been disposed.
+
+        :param pyramid_key: A key that identifies a pyramid. If not given, the tiles of all pyramids are dropped.
+        """
+        with self._condition:
+            if pyramid_key is None:
+                self._pending.clear()
+                self._histories.clear()
+                return
+            for key in [key for key in self._pending.keys() if key[0] == pyramid_key]:
+                del self._pending[key]
+            self._histories.pop(pyramid_key, None)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop prefetching. Scheduled tiles are dropped.
+
+        :param wait: Whether to wait until the tiles being prefetched have been computed.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._pending.clear()
+            self._condition.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _ensure_workers_started(self):
+        # Must be called while holding the lock
+        if len(self._threads) < self._max_workers:
+            thread = threading.Thread(target=self._run,
+                                      name='cate-prefetch-%d' % len(self._threads),
+                                      daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._shutdown and (not self._pending or self._num_foreground > 0):
+                    self._condition.wait()
+                if self._shutdown:
+                    return
+                (pyramid_key, (tile_x, tile_y, z_index)), pyramid = self._pending.popitem(last=True)
+            # noinspection PyBroadException
+            try:
+                if self._executor is not None:
+                    self._executor.submit((pyramid_key, tile_x, tile_y, z_index),
+                                          pyramid.get_tile, tile_x, tile_y, z_index).result()
+                else:
+                    pyramid.get_tile(tile_x, tile_y, z_index)
+            except Exception:
+                # The pyramid may have been disposed in the meantime
+                _LOG.debug('prefetching tile %s/%s/%s failed' % (z_index, tile_y, tile_x), exc_info=True)
+                continue
+            with self._condition:
+                self._num_prefetched += 1
+
+
+def _get_candidates(pyramid: ImagePyramid, tile_index: TileIndex, last_tile_index: TileIndex = None) \
+        -> List[TileIndex]:
+    """Get the indexes of the tiles to be prefetched after a request for *tile_index* in the order of priority."""
+    tile_x, tile_y, z_index = tile_index
+
+    # Direction of the client's movement
+    dx, dy = 0, 0
+    if last_tile_index is not None and last_tile_index[2] == z_index:
+        dx = _sign(tile_x - last_tile_index[0])
+        dy = _sign(tile_y - last_tile_index[1])
+
+    neighbours = [(tile_x + i, tile_y + j, z_index)
+                  for j in (-1, 0, 1) for i in (-1, 0, 1) if i != 0 or j != 0]
+    neighbours.sort(key=lambda index: -((index[0] - tile_x) * dx + (index[1] - tile_y) * dy))
+
+    candidates = neighbours
+    if z_index > 0:
+        candidates.append((tile_x // 2, tile_y // 2, z_index - 1))
+    if z_index < pyramid.num_levels - 1:
+        candidates.extend((2 * tile_x + i, 2 * tile_y + j, z_index + 1) for j in (0, 1) for i in (0, 1))
+
+    def is_valid(index: TileIndex) -> bool:
+        num_tiles_x, num_tiles_y = pyramid.get_level_image(index[2]).num_tiles
+        return 0 <= index[0] < num_tiles_x and 0 <= index[1] < num_tiles_y
+
+    return [candidate for candidate in candidates if is_valid(candidate)]
+
+
+def _sign(value: int) -> int:
+    return (value > 0) - (value < 0)
@@ -0,0 +1,151 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+#: A factory that returns a new image pyramid and its estimated size in bytes.
+PyramidFactory = Callable[[], Tuple[Any, int]]
+
+
+class PyramidRegistry:
+    """
+    A thread-safe registry of image pyramids with least-recently-used eviction under a memory budget.
+
+    Each pyramid is registered with an estimated size in bytes. If the sum of sizes exceeds *capacity*,
+    the least recently used pyramids are dropped from the registry. Dropped pyramids are not disposed,
+    because tiles of equally identified images remain valid in the tile caches.
+
+    Pyramids may also be registered with a *group*, e.g. the resource they have been created from.
+    All pyramids of a group are removed from the registry and disposed by :py:meth:`invalidate`.
+
+    :param capacity: The maximum sum of the estimated sizes of the registered pyramids in bytes.
+    """
+
+    def __init__(self, capacity: int):
+        self._capacity = capacity
+        self._size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def size(self) -> int:
+        """The sum of the estimated sizes of the registered pyramids in bytes."""
+        with self._lock:
+            return self._size
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get the pyramid registered for *key* and mark it as recently used.
+
+        :param key: The pyramid's key.
+        :return: The pyramid or ``None``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get_or_create(self, key: Hashable, factory: PyramidFactory, group: Hashable = None) -> Any:
+        """
+        Get the pyramid registered for *key*. If there is none, create it by calling *factory*
+        and register it. The factory is called without holding the registry's lock.
+
+        :param key: The pyramid's key.
+        :param factory: Returns a new pyramid and its estimated size in bytes.
+        :param group: An optional group the new pyramid belongs to.
+        :return: The registered pyramid.
+        """
+        pyramid = self.get(key)
+        if pyramid is not None:
+            return pyramid
+        pyramid, size = factory()
+        return self.put(key, pyramid, size, group=group)
+
+    def put(self, key: Hashable, pyramid: Any, size: int, group: Hashable = None) -> Any:
+        """
+        Register *pyramid* for *key*, unless another pyramid is already registered for *key*.
+        Least recently used pyramids are evicted if the registry's capacity is exceeded.
+        The most recently used pyramid is never evicted, even if it alone exceeds the capacity.
+
+        :param key: The pyramid's key.
+        :param pyramid: The pyramid.
+        :param size: The pyramid's estimated size in bytes.
+        :param group: An optional group the pyramid belongs to.
+        :return: The registered pyramid, which may be another one than *pyramid*.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                # Another thread may have created an equal pyramid in the meantime
+                self._entries.move_to_end(key)
+                return entry[0]
+            self._entries[key] = pyramid, size, group
+            self._size += size
+            while self._size > self._capacity and len(self._entries) > 1:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+            return pyramid
+
+    def invalidate(self, group: Hashable, base_key: str = None) -> int:
+        """
+        Remove all pyramids of the given *group* and dispose them.
+
+        :param group: The group.
+        :param base_key: If given, only pyramids whose (string) keys equal *base_key* or start with *base_key*
+               followed by a hyphen are removed, e.g. "sst" removes "sst" and "sst-jet", but neither "sst1" nor
+               "sst1-jet".
+        :return: The number of removed pyramids.
+        """
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if entry[2] == group and (base_key is None or key == base_key or key.startswith(base_key + '-'))]
+            pyramids = []
+            for key in keys:
+                pyramid, size, _ = self._entries.pop(key)
+                self._size -= size
+                pyramids.append(pyramid)
+        for pyramid in pyramids:
+            pyramid.dispose()
+        return len(pyramids)
+
+    def clear(self) -> None:
+        """Remove all pyramids without disposing them."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
@@ -51,6 +51,30 @@ def aggregate_ndarray_mean(a1, a2, a3, a4):
     return (a1 + a2 + a3 + a4) / 4.
 
 
+def aggregate_ndarray_nanmean(a1, a2, a3, a4):
+    """Mean of the non-NaN values of floating point arrays, NaN where all values are NaN."""
+    total = np.zeros(a1.shape, dtype=np.float64)
+    count = np.zeros(a1.shape, dtype=np.int8)
+    for a in (a1, a2, a3, a4):
+        valid = np.isfinite(a)
+        total += np.where(valid, a, 0.)
+        count += valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / count
+
+
+def aggregate_ndarray_mode(a1, a2, a3, a4):
+    """Most frequent value, e.g. of classification arrays. Ties are resolved in favour of the first array."""
+    counts = [sum((a == b).astype(np.int8) for b in (a1, a2, a3, a4) if b is not a) for a in (a1, a2, a3, a4)]
+    mode = np.array(a1, copy=True)
+    max_count = counts[0]
+    for a, count in zip((a2, a3, a4), counts[1:]):
+        better = count > max_count
+        mode[better] = a[better]
+        max_count = np.maximum(max_count, count)
+    return mode
+
+
 def downsample_ndarray(a, aggregator=aggregate_ndarray_mean):
     if aggregator is aggregate_ndarray_first:
         # Optimization
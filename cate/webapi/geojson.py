@@ -38,7 +38,7 @@ Type Name         | Coordinates
 
 """
 
-import heapq
+import itertools
 import json
 import logging
 from typing import Tuple, List, Callable, Union, Dict, Iterable
@@ -65,6 +65,12 @@ Feature = Dict
 
 _LOG = logging.getLogger('cate')
 
+_WGS84_CRS = dict(init='epsg:4326')
+_PROJ_CACHE = dict()
+
+# Number of features whose geometries are transformed together
+_FEATURE_BATCH_SIZE = 1000
+
 
 # noinspection PyUnusedLocal conservation_ratio
 def _transform_point(source_prj: pyproj.Proj, target_prj: pyproj.Proj,
@@ -237,6 +243,87 @@ def get_geometry_point_counter(type_name: str) -> GeometryPointCounter:
     return _GEOMETRY_POINT_COUNTERS.get(type_name)
 
 
+def _collect_coords_point(point: Point, coords: List[Point]) -> List[int]:
+    coords.append(point)
+    return [1]
+
+
+def _collect_coords_line_string(line_string: LineString, coords: List[Point]) -> List[int]:
+    coords.extend(line_string)
+    return [len(line_string)]
+
+
+def _collect_coords_polygon(polygon: Union[Polygon, MultiLineString], coords: List[Point]) -> List[int]:
+    part_lengths = []
+    for ring in polygon:
+        coords.extend(ring)
+        part_lengths.append(len(ring))
+    return part_lengths
+
+
+def _collect_coords_multi_polygon(multi_polygon: MultiPolygon, coords: List[Point]) -> List[int]:
+    part_lengths = []
+    for polygon in multi_polygon:
+        part_lengths.extend(_collect_coords_polygon(polygon, coords))
+    return part_lengths
+
+
+# Append the coordinates of a geometry to a flat list and return the lengths of its parts,
+# that is, of the point, line-strings, or rings.
+_GEOMETRY_COORDS_COLLECTORS = dict(Point=_collect_coords_point,
+                                   LineString=_collect_coords_line_string,
+                                   Polygon=_collect_coords_polygon,
+                                   MultiPoint=_collect_coords_line_string,
+                                   MultiLineString=_collect_coords_polygon,
+                                   MultiPolygon=_collect_coords_multi_polygon)
+
+
+# noinspection PyUnusedLocal
+def _build_point(point: Point, parts: List[LineString]) -> Point:
+    return parts[0][0]
+
+
+# noinspection PyUnusedLocal
+def _build_line_string(line_string: LineString, parts: List[LineString]) -> LineString:
+    return parts[0]
+
+
+# noinspection PyUnusedLocal
+def _build_polygon(polygon: Union[Polygon, MultiLineString], parts: List[LineString]) \
+        -> Union[Polygon, MultiLineString]:
+    return parts
+
+
+def _build_multi_polygon(multi_polygon: MultiPolygon, parts: List[Ring]) -> MultiPolygon:
+    new_multi_polygon = []
+    part_index = 0
+    for polygon in multi_polygon:
+        new_multi_polygon.append(parts[part_index:part_index + len(polygon)])
+        part_index += len(polygon)
+    return new_multi_polygon
+
+
+# Build the coordinates of a geometry from the transformed coordinates of its parts,
+# the original coordinates provide the nesting of the parts.
+_GEOMETRY_BUILDERS = dict(Point=_build_point,
+                          LineString=_build_line_string,
+                          Polygon=_build_polygon,
+                          MultiPoint=_build_line_string,
+                          MultiLineString=_build_polygon,
+                          MultiPolygon=_build_multi_polygon)
+
+
+def _get_coordinate_arrays(coords: List[Point]) -> Tuple[np.ndarray, np.ndarray]:
+    try:
+        xy = np.array(coords, dtype=np.float64)
+    except ValueError:
+        # Mixed 2D and 3D coordinates
+        xy = np.array([coord[0:2] for coord in coords], dtype=np.float64)
+    if xy.ndim != 2:
+        xy = xy.reshape((-1, 2))
+    return np.ascontiguousarray(xy[:, 0]), np.ascontiguousarray(xy[:, 1])
+
+
 def write_feature_collection(feature_collection: Union[fiona.Collection, Iterable[Feature]],
                              io,
                              crs=None,
@@ -259,34 +346,41 @@ def write_feature_collection(feature_collection: Union[fiona.Collection, Iterabl
 
     source_prj = target_prj = None
     if crs:
-        source_prj = pyproj.Proj(crs)
-        target_prj = pyproj.Proj(init='epsg:4326')
+        source_prj = _get_proj(crs)
+        target_prj = _get_proj(_WGS84_CRS)
 
     io.write('{"type": "FeatureCollection", "features": [\n')
     io.flush()
 
     num_features_written = 0
     feature_index = 0
-    for feature in feature_collection:
-        feature_ok = _transform_feature(feature,
-                                        max_num_display_geometry_points,
-                                        conservation_ratio,
-                                        source_prj, target_prj)
-        if feature_ok:
-            if num_features_written > 0:
-                io.write(',\n')
-                io.flush()
-            if res_id is not None:
-                feature['_resId'] = res_id
-            feature['_idx'] = feature_index
-            if 'id' not in feature:
-                feature['id'] = feature_index
-            # Note: io.write(json.dumps(feature)) is 3x faster than json.dump(feature, fp=io)
-            json_text = json.dumps(feature)
-            io.write(json_text)
-            num_features_written += 1
-
-        feature_index += 1
+    features = iter(feature_collection)
+    while True:
+        # Geometries are transformed batch-wise, so that coordinates are reprojected
+        # and simplified by a few vectorised calls while features are still streamed.
+        feature_batch = list(itertools.islice(features, _FEATURE_BATCH_SIZE))
+        if not feature_batch:
+            break
+        feature_oks = _transform_features(feature_batch,
+                                          max_num_display_geometry_points,
+                                          conservation_ratio,
+                                          source_prj, target_prj)
+        for feature, feature_ok in zip(feature_batch, feature_oks):
+            if feature_ok:
+                if num_features_written > 0:
+                    io.write(',\n')
+                if res_id is not None:
+                    feature['_resId'] = res_id
+                feature['_idx'] = feature_index
+                if 'id' not in feature:
+                    feature['id'] = feature_index
+                # Note: io.write(json.dumps(feature)) is 3x faster than json.dump(feature, fp=io)
+                json_text = json.dumps(feature)
+                io.write(json_text)
+                num_features_written += 1
+
+            feature_index += 1
+        io.flush()
 
     io.write('\n]}\n')
     io.flush()
@@ -303,8 +397,8 @@ def write_feature(feature: Feature,
                   conservation_ratio: float = 1.0):
     source_prj = target_prj = None
     if crs:
-        source_prj = pyproj.Proj(crs)
-        target_prj = pyproj.Proj(init='epsg:4326')
+        source_prj = _get_proj(crs)
+        target_prj = _get_proj(_WGS84_CRS)
 
     feature_ok = _transform_feature(feature,
                                     max_num_display_geometry_points,
@@ -322,40 +416,148 @@ def write_feature(feature: Feature,
         io.flush()
 
 
+def _get_proj(crs) -> pyproj.Proj:
+    """
+    Return a cached projection for *crs*, which may be a PROJ.4 string or a dictionary of PROJ.4 parameters.
+    """
+    key = tuple(sorted(crs.items())) if isinstance(crs, dict) else crs
+    proj = _PROJ_CACHE.get(key)
+    if proj is None:
+        proj = pyproj.Proj(crs)
+        _PROJ_CACHE[key] = proj
+    return proj
+
+
 def _transform_feature(feature: Feature,
                        max_num_display_geometry_points: int,
                        conservation_ratio: float,
                        source_prj, target_prj):
-    feature_ok = True
-    if 'geometry' in feature:
-        geometry = feature['geometry']
-        geometry_transform = get_geometry_transform(geometry['type'])
-        if geometry_transform is not None:
-            # print('transforming feature: ', feature)
-            coordinates = geometry['coordinates']
-            # noinspection PyBroadException
-            try:
-                geometry_conservation_ratio = conservation_ratio
-                if conservation_ratio > 0.0:
-                    num_geometry_points = get_geometry_point_counter(geometry['type'])(geometry)
-                    if 0 <= max_num_display_geometry_points < num_geometry_points:
-                        geometry_conservation_ratio = 0.0
-
-                coordinates = geometry_transform(source_prj, target_prj,
-                                                 geometry_conservation_ratio,
-                                                 coordinates)
-                geometry['coordinates'] = coordinates
-                if geometry_conservation_ratio == 0.0:
-                    geometry['type'] = 'Point'
-                if geometry_conservation_ratio < 1.0:
-                    # We may mask other simplifications,
-                    # for time being (simp & 0x01) != 0 means, geometry is simplified
-                    feature['_simp'] = 0x01
-            except Exception:
-                _LOG.exception('transforming feature geometry failed: %s' % geometry['type'])
-                feature_ok = False
-                pass
-    return feature_ok
+    return _transform_features([feature],
+                               max_num_display_geometry_points,
+                               conservation_ratio,
+                               source_prj, target_prj)[0]
+
+
+def _transform_features(features: List[Feature],
+                        max_num_display_geometry_points: int,
+                        conservation_ratio: float,
+                        source_prj, target_prj) -> List[bool]:
+    """
+    Transform the geometries of the given *features* in place.
+    If transforming the batch fails, the features are transformed one by one,
+    so that only the invalid ones are rejected.
+
+    :return: A list of flags that tell whether the corresponding feature has been transformed successfully.
+    """
+    # noinspection PyBroadException
+    try:
+        _transform_feature_batch(features,
+                                 max_num_display_geometry_points,
+                                 conservation_ratio,
+                                 source_prj, target_prj)
+        return [True] * len(features)
+    except Exception:
+        if len(features) > 1:
+            return [_transform_feature(feature,
+                                       max_num_display_geometry_points,
+                                       conservation_ratio,
+                                       source_prj, target_prj) for feature in features]
+        _LOG.exception('transforming feature geometry failed: %s' % features[0]['geometry']['type'])
+        return [False]
+
+
+def _transform_feature_batch(features: List[Feature],
+                             max_num_display_geometry_points: int,
+                             conservation_ratio: float,
+                             source_prj, target_prj) -> None:
+    must_reproject = source_prj is not None
+
+    # Collect the coordinates of all geometries of the batch
+    coords = []
+    jobs = []
+    for feature in features:
+        geometry = feature.get('geometry')
+        if not geometry:
+            continue
+        coords_collector = _GEOMETRY_COORDS_COLLECTORS.get(geometry['type'])
+        if coords_collector is None:
+            continue
+        geometry_conservation_ratio = conservation_ratio
+        if conservation_ratio > 0.0:
+            num_geometry_points = get_geometry_point_counter(geometry['type'])(geometry)
+            if 0 <= max_num_display_geometry_points < num_geometry_points:
+                geometry_conservation_ratio = 0.0
+        if geometry_conservation_ratio < 1.0:
+            # We may mask other simplifications,
+            # for time being (simp & 0x01) != 0 means, geometry is simplified
+            feature['_simp'] = 0x01
+        is_unchanged_point = geometry_conservation_ratio > 0.0 and geometry['type'] == 'Point'
+        if not must_reproject and (geometry_conservation_ratio == 1.0 or is_unchanged_point):
+            continue
+        start = len(coords)
+        part_lengths = coords_collector(geometry['coordinates'], coords)
+        if geometry_conservation_ratio == 0.0 and len(coords) == start:
+            raise ValueError('cannot convert empty %s into a point' % geometry['type'])
+        jobs.append((geometry, geometry_conservation_ratio, start, part_lengths))
+
+    if not jobs:
+        return
+
+    x, y = _get_coordinate_arrays(coords)
+
+    # Simplify all parts and compute the mass centers of pointified geometries in one go
+    keep = np.ones(x.size, dtype=np.bool_)
+    simplify_starts = []
+    simplify_ends = []
+    point_starts = []
+    point_ends = []
+    for geometry, geometry_conservation_ratio, start, part_lengths in jobs:
+        if geometry_conservation_ratio == 0.0:
+            end = start + sum(part_lengths)
+            point_starts.append(start)
+            point_ends.append(end)
+            keep[start:end] = False
+        elif geometry_conservation_ratio < 1.0:
+            for part_length in part_lengths:
+                simplify_starts.append(start)
+                simplify_ends.append(start + part_length)
+                start += part_length
+    simplify_parts(x, y,
+                   np.array(simplify_starts, dtype=np.int64),
+                   np.array(simplify_ends, dtype=np.int64),
+                   conservation_ratio, keep)
+    point_starts = np.array(point_starts, dtype=np.int64)
+    point_ends = np.array(point_ends, dtype=np.int64)
+    px = np.zeros(point_starts.size, dtype=np.float64)
+    py = np.zeros(point_starts.size, dtype=np.float64)
+    pointify_parts(x, y, point_starts, point_ends, px, py)
+
+    # Reproject all remaining coordinates at once
+    kept_offsets = np.zeros(x.size + 1, dtype=np.int64)
+    np.cumsum(keep, out=kept_offsets[1:])
+    x = np.concatenate((x[keep], px))
+    y = np.concatenate((y[keep], py))
+    if must_reproject:
+        x, y = pyproj.transform(source_prj, target_prj, x, y)
+    x = x.tolist()
+    y = y.tolist()
+
+    point_index = int(kept_offsets[-1])
+    for geometry, geometry_conservation_ratio, start, part_lengths in jobs:
+        if geometry_conservation_ratio == 0.0:
+            geometry['type'] = 'Point'
+            geometry['coordinates'] = x[point_index], y[point_index]
+            point_index += 1
+            continue
+        parts = []
+        part_start = start
+        for part_length in part_lengths:
+            part_end = part_start + part_length
+            new_start = int(kept_offsets[part_start])
+            new_end = int(kept_offsets[part_end])
+            parts.append(list(zip(x[new_start:new_end], y[new_start:new_end])))
+            part_start = part_end
+        geometry['coordinates'] = _GEOMETRY_BUILDERS[geometry['type']](geometry['coordinates'], parts)
 
 
 @numba.jit(nopython=True)
@@ -370,7 +572,7 @@ def pointify_geometry(x_data: np.ndarray, y_data: np.ndarray, px: np.ndarray, py
     :param px: The point's resulting x coordinate.
     :param py: The point's resulting y coordinate.
     """
-    is_ring = x_data[0] == x_data[-1] and y_data[0] == y_data[-1]
+    is_ring = x_data.size > 1 and x_data[0] == x_data[-1] and y_data[0] == y_data[-1]
     # TODO - must take care of anti-meridian in x_data if we have WGS84 coordinates
     if is_ring:
         px[0] = x_data[0:-1].mean()
@@ -395,7 +597,26 @@ def triangle_area(x_data: np.ndarray, y_data: np.ndarray, i0: int, i1: int, i2:
     return 0.5 * abs(dx1 * dy2 - dy1 * dx2)
 
 
-@numba.jit(forceobj=True)
+@numba.jit(nopython=True)
+def pointify_parts(x_data: np.ndarray, y_data: np.ndarray,
+                   starts: np.ndarray, ends: np.ndarray,
+                   px: np.ndarray, py: np.ndarray) -> None:
+    """
+    Convert multiple geometries, whose coordinates are stored in the flat arrays *x_data* and *y_data*,
+    into single points using :py:func:`pointify_geometry`.
+    The coordinates of the i-th geometry are given by the index range *starts[i]* to *ends[i]* (exclusive).
+
+    :param x_data: The x coordinates.
+    :param y_data: The y coordinates.
+    :param starts: The start indexes of the geometries.
+    :param ends: The end indexes of the geometries.
+    :param px: The points' resulting x coordinates.
+    :param py: The points' resulting y coordinates.
+    """
+    for i in range(starts.size):
+        pointify_geometry(x_data[starts[i]:ends[i]], y_data[starts[i]:ends[i]], px[i:i + 1], py[i:i + 1])
+
+
 def simplify_geometry(x_data: np.ndarray, y_data: np.ndarray, conservation_ratio: float) \
         -> Tuple[np.ndarray, np.ndarray]:
     """
@@ -409,125 +630,128 @@ def simplify_geometry(x_data: np.ndarray, y_data: np.ndarray, conservation_ratio
     :param conservation_ratio: The ratio of coordinates to be conserved, 0 <= *conservation_ratio* <= 1.
     :return: A pair comprising the simplified *x_data* and *y_data*.
     """
-    is_ring = x_data[0] == x_data[-1] and y_data[0] == y_data[-1]
-    old_point_count = int(x_data.size)
+    keep = np.ones(x_data.size, dtype=np.bool_)
+    _simplify_part(x_data, y_data, 0, x_data.size, conservation_ratio, keep)
+    if keep.all():
+        return x_data, y_data
+    return x_data[keep], y_data[keep]
+
+
+@numba.jit(nopython=True)
+def simplify_parts(x_data: np.ndarray, y_data: np.ndarray,
+                   starts: np.ndarray, ends: np.ndarray,
+                   conservation_ratio: float, keep: np.ndarray) -> None:
+    """
+    Simplify multiple rings or line-strings, whose coordinates are stored in the flat arrays *x_data* and *y_data*,
+    as described for :py:func:`simplify_geometry`.
+    The coordinates of the i-th ring or line-string are given by the index range *starts[i]* to *ends[i]*
+    (exclusive). Rather than creating new arrays, removed points are marked by setting their *keep* elements to
+    ``False``.
+
+    :param x_data: The x coordinates.
+    :param y_data: The y coordinates.
+    :param starts: The start indexes of the rings or line-strings.
+    :param ends: The end indexes of the rings or line-strings.
+    :param conservation_ratio: The ratio of coordinates to be conserved, 0 <= *conservation_ratio* <= 1.
+    :param keep: Boolean array of size *x_data.size* whose elements are initially ``True``.
+    """
+    for i in range(starts.size):
+        _simplify_part(x_data, y_data, starts[i], ends[i], conservation_ratio, keep)
+
+
+@numba.jit(nopython=True)
+def _simplify_part(x_data: np.ndarray, y_data: np.ndarray, start: int, end: int,
+                   conservation_ratio: float, keep: np.ndarray) -> None:
+    # Visvalingam's algorithm: repeatedly remove the point that forms the smallest triangle with its neighbours
+    old_point_count = end - start
+    if old_point_count < 3:
+        return
+    is_ring = x_data[start] == x_data[end - 1] and y_data[start] == y_data[end - 1]
     new_point_count = int(conservation_ratio * old_point_count + 0.5)
     min_point_count = 4 if is_ring else 2
     if new_point_count < min_point_count:
         new_point_count = min_point_count
     if old_point_count <= new_point_count:
-        return x_data, y_data
+        return
+
+    # Doubly linked list of the remaining points, indexes are relative to start
+    prev_indexes = np.arange(-1, old_point_count - 1)
+    next_indexes = np.arange(1, old_point_count + 1)
+    areas = np.zeros(old_point_count, dtype=np.float64)
+    # Min-heap of (area, index) pairs, outdated pairs are skipped when popped.
+    # Every removal pushes at most two pairs, so the heap never exceeds 3 * old_point_count pairs.
+    heap_areas = np.empty(3 * old_point_count, dtype=np.float64)
+    heap_indexes = np.empty(3 * old_point_count, dtype=np.int64)
+    heap_size = 0
+    for i in range(1, old_point_count - 1):
+        areas[i] = triangle_area(x_data, y_data, start + i, start + i - 1, start + i + 1)
+        heap_size = _heap_push(heap_areas, heap_indexes, heap_size, areas[i], i)
+
+    point_count = old_point_count
+    # Points that form triangles with NaN areas are never removed, so the heap may run empty
+    while point_count > new_point_count and heap_size > 0:
+        area = heap_areas[0]
+        i = heap_indexes[0]
+        heap_size = _heap_pop(heap_areas, heap_indexes, heap_size)
+        if not keep[start + i] or area != areas[i]:
+            continue
+        keep[start + i] = False
+        point_count -= 1
+        prev_i = prev_indexes[i]
+        next_i = next_indexes[i]
+        next_indexes[prev_i] = next_i
+        prev_indexes[next_i] = prev_i
+        if prev_i > 0:
+            areas[prev_i] = triangle_area(x_data, y_data, start + prev_i, start + prev_indexes[prev_i], start + next_i)
+            heap_size = _heap_push(heap_areas, heap_indexes, heap_size, areas[prev_i], prev_i)
+        if next_i < old_point_count - 1:
+            areas[next_i] = triangle_area(x_data, y_data, start + next_i, start + prev_i, start + next_indexes[next_i])
+            heap_size = _heap_push(heap_areas, heap_indexes, heap_size, areas[next_i], next_i)
 
-    point_heap = PointHeap(x_data, y_data)
-    while point_heap.size > new_point_count:
-        point_heap.pop()
-
-    new_x_data = np.zeros(new_point_count, dtype=x_data.dtype)
-    new_y_data = np.zeros(new_point_count, dtype=y_data.dtype)
-    point = point_heap.first_point
-    i = 0
-    while point is not None:
-        index = point[1]
-        new_x_data[i] = x_data[index]
-        new_y_data[i] = y_data[index]
-        point = point[3]
-        i += 1
-
-    return new_x_data, new_y_data
-
-
-# TODO (forman): Optimize me!
-# This is an non-optimised version of PointHeap for testing only.
-# It uses the pure Python heapq implementation of a min-heap.
-# We should ASAP replace heapq by the jit-compiled cate.webapi.minheap implementation
-# so that we can compile the PointHeap class using @numba.jitclass().
-# See http://numba.pydata.org/numba-doc/dev/user/jitclass.html
-
-# PointHeapSpec = [
-#     ('_x_data', np.float64[:]),
-#     ('_y_data', np.float64[:]),
-#     ('_point_heap', np.int64[:]),
-#     ('_size', np.int64),
-# ]
-# @numba.jitclass(PointHeapSpec)
-class PointHeap:
-    def __init__(self, x_data: np.ndarray, y_data: np.ndarray):
-        size = x_data.size
-        if size < 2:
-            raise ValueError('x_data.size must be greater than 2')
-        if size != y_data.size:
-            raise ValueError('x_data.size must be equal to y_data.size')
-        self._x_data = x_data
-        self._y_data = y_data
-        self._point_heap = []
-        self._size = size
-
-        first_point = None
-        prev_point = None
-        for i in range(size):
-            curr_point = [-1.0, i, prev_point, None]
-            if prev_point is None:
-                first_point = curr_point
-            else:
-                prev_point[3] = curr_point
-            if 0 < i < size - 1:
-                curr_point[0] = triangle_area(x_data, y_data, i, i - 1, i + 1)
-                self._push(curr_point)
-            prev_point = curr_point
-
-        # Must store _first_point, so we can later loop through connected points
-        self._first_point = first_point
-        # _counter is used to generate unique indexes, which don't occur in valid points
-        self._counter = size
-
-    @property
-    def size(self):
-        return self._size
-
-    @property
-    def first_point(self):
-        return self._first_point
-
-    def pop(self):
-        """Remove and return the smallest-area point. Raise KeyError if empty."""
-        while self._point_heap:
-            point = heapq.heappop(self._point_heap)
-            prev_point = point[2]
-            next_point = point[3]
-            has_prev_point = prev_point is not None
-            has_next_point = next_point is not None
-            if has_prev_point or has_next_point:  # Not yet removed?
-                if has_prev_point:
-                    prev_point = self._update_point(prev_point)
-                if has_next_point:
-                    next_point = self._update_point(next_point)
-                if has_prev_point and has_next_point:
-                    prev_point[3] = next_point
-                    next_point[2] = prev_point
-                self._size -= 1
-                return point
-        raise KeyError('pop from an empty priority queue')
-
-    def _push(self, point):
-        heapq.heappush(self._point_heap, point)
-
-    def _update_point(self, point):
-        prev_point = point[2]
-        next_point = point[3]
-        if prev_point is not None and next_point is not None:
-            index = point[1]
-            self._counter += 1  # Generate a unique, invalid index
-            point[1] = self._counter
-            point[2] = point[3] = None  # Mark point as removed / invalid
-            area = triangle_area(self._x_data, self._y_data, index, prev_point[1], next_point[1])
-            new_point = [area, index, prev_point, next_point]
-            if prev_point is not None:
-                prev_point[3] = new_point
-            if next_point is not None:
-                next_point[2] = new_point
-            self._push(new_point)
-            return new_point
-        return point
+
+@numba.jit(nopython=True)
+def _heap_less(keys: np.ndarray, values: np.ndarray, i: int, j: int) -> bool:
+    # Equal keys are ordered by value, which makes simplification results deterministic
+    return keys[i] < keys[j] or (keys[i] == keys[j] and values[i] < values[j])
+
+
+@numba.jit(nopython=True)
+def _heap_swap(keys: np.ndarray, values: np.ndarray, i: int, j: int) -> None:
+    keys[i], keys[j] = keys[j], keys[i]
+    values[i], values[j] = values[j], values[i]
+
+
+@numba.jit(nopython=True)
+def _heap_push(keys: np.ndarray, values: np.ndarray, size: int, key: float, value: int) -> int:
+    index = size
+    keys[index] = key
+    values[index] = value
+    while index > 0:
+        parent = (index - 1) >> 1
+        if not _heap_less(keys, values, index, parent):
+            break
+        _heap_swap(keys, values, index, parent)
+        index = parent
+    return size + 1
+
+
+@numba.jit(nopython=True)
+def _heap_pop(keys: np.ndarray, values: np.ndarray, size: int) -> int:
+    size -= 1
+    keys[0] = keys[size]
+    values[0] = values[size]
+    index = 0
+    while True:
+        smallest = 2 * index + 1
+        if smallest >= size:
+            break
+        if smallest + 1 < size and _heap_less(keys, values, smallest + 1, smallest):
+            smallest += 1
+        if not _heap_less(keys, values, smallest, index):
+            break
+        _heap_swap(keys, values, index, smallest)
+        index = smallest
+    return size
 
 
 class SeriesJSONEncoder(json.JSONEncoder):
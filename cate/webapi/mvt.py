@@ -0,0 +1,488 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+
+Functions and classes for providing feature collections as vector tiles.
+
+Vector tiles are encoded according to the Mapbox Vector Tile specification 2.1,
+see https://github.com/mapbox/vector-tile-spec. Tiles are given in the geographic (EPSG:4326) tiling scheme
+also used for the imagery of dataset variables: level zero comprises 2 x 1 tiles, tile row zero is in the north.
+
+"""
+
+import logging
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import box
+from shapely.geometry.base import BaseGeometry
+from shapely.strtree import STRtree
+
+from ..util.cache import Cache
+
+__author__ = "Norman Fomferra (Brockmann Consult GmbH)"
+
+_LOG = logging.getLogger('cate')
+
+#: The extent of vector tiles in tile coordinate units
+MVT_EXTENT = 4096
+
+#: The maximum level of vector tiles
+MAX_LEVEL = 24
+
+# Features are clipped to tiles extended by this fraction of the tile size, so that lines and outlines
+# don't end visibly at tile borders
+_CLIP_BUFFER = 1. / 64.
+
+# Features are simplified with a tolerance of this fraction of the tile size, which is half a pixel
+# if a tile is displayed with 256 x 256 pixels
+_SIMPLIFY_TOLERANCE = 1. / 512.
+
+_GEOM_TYPE_POINT = 1
+_GEOM_TYPE_LINESTRING = 2
+_GEOM_TYPE_POLYGON = 3
+
+_CMD_MOVE_TO = 1
+_CMD_LINE_TO = 2
+_CMD_CLOSE_PATH = 7
+
+Properties = Dict[str, Any]
+TileBounds = Tuple[float, float, float, float]
+
+
+class FeatureTilePyramid:
+    """
+    Provides a feature collection as vector tiles. Features are selected for a tile by a spatial index,
+    which is built once, clipped to the tile, simplified with a tolerance that depends on the tile's level,
+    and encoded as Mapbox Vector Tile. The features' indexes in the collection are used as feature IDs.
+    Features that cannot be clipped or simplified, e.g. because of invalid geometries, are skipped.
+
+    :param geometries: The features' geometries in geographic coordinates (EPSG:4326), may contain None.
+    :param properties: The features' properties, only numbers, strings, and booleans are encoded.
+    :param pyramid_id: Unique identifier of the pyramid, used for the keys of cached tiles.
+    :param layer_name: The name of the layer in the vector tiles.
+    :param tile_cache: Optional cache for encoded tiles.
+    """
+
+    def __init__(self,
+                 geometries: Sequence[Optional[BaseGeometry]],
+                 properties: Sequence[Properties],
+                 pyramid_id: str,
+                 layer_name: str = 'features',
+                 tile_cache: Cache = None):
+        if len(geometries) != len(properties):
+            raise ValueError('geometries and properties must have the same length')
+        self._indexes = [index for index, geometry in enumerate(geometries)
+                         if geometry is not None and not geometry.is_empty]
+        self._geometries = [geometries[index] for index in self._indexes]
+        self._properties = properties
+        self._tree = STRtree(self._geometries) if self._geometries else None
+        # Shapely < 2.0 returns the geometries found, not their indexes
+        self._tree_indexes = {id(geometry): i for i, geometry in enumerate(self._geometries)}
+        self._pyramid_id = pyramid_id
+        self._layer_name = layer_name
+        self._tile_cache = tile_cache
+        self._tile_ids = set()
+        self._tile_ids_lock = threading.Lock()
+
+    @classmethod
+    def from_geo_data_frame(cls, gdf: gpd.GeoDataFrame, pyramid_id: str, **kwargs) -> 'FeatureTilePyramid':
+        """
+        Create a pyramid from a geopandas GeoDataFrame. Geometries are transformed into geographic coordinates.
+
+        :param gdf: The GeoDataFrame.
+        :param pyramid_id: Unique identifier of the pyramid.
+        :param kwargs: Further arguments passed to the constructor.
+        :return: A new pyramid.
+        """
+        if gdf.crs and not _is_geographic_crs(gdf.crs):
+            gdf = gdf.to_crs(epsg=4326)
+        properties = gdf.drop(columns=gdf.geometry.name).to_dict('records')
+        return cls(list(gdf.geometry), properties, pyramid_id, **kwargs)
+
+    @property
+    def num_features(self) -> int:
+        """The number of features with geometries."""
+        return len(self._geometries)
+
+    @property
+    def size(self) -> int:
+        """The estimated number of bytes occupied by the pyramid's geometries and spatial index."""
+        num_coords = sum(_count_coords(geometry) for geometry in self._geometries)
+        return 16 * num_coords + 256 * len(self._geometries)
+
+    def get_tile(self, tile_x: int, tile_y: int, z_index: int) -> bytes:
+        """
+        Get the encoded vector tile.
+
+        :param tile_x: The tile's column index.
+        :param tile_y: The tile's row index, zero is in the north.
+        :param z_index: The tile's level.
+        :return: The tile encoded as Mapbox Vector Tile.
+        """
+        if not 0 <= z_index <= MAX_LEVEL \
+                or not 0 <= tile_x < (2 << z_index) \
+                or not 0 <= tile_y < (1 << z_index):
+            raise ValueError('invalid tile index %s/%s/%s' % (z_index, tile_y, tile_x))
+        tile_id = '%s/%d/%d/%d' % (self._pyramid_id, z_index, tile_y, tile_x)
+        cache = self._tile_cache
+        if cache:
+            tile = cache.get_value(tile_id)
+            if tile is not None:
+                return tile
+        tile = self.compute_tile(tile_x, tile_y, z_index)
+        if cache:
+            cache.put_value(tile_id, tile)
+            with self._tile_ids_lock:
+                self._tile_ids.add(tile_id)
+        return tile
+
+    def compute_tile(self, tile_x: int, tile_y: int, z_index: int) -> bytes:
+        """Compute the encoded vector tile."""
+        bounds = get_tile_bounds(tile_x, tile_y, z_index)
+        x1, y1, x2, y2 = bounds
+        tile_size = x2 - x1
+        buffer = tile_size * _CLIP_BUFFER
+        clip_x1, clip_y1, clip_x2, clip_y2 = x1 - buffer, y1 - buffer, x2 + buffer, y2 + buffer
+        clip_box = box(clip_x1, clip_y1, clip_x2, clip_y2)
+        tolerance = tile_size * _SIMPLIFY_TOLERANCE
+
+        features = []
+        for i in self._query(clip_box):
+            index = self._indexes[i]
+            # noinspection PyBroadException
+            try:
+                geometry = _clip_and_simplify(self._geometries[i], clip_box, tolerance)
+            except Exception:
+                _LOG.debug('skipping feature %s of tile %s/%s/%s' % (index, z_index, tile_y, tile_x), exc_info=True)
+                continue
+            if geometry is not None:
+                features.append((index, geometry, self._properties[index]))
+        features.sort(key=lambda feature: feature[0])
+        return encode_tile([(self._layer_name, features)], bounds)
+
+    def dispose(self) -> None:
+        """Remove the pyramid's tiles from the tile cache."""
+        cache = self._tile_cache
+        if cache:
+            with self._tile_ids_lock:
+                tile_ids = list(self._tile_ids)
+                self._tile_ids.clear()
+            for tile_id in tile_ids:
+                cache.remove_value(tile_id)
+
+    def _query(self, geometry: BaseGeometry) -> List[int]:
+        if self._tree is None:
+            return []
+        result = self._tree.query(geometry)
+        if len(result) and isinstance(result[0], BaseGeometry):
+            return [self._tree_indexes[id(g)] for g in result]
+        return [int(i) for i in result]
+
+
+def _clip_and_simplify(geometry: BaseGeometry, clip_box: BaseGeometry, tolerance: float) -> Optional[BaseGeometry]:
+    clip_x1, clip_y1, clip_x2, clip_y2 = clip_box.bounds
+    g_x1, g_y1, g_x2, g_y2 = geometry.bounds
+    if g_x1 < clip_x1 or g_y1 < clip_y1 or g_x2 > clip_x2 or g_y2 > clip_y2:
+        # noinspection PyBroadException
+        try:
+            geometry = geometry.intersection(clip_box)
+        except Exception:
+            if geometry.geom_type not in ('Polygon', 'MultiPolygon'):
+                raise
+            # Repair invalid, e.g. self-intersecting, polygons
+            geometry = geometry.buffer(0).intersection(clip_box)
+        if geometry.is_empty:
+            return None
+    if geometry.geom_type not in ('Point', 'MultiPoint'):
+        # Simplifying after clipping keeps the simplification errors at tile borders small,
+        # and preserving the topology keeps valid geometries valid
+        geometry = geometry.simplify(tolerance, preserve_topology=True)
+        if geometry.is_empty:
+            return None
+    return geometry
+
+
+def get_tile_bounds(tile_x: int, tile_y: int, z_index: int) -> TileBounds:
+    """
+    Get the geographic bounds of a tile.
+
+    :return: The tuple (lon_min, lat_min, lon_max, lat_max).
+    """
+    tile_size = 180. / (1 << z_index)
+    x1 = -180. + tile_x * tile_size
+    y2 = 90. - tile_y * tile_size
+    return x1, y2 - tile_size, x1 + tile_size, y2
+
+
+def encode_tile(layers: Sequence[Tuple[str, Sequence[Tuple[int, BaseGeometry, Properties]]]],
+                bounds: TileBounds,
+                extent: int = MVT_EXTENT) -> bytes:
+    """
+    Encode a vector tile according to the Mapbox Vector Tile specification.
+
+    :param layers: The layers given as (name, features) tuples, where features is a sequence of
+           (id, geometry, properties) tuples.
+    :param bounds: The geographic bounds of the tile, i.e. (lon_min, lat_min, lon_max, lat_max).
+    :param extent: The extent of the tile in tile coordinate units.
+    :return: The encoded tile.
+    """
+    tile = bytearray()
+    for name, features in layers:
+        _write_bytes(tile, 3, _encode_layer(name, features, bounds, extent))
+    return bytes(tile)
+
+
+def _encode_layer(name: str,
+                  features: Sequence[Tuple[int, BaseGeometry, Properties]],
+                  bounds: TileBounds,
+                  extent: int) -> bytes:
+    x1, y1, x2, y2 = bounds
+    transform = extent / (x2 - x1), x1, y2
+
+    keys = {}
+    values = {}
+    encoded_features = bytearray()
+    for feature_id, geometry, properties in features:
+        geom_type, commands = _encode_geometry(geometry, transform)
+        if not commands:
+            continue
+        tags = []
+        for key, value in properties.items():
+            value = _normalize_value(value)
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault((type(value), value), len(values)))
+        feature = bytearray()
+        _write_varint_field(feature, 1, feature_id)
+        if tags:
+            _write_packed(feature, 2, tags)
+        _write_varint_field(feature, 3, geom_type)
+        _write_packed(feature, 4, commands)
+        _write_bytes(encoded_features, 2, feature)
+
+    layer = bytearray()
+    _write_varint_field(layer, 15, 2)
+    _write_bytes(layer, 1, name.encode('utf-8'))
+    layer += encoded_features
+    for key in keys:
+        _write_bytes(layer, 3, str(key).encode('utf-8'))
+    for value_type, value in values:
+        _write_bytes(layer, 4, _encode_value(value))
+    _write_varint_field(layer, 5, extent)
+    return bytes(layer)
+
+
+def _encode_geometry(geometry: BaseGeometry, transform) -> Tuple[int, List[int]]:
+    geom_type = geometry.geom_type
+    if geom_type == 'GeometryCollection':
+        # E.g. the intersection of a polygon with a tile, if the polygon touches the tile's border:
+        # use the parts of the highest dimension
+        parts = [part for part in geometry.geoms if not part.is_empty]
+        if not parts:
+            return 0, []
+        geom_type = max((part.geom_type for part in parts), key=_get_dimension)
+        parts = [part for part in parts if _get_dimension(part.geom_type) == _get_dimension(geom_type)]
+    elif geom_type.startswith('Multi'):
+        parts = list(geometry.geoms)
+    else:
+        parts = [geometry]
+
+    commands = []
+    cursor = [0, 0]
+    dimension = _get_dimension(geom_type)
+    if dimension == 0:
+        points = np.concatenate([_to_tile_coords(part.coords, transform) for part in parts])
+        commands.append(_command(_CMD_MOVE_TO, len(points)))
+        _append_deltas(commands, points, cursor)
+        return _GEOM_TYPE_POINT, commands
+    if dimension == 1:
+        for part in parts:
+            points = _remove_repeated(_to_tile_coords(part.coords, transform))
+            if len(points) >= 2:
+                _append_line(commands, points, cursor)
+        return _GEOM_TYPE_LINESTRING, commands
+    for part in parts:
+        polygons = part.geoms if part.geom_type == 'MultiPolygon' else [part]
+        for polygon in polygons:
+            exterior = _to_tile_ring(polygon.exterior.coords, transform, 1)
+            if exterior is None:
+                continue
+            _append_ring(commands, exterior, cursor)
+            for interior in polygon.interiors:
+                interior = _to_tile_ring(interior.coords, transform, -1)
+                if interior is not None:
+                    _append_ring(commands, interior, cursor)
+    return _GEOM_TYPE_POLYGON, commands
+
+
+def _get_dimension(geom_type: str) -> int:
+    if geom_type in ('Point', 'MultiPoint'):
+        return 0
+    if geom_type in ('LineString', 'LinearRing', 'MultiLineString'):
+        return 1
+    return 2
+
+
+def _to_tile_coords(coords, transform) -> np.ndarray:
+    scale, x0, y0 = transform
+    points = np.asarray(coords, dtype=np.float64)[:, 0:2]
+    tile_coords = np.empty(points.shape, dtype=np.int64)
+    np.rint((points[:, 0] - x0) * scale, out=tile_coords[:, 0], casting='unsafe')
+    # Tile coordinates increase downwards
+    np.rint((y0 - points[:, 1]) * scale, out=tile_coords[:, 1], casting='unsafe')
+    return tile_coords
+
+
+def _remove_repeated(points: np.ndarray) -> np.ndarray:
+    if len(points) < 2:
+        return points
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = np.any(points[1:] != points[:-1], axis=1)
+    return points[keep]
+
+
+def _to_tile_ring(coords, transform, sign: int) -> Optional[np.ndarray]:
+    points = _remove_repeated(_to_tile_coords(coords, transform))
+    if len(points) > 1 and np.all(points[0] == points[-1]):
+        # The ring is closed by the ClosePath command
+        points = points[:-1]
+    if len(points) < 3:
+        return None
+    x, y = points[:, 0], points[:, 1]
+    area = np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+    if area == 0:
+        return None
+    # Exterior rings must have a positive, interior ones a negative area in tile coordinates
+    if (area > 0) != (sign > 0):
+        points = points[::-1]
+    return points
+
+
+def _command(command_id: int, count: int) -> int:
+    return (count << 3) | command_id
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _append_deltas(commands: List[int], points: np.ndarray, cursor: List[int]):
+    deltas = np.diff(points, axis=0, prepend=np.array([cursor], dtype=np.int64))
+    deltas = (deltas << 1) ^ (deltas >> 63)
+    commands.extend(deltas.ravel().tolist())
+    cursor[0], cursor[1] = int(points[-1, 0]), int(points[-1, 1])
+
+
+def _append_line(commands: List[int], points: np.ndarray, cursor: List[int]):
+    commands.append(_command(_CMD_MOVE_TO, 1))
+    _append_deltas(commands, points[0:1], cursor)
+    commands.append(_command(_CMD_LINE_TO, len(points) - 1))
+    _append_deltas(commands, points[1:], cursor)
+
+
+def _append_ring(commands: List[int], points: np.ndarray, cursor: List[int]):
+    _append_line(commands, points, cursor)
+    commands.append(_command(_CMD_CLOSE_PATH, 1))
+
+
+def _normalize_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bool) or isinstance(value, str):
+        return value
+    if isinstance(value, int):
+        return value if -(1 << 63) <= value < (1 << 64) else None
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    return None
+
+
+def _encode_value(value) -> bytes:
+    encoded_value = bytearray()
+    if isinstance(value, str):
+        _write_bytes(encoded_value, 1, value.encode('utf-8'))
+    elif isinstance(value, bool):
+        _write_varint_field(encoded_value, 7, int(value))
+    elif isinstance(value, int):
+        if value >= 0:
+            _write_varint_field(encoded_value, 5, value)
+        else:
+            _write_varint_field(encoded_value, 6, _zigzag(value))
+    else:
+        encoded_value += _encode_key(3, 1)
+        encoded_value += np.float64(value).astype('<f8').tobytes()
+    return bytes(encoded_value)
+
+
+def _count_coords(geometry: BaseGeometry) -> int:
+    if hasattr(geometry, 'geoms'):
+        return sum(_count_coords(part) for part in geometry.geoms)
+    if geometry.geom_type == 'Polygon':
+        return len(geometry.exterior.coords) + sum(len(interior.coords) for interior in geometry.interiors)
+    return len(geometry.coords)
+
+
+def _is_geographic_crs(crs) -> bool:
+    if hasattr(crs, 'to_epsg'):
+        return crs.to_epsg() == 4326
+    if isinstance(crs, dict):
+        return crs.get('init', '').lower() == 'epsg:4326' or crs.get('proj') in ('longlat', 'latlong')
+    return str(crs).lower() in ('epsg:4326', '+init=epsg:4326')
+
+
+# Minimal Protocol Buffers encoding, see https://developers.google.com/protocol-buffers/docs/encoding
+
+def _encode_varint(value: int) -> bytes:
+    encoded_value = bytearray()
+    while value > 0x7f:
+        encoded_value.append((value & 0x7f) | 0x80)
+        value >>= 7
+    encoded_value.append(value)
+    return bytes(encoded_value)
+
+
+def _encode_key(field_number: int, wire_type: int) -> bytes:
+    return _encode_varint((field_number << 3) | wire_type)
+
+
+def _write_varint_field(message: bytearray, field_number: int, value: int):
+    message += _encode_key(field_number, 0)
+    message += _encode_varint(value)
+
+
+def _write_bytes(message: bytearray, field_number: int, value: bytes):
+    message += _encode_key(field_number, 2)
+    message += _encode_varint(len(value))
+    message += value
+
+
+def _write_packed(message: bytearray, field_number: int, values: Sequence[int]):
+    packed = bytearray()
+    for value in values:
+        packed += _encode_varint(value)
+    _write_bytes(message, field_number, packed)
@@ -23,12 +23,16 @@ __author__ = "Norman Fomferra (Brockmann Consult GmbH), " \
              "Marco Zühlke (Brockmann Consult GmbH)" \
              "Helge Dzierzon (Brockmann Consult GmbH)"
 
+import asyncio
 import concurrent.futures
 import datetime
+import hashlib
 import json
+import logging
 import os
 import sys
 import tempfile
+import threading
 import time
 import zipfile
 from typing import Sequence, Any
@@ -39,10 +43,14 @@ import numpy as np
 import tornado.gen
 import tornado.web
 from tornado import escape
+from tornado.ioloop import IOLoop
 import xarray as xr
 
 from .geojson import write_feature_collection, write_feature
-from ..conf import get_config
+from .mvt import FeatureTilePyramid, MAX_LEVEL
+from ..conf import get_config, get_webapi_tile_max_workers, get_webapi_pyramid_registry_capacity, \
+    get_use_workspace_overview_cache, get_webapi_tile_format, get_webapi_memory_cache_capacity, get_webapi_max_rss, \
+    get_use_tile_prefetching
 from ..conf.defaults import \
     WORKSPACE_CACHE_DIR_NAME, \
     WEBAPI_WORKSPACE_FILE_TILE_CACHE_CAPACITY, \
@@ -51,12 +59,17 @@ from ..conf.defaults import \
     WEBAPI_USE_WORKSPACE_IMAGERY_CACHE
 from ..core.cdm import get_tiling_scheme
 from ..core.types import GeoDataFrame
+from ..core.workspace import Workspace
 from ..core.wsmanag import WorkspaceManager
-from ..util.cache import Cache, MemoryCacheStore, FileCacheStore
-from ..util.im import ImagePyramid, TransformArrayImage, ColorMappedRgbaImage
+from ..util.cache import Cache, MemoryCacheStore, FileCacheStore, MemoryBudget, set_memory_budget
+from ..util.coalesce import CoalescingExecutor
+from ..util.im import ImagePyramid, TransformArrayImage, ColorMappedRgbaImage, PyramidRegistry, TilingScheme, \
+    TileEncoder, TilePrefetcher, LC_STANDARD_NAMES, negotiate_tile_encoder
 from ..util.im.ds import NaturalEarth2Image
+from ..util.im.overview import open_overviews, write_overviews, AGGREGATION_MEAN, AGGREGATION_MODE
 from ..util.misc import cwd
 from ..util.monitor import Monitor, ConsoleMonitor
+from ..util.undefined import UNDEFINED
 from ..util.web.webapi import WebAPIRequestHandler, check_for_auto_stop
 from ..version import __version__
 
@@ -68,13 +81,35 @@ MEM_TILE_CACHE = Cache(MemoryCacheStore(),
                        capacity=WEBAPI_WORKSPACE_MEM_TILE_CACHE_CAPACITY,
                        threshold=0.75)
 
+# All in-memory caches of the process, e.g. MEM_TILE_CACHE, share this budget, if configured
+if get_webapi_memory_cache_capacity() is not None or get_webapi_max_rss() is not None:
+    set_memory_budget(MemoryBudget(capacity=get_webapi_memory_cache_capacity(), max_rss=get_webapi_max_rss()))
+
 # Note, the following "get_config()" call in the code will make sure "~/.cate/<version>" is created
 USE_WORKSPACE_IMAGERY_CACHE = get_config().get('use_workspace_imagery_cache', WEBAPI_USE_WORKSPACE_IMAGERY_CACHE)
 
+USE_WORKSPACE_OVERVIEW_CACHE = get_use_workspace_overview_cache()
+
+TILE_FORMAT = get_webapi_tile_format()
+
 TRACE_PERF = True
 
 THREAD_POOL = concurrent.futures.ThreadPoolExecutor()
 
+TILE_EXECUTOR = CoalescingExecutor(max_workers=get_webapi_tile_max_workers(), thread_name_prefix='cate-tile')
+
+PYRAMID_REGISTRY = PyramidRegistry(capacity=get_webapi_pyramid_registry_capacity())
+
+# Computes tiles likely to be requested next, while no requested tiles are computed
+TILE_PREFETCHER = TilePrefetcher(executor=TILE_EXECUTOR) if get_use_tile_prefetching() else None
+
+# Overviews are computed one after the other, so they don't compete with tiles for I/O
+OVERVIEW_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='cate-overview')
+_OVERVIEW_JOBS = set()
+_OVERVIEW_JOBS_LOCK = threading.Lock()
+
+_LOG = logging.getLogger('cate')
+
 _NUM_GEOM_SIMP_LEVELS = 8
 
 _MAX_CSV_ROW_COUNT = 10000
@@ -98,25 +133,75 @@ class NE2Handler(WebAPIRequestHandler):
 class WorkspaceResourceHandler(WebAPIRequestHandler):
 
     def get_workspace_resource(self, base_dir, res_id: str):
+        workspace, res_id, res_name = self._get_workspace_res_name(base_dir, res_id)
+        resource = workspace.get_resource(res_name)
+        return workspace, res_id, res_name, resource
+
+    async def get_workspace_resource_async(self, base_dir, res_id: str):
+        """
+        Like :py:meth:`get_workspace_resource`, but a resource that has not been restored or computed yet,
+        see ``Workspace.open(lazy=True)``, is restored or computed by THREAD_POOL, so the IOLoop stays responsive.
+        """
+        workspace, res_id, res_name = self._get_workspace_res_name(base_dir, res_id)
+        resource = workspace.resource_cache.get(res_name, UNDEFINED)
+        if resource is UNDEFINED:
+            resource = await IOLoop.current().run_in_executor(THREAD_POOL, workspace.get_resource, res_name)
+        return workspace, res_id, res_name, resource
+
+    def _get_workspace_res_name(self, base_dir, res_id: str):
         res_id = self.to_int("res_id", res_id)
         # noinspection PyUnresolvedReferences
         workspace_manager: WorkspaceManager = self.application.workspace_manager
         base_dir = workspace_manager.resolve_path(base_dir)
         workspace = workspace_manager.get_workspace(base_dir)
         res_name = workspace.resource_cache.get_key(res_id)
-        resource = workspace.resource_cache[res_name]
-        return workspace, res_id, res_name, resource
+        return workspace, res_id, res_name
 
 
-# noinspection PyAbstractClass,PyBroadException
-class ResVarTileHandler(WorkspaceResourceHandler):
-    PYRAMIDS = None
+# noinspection PyAbstractClass
+class ResTileHandler(WorkspaceResourceHandler):
+    """
+    Base class of handlers of tile requests. Tiles are computed by TILE_EXECUTOR, so the IOLoop stays responsive
+    and concurrent requests for the same tile share a single computation. Computations that have not started yet
+    are cancelled if all clients waiting for them have abandoned their requests.
+    """
+    _tile_request = None
+    _connection_closed = False
+
+    async def compute_tile(self, tile_key, fn, *args):
+        """
+        Compute a tile by calling ``fn(*args)``, unless a computation of the tile identified by *tile_key*
+        is already pending or running.
 
-    def get(self, base_dir, res_id, z, y, x):
+        :return: The tile, or None if the client has abandoned the request.
+        """
+        future = TILE_EXECUTOR.submit(tile_key, fn, *args)
+        self._tile_request = tile_key, future
         try:
-            workspace, res_id, res_name, dataset = self.get_workspace_resource(base_dir, res_id)
+            tile = await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            # The client has abandoned the request, see on_connection_close()
+            return None
+        finally:
+            self._tile_request = None
+        if self._connection_closed:
+            return None
+        return tile
+
+    def on_connection_close(self):
+        super().on_connection_close()
+        self._connection_closed = True
+        if self._tile_request is not None:
+            tile_key, future = self._tile_request
+            if TILE_EXECUTOR.release(tile_key, future) and TRACE_PERF:
+                print('PERF: --- Tile cancelled:', tile_key)
 
-            # GLOBAL_LOCK.acquire()
+
+# noinspection PyAbstractClass,PyBroadException
+class ResVarTileHandler(ResTileHandler):
+    async def get(self, base_dir, res_id, z, y, x):
+        try:
+            workspace, res_id, res_name, dataset = await self.get_workspace_resource_async(base_dir, res_id)
 
             if not isinstance(dataset, xr.Dataset):
                 self.write_status_error(message='Resource "%s" must be a Dataset' % res_name)
@@ -128,119 +213,261 @@ class ResVarTileHandler(WorkspaceResourceHandler):
             cmap_name = self.get_query_argument('cmap', default='jet')
             cmap_min = self.get_query_argument_float('min', default=float('nan'))
             cmap_max = self.get_query_argument_float('max', default=float('nan'))
+            # Clients may request a specific encoder, otherwise we choose one by the Accept header
+            encoder = negotiate_tile_encoder(self.get_query_argument('format', default=None),
+                                             self.request.headers.get('Accept'),
+                                             TILE_FORMAT)
+            if encoder is None:
+                raise _TileError('Unknown or unsupported tile format "%s"' % self.get_query_argument('format'))
+
+            # Pyramids of resources that have been changed or deleted are disposed, see _invalidate_pyramids()
+            workspace.add_resource_observer(_invalidate_pyramids)
+            # The resource's update count makes sure that tiles of previous resource values are never reused
+            res_update_count = workspace.resource_cache.get_update_count(res_name)
+
+            array_id = '%s.%s-%s-%s' % (res_name,
+                                        res_update_count,
+                                        var_name,
+                                        ','.join(map(str, var_index)))
+            image_id = '%s-%s-%s-%s-%s' % (array_id,
+                                           cmap_name,
+                                           cmap_min,
+                                           cmap_max,
+                                           encoder.id)
 
-            if ResVarTileHandler.PYRAMIDS is None:
-                ResVarTileHandler.PYRAMIDS = dict()
+            pyramid_id = '%s-%s' % (base_dir, image_id)
 
-            array_id = '%s-%s-%s' % (res_name,
-                                     var_name,
-                                     ','.join(map(str, var_index)))
-            image_id = '%s-%s-%s-%s' % (array_id,
-                                        cmap_name,
-                                        cmap_min,
-                                        cmap_max)
+            # Requests and prefetches of the same tile share a single computation
+            tile_key = pyramid_id, int(x), int(y), int(z)
+            tile = await self.compute_tile(tile_key, self._get_tile, workspace, base_dir, res_name, dataset,
+                                           var_name, var_index, cmap_name, cmap_min, cmap_max, encoder,
+                                           array_id, image_id, pyramid_id,
+                                           int(x), int(y), int(z))
+            if tile is None:
+                return
 
-            pyramid_id = '%s-%s' % (base_dir, image_id)
+            self.set_header('Content-Type', encoder.mime_type)
+            self.set_header('Vary', 'Accept')
+            self.write(tile)
+
+        except _TileError as e:
+            self.write_status_error(message=str(e))
+            self.finish()
+        except Exception:
+            self.write_status_error(exc_info=sys.exc_info())
+            self.finish()
 
-            if pyramid_id in ResVarTileHandler.PYRAMIDS:
-                pyramid = ResVarTileHandler.PYRAMIDS[pyramid_id]
+    @classmethod
+    def _get_tile(cls, workspace, base_dir, res_name, dataset, var_name, var_index, cmap_name, cmap_min, cmap_max,
+                  encoder, array_id, image_id, pyramid_id, x, y, z):
+        group = workspace.base_dir, res_name
+        pyramid = PYRAMID_REGISTRY.get_or_create(pyramid_id,
+                                                 lambda: cls._create_rgb_pyramid(workspace, base_dir, res_name,
+                                                                                 dataset, var_name, var_index,
+                                                                                 cmap_name, cmap_min, cmap_max,
+                                                                                 encoder, array_id, image_id, group),
+                                                 group=group)
+
+        if TRACE_PERF:
+            print('PERF: >>> Tile:', image_id, z, y, x)
+
+        t1 = time.perf_counter()
+        if TILE_PREFETCHER is not None:
+            with TILE_PREFETCHER.foreground():
+                tile = pyramid.get_tile(x, y, z)
+        else:
+            tile = pyramid.get_tile(x, y, z)
+        t2 = time.perf_counter()
+
+        if TRACE_PERF:
+            print('PERF: <<< Tile:', image_id, z, y, x, 'took', t2 - t1, 'seconds')
+
+        if TILE_PREFETCHER is not None:
+            if USE_WORKSPACE_IMAGERY_CACHE:
+                TILE_PREFETCHER.notify_request(pyramid_id, pyramid, x, y, z)
             else:
-                variable = dataset[var_name]
-                no_data_value = variable.attrs.get('_FillValue')
-                valid_range = variable.attrs.get('valid_range')
-                if valid_range is None:
-                    valid_min = variable.attrs.get('valid_min')
-                    valid_max = variable.attrs.get('valid_max')
-                    if valid_min is not None and valid_max is not None:
-                        valid_range = [valid_min, valid_max]
-
-                # Make sure we work with 2D image arrays only
-                if variable.ndim == 2:
-                    array = variable
-                elif variable.ndim > 2:
-                    if not var_index or len(var_index) != variable.ndim - 2:
-                        var_index = (0,) * (variable.ndim - 2)
-
-                    # noinspection PyTypeChecker
-                    var_index += (slice(None), slice(None),)
-
-                    # print('var_index =', var_index)
-                    array = variable[var_index]
-                else:
-                    self.write_status_error(message='Variable must be an N-D Dataset with N >= 2, '
-                                                    'but "%s" is only %d-D' % (var_name, variable.ndim))
-                    self.finish()
-                    return
+                # Without a cache for the RGB tiles, we prefetch the cached data tiles only
+                array_key = '%s-%s' % (base_dir, array_id)
+                array_pyramid = PYRAMID_REGISTRY.get(array_key)
+                if array_pyramid is not None:
+                    TILE_PREFETCHER.notify_request(array_key, array_pyramid, x, y, z)
+
+        return tile
+
+    @classmethod
+    def _create_rgb_pyramid(cls, workspace, base_dir, res_name, dataset, var_name, var_index,
+                            cmap_name, cmap_min, cmap_max, encoder: TileEncoder, array_id, image_id, group):
+        # Pyramids that differ only in their colour mapping share the same array pyramid
+        array_key = '%s-%s' % (base_dir, array_id)
+        array_pyramid = PYRAMID_REGISTRY.get_or_create(array_key,
+                                                       lambda: cls._create_array_pyramid(workspace, res_name,
+                                                                                         dataset, var_name,
+                                                                                         var_index, array_id,
+                                                                                         array_key, group),
+                                                       group=group)
+
+        if np.isnan(cmap_min) or np.isnan(cmap_max):
+            _, array = _get_image_array(dataset, var_name, var_index)
+            cmap_min = np.nanmin(array.values) if np.isnan(cmap_min) else cmap_min
+            cmap_max = np.nanmax(array.values) if np.isnan(cmap_max) else cmap_max
+        # print('cmap_min =', cmap_min)
+        # print('cmap_max =', cmap_max)
+
+        if USE_WORKSPACE_IMAGERY_CACHE:
+            rgb_tile_cache_dir = os.path.join(base_dir, WORKSPACE_CACHE_DIR_NAME, 'v%s' % __version__, 'tiles')
+            rgb_tile_cache = Cache(FileCacheStore(rgb_tile_cache_dir, encoder.ext),
+                                   capacity=WEBAPI_WORKSPACE_FILE_TILE_CACHE_CAPACITY,
+                                   threshold=0.75)
+        else:
+            rgb_tile_cache = None
+
+        pyramid = array_pyramid.apply(lambda image, level:
+                                      ColorMappedRgbaImage(image,
+                                                           image_id='rgb-%s/%d' % (image_id, level),
+                                                           value_range=(cmap_min, cmap_max),
+                                                           cmap_name=cmap_name,
+                                                           encode=True,
+                                                           encoder=encoder,
+                                                           tile_cache=rgb_tile_cache))
+        if TRACE_PERF:
+            print('Created pyramid "%s-%s":' % (base_dir, image_id))
+            print('  tile_size:', pyramid.tile_size)
+            print('  num_level_zero_tiles:', pyramid.num_level_zero_tiles)
+            print('  num_levels:', pyramid.num_levels)
+
+        # The colour mapping holds no data of its own, so we account for one RGBA tile per level
+        return pyramid, _get_min_pyramid_size(pyramid.tiling_scheme, 4)
+
+    @classmethod
+    def _create_array_pyramid(cls, workspace, res_name, dataset, var_name, var_index, array_id, array_key, group):
+        variable, array = _get_image_array(dataset, var_name, var_index)
+        no_data_value = variable.attrs.get('_FillValue')
+        valid_range = variable.attrs.get('valid_range')
+        if valid_range is None:
+            valid_min = variable.attrs.get('valid_min')
+            valid_max = variable.attrs.get('valid_max')
+            if valid_min is not None and valid_max is not None:
+                valid_range = [valid_min, valid_max]
+
+        def array_image_id_factory(level):
+            return 'arr-%s/%s' % (array_id, level)
+
+        tiling_scheme = get_tiling_scheme(variable)
+        if tiling_scheme is None:
+            raise _TileError('Internal error: failed to compute tiling scheme for array_id="%s"' % array_id)
+
+        overviews = None
+        if USE_WORKSPACE_OVERVIEW_CACHE and tiling_scheme.num_levels > 1:
+            overview_path = _get_overview_path(workspace, res_name, var_name, var_index, array)
+            overviews = open_overviews(overview_path, shape=array.shape)
+            if overviews is None:
+                _submit_overview_job(overview_path, array, tiling_scheme.num_levels - 1,
+                                     _get_overview_aggregation(variable), no_data_value, valid_range,
+                                     group, array_key)
+
+        # print('tiling_scheme =', repr(tiling_scheme))
+        pyramid = ImagePyramid.create_from_array(array, tiling_scheme,
+                                                 level_image_id_factory=array_image_id_factory,
+                                                 overviews=overviews)
+        pyramid = pyramid.apply(lambda image, level:
+                                TransformArrayImage(image,
+                                                    image_id='tra-%s/%d' % (array_id, level),
+                                                    flip_y=tiling_scheme.geo_extent.inv_y,
+                                                    force_masked=True,
+                                                    no_data_value=no_data_value,
+                                                    valid_range=valid_range,
+                                                    quantize=True,
+                                                    tile_cache=MEM_TILE_CACHE))
+
+        # Only in-memory arrays occupy memory, lazily loaded ones are read tile by tile
+        size = _get_min_pyramid_size(tiling_scheme, array.dtype.itemsize)
+        if isinstance(array.data, np.ndarray):
+            size += array.nbytes
+        return pyramid, size
+
+
+def _get_image_array(dataset: xr.Dataset, var_name: str, var_index: tuple):
+    variable = dataset[var_name]
+
+    # Make sure we work with 2D image arrays only
+    if variable.ndim == 2:
+        array = variable
+    elif variable.ndim > 2:
+        if not var_index or len(var_index) != variable.ndim - 2:
+            var_index = (0,) * (variable.ndim - 2)
+
+        # noinspection PyTypeChecker
+        var_index += (slice(None), slice(None),)
+
+        # print('var_index =', var_index)
+        array = variable[var_index]
+    else:
+        raise _TileError('Variable must be an N-D Dataset with N >= 2, '
+                         'but "%s" is only %d-D' % (var_name, variable.ndim))
 
-                cmap_min = np.nanmin(array.values) if np.isnan(cmap_min) else cmap_min
-                cmap_max = np.nanmax(array.values) if np.isnan(cmap_max) else cmap_max
-                # print('cmap_min =', cmap_min)
-                # print('cmap_max =', cmap_max)
-
-                if USE_WORKSPACE_IMAGERY_CACHE:
-                    mem_tile_cache = MEM_TILE_CACHE
-                    rgb_tile_cache_dir = os.path.join(base_dir, WORKSPACE_CACHE_DIR_NAME, 'v%s' % __version__, 'tiles')
-                    rgb_tile_cache = Cache(FileCacheStore(rgb_tile_cache_dir, ".png"),
-                                           capacity=WEBAPI_WORKSPACE_FILE_TILE_CACHE_CAPACITY,
-                                           threshold=0.75)
-                else:
-                    mem_tile_cache = MEM_TILE_CACHE
-                    rgb_tile_cache = None
-
-                def array_image_id_factory(level):
-                    return 'arr-%s/%s' % (array_id, level)
-
-                tiling_scheme = get_tiling_scheme(variable)
-                if tiling_scheme is None:
-                    self.write_status_error(
-                        message='Internal error: failed to compute tiling scheme for array_id="%s"' % array_id)
-                    self.finish()
-                    return
+    return variable, array
 
-                # print('tiling_scheme =', repr(tiling_scheme))
-                pyramid = ImagePyramid.create_from_array(array, tiling_scheme,
-                                                         level_image_id_factory=array_image_id_factory)
-                pyramid = pyramid.apply(lambda image, level:
-                                        TransformArrayImage(image,
-                                                            image_id='tra-%s/%d' % (array_id, level),
-                                                            flip_y=tiling_scheme.geo_extent.inv_y,
-                                                            force_masked=True,
-                                                            no_data_value=no_data_value,
-                                                            valid_range=valid_range,
-                                                            tile_cache=mem_tile_cache))
-                pyramid = pyramid.apply(lambda image, level:
-                                        ColorMappedRgbaImage(image,
-                                                             image_id='rgb-%s/%d' % (image_id, level),
-                                                             value_range=(cmap_min, cmap_max),
-                                                             cmap_name=cmap_name,
-                                                             encode=True,
-                                                             format='PNG',
-                                                             tile_cache=rgb_tile_cache))
-                ResVarTileHandler.PYRAMIDS[pyramid_id] = pyramid
-                if TRACE_PERF:
-                    print('Created pyramid "%s":' % pyramid_id)
-                    print('  tile_size:', pyramid.tile_size)
-                    print('  num_level_zero_tiles:', pyramid.num_level_zero_tiles)
-                    print('  num_levels:', pyramid.num_levels)
 
-            if TRACE_PERF:
-                print('PERF: >>> Tile:', image_id, z, y, x)
+def _get_min_pyramid_size(tiling_scheme: TilingScheme, item_size: int) -> int:
+    return tiling_scheme.tile_width * tiling_scheme.tile_height * item_size * tiling_scheme.num_levels
 
-            t1 = time.perf_counter()
-            tile = pyramid.get_tile(int(x), int(y), int(z))
-            t2 = time.perf_counter()
 
-            self.set_header('Content-Type', 'image/png')
-            self.write(tile)
+def _get_overview_path(workspace: Workspace, res_name: str, var_name: str, var_index: tuple,
+                       array: xr.DataArray) -> str:
+    # Overviews are identified by the workflow steps that compute the resource, so they are reused
+    # after the workspace has been reopened
+    workflow = workspace.workflow
+    res_step = workflow.find_node(res_name)
+    steps = [step.to_json_dict() for step in workflow.steps if step is res_step or res_step.requires(step)]
+    key = json.dumps([steps, var_name, list(var_index), list(array.shape), str(array.dtype)],
+                     sort_keys=True, default=str)
+    return os.path.join(workspace.base_dir, WORKSPACE_CACHE_DIR_NAME, 'v%s' % __version__, 'overviews',
+                        hashlib.sha1(key.encode('utf-8')).hexdigest() + '.zarr')
 
-            if TRACE_PERF:
-                print('PERF: <<< Tile:', image_id, z, y, x, 'took', t2 - t1, 'seconds')
 
-            # GLOBAL_LOCK.release()
+def _get_overview_aggregation(variable: xr.DataArray) -> str:
+    if np.issubdtype(variable.dtype, np.integer) \
+            and ('flag_values' in variable.attrs or variable.attrs.get('standard_name') in LC_STANDARD_NAMES):
+        return AGGREGATION_MODE
+    return AGGREGATION_MEAN
+
 
+def _submit_overview_job(overview_path: str, array: xr.DataArray, num_overviews: int, aggregation: str,
+                         no_data_value, valid_range, group, array_key: str):
+    with _OVERVIEW_JOBS_LOCK:
+        if overview_path in _OVERVIEW_JOBS:
+            return
+        _OVERVIEW_JOBS.add(overview_path)
+
+    def write_overviews_and_invalidate_pyramids():
+        try:
+            t1 = time.perf_counter()
+            write_overviews(array, overview_path, num_overviews,
+                            aggregation=aggregation, no_data_value=no_data_value, valid_range=valid_range)
+            if TRACE_PERF:
+                print('PERF: --- Overviews "%s" took %s seconds' % (overview_path, time.perf_counter() - t1))
+            # Pyramids created in the meantime read the full resolution array, so they are replaced
+            PYRAMID_REGISTRY.invalidate(group, base_key=array_key)
         except Exception:
-            self.write_status_error(exc_info=sys.exc_info())
-            self.finish()
+            _LOG.exception('computing overviews failed')
+        finally:
+            with _OVERVIEW_JOBS_LOCK:
+                _OVERVIEW_JOBS.discard(overview_path)
+
+    OVERVIEW_EXECUTOR.submit(write_overviews_and_invalidate_pyramids)
+
+
+def _invalidate_pyramids(workspace: Workspace, res_name: str):
+    num_pyramids = PYRAMID_REGISTRY.invalidate((workspace.base_dir, res_name))
+    if num_pyramids and TILE_PREFETCHER is not None:
+        # Don't prefetch tiles of disposed pyramids
+        TILE_PREFETCHER.cancel()
+    if num_pyramids and TRACE_PERF:
+        print('PERF: --- Disposed %d pyramid(s) of resource "%s"' % (num_pyramids, res_name))
+
+
+class _TileError(Exception):
+    """Raised if a tile cannot be computed for a given request."""
 
 
 # noinspection PyAbstractClass,PyBroadException
@@ -315,7 +542,7 @@ class ResFeatureCollectionHandler(WorkspaceResourceHandler):
     @tornado.gen.coroutine
     def get(self, base_dir, res_id):
         try:
-            _, res_id, res_name, resource = self.get_workspace_resource(base_dir, res_id)
+            _, res_id, res_name, resource = yield self.get_workspace_resource_async(base_dir, res_id)
             level = self.get_query_argument_int('level', default=_NUM_GEOM_SIMP_LEVELS)
 
             if isinstance(resource, fiona.Collection):
@@ -361,13 +588,75 @@ class ResFeatureCollectionHandler(WorkspaceResourceHandler):
             self.finish()
 
 
+# noinspection PyAbstractClass,PyBroadException
+class ResFeatureTileHandler(ResTileHandler):
+    async def get(self, base_dir, res_id, z, y, x):
+        try:
+            workspace, res_id, res_name, resource = await self.get_workspace_resource_async(base_dir, res_id)
+
+            if not isinstance(resource, (fiona.Collection, GeoDataFrame, gpd.GeoDataFrame)):
+                self.write_status_error(message='Resource "%s" is not a GeoDataFrame' % res_name)
+                self.finish()
+                return
+
+            x, y, z = self.to_int('x', x), self.to_int('y', y), self.to_int('z', z)
+            if not 0 <= z <= MAX_LEVEL or not 0 <= x < (2 << z) or not 0 <= y < (1 << z):
+                raise _TileError('Invalid tile index %s/%s/%s' % (z, y, x))
+
+            # Pyramids of resources that have been changed or deleted are disposed, see _invalidate_pyramids()
+            workspace.add_resource_observer(_invalidate_pyramids)
+            res_update_count = workspace.resource_cache.get_update_count(res_name)
+            pyramid_id = 'mvt-%s-%s.%s' % (base_dir, res_name, res_update_count)
+
+            tile = await self.compute_tile((pyramid_id, x, y, z), self._get_tile, workspace, res_name, resource,
+                                           pyramid_id, x, y, z)
+            if tile is None:
+                return
+
+            self.set_header('Content-Type', 'application/vnd.mapbox-vector-tile')
+            self.write(tile)
+
+        except _TileError as e:
+            self.write_status_error(message=str(e))
+            self.finish()
+        except Exception:
+            self.write_status_error(exc_info=sys.exc_info())
+            self.finish()
+
+    @classmethod
+    def _get_tile(cls, workspace, res_name, resource, pyramid_id, x, y, z):
+        group = workspace.base_dir, res_name
+        pyramid = PYRAMID_REGISTRY.get_or_create(pyramid_id,
+                                                 lambda: cls._create_pyramid(res_name, resource, pyramid_id),
+                                                 group=group)
+        return pyramid.get_tile(x, y, z)
+
+    @classmethod
+    def _create_pyramid(cls, res_name, resource, pyramid_id):
+        if isinstance(resource, GeoDataFrame):
+            gdf = resource.lazy_data_frame
+        elif isinstance(resource, fiona.Collection):
+            gdf = gpd.GeoDataFrame.from_features(resource, crs=resource.crs)
+        else:
+            gdf = resource
+        t1 = time.perf_counter()
+        # The spatial index is built once per resource value
+        pyramid = FeatureTilePyramid.from_geo_data_frame(gdf, pyramid_id,
+                                                         layer_name=res_name,
+                                                         tile_cache=MEM_TILE_CACHE)
+        if TRACE_PERF:
+            print('PERF: Created feature tile pyramid "%s" with %d features, took %s seconds'
+                  % (pyramid_id, pyramid.num_features, time.perf_counter() - t1))
+        return pyramid, pyramid.size
+
+
 # noinspection PyAbstractClass,PyBroadException
 class ResFeatureHandler(WorkspaceResourceHandler):
     # see http://stackoverflow.com/questions/20018684/tornado-streaming-http-response-as-asynchttpclient-receives-chunks
     @tornado.gen.coroutine
     def get(self, base_dir, res_id, feature_index):
         try:
-            _, res_id, res_name, resource = self.get_workspace_resource(base_dir, res_id)
+            _, res_id, res_name, resource = yield self.get_workspace_resource_async(base_dir, res_id)
             feature_index = self.to_int('feature_index', feature_index)
             level = self.get_query_argument_int('level', default=_NUM_GEOM_SIMP_LEVELS)
 
@@ -360,7 +360,10 @@ class WebSocketService:
         base_dir = self._resolve_workspace_dir(base_dir)
         with cwd(base_dir):
             from cate.ops.subset import extract_point
-            ds = self.workspace_manager.get_workspace(base_dir).resource_cache.get(source)
+            workspace = self.workspace_manager.get_workspace(base_dir)
+            if source not in workspace.resource_cache:
+                return {}
+            ds = workspace.get_resource(source)
             if ds is None:
                 return {}
             return extract_point(ds, point, indexers)
@@ -385,7 +388,7 @@ class WebSocketService:
         if res_name not in workspace.resource_cache:
             raise ValueError('Unknown resource "%s"' % res_name)
 
-        dataset = workspace.resource_cache[res_name]
+        dataset = workspace.get_resource(res_name)
         if not isinstance(dataset, xr.Dataset):
             raise ValueError('Resource "%s" must be a Dataset' % res_name)
 
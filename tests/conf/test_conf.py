@@ -87,6 +87,21 @@ class ConfTest(unittest.TestCase):
             self.assertEqual(1, len(cm.output))
             self.assertEqual("WARNING:cate:invalid configuration: http_proxy = 'invalid_proxy_url'", cm.output[0])
 
+    def test_get_workflow_max_workers(self):
+        try:
+            conf.set_config({'workflow_max_workers': 4})
+            self.assertEqual(4, conf.get_workflow_max_workers())
+
+            conf.set_config({'workflow_max_workers': 0})
+            self.assertEqual(1, conf.get_workflow_max_workers())
+
+            with self.assertLogs('cate', level='INFO') as cm:
+                conf.set_config({'workflow_max_workers': 'many'})
+                self.assertEqual(1, conf.get_workflow_max_workers())
+                self.assertEqual(["WARNING:cate:invalid configuration: workflow_max_workers = 'many'"], cm.output)
+        finally:
+            conf.set_config({'workflow_max_workers': 1})
+
     def test_read_python_config_file(self):
         config = conf._read_python_config(io.StringIO("import os.path\n"
                                                       "root_dir = os.path.join('user', 'home', 'norman')"))
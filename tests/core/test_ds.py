@@ -362,6 +362,52 @@ class ChunkUtilsTest(unittest.TestCase):
         self.assertIsNotNone(chunk_sizes)
         self.assertEqual(chunk_sizes, dict(time=12, lat=5, lon=10))
 
+    def test_open_xarray_dataset_using_file_index(self):
+        import shutil
+        import tempfile
+        from unittest import mock
+        import pandas as pd
+        from cate.conf import conf
+        from cate.conf.defaults import DATASET_FILE_INDEX_FILE, DATASET_OPEN_PARALLEL_MIN_FILES
+        from cate.core import ds as ds_module
+
+        temp_dir = tempfile.mkdtemp()
+        index_file = os.path.join(temp_dir, 'dataset-file-index.json')
+        for day in range(1, 5):
+            xr.Dataset(dict(sst=(('time', 'lat', 'lon'), np.full((1, 4, 8), day, dtype=np.float32)),
+                            sst_error=(('time', 'lat', 'lon'), np.zeros((1, 4, 8), dtype=np.float32))),
+                       coords=dict(time=pd.to_datetime(['2010-01-0%d' % day]),
+                                   lat=np.linspace(-67.5, 67.5, 4),
+                                   lon=np.linspace(-157.5, 157.5, 8))) \
+                .to_netcdf(os.path.join(temp_dir, '2010010%d-sst.nc' % day))
+        path = os.path.join(temp_dir, '*.nc')
+
+        conf.set_config({'dataset_file_index_file': index_file, 'dataset_open_parallel_min_files': 2})
+        try:
+            with mock.patch.object(ds_module, 'normalize_missing_time', wraps=ds_module.normalize_missing_time) as m:
+                monitor = RecordingMonitor()
+                # Files are opened in parallel without changing dask's global configuration
+                with mock.patch('dask.config.set', side_effect=AssertionError('dask config changed')):
+                    ds1 = open_xarray_dataset(path, monitor=monitor)
+                self.assertEqual(4, m.call_count)
+                self.assertEqual(('start', 'Opening dataset', 4), monitor.records[0])
+                self.assertEqual(6, len(monitor.records))
+                self.assertTrue(os.path.isfile(index_file))
+
+                # Files are known to be normalized already
+                m.reset_mock()
+                ds2 = open_xarray_dataset(path)
+                self.assertEqual(0, m.call_count)
+                xr.testing.assert_identical(ds1, ds2)
+
+                ds3 = open_xarray_dataset(path, var_names=['sst'])
+                self.assertEqual(['sst'], list(ds3.data_vars))
+                self.assertEqual([1., 2., 3., 4.], list(ds3.sst.mean(dim=('lat', 'lon')).values))
+        finally:
+            conf.set_config({'dataset_file_index_file': DATASET_FILE_INDEX_FILE,
+                             'dataset_open_parallel_min_files': DATASET_OPEN_PARALLEL_MIN_FILES})
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
     def test_open_xarray(self):
         wrong_path = os.path.join(_TEST_DATA_PATH, 'small', '*.nck')
         wrong_url = 'httpz://www.acme.com'
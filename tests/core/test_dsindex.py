@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from cate.core.dsindex import DatasetFileIndex
+
+
+class DatasetFileIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.temp_dir, 'index', 'dataset-file-index.json')
+        self.data_file = os.path.join(self.temp_dir, 'data.nc')
+        xr.Dataset(dict(sst=(('time', 'lat', 'lon'), np.zeros((1, 4, 8)))),
+                   coords=dict(time=pd.to_datetime(['2010-01-01']),
+                               lat=np.linspace(-67.5, 67.5, 4),
+                               lon=np.linspace(-157.5, 157.5, 8))).to_netcdf(self.data_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_put_save_and_get_entry(self):
+        index = DatasetFileIndex(self.index_file)
+        self.assertIsNone(index.get_entry(self.data_file))
+
+        with xr.open_dataset(self.data_file) as ds:
+            index.put_entry(self.data_file, ds, ds)
+        index.save()
+        self.assertTrue(os.path.isfile(self.index_file))
+
+        entry = DatasetFileIndex(self.index_file).get_entry(self.data_file)
+        self.assertIsNotNone(entry)
+        self.assertEqual(True, entry['normalized'])
+        self.assertEqual(['sst'], entry['variables'])
+        self.assertEqual(dict(dims=['lat'], shape=[4]), entry['coords']['lat'])
+        self.assertEqual(['2010-01-01T00:00:00', '2010-01-01T00:00:00'], entry['time_coverage'])
+
+    def test_save_only_if_modified(self):
+        index = DatasetFileIndex(self.index_file)
+        with xr.open_dataset(self.data_file) as ds:
+            index.put_entry(self.data_file, ds, ds)
+        index.save()
+        os.utime(self.index_file, ns=(0, 0))
+
+        index = DatasetFileIndex(self.index_file)
+        with xr.open_dataset(self.data_file) as ds:
+            index.put_entry(self.data_file, ds, ds)
+        index.save()
+        self.assertEqual(0, os.stat(self.index_file).st_mtime_ns)
+
+        with xr.open_dataset(self.data_file) as ds:
+            index.put_entry(self.data_file, ds, ds.copy())
+        index.save()
+        self.assertNotEqual(0, os.stat(self.index_file).st_mtime_ns)
+        self.assertEqual(False, DatasetFileIndex(self.index_file).get_entry(self.data_file)['normalized'])
+
+    def test_entry_is_invalidated_if_file_changes(self):
+        index = DatasetFileIndex(self.index_file)
+        with xr.open_dataset(self.data_file) as ds:
+            index.put_entry(self.data_file, ds, ds.copy())
+        self.assertEqual(False, index.get_entry(self.data_file)['normalized'])
+
+        with open(self.data_file, 'ab') as fp:
+            fp.write(b'\0')
+        self.assertIsNone(index.get_entry(self.data_file))
+
+    def test_urls_are_not_indexed(self):
+        index = DatasetFileIndex(self.index_file)
+        with xr.open_dataset(self.data_file) as ds:
+            index.put_entry('https://acme.com/data.nc', ds, ds)
+        self.assertIsNone(index.get_entry('https://acme.com/data.nc'))
+        index.save()
+        self.assertFalse(os.path.exists(self.index_file))
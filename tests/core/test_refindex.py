@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from cate.core import refindex
+from cate.core.refindex import ReferenceIndex, get_file_references, combine_file_references
+
+
+def _write_daily_files(dir_path, num_days=4, **to_netcdf_kwargs):
+    paths = []
+    for day in range(1, num_days + 1):
+        time_bnds = np.array([['2010-01-%02d' % day, '2010-01-%02dT12:00' % day]], dtype='datetime64[ns]')
+        ds = xr.Dataset(dict(sst=(('time', 'lat', 'lon'), np.full((1, 4, 8), day, dtype=np.float32)),
+                             crs=((), np.int32(0)),
+                             time_bnds=(('time', 'bnds'), time_bnds)),
+                        coords=dict(time=pd.to_datetime(['2010-01-%02dT06:00' % day]),
+                                    lat=np.linspace(-67.5, 67.5, 4),
+                                    lon=np.linspace(-157.5, 157.5, 8)),
+                        attrs=dict(title='SST'))
+        ds.time.attrs['bounds'] = 'time_bnds'
+        ds.sst.attrs['units'] = 'kelvin'
+        ds.sst.encoding.update(zlib=True, shuffle=True, chunksizes=(1, 2, 4), _FillValue=np.nan)
+        path = os.path.join(dir_path, '201001%02d-sst.nc' % day)
+        ds.to_netcdf(path, **to_netcdf_kwargs)
+        paths.append(path)
+    return paths
+
+
+class ReferenceIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.temp_dir, 'sst.refs')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_open_dataset(self):
+        paths = _write_daily_files(self.temp_dir)
+        index = ReferenceIndex(self.index_file)
+        index.update(paths)
+        index.save()
+        self.assertTrue(os.path.isfile(self.index_file))
+
+        ds = ReferenceIndex(self.index_file).open_dataset(paths)
+        self.assertIsNotNone(ds)
+        expected_ds = xr.open_mfdataset(paths, combine='by_coords')
+        xr.testing.assert_equal(expected_ds.drop_vars('crs'), ds.drop_vars('crs'))
+        self.assertEqual(((1, 1, 1, 1), (2, 2), (4, 4)), ds.sst.chunks)
+        self.assertEqual(dict(units='kelvin'), ds.sst.attrs)
+        self.assertEqual('SST', ds.attrs['title'])
+
+        # Subsets of files are combined as well
+        ds = ReferenceIndex(self.index_file).open_dataset(paths[1:3])
+        self.assertEqual([2., 3.], list(ds.sst.mean(dim=('lat', 'lon')).values))
+
+    def test_open_dataset_with_unlimited_time(self):
+        # Like typical daily CCI files: the unlimited "time" is chunked by 512 while each file holds one time
+        time_encoding = dict(units='seconds since 1981-01-01', calendar='standard')
+        paths = _write_daily_files(self.temp_dir, unlimited_dims=['time'],
+                                   encoding=dict(time=dict(time_encoding, chunksizes=(512,)),
+                                                 time_bnds=dict(time_encoding, chunksizes=(512, 2))))
+        file_refs = get_file_references(paths[0])
+        self.assertEqual([512], json.loads(file_refs['refs']['time/.zarray'])['chunks'])
+
+        index = ReferenceIndex(self.index_file)
+        index.update(paths)
+        ds = index.open_dataset(paths)
+        self.assertIsNotNone(ds)
+        expected_ds = xr.open_mfdataset(paths, combine='by_coords')
+        xr.testing.assert_equal(expected_ds.drop_vars('crs'), ds.drop_vars('crs'))
+        self.assertEqual(pd.to_datetime(['2010-01-%02dT06:00' % day for day in range(1, 5)]).tolist(),
+                         pd.to_datetime(ds.time.values).tolist())
+
+    def test_update_is_incremental(self):
+        paths = _write_daily_files(self.temp_dir)
+        index = ReferenceIndex(self.index_file)
+        with mock.patch.object(refindex, 'get_file_references', wraps=get_file_references) as m:
+            index.update(paths[0:2])
+            self.assertEqual(2, m.call_count)
+            index.update(paths)
+            self.assertEqual(4, m.call_count)
+
+            index.save()
+            os.utime(self.index_file, ns=(0, 0))
+            index = ReferenceIndex(self.index_file)
+            index.update(paths)
+            index.save()
+            self.assertEqual(4, m.call_count)
+            # Not rewritten, as no entry has changed
+            self.assertEqual(0, os.stat(self.index_file).st_mtime_ns)
+
+            with open(paths[0], 'ab') as fp:
+                fp.write(b'\0')
+            index.update(paths)
+            self.assertEqual(5, m.call_count)
+
+    def test_files_that_cannot_be_referenced(self):
+        paths = _write_daily_files(self.temp_dir, format='NETCDF3_64BIT')
+        index = ReferenceIndex(self.index_file)
+        index.update(paths)
+        self.assertIsNone(index.open_dataset(paths))
+        # Files are not indexed
+        self.assertIsNone(index.open_dataset([os.path.join(self.temp_dir, 'missing.nc')]))
+
+    def test_combine_file_references_fails(self):
+        paths = _write_daily_files(self.temp_dir, num_days=2)
+        file_refs_list = [get_file_references(path) for path in paths]
+        with self.assertRaises(ValueError) as cm:
+            combine_file_references(file_refs_list, concat_dim='depth')
+        self.assertEqual('dimension "depth" not found', str(cm.exception))
+
+        zattrs = json.loads(file_refs_list[1]['refs']['sst/.zattrs'])
+        zattrs['units'] = 'celsius'
+        file_refs_list[1]['refs']['sst/.zattrs'] = json.dumps(zattrs)
+        with self.assertRaises(ValueError) as cm:
+            combine_file_references(file_refs_list)
+        self.assertEqual('attributes of variable "sst" differ', str(cm.exception))
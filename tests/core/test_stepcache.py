@@ -0,0 +1,199 @@
+import gc
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from cate.conf import conf
+from cate.core.ds import DATA_STORE_REGISTRY
+from cate.core.op import op
+from cate.core.stepcache import StepCache
+from cate.core.workspace import Workspace, mk_op_kwargs
+from cate.ds.local import LocalDataStore
+from cate.ops.aggregate import temporal_aggregation
+from cate.ops.io import open_dataset, read_netcdf
+from cate.util.misc import object_to_qualified_name
+
+_CALL_COUNT = 0
+
+
+@op(version='1.0')
+def make_test_dataset(size: int) -> xr.Dataset:
+    global _CALL_COUNT
+    _CALL_COUNT += 1
+    return _new_dataset(size)
+
+
+def _new_dataset(size: int) -> xr.Dataset:
+    return xr.Dataset(dict(x=xr.DataArray(np.arange(size, dtype=np.float64), dims=['i'])))
+
+
+class StepCacheTest(TestCase):
+    def setUp(self):
+        self._cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+
+    def test_put_and_get_value(self):
+        cache = StepCache(self._cache_dir, capacity=1024 * 1024)
+        self.assertIsNone(cache.get_value('abc'))
+
+        cache.put_value('abc', _new_dataset(10))
+        self.assertTrue(os.path.isfile(os.path.join(self._cache_dir, 'abc.nc')))
+        self.assertGreater(cache.size, 0)
+        value = cache.get_value('abc')
+        self.assertIsInstance(value, xr.Dataset)
+        np.testing.assert_equal(value.x.values, np.arange(10))
+        value.close()
+
+        # Other values than datasets are not cached
+        cache.put_value('def', 'Hallo')
+        self.assertIsNone(cache.get_value('def'))
+
+    def test_values_are_persistent(self):
+        cache = StepCache(self._cache_dir, capacity=1024 * 1024)
+        cache.put_value('abc', _new_dataset(10))
+        size = cache.size
+
+        cache = StepCache(self._cache_dir, capacity=1024 * 1024)
+        self.assertEqual(cache.size, size)
+        value = cache.get_value('abc')
+        self.assertIsInstance(value, xr.Dataset)
+        value.close()
+
+    def test_put_value_returns_stored_value(self):
+        cache = StepCache(self._cache_dir, capacity=1024 * 1024)
+        value = _new_dataset(10).chunk()
+        stored_value = cache.put_value('abc', value)
+        self.assertIsNot(stored_value, value)
+        self.assertEqual(stored_value.encoding.get('source'), os.path.join(self._cache_dir, 'abc.nc'))
+        self.assertIs(cache.get_value('abc'), stored_value)
+        # Not overwritten while in use
+        self.assertIs(cache.put_value('abc', _new_dataset(10)), stored_value)
+        stored_value.close()
+
+    def test_values_are_evicted(self):
+        cache = StepCache(self._cache_dir, capacity=4 * 8 * 1000)
+        for key in ('a', 'b', 'c'):
+            cache.put_value(key, _new_dataset(1000)).close()
+        gc.collect()
+        self.assertLessEqual(cache.size, 0.75 * 4 * 8 * 1000)
+        self.assertEqual(sorted(os.listdir(self._cache_dir)), ['c.nc'])
+
+    def test_values_in_use_are_not_removed(self):
+        cache = StepCache(self._cache_dir, capacity=4 * 8 * 1000)
+        value_a = cache.put_value('a', _new_dataset(1000))
+        for key in ('b', 'c'):
+            cache.put_value(key, _new_dataset(1000)).close()
+        gc.collect()
+        self.assertLessEqual(cache.size, 0.75 * 4 * 8 * 1000)
+        self.assertEqual(sorted(os.listdir(self._cache_dir)), ['a.nc', 'c.nc'])
+        np.testing.assert_equal(value_a.x.values, np.arange(1000))
+        self.assertIs(cache.get_value('a'), value_a)
+
+        value_a.close()
+        del value_a
+        gc.collect()
+        self.assertEqual(sorted(os.listdir(self._cache_dir)), ['c.nc'])
+
+    def test_workspace_uses_step_cache(self):
+        global _CALL_COUNT
+        conf.set_config({'use_workspace_step_cache': True})
+        try:
+            op_name = 'tests.core.test_stepcache.make_test_dataset'
+
+            _CALL_COUNT = 0
+            ws = Workspace(self._cache_dir, Workspace.new_workflow())
+            ws.set_resource(op_name, mk_op_kwargs(size=10), res_name='ds1')
+            ws.execute_workflow('ds1')
+            self.assertEqual(_CALL_COUNT, 1)
+            self.assertTrue(os.path.isdir(ws.workspace_step_cache_dir))
+
+            # Same operation and inputs, different resource name
+            ws.set_resource(op_name, mk_op_kwargs(size=10), res_name='ds2')
+            value = ws.execute_workflow('ds2')
+            self.assertEqual(_CALL_COUNT, 1)
+            np.testing.assert_equal(value.x.values, np.arange(10))
+
+            ws.set_resource(op_name, mk_op_kwargs(size=11), res_name='ds2', overwrite=True)
+            ws.execute_workflow('ds2')
+            self.assertEqual(_CALL_COUNT, 2)
+            ws.close()
+
+            # Results are reused by a new session
+            ws = Workspace(self._cache_dir, Workspace.new_workflow())
+            ws.set_resource(op_name, mk_op_kwargs(size=11), res_name='ds3')
+            ws.execute_workflow('ds3')
+            self.assertEqual(_CALL_COUNT, 2)
+            ws.close()
+        finally:
+            conf.set_config({'use_workspace_step_cache': False})
+
+    def test_workspace_caches_steps_reading_data(self):
+        data_dir = os.path.join(self._cache_dir, 'data')
+        os.makedirs(data_dir)
+        time = pd.date_range('2000-01-01', '2000-12-31')
+        xr.Dataset(dict(sst=xr.DataArray(np.arange(366 * 4 * 8, dtype=np.float64).reshape((366, 4, 8)),
+                                         dims=['time', 'lat', 'lon'])),
+                   coords=dict(time=time,
+                               lat=np.linspace(-67.5, 67.5, 4),
+                               lon=np.linspace(-157.5, 157.5, 8))).to_netcdf(os.path.join(data_dir, 'sst.nc'))
+        existing_data_store = DATA_STORE_REGISTRY.get_data_store('local')
+        data_store = LocalDataStore('local', os.path.join(self._cache_dir, 'local'))
+        data_store.add_pattern('sst', os.path.join(data_dir, 'sst.nc'))
+        DATA_STORE_REGISTRY.add_data_store(data_store)
+        conf.set_config({'use_workspace_step_cache': True})
+        try:
+            def execute_chain(res_name):
+                ws = Workspace(self._cache_dir, Workspace.new_workflow())
+                ws.set_resource(object_to_qualified_name(open_dataset), mk_op_kwargs(ds_id='local.sst'), res_name='ds')
+                ws.set_resource(object_to_qualified_name(temporal_aggregation), mk_op_kwargs(ds='@ds'),
+                                res_name=res_name)
+                fingerprints = [ws.workflow.find_node(name).get_fingerprint() for name in ('ds', res_name)]
+                value = ws.execute_workflow(res_name)
+                return ws, fingerprints, value
+
+            ws, fingerprints, value = execute_chain('agg')
+            self.assertTrue(all(fingerprints))
+            cached_files = os.listdir(ws.workspace_step_cache_dir)
+            # The dataset that has been read is not copied into the cache
+            self.assertEqual(cached_files, [fingerprints[1] + '.nc'])
+            agg_file = os.path.join(ws.workspace_step_cache_dir, cached_files[0])
+            self.assertEqual(value.encoding.get('source'), agg_file)
+            agg_values = value.sst.values
+            mtime = os.path.getmtime(agg_file)
+            ws.close()
+
+            # A new session reuses the result computed from the same data source, also under another name
+            ws, other_fingerprints, value = execute_chain('agg2')
+            self.assertEqual(other_fingerprints, fingerprints)
+            self.assertEqual(value.encoding.get('source'), agg_file)
+            self.assertEqual(os.path.getmtime(agg_file), mtime)
+            np.testing.assert_equal(value.sst.values, agg_values)
+            ws.close()
+        finally:
+            conf.set_config({'use_workspace_step_cache': False})
+            if existing_data_store is not None:
+                DATA_STORE_REGISTRY.add_data_store(existing_data_store)
+            else:
+                DATA_STORE_REGISTRY.remove_data_store('local')
+
+    def test_fingerprints_of_steps_reading_files(self):
+        file = os.path.join(self._cache_dir, 'ds.nc')
+        _new_dataset(10).to_netcdf(file)
+        ws = Workspace(self._cache_dir, Workspace.new_workflow())
+        ws.set_resource(object_to_qualified_name(read_netcdf), mk_op_kwargs(file=file), res_name='ds')
+        step = ws.workflow.find_node('ds')
+        fingerprint = step.get_fingerprint()
+        self.assertIsNotNone(fingerprint)
+        self.assertEqual(step.get_fingerprint(), fingerprint)
+
+        # The file changes
+        _new_dataset(11).to_netcdf(file)
+        self.assertNotEqual(step.get_fingerprint(), fingerprint)
+        ws.close()
@@ -1,13 +1,15 @@
 import json
 import os.path
+import threading
 from collections import OrderedDict
-from unittest import TestCase
+from unittest import TestCase, mock
 
 from cate.core.op import op_input, op_output, Operation
 from cate.core.workflow import OpStep, Workflow, WorkflowStep, NodePort, ExpressionStep, NoOpStep, SubProcessStep, ValueCache, \
     SourceRef, new_workflow_op
 from cate.util.undefined import UNDEFINED
 from cate.util.misc import object_to_qualified_name
+from cate.util.monitor import Monitor, Cancellation
 from cate.util.opmetainf import OpMetaInfo
 
 
@@ -30,6 +32,23 @@ def op3(u, v, c=0):
     return {'w': 2 * u + 3 * v + c}
 
 
+_BARRIER = threading.Barrier(2, timeout=10)
+
+
+@op_input('x')
+@op_output('y')
+def op_wait_for_other(x):
+    # Returns only if invoked concurrently with another invocation
+    _BARRIER.wait()
+    return {'y': x}
+
+
+@op_input('x')
+@op_output('y')
+def op_fail(x):
+    raise ValueError('step failed: %s' % x)
+
+
 def get_resource(rel_path):
     return os.path.join(os.path.dirname(__file__), rel_path).replace('\\', '/')
 
@@ -75,6 +94,48 @@ class WorkflowTest(TestCase):
         self.assertEqual(workflow.find_steps_to_compute('op2'), [step1, step2])
         self.assertEqual(workflow.find_steps_to_compute('op3'), [step1, step2, step3])
 
+    def test_get_fingerprint(self):
+        step1, step2, step3, workflow = self.create_example_3_steps_workflow()
+        workflow.inputs.p.value = 3
+        fingerprint1 = step1.get_fingerprint()
+        fingerprint2 = step2.get_fingerprint()
+        fingerprint3 = step3.get_fingerprint()
+        self.assertIsInstance(fingerprint1, str)
+        self.assertEqual(len({fingerprint1, fingerprint2, fingerprint3}), 3)
+
+        # Fingerprints don't depend on step IDs
+        step1.set_id('op1_renamed')
+        self.assertEqual(step1.get_fingerprint(), fingerprint1)
+        self.assertEqual(step3.get_fingerprint(), fingerprint3)
+
+        # Changed inputs change all dependent fingerprints
+        workflow.inputs.p.value = 4
+        self.assertNotEqual(step1.get_fingerprint(), fingerprint1)
+        self.assertNotEqual(step2.get_fingerprint(), fingerprint2)
+        self.assertNotEqual(step3.get_fingerprint(), fingerprint3)
+
+        # Non-JSON-serializable inputs cannot be fingerprinted
+        workflow.inputs.p.value = object()
+        self.assertIsNone(step1.get_fingerprint())
+        self.assertIsNone(step3.get_fingerprint())
+
+        self.assertIsNone(workflow.get_fingerprint())
+
+    def test_get_fingerprint_memoized(self):
+        step1, step2, step3, workflow = self.create_example_3_steps_workflow()
+        workflow.inputs.p.value = 3
+        fingerprint3 = step3.get_fingerprint()
+
+        fingerprints = dict()
+        with mock.patch.object(OpStep, '_compute_fingerprint', autospec=True,
+                               side_effect=OpStep._compute_fingerprint) as m:
+            self.assertEqual(step3.get_fingerprint(fingerprints), fingerprint3)
+            self.assertEqual(step2.get_fingerprint(fingerprints), fingerprints[step2])
+            self.assertEqual(step1.get_fingerprint(fingerprints), fingerprints[step1])
+            # Each step's fingerprint has been computed once
+            self.assertEqual(3, m.call_count)
+        self.assertEqual({step1, step2, step3}, set(fingerprints.keys()))
+
     def test_requires(self):
         step1, step2, step3, workflow = self.create_example_3_steps_workflow()
         self.assertFalse(step1.requires(step2))
@@ -153,6 +214,63 @@ class WorkflowTest(TestCase):
         self.assertEqual(output_value, 2 * (3 + 1) + 3 * (2 * (3 + 1)))
         self.assertEqual(value_cache, dict(op1={'y': 4}, op2={'b': 8}, op3={'w': 32}))
 
+    def test_invoke_steps_concurrently(self):
+        step1, step2, step3, workflow = self.create_example_3_steps_workflow()
+
+        workflow.inputs.p.value = 3
+        value_cache = dict()
+        workflow.invoke_steps([step3, step2, step1], context=dict(value_cache=value_cache), max_workers=4)
+        self.assertEqual(step3.outputs.w.value, 2 * (3 + 1) + 3 * (2 * (3 + 1)))
+        self.assertEqual(value_cache, dict(op1={'y': 4}, op2={'b': 8}, op3={'w': 32}))
+
+    def test_invoke_independent_steps_concurrently(self):
+        workflow = Workflow(OpMetaInfo('myWorkflow'))
+        step1 = OpStep(op_wait_for_other, node_id='step1')
+        step2 = OpStep(op_wait_for_other, node_id='step2')
+        step3 = OpStep(op3, node_id='step3')
+        workflow.add_steps(step1, step2, step3)
+        step1.inputs.x.value = 1
+        step2.inputs.x.value = 2
+        step3.inputs.u.source = step1.outputs.y
+        step3.inputs.v.source = step2.outputs.y
+
+        _BARRIER.reset()
+        workflow.invoke_steps(workflow.steps, max_workers=2)
+        self.assertEqual(step3.outputs.w.value, 2 * 1 + 3 * 2)
+
+    def test_invoke_steps_concurrently_fails(self):
+        workflow = Workflow(OpMetaInfo('myWorkflow'))
+        step1 = OpStep(op_fail, node_id='step1')
+        step2 = OpStep(op1, node_id='step2')
+        workflow.add_steps(step1, step2)
+        step1.inputs.x.value = 1
+        step2.inputs.x.source = step1.outputs.y
+
+        with self.assertRaises(ValueError) as cm:
+            workflow.invoke_steps(workflow.steps, max_workers=2)
+        self.assertEqual(str(cm.exception), 'step failed: 1')
+        self.assertIsNone(step2.outputs.y.value)
+
+    def test_invoke_steps_concurrently_cancelled(self):
+        class CancelledMonitor(Monitor):
+            def start(self, label: str, total_work: float = None):
+                pass
+
+            def progress(self, work: float = None, msg: str = None):
+                pass
+
+            def done(self):
+                pass
+
+            def is_cancelled(self) -> bool:
+                return True
+
+        step1, step2, step3, workflow = self.create_example_3_steps_workflow()
+        workflow.inputs.p.value = 3
+        with self.assertRaises(Cancellation):
+            workflow.invoke_steps(workflow.steps, monitor=CancelledMonitor(), max_workers=2)
+        self.assertIsNone(step1.outputs.y.value)
+
     def test_invoke_with_context_inputs(self):
         def some_op(context, workflow, workflow_id, step, step_id, invalid):
             return dict(context=context,
@@ -1,5 +1,7 @@
 import json
 import os
+import shutil
+import tempfile
 import unittest
 from collections import OrderedDict
 
@@ -12,6 +14,7 @@ from shapely.geometry import Point
 from cate.core.types import ValidationError
 from cate.core.workflow import Workflow, OpStep
 from cate.core.workspace import Workspace, mk_op_arg, mk_op_args, mk_op_kwargs
+from cate.util.monitor import Monitor
 from cate.util.opmetainf import OpMetaInfo
 from cate.util.undefined import UNDEFINED
 
@@ -459,6 +462,145 @@ class WorkspaceTest(unittest.TestCase):
         self.assertEqual(ws.resource_cache.get('Y'), 5)
         self.assertEqual(ws.resource_cache.get('Z'), 5)
 
+    def test_set_and_execute_steps_concurrently(self):
+        ws = Workspace('/path', Workflow(OpMetaInfo('workspace_workflow', header=dict(description='Test!'))))
+
+        ws.set_resource('cate.ops.utility.identity', mk_op_kwargs(value=1), res_name='X')
+        ws.set_resource('cate.ops.utility.identity', mk_op_kwargs(value=2), res_name='Y')
+        ws.set_resource('cate.ops.utility.identity', mk_op_kwargs(value="@X"), res_name='Z')
+        ws.set_resource('cate.ops.utility.identity', mk_op_kwargs(value="@Y"), res_name='W')
+
+        value = ws.execute_workflow(max_workers=4)
+        self.assertEqual(value, 2)
+        self.assertEqual(ws.resource_cache.get('X'), 1)
+        self.assertEqual(ws.resource_cache.get('Y'), 2)
+        self.assertEqual(ws.resource_cache.get('Z'), 1)
+        self.assertEqual(ws.resource_cache.get('W'), 2)
+
+    def test_open_lazy(self):
+        base_dir = tempfile.mkdtemp()
+        try:
+            ws = Workspace.create(base_dir, description='Test!')
+            ws.set_resource('cate.ops.io.read_netcdf', mk_op_kwargs(file=NETCDF_TEST_FILE_1), res_name='X')
+            ws.set_resource('cate.ops.normalize.adjust_temporal_attrs', mk_op_kwargs(ds='@X'), res_name='Y')
+            ws.set_resource_persistence('Y', True)
+            ws.execute_workflow()
+            expected_resources = ws.to_json_dict()['resources']
+            ws.save()
+            self.assertTrue(os.path.isfile(ws.resources_file))
+            ws.close()
+
+            ws = Workspace.open(base_dir, lazy=True)
+            self.assertTrue(ws.is_lazy)
+            # Nothing read or computed yet
+            self.assertIs(ws.resource_cache['X'], UNDEFINED)
+            self.assertIs(ws.resource_cache['Y'], UNDEFINED)
+            resources = json.loads(json.dumps(ws.to_json_dict()['resources']))
+            expected_resources = json.loads(json.dumps(expected_resources))
+            self.assertEqual([resource['name'] for resource in resources], ['X', 'Y'])
+            self.assertEqual([resource['variables'] for resource in resources],
+                             [resource['variables'] for resource in expected_resources])
+
+            # Persistent resource is read from file
+            dataset = ws.get_resource('Y')
+            self.assertIsInstance(dataset, xr.Dataset)
+            self.assertIs(ws.resource_cache['X'], UNDEFINED)
+            self.assertEqual(ws.resource_cache.get_update_count('Y'), 1)
+
+            # Non-persistent resource is computed
+            dataset = ws.get_resource('X')
+            self.assertIsInstance(dataset, xr.Dataset)
+
+            # Changing a resource invalidates its descriptor
+            ws.set_resource('cate.ops.io.read_netcdf', mk_op_kwargs(file=NETCDF_TEST_FILE_2), res_name='X',
+                            overwrite=True)
+            resources = ws.to_json_dict()['resources']
+            self.assertEqual(resources[0]['dataType'], 'cate.util.undefined._Undefined')
+            ws.close()
+        finally:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    def test_open_lazy_expressions_and_previous_versions(self):
+        from cate.core.wsmanag import FSWorkspaceManager
+
+        base_dir = tempfile.mkdtemp()
+        try:
+            ws = Workspace.create(base_dir, description='Test!')
+            ws.set_resource('cate.ops.io.read_netcdf', mk_op_kwargs(file=NETCDF_TEST_FILE_1), res_name='X')
+            ws.set_resource('cate.ops.normalize.adjust_temporal_attrs', mk_op_kwargs(ds='@X'), res_name='Y')
+            ws.set_resource_persistence('Y', True)
+            ws.execute_workflow()
+            ws.save()
+            ws.close()
+
+            # Resource descriptors are read lazily, expressions restore or compute the resources they refer to
+            ws = Workspace.open(base_dir, lazy=True)
+            self.assertIs(ws.resource_cache['Y'], UNDEFINED)
+            # noinspection PyProtectedMember
+            attrs = FSWorkspaceManager()._get_resource_value(ws, 'Y.attrs', Monitor.NONE)
+            self.assertIsInstance(attrs, dict)
+            self.assertIsInstance(ws.resource_cache['Y'], xr.Dataset)
+            ws.close()
+
+            # Workspaces saved by previous versions have no resource descriptors, so they are opened eagerly
+            os.remove(Workspace.get_resources_file(base_dir))
+            ws = Workspace.open(base_dir, lazy=True)
+            self.assertFalse(ws.is_lazy)
+            self.assertIsInstance(ws.resource_cache['Y'], xr.Dataset)
+            ws.close()
+        finally:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    def test_save_incrementally_as_zarr(self):
+        from unittest import mock
+        from cate.conf import conf
+        from cate.core import workspace
+
+        base_dir = tempfile.mkdtemp()
+        conf.set_config({'dataset_persistence_format': 'zarr'})
+        try:
+            ws = Workspace.create(base_dir, description='Test!')
+            ws.set_resource('cate.ops.io.read_netcdf', mk_op_kwargs(file=NETCDF_TEST_FILE_1), res_name='X')
+            ws.set_resource('cate.ops.normalize.adjust_temporal_attrs', mk_op_kwargs(ds='@X'), res_name='Y')
+            ws.set_resource('cate.ops.normalize.adjust_spatial_attrs', mk_op_kwargs(ds='@X'), res_name='Z')
+            ws.set_resource_persistence('Y', True)
+            ws.set_resource_persistence('Z', True)
+            ws.execute_workflow()
+
+            with mock.patch.object(workspace, '_write_dataset_to_zarr', wraps=workspace._write_dataset_to_zarr) as m:
+                ws.save()
+                self.assertEqual(2, m.call_count)
+                self.assertTrue(os.path.isdir(os.path.join(ws.workspace_data_dir, 'Y.zarr')))
+                self.assertTrue(os.path.isdir(os.path.join(ws.workspace_data_dir, 'Z.zarr')))
+
+                # Nothing changed
+                m.reset_mock()
+                ws.save()
+                self.assertEqual(0, m.call_count)
+
+                # Only the changed resource is written
+                ws.set_resource('cate.ops.normalize.adjust_spatial_attrs',
+                                mk_op_kwargs(ds='@X', allow_point=True), res_name='Z', overwrite=True)
+                ws.set_resource_persistence('Z', True)
+                ws.execute_workflow('Z')
+                m.reset_mock()
+                ws.save()
+                self.assertEqual(1, m.call_count)
+                self.assertEqual('Z', os.path.splitext(os.path.basename(m.call_args[0][1]))[0])
+            ws.close()
+
+            ws = Workspace.open(base_dir)
+            self.assertIsInstance(ws.resource_cache['Y'], xr.Dataset)
+            self.assertIsInstance(ws.resource_cache['Z'], xr.Dataset)
+            with mock.patch.object(workspace, '_write_dataset_to_zarr') as m:
+                # Resources read from file are not written again
+                ws.save()
+                self.assertEqual(0, m.call_count)
+            ws.close()
+        finally:
+            conf.set_config({'dataset_persistence_format': 'netcdf4'})
+            shutil.rmtree(base_dir, ignore_errors=True)
+
     @unittest.skip("_extract_point is not an operator anymore")
     def test_set_step_and_run_op(self):
         ws = Workspace('/path', Workflow(OpMetaInfo('workspace_workflow', header=dict(description='Test!'))))
@@ -511,6 +653,43 @@ class WorkspaceTest(unittest.TestCase):
         expected_res_names = {'res_%s' % (i + 1) for i in range(num_res)}
         self.assertEqual(actual_res_names, expected_res_names)
 
+    def test_resource_observers(self):
+        ws = Workspace('/path', Workflow(OpMetaInfo('workspace_workflow', header=dict(description='Test!'))))
+
+        invalidated = []
+
+        def observer(workspace, res_name):
+            self.assertIs(workspace, ws)
+            invalidated.append(res_name)
+
+        ws.add_resource_observer(observer)
+        ws.add_resource_observer(observer)
+
+        ws.set_resource('cate.ops.utility.identity', mk_op_kwargs(value=1), res_name='X')
+        ws.set_resource('cate.ops.utility.identity', mk_op_kwargs(value="@X"), res_name='Y')
+        self.assertEqual(invalidated, ['X', 'Y'])
+
+        invalidated.clear()
+        ws.set_resource('cate.ops.utility.identity', mk_op_kwargs(value=9), res_name='X', overwrite=True)
+        self.assertEqual(sorted(invalidated), ['X', 'Y'])
+
+        invalidated.clear()
+        ws.rename_resource('Y', 'Z')
+        self.assertEqual(invalidated, ['Y'])
+
+        invalidated.clear()
+        ws.delete_resource('Z')
+        self.assertEqual(invalidated, ['Z'])
+
+        invalidated.clear()
+        ws.remove_resource_observer(observer)
+        ws.set_resource('cate.ops.utility.identity', mk_op_kwargs(value=3), res_name='X', overwrite=True)
+        self.assertEqual(invalidated, [])
+
+        ws.add_resource_observer(observer)
+        ws.close()
+        self.assertEqual(invalidated, ['X'])
+
     def test_validate_res_name(self):
         Workspace._validate_res_name("a")
         Workspace._validate_res_name("A")
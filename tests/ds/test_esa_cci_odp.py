@@ -3,6 +3,7 @@ import string
 from datetime import datetime
 from lxml.etree import XML
 import asyncio
+import hashlib
 import json
 import os
 import shutil
@@ -10,11 +11,13 @@ import tempfile
 import unittest
 import unittest.mock
 import urllib.request
-from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, DataStoreNotice
+from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, DataAccessWarning, DataStoreNotice
 from cate.ds.esa_cci_odp import _fetch_file_list_json, _extract_metadata_from_odd, _extract_metadata_from_odd_url, \
     _extract_metadata_from_descxml, _extract_metadata_from_descxml_url, _harmonize_info_field_names, \
-    _DownloadStatistics, EsaCciOdpDataStore, find_datetime_format, _retrieve_infos_from_dds
+    _DownloadStatistics, _Download, _download_files, _is_local_file_valid, EsaCciOdpDataStore, \
+    find_datetime_format, _retrieve_infos_from_dds
 from cate.core.types import PolygonLike, TimeRangeLike, VarNamesLike
+from cate.ds.esa_cci_odp_index import OdpFileListIndex
 from cate.ds.local import LocalDataStore
 
 
@@ -280,6 +283,32 @@ class EsaCciOdpDataStoreTest(unittest.TestCase):
         self.assertIsNotNone(data_sources)
         self.assertEqual(len(data_sources), 1)
 
+    def test_query_with_filters(self):
+        ozone_id = 'esacci.OZONE.mon.L3.NP.multi-sensor.multi-platform.MERGED.fv0002.r1'
+        data_sources = self.data_store.query(query_expr='ecv:OZONE time_frequency:month')
+        self.assertEqual([ozone_id], [data_source.id for data_source in data_sources])
+        data_sources = self.data_store.query(query_expr='ozone nadir merged')
+        self.assertEqual([ozone_id], [data_source.id for data_source in data_sources])
+        data_sources = self.data_store.query(query_expr='ecv:OZONE time:2009-01-01,2009-12-31')
+        self.assertEqual([], data_sources)
+
+    def test_query_uses_catalogue_index(self):
+        data_sources = self.data_store.query()
+        self.assertTrue(os.path.isdir(os.path.join(self.data_store.data_store_path, 'test1-index')))
+
+        # A new data store instance must not read the catalogue nor any meta-info.json files
+        data_store = EsaCciOdpDataStore('test-odp', index_cache_update_tag='test1',
+                                        meta_data_store_path=self.data_store.data_store_path)
+        with unittest.mock.patch('cate.ds.esa_cci_odp.EsaCciOdpDataStore._init_data_sources') as init_mock:
+            indexed_data_sources = data_store.query()
+        init_mock.assert_not_called()
+        self.assertEqual(sorted(data_source.id for data_source in data_sources),
+                         sorted(data_source.id for data_source in indexed_data_sources))
+        ozone_data_source = data_store.query(ds_id='esacci.OZONE.mon.L3.NP.multi-sensor.multi-platform.'
+                                                   'MERGED.fv0002.r1')[0]
+        self.assertEqual('OZONE', ozone_data_source.meta_info['ecv'])
+        self.assertEqual('4eb4e801424a47f7b77434291921f889', ozone_data_source.meta_info['uuid'])
+
     def test_adjust_json_dict(self):
         test_dict = dict(
             time_frequencies=['day', 'month'],
@@ -498,6 +527,92 @@ class EsaCciOdpDataSourceTest(unittest.TestCase):
                 self.assertIsNotNone(new_ds)
                 self.assertEqual(new_ds.meta_info['title'], title)
 
+    def test_make_local_subset_with_failing_file(self):
+        data_source = self.data_store.query(
+            query_expr='esacci.OZONE.mon.L3.NP.multi-sensor.multi-platform.MERGED.fv0002.r1')[0]
+        reference_path = os.path.join(os.path.dirname(__file__),
+                                      os.path.normpath('resources/datasources/local/files/'))
+        file_names = ['ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781114000000-fv02.2.nc',
+                      'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781115000000-fv02.2.nc',
+                      'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781116000000-fv02.2.nc',
+                      'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781117000000-fv02.2.nc']
+
+        # noinspection PyUnusedLocal
+        def find_files_mock(_, time_range):
+            # The last file does not exist
+            return [[file_name, datetime(1995, 11, 14 + i, 0, 0), datetime(1995, 11, 14 + i, 23, 59), 0,
+                     {'Opendap': os.path.join(reference_path, file_name)}]
+                    for i, file_name in enumerate(file_names)]
+
+        with unittest.mock.patch('cate.ds.esa_cci_odp.EsaCciOdpDataSource._find_files', find_files_mock):
+            with self.assertWarns(DataAccessWarning) as cm:
+                new_ds = data_source.make_local('local_ds_failing_file', var_names='sm', compression_level=0)
+        self.assertIn(file_names[3], str(cm.warning))
+        self.assertIsNotNone(new_ds)
+        self.assertEqual(3, len(new_ds.open_dataset().time))
+        self.assertEqual('1995-11-14', new_ds.meta_info['temporal_coverage_start'])
+        self.assertEqual('1995-11-16T23:59:00', new_ds.meta_info['temporal_coverage_end'])
+        self.assertEqual(sorted(file_names[0:3]),
+                         sorted(os.listdir(os.path.join(self.tmp_dir, 'local.local_ds_failing_file'))))
+
+    def test_make_local_subset_with_failing_first_file(self):
+        data_source = self.data_store.query(
+            query_expr='esacci.OZONE.mon.L3.NP.multi-sensor.multi-platform.MERGED.fv0002.r1')[0]
+        reference_path = os.path.join(os.path.dirname(__file__),
+                                      os.path.normpath('resources/datasources/local/files/'))
+        file_names = ['ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781113000000-fv02.2.nc',
+                      'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781114000000-fv02.2.nc',
+                      'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781115000000-fv02.2.nc']
+
+        # noinspection PyUnusedLocal
+        def find_files_mock(_, time_range):
+            # The first file does not exist
+            return [[file_name, datetime(1995, 11, 13 + i, 0, 0), datetime(1995, 11, 13 + i, 23, 59), 0,
+                     {'Opendap': os.path.join(reference_path, file_name)}]
+                    for i, file_name in enumerate(file_names)]
+
+        with unittest.mock.patch('cate.ds.esa_cci_odp.EsaCciOdpDataSource._find_files', find_files_mock):
+            with self.assertWarns(DataAccessWarning) as cm:
+                new_ds = data_source.make_local('local_ds_failing_first_file', var_names='sm', compression_level=0)
+        self.assertIn(file_names[0], str(cm.warning))
+        self.assertIsNotNone(new_ds)
+        self.assertEqual('1995-11-14', new_ds.meta_info['temporal_coverage_start'])
+        self.assertEqual('1995-11-15T23:59:00', new_ds.meta_info['temporal_coverage_end'])
+
+    def test_make_local_subset_with_failing_inner_file(self):
+        data_source = self.data_store.query(
+            query_expr='esacci.OZONE.mon.L3.NP.multi-sensor.multi-platform.MERGED.fv0002.r1')[0]
+        reference_path = os.path.join(os.path.dirname(__file__),
+                                      os.path.normpath('resources/datasources/local/files/'))
+        file_names = ['ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781114000000-fv02.2.nc',
+                      'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781113000000-fv02.2.nc',
+                      'ESACCI-SOILMOISTURE-L3S-SSMV-COMBINED-19781115000000-fv02.2.nc']
+
+        # noinspection PyUnusedLocal
+        def find_files_mock(_, time_range):
+            # The second file does not exist
+            return [[file_name, datetime(1995, 11, 14 + i, 0, 0), datetime(1995, 11, 14 + i, 23, 59), 0,
+                     {'Opendap': os.path.join(reference_path, file_name)}]
+                    for i, file_name in enumerate(file_names)]
+
+        with unittest.mock.patch('cate.ds.esa_cci_odp.EsaCciOdpDataSource._find_files', find_files_mock):
+            with self.assertWarns(DataAccessWarning) as cm:
+                new_ds = data_source.make_local('local_ds_failing_inner_file', var_names='sm', compression_level=0)
+        self.assertIn(file_names[1], str(cm.warning))
+        self.assertIsNotNone(new_ds)
+        # The verified time coverage does not span the gap
+        self.assertEqual('1995-11-14', new_ds.meta_info['temporal_coverage_start'])
+        self.assertEqual('1995-11-14T23:59:00', new_ds.meta_info['temporal_coverage_end'])
+
+    def test_empty_file_list_is_not_fetched_again(self):
+        data_source = self.first_oc_data_source
+        # noinspection PyProtectedMember
+        data_source._set_file_list_index(OdpFileListIndex.from_file_list([]))
+        with unittest.mock.patch('cate.ds.esa_cci_odp._load_or_fetch_json',
+                                 side_effect=AssertionError('file list fetched again')):
+            # noinspection PyProtectedMember
+            self.assertEqual([], list(data_source._find_files(None)))
+
     def test_data_store(self):
         self.assertIs(self.first_oc_data_source.data_store,
                       self.data_store)
@@ -594,6 +709,131 @@ class DownloadStatisticsTest(unittest.TestCase):
         download_stats.handle_chunk(16000000)
         self.assertEqual(str(download_stats), '64 of 64 MB @ 0.000 MB/s, 100.0% complete')
 
+    def test_files(self):
+        download_stats = _DownloadStatistics(64000000, files_total=4)
+        self.assertEqual(str(download_stats), '0 of 64 MB @ 0.000 MB/s, 0.0% complete, 0 of 4 files')
+        download_stats.handle_chunk(16000000)
+        download_stats.handle_file()
+        self.assertEqual(str(download_stats), '16 of 64 MB @ 0.000 MB/s, 25.0% complete, 1 of 4 files')
+
+
+class DownloadFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server_dir = tempfile.mkdtemp()
+        self.local_dir = tempfile.mkdtemp()
+        self.file_contents = {}
+        for i in range(5):
+            file_name = f'file-{i}.nc'
+            content = os.urandom(100000 + i)
+            with open(os.path.join(self.server_dir, file_name), 'wb') as fp:
+                fp.write(content)
+            self.file_contents[file_name] = content
+        self.requested_ranges = []
+        self.ignore_ranges = False
+        self.broken_files = set()
+
+    def tearDown(self):
+        shutil.rmtree(self.server_dir)
+        shutil.rmtree(self.local_dir)
+
+    def _download(self, checksum_type='md5', wrong_checksum=None):
+        from aiohttp import web
+
+        async def handle(request):
+            file_name = request.match_info['name']
+            self.requested_ranges.append((file_name, request.headers.get('Range')))
+            if file_name in self.broken_files:
+                # Send half of the file only, then drop the connection
+                self.broken_files.remove(file_name)
+                content = self.file_contents[file_name]
+                response = web.StreamResponse(headers={'Content-Length': str(len(content))})
+                await response.prepare(request)
+                await response.write(content[:len(content) // 2])
+                # Give the client time to write the received bytes before they are discarded with the error
+                await asyncio.sleep(0.5)
+                request.transport.close()
+                return response
+            if self.ignore_ranges:
+                return web.Response(body=self.file_contents[file_name])
+            return web.FileResponse(os.path.join(self.server_dir, file_name))
+
+        async def run():
+            app = web.Application()
+            app.router.add_get('/{name}', handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            downloads = []
+            for file_name, content in self.file_contents.items():
+                checksum = wrong_checksum if wrong_checksum and file_name == 'file-2.nc' \
+                    else hashlib.new(checksum_type, content).hexdigest()
+                downloads.append(_Download(url=f'http://127.0.0.1:{port}/{file_name}',
+                                           file_path=os.path.join(self.local_dir, file_name),
+                                           file_size=len(content),
+                                           checksum_info=[checksum_type.upper(), checksum],
+                                           file_rec=[file_name]))
+            dl_stat = _DownloadStatistics(sum(len(c) for c in self.file_contents.values()),
+                                          files_total=len(downloads))
+            downloaded = []
+            try:
+                await _download_files(downloads, max_workers=3, dl_stat=dl_stat,
+                                      on_file_downloaded=lambda file_rec: downloaded.append(file_rec[0]))
+            finally:
+                await runner.cleanup()
+            return dl_stat, downloaded
+
+        return asyncio.run(run())
+
+    def test_download_files(self):
+        dl_stat, downloaded = self._download()
+        self.assertEqual(sorted(self.file_contents.keys()), sorted(downloaded))
+        self.assertEqual(5, dl_stat.files_done)
+        self.assertEqual(dl_stat.bytes_total, dl_stat.bytes_done)
+        for file_name, content in self.file_contents.items():
+            with open(os.path.join(self.local_dir, file_name), 'rb') as fp:
+                self.assertEqual(content, fp.read())
+        self.assertEqual([], [f for f in os.listdir(self.local_dir) if f.endswith('.part')])
+
+    def test_download_files_resumes_partial_download(self):
+        with open(os.path.join(self.local_dir, 'file-1.nc.part'), 'wb') as fp:
+            fp.write(self.file_contents['file-1.nc'][0:40000])
+        dl_stat, downloaded = self._download()
+        self.assertIn(('file-1.nc', 'bytes=40000-'), self.requested_ranges)
+        self.assertEqual(dl_stat.bytes_total - 40000, dl_stat.bytes_done)
+        with open(os.path.join(self.local_dir, 'file-1.nc'), 'rb') as fp:
+            self.assertEqual(self.file_contents['file-1.nc'], fp.read())
+
+    def test_download_files_restarts_if_range_is_ignored(self):
+        self.ignore_ranges = True
+        self.broken_files.add('file-1.nc')
+        dl_stat, downloaded = self._download()
+        self.assertIn(('file-1.nc', 'bytes=50000-'), self.requested_ranges)
+        self.assertEqual(dl_stat.bytes_total, dl_stat.bytes_done)
+        with open(os.path.join(self.local_dir, 'file-1.nc'), 'rb') as fp:
+            self.assertEqual(self.file_contents['file-1.nc'], fp.read())
+
+    def test_is_local_file_valid(self):
+        content = self.file_contents['file-0.nc']
+        file_path = os.path.join(self.server_dir, 'file-0.nc')
+        file_rec = ['file-0.nc', None, None, len(content), {}, ['MD5', hashlib.md5(content).hexdigest()]]
+        self.assertTrue(_is_local_file_valid(file_path, file_rec))
+        self.assertTrue(_is_local_file_valid(file_path, file_rec[0:5]))
+        self.assertFalse(_is_local_file_valid(os.path.join(self.local_dir, 'file-0.nc'), file_rec))
+        self.assertFalse(_is_local_file_valid(file_path, file_rec[0:3] + [len(content) + 1] + file_rec[4:]))
+        with open(file_path, 'r+b') as fp:
+            fp.write(b'corrupted')
+        self.assertFalse(_is_local_file_valid(file_path, file_rec))
+
+    def test_download_files_verifies_checksum(self):
+        with self.assertRaises(DataAccessError) as cm:
+            self._download(wrong_checksum='0123456789abcdef')
+        self.assertIn('file-2.nc', str(cm.exception))
+        self.assertFalse(os.path.exists(os.path.join(self.local_dir, 'file-2.nc')))
+        self.assertFalse(os.path.exists(os.path.join(self.local_dir, 'file-2.nc.part')))
+
 
 @unittest.skip(reason='Used for debugging to fix Cate issues #823, #822, #818, #816, #783, #892, #900, #904')
 class SpatialSubsetTest(unittest.TestCase):
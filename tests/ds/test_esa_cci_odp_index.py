@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+
+from cate.ds.esa_cci_odp_index import OdpCatalogueIndex, OdpFileListIndex, parse_query_expr
+
+
+def _meta_info(fid, ecv, title, time_frequency='day', bbox=(-180., -90., 180., 90.),
+               time_coverage=('2000-01-01T00:00:00', '2010-12-31T23:59:59')):
+    return dict(fid=fid,
+                ecv=ecv,
+                title=title,
+                time_frequency=time_frequency,
+                processing_level='L3S',
+                bbox_minx=str(bbox[0]), bbox_miny=str(bbox[1]), bbox_maxx=str(bbox[2]), bbox_maxy=str(bbox[3]),
+                temporal_coverage_start=time_coverage[0],
+                temporal_coverage_end=time_coverage[1])
+
+
+_RECORDS = [
+    ('esacci.SST.day.L4.SSTdepth.multi-sensor.multi-platform.OSTIA.1-1.r1',
+     _meta_info('f1', 'SST', 'ESA Sea Surface Temperature Climate Change Initiative: Level 4 Analysis')),
+    ('esacci.OC.mon.L3S.CHLOR_A.multi-sensor.multi-platform.MERGED.3-1.geographic',
+     _meta_info('f2', 'OC', 'ESA Ocean Colour Climate Change Initiative: Chlorophyll-a', time_frequency='month',
+                bbox=(-20., 30., 40., 70.))),
+    ('esacci.OZONE.mon.L3.NP.multi-sensor.multi-platform.MERGED.fv0002.r1',
+     _meta_info('f3', 'OZONE', 'ESA Ozone Climate Change Initiative: Nadir Ozone Profile Merged Data Product',
+                time_frequency='month', time_coverage=('1997-01-01T00:00:00', '2008-12-31T00:00:00'))),
+]
+
+
+class OdpCatalogueIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_dir = os.path.join(self.temp_dir, 'dataset-list-index')
+        self.index = OdpCatalogueIndex(self.index_dir)
+        self.index.update(_RECORDS)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _query_ids(self, ds_id=None, query_expr=None):
+        records = OdpCatalogueIndex(self.index_dir).query(ds_id=ds_id, query_expr=query_expr)
+        return sorted(ds_id for ds_id, _ in records)
+
+    def test_query_all(self):
+        records = OdpCatalogueIndex(self.index_dir).query()
+        self.assertEqual(3, len(records))
+        self.assertEqual(sorted(_RECORDS), sorted(records))
+
+    def test_query_ds_id(self):
+        self.assertEqual([_RECORDS[2][0]], self._query_ids(ds_id=_RECORDS[2][0].upper()))
+        self.assertEqual([], self._query_ids(ds_id='esacci.OZONE'))
+
+    def test_query_text(self):
+        # substring of id or title
+        self.assertEqual([_RECORDS[1][0]], self._query_ids(query_expr='OC.mon'))
+        self.assertEqual([_RECORDS[1][0], _RECORDS[2][0]], self._query_ids(query_expr='MERGED'))
+        # every word is prefix of a token
+        self.assertEqual([_RECORDS[2][0]], self._query_ids(query_expr='ozone prof merg'))
+        self.assertEqual([], self._query_ids(query_expr='ozone ostia'))
+
+    def test_query_filters(self):
+        self.assertEqual([_RECORDS[0][0]], self._query_ids(query_expr='ecv:sst'))
+        self.assertEqual([_RECORDS[1][0], _RECORDS[2][0]], self._query_ids(query_expr='time_frequency:month'))
+        self.assertEqual([_RECORDS[2][0]], self._query_ids(query_expr='ozone time_frequency:month'))
+        self.assertEqual(sorted([_RECORDS[0][0], _RECORDS[2][0]]),
+                         self._query_ids(query_expr='bbox:100,-10,120,10'))
+        self.assertEqual(sorted([_RECORDS[0][0], _RECORDS[1][0]]),
+                         self._query_ids(query_expr='time:2009-01-01,2009-12-31'))
+        self.assertEqual([_RECORDS[2][0]], self._query_ids(query_expr='time:,1999-01-01'))
+
+    def test_update_rewrites_changed_shards_only(self):
+        shard_dirs = set(os.listdir(self.index_dir))
+        records = [_RECORDS[0], _RECORDS[1],
+                   ('esacci.OZONE.mon.L3.LP.multi-sensor.multi-platform.MERGED.fv0002.r1',
+                    _meta_info('f4', 'OZONE', 'ESA Ozone Climate Change Initiative: Limb Ozone Profile'))]
+        self.index.update(records)
+        new_shard_dirs = set(os.listdir(self.index_dir))
+        self.assertEqual(1, len(new_shard_dirs - shard_dirs))
+        self.assertTrue(next(iter(new_shard_dirs - shard_dirs)).startswith('ozone-'))
+        self.assertEqual(1, len(shard_dirs - new_shard_dirs))
+        self.assertEqual(['esacci.OZONE.mon.L3.LP.multi-sensor.multi-platform.MERGED.fv0002.r1'],
+                         self._query_ids(query_expr='ecv:ozone'))
+
+        self.index.update(records[0:1])
+        self.assertEqual([_RECORDS[0][0]], self._query_ids())
+
+    def test_is_up_to_date_and_remove(self):
+        self.assertTrue(self.index.exists)
+        self.assertTrue(self.index.is_up_to_date(1.0))
+        self.assertFalse(self.index.is_up_to_date(0.0))
+        self.index.remove()
+        self.assertFalse(self.index.exists)
+        self.assertFalse(self.index.is_up_to_date(1.0))
+        self.assertEqual([], self.index.query())
+
+
+class ParseQueryExprTest(unittest.TestCase):
+    def test_parse_query_expr(self):
+        self.assertEqual(('', {}), parse_query_expr(None))
+        self.assertEqual(('ozone MERGED', {'ecv': 'OZONE'}), parse_query_expr('ozone ECV:OZONE MERGED'))
+        self.assertEqual(('', {'bbox': (-10., 20., 30., 40.)}), parse_query_expr('bbox:-10,20,30,40'))
+        text, filters = parse_query_expr('time:2010-01-01,')
+        self.assertEqual(np.datetime64('2010-01-01T00:00:00'), filters['time'][0])
+        self.assertTrue(np.isnat(filters['time'][1]))
+        self.assertEqual(('http://acme.com', {}), parse_query_expr('http://acme.com'))
+        with self.assertRaises(ValueError):
+            parse_query_expr('bbox:10,20')
+
+
+def _file_rec(day, size=1000, checksum_info=None):
+    file_name = 'ESACCI-SST-L4-%s.nc' % (day if day else 'clim')
+    start_time = datetime(2010, 1, day) if day else ''
+    end_time = datetime(2010, 1, day, 23, 59, 59) if day else ''
+    return [file_name, start_time, end_time, size,
+            {'Download': 'http://acme.com/' + file_name, 'Opendap': 'http://acme.com/dodsC/' + file_name},
+            checksum_info]
+
+
+class OdpFileListIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.temp_dir, 'f1', 'file-list-index.bin')
+        # Unsorted, with a file without start time and a file list record of a former version
+        self.file_list = [_file_rec(3), _file_rec(None), _file_rec(1, checksum_info=['md5', 'abc']),
+                          _file_rec(4), _file_rec(2)[0:5]]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _assert_index(self, index):
+        self.assertEqual(5, len(index))
+        self.assertEqual((datetime(2010, 1, 1), datetime(2010, 1, 4, 23, 59, 59)), index.temporal_coverage)
+
+        file_list = index.find()
+        self.assertEqual(['ESACCI-SST-L4-1.nc', 'ESACCI-SST-L4-2.nc', 'ESACCI-SST-L4-3.nc', 'ESACCI-SST-L4-4.nc',
+                          'ESACCI-SST-L4-clim.nc'], [file_rec[0] for file_rec in file_list])
+        self.assertEqual(_file_rec(1, checksum_info=['md5', 'abc']), file_list[0])
+        self.assertEqual(_file_rec(2), file_list[1])
+        self.assertEqual(_file_rec(None), file_list[4])
+
+        self.assertEqual(['ESACCI-SST-L4-2.nc', 'ESACCI-SST-L4-3.nc'],
+                         [file_rec[0] for file_rec in index.find(datetime(2010, 1, 2), datetime(2010, 1, 3))])
+        self.assertEqual(['ESACCI-SST-L4-3.nc', 'ESACCI-SST-L4-4.nc'],
+                         [file_rec[0] for file_rec in index.find(datetime(2010, 1, 2, 12))])
+        self.assertEqual(['ESACCI-SST-L4-1.nc'],
+                         [file_rec[0] for file_rec in index.find(end=datetime(2010, 1, 1, 12))])
+        self.assertEqual([], index.find(datetime(2011, 1, 1), datetime(2011, 12, 31)))
+
+    def test_from_file_list(self):
+        self._assert_index(OdpFileListIndex.from_file_list(self.file_list))
+
+    def test_save_and_load(self):
+        OdpFileListIndex.from_file_list(self.file_list).save(self.index_file)
+        self._assert_index(OdpFileListIndex.load(self.index_file))
+
+    def test_empty(self):
+        OdpFileListIndex.from_file_list([]).save(self.index_file)
+        index = OdpFileListIndex.load(self.index_file)
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.temporal_coverage)
+        self.assertEqual([], index.find())
+        self.assertEqual([], index.find(datetime(2010, 1, 1)))
+
+    def test_load_invalid(self):
+        self.assertIsNone(OdpFileListIndex.load(self.index_file))
+        os.makedirs(os.path.dirname(self.index_file))
+        with open(self.index_file, 'w') as fp:
+            fp.write('[]')
+        self.assertIsNone(OdpFileListIndex.load(self.index_file))
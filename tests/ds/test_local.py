@@ -6,7 +6,7 @@ import unittest.mock
 import datetime
 import shutil
 import json
-from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, DataStoreNotice
+from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, DataStoreNotice, open_xarray_dataset
 from cate.core.types import PolygonLike, TimeRangeLike, VarNamesLike
 from cate.ds.local import LocalDataStore, LocalDataSource
 from cate.ds.esa_cci_odp import EsaCciOdpDataStore
@@ -97,6 +97,39 @@ class LocalDataStoreTest(unittest.TestCase):
         data_sources = self.data_store.query()
         self.assertEqual(len(data_sources), 3)
 
+    def test_add_pattern_and_open_using_reference_index(self):
+        from tests.core.test_refindex import _write_daily_files
+
+        data_dir = os.path.join(self.tmp_dir, 'data')
+        os.mkdir(data_dir)
+        _write_daily_files(data_dir)
+
+        new_ds = self.data_store.add_pattern('sst', os.path.join(data_dir, '*.nc'))
+        # Files are indexed when they are opened
+        self.assertFalse(os.path.isfile(self.data_store.get_reference_index_file(new_ds.id)))
+
+        with unittest.mock.patch('cate.ds.local.get_use_dataset_reference_index', return_value=True):
+            with unittest.mock.patch('cate.ds.local.open_xarray_dataset') as m:
+                ds = new_ds.open_dataset(var_names=['sst'])
+                self.assertEqual(0, m.call_count)
+            self.assertEqual(['sst'], list(ds.data_vars))
+            self.assertEqual(4, ds.dims['time'])
+            self.assertEqual([1., 2., 3., 4.], list(ds.sst.mean(dim=('lat', 'lon')).values))
+            self.assertTrue(os.path.isfile(self.data_store.get_reference_index_file(new_ds.id)))
+
+            # If the references cannot be opened, the files are opened instead
+            with unittest.mock.patch('cate.core.refindex.open_references', side_effect=ValueError('stale')):
+                ds = new_ds.open_dataset(var_names=['sst'])
+            self.assertEqual([1., 2., 3., 4.], list(ds.sst.mean(dim=('lat', 'lon')).values))
+
+        # The reference index is not used by default
+        with unittest.mock.patch('cate.ds.local.open_xarray_dataset', wraps=open_xarray_dataset) as m:
+            new_ds.open_dataset(var_names=['sst'])
+            self.assertEqual(1, m.call_count)
+
+        self.data_store.remove_data_source(new_ds)
+        self.assertFalse(os.path.isfile(self.data_store.get_reference_index_file(new_ds.id)))
+
     def test__repr_html(self):
         html = self.data_store._repr_html_()
         self.assertEqual(524, len(html), html)
@@ -289,6 +322,11 @@ class LocalDataSourceTest(unittest.TestCase):
     def tearDown(self):
         DATA_STORE_REGISTRY.add_data_store(self._existing_local_data_store)
         shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        # Remove reference indexes written when opening data sources of the test data store
+        for data_source in self._local_data_store.query():
+            reference_index_file = self._local_data_store.get_reference_index_file(data_source.id)
+            if os.path.isfile(reference_index_file):
+                os.remove(reference_index_file)
 
     def test_data_store(self):
         self.assertIs(self.ds1.data_store, self._dummy_store)
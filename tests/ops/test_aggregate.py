@@ -3,6 +3,7 @@ Tests for aggregation operations
 """
 from unittest import TestCase
 
+import dask
 import xarray as xr
 import pandas as pd
 import numpy as np
@@ -76,6 +77,55 @@ class TestLTA(TestCase):
         # self.assertEqual(actual.time.attrs['climatology'],
         #                 'climatology_bounds')
 
+    def test_values(self):
+        """
+        Test that chunked datasets are averaged correctly
+        """
+        time = pd.date_range('2000-01-01', '2003-12-31')
+        first = np.random.random([len(time), 4, 8]).astype(np.float32)
+        first[0:40, 0, 0] = np.nan
+        first[:, 1, 1] = np.nan
+        ds = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], first),
+            'second': (['lat', 'lon', 'time'], np.arange(4 * 8 * len(time)).reshape([4, 8, len(time)])),
+            'lat': np.linspace(-88, 88, 4),
+            'lon': np.linspace(-178, 178, 8),
+            'time': time})
+        ds = adjust_temporal_attrs(ds).chunk({'time': 100, 'lat': 2})
+
+        monthly_ds = adjust_temporal_attrs(ds.resample(time='MS').mean('time'))
+        for expected_ds, actual_ds in ((ds.groupby('time.dayofyear').mean('time'),
+                                        long_term_average(ds)),
+                                       (monthly_ds.groupby('time.month').mean('time').rename(month='time'),
+                                        long_term_average(monthly_ds))):
+            self.assertEqual(actual_ds['first'].dtype, np.float32)
+            self.assertEqual(actual_ds['second'].dtype, np.float64)
+            for var in ('first', 'second'):
+                np.testing.assert_allclose(actual_ds[var].values,
+                                           expected_ds[var].transpose(*actual_ds[var].dims).values,
+                                           rtol=1e-5)
+        self.assertTrue(np.isnan(actual_ds['first'].values[:, 1, 1]).all())
+        self.assertFalse(np.isnan(actual_ds['first'].values[:, 0, 0]).any())
+
+    def test_group_chunks(self):
+        """
+        Test that the groups of daily LTAs are split into chunks bounded by dask's chunk size
+        """
+        time = pd.date_range('2000-01-01', '2001-12-31')
+        ds = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.random.random([len(time), 4, 8])),
+            'lat': np.linspace(-88, 88, 4),
+            'lon': np.linspace(-178, 178, 8),
+            'time': time})
+        ds = adjust_temporal_attrs(ds).chunk({'time': 100, 'lat': 2})
+
+        # 16 groups of 2 x 8 sums and counts per chunk
+        with dask.config.set({'array.chunk-size': '4KiB'}):
+            actual = long_term_average(ds)
+        self.assertEqual((16,) * 22 + (14,), actual['first'].chunks[0])
+        np.testing.assert_allclose(actual['first'].values,
+                                   ds.groupby('time.dayofyear').mean('time')['first'].values)
+
     def test_general(self):
         """
         Test creating a 'general' LTA dataset
@@ -276,6 +326,38 @@ class TestTemporalAggregation(TestCase):
         actual = temporal_aggregation(ds, custom_resolution='4M', monitor=m)
         self.assertTrue(actual.broadcast_equals(ex))
 
+    def test_methods(self):
+        """
+        Test that all methods aggregate chunked datasets with missing values like resample does
+        """
+        time = pd.date_range('2000-01-01', '2001-12-31')
+        first = np.random.random([4, 8, len(time)]).astype(np.float32)
+        first[0, 0, 0:50] = np.nan
+        first[1, 1, :] = np.nan
+        first[2, 2, ::3] = np.nan
+        ds = xr.Dataset({
+            'first': (['lat', 'lon', 'time'], first),
+            'second': (['time', 'lat'], np.random.randint(0, 100, [len(time), 4]).astype(np.int32)),
+            'lat': np.linspace(-88, 88, 4),
+            'lon': np.linspace(-178, 178, 8),
+            'time': time})
+        # Leave out April 2000
+        ds = adjust_temporal_attrs(ds.isel(time=np.r_[0:91, 121:len(time)])).chunk({'time': 37, 'lat': 2})
+
+        for method in ('mean', 'min', 'max', 'sum', 'prod', 'std', 'var', 'first', 'last'):
+            for output_resolution in ('month', 'season'):
+                freq = 'MS' if output_resolution == 'month' else 'QS-DEC'
+                expected = getattr(ds.resample(time=freq), method)('time')
+                actual = temporal_aggregation(ds, method=method, output_resolution=output_resolution)
+                np.testing.assert_equal(actual.time.values, expected.time.values)
+                for var in ('first', 'second'):
+                    self.assertEqual(actual[var].dims, ds[var].dims)
+                    self.assertEqual(actual[var].dtype, expected[var].dtype)
+                    np.testing.assert_allclose(actual[var].values,
+                                               expected[var].transpose(*actual[var].dims).values,
+                                               rtol=1e-5)
+                self.assertEqual(actual['first'].attrs['cell_methods'], 'time: {} within years'.format(method))
+
     def test_8days(self):
         """
         Test nominal execution with a 8 Days frequency input dataset
@@ -8,6 +8,7 @@ when using default upsampling/downsampling methods.
 
 from unittest import TestCase
 
+import dask
 import numpy as np
 import xarray as xr
 from numpy.testing import assert_almost_equal, assert_array_equal
@@ -15,7 +16,7 @@ from numpy.testing import assert_almost_equal, assert_array_equal
 from cate.core.op import OP_REGISTRY
 from cate.util.misc import object_to_qualified_name
 
-from cate.ops import coregister
+from cate.ops import coregister, regrid
 from cate.ops.coregistration import _find_intersection
 from ..util.test_monitor import RecordingMonitor
 
@@ -618,6 +619,28 @@ class TestCoregistration(TestCase):
 
         assert_almost_equal(ds_fine_resampled['first'].values, expected['first'].values)
 
+    def test_chunk_size(self):
+        """
+        Test that the chunks of the resampled arrays are bounded by dask's chunk size
+        """
+        ds_fine = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.array([np.eye(4, 8)] * 10)),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': np.arange(10)})
+        ds_coarse = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.array([np.eye(3, 6)] * 10)),
+            'lat': np.linspace(-60, 60, 3),
+            'lon': np.linspace(-150, 150, 6),
+            'time': np.arange(10)}).chunk(chunks={'lat': 3, 'lon': 3})
+
+        expected = coregister(ds_fine, ds_coarse)
+        # A resampled time step occupies 4 * 8 * 8 = 256 bytes
+        with dask.config.set({'array.chunk-size': '1KiB'}):
+            actual = coregister(ds_fine, ds_coarse)
+        self.assertEqual(((4, 4, 2), (4,), (8,)), actual['first'].chunks)
+        assert_almost_equal(actual['first'].values, expected['first'].values)
+
     def test_same_grid(self):
         """
         Test the case when both datasets already have the same geospatial definition
@@ -645,3 +668,48 @@ class TestCoregistration(TestCase):
         ds_coreg = coregister(ds_subset, ds_fine, monitor=rm)
         self.assertEqual([], rm.records)
         assert_almost_equal(ds_coreg['first'].values, ds_subset['first'].values)
+
+
+class TestRegrid(TestCase):
+    """
+    Test regridding onto a global grid of a given resolution
+    """
+    def test_nominal(self):
+        ds = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.array([np.eye(4, 8), np.eye(4, 8)])),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': np.array([1, 2])})
+
+        ds_regridded = regrid(ds, resolution=22.5)
+        assert_almost_equal(ds_regridded['lat'].values, np.linspace(-78.75, 78.75, 8))
+        assert_almost_equal(ds_regridded['lon'].values, np.linspace(-168.75, 168.75, 16))
+        self.assertEqual(ds_regridded['first'].shape, (2, 8, 16))
+
+        # Back to the original grid
+        ds_regridded = regrid(ds_regridded, resolution=45)
+        assert_almost_equal(ds_regridded['lat'].values, ds['lat'].values)
+        assert_almost_equal(ds_regridded['lon'].values, ds['lon'].values)
+
+        ds_regridded = regrid(ds, resolution=90, method_ds='first')
+        assert_almost_equal(ds_regridded['first'].values, np.array([np.eye(2, 4), np.eye(2, 4)]))
+
+    def test_error(self):
+        ds = xr.Dataset({
+            'first': (['lat', 'lon'], np.eye(4, 8)),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8)})
+
+        with self.assertRaises(ValueError) as cm:
+            regrid(ds, resolution=7)
+        self.assertIn('integer number of pixels', str(cm.exception))
+
+    def test_registered(self):
+        reg_op = OP_REGISTRY.get_op(object_to_qualified_name(regrid))
+        ds = xr.Dataset({
+            'first': (['lat', 'lon'], np.eye(4, 8)),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8)})
+
+        ds_regridded = reg_op(ds=ds, resolution=90)
+        assert_almost_equal(ds_regridded['first'].values, regrid(ds, resolution=90)['first'].values)
@@ -209,6 +209,37 @@ class TestPearson(TestCase):
         self.assertTrue(np.all(np.isclose(correlation['p_value'].values,
                                           pv_sp)))
 
+    def test_chunked(self):
+        """
+        Test that datasets chunked along time are correlated pixel by pixel
+        """
+        x_3d = np.random.random((20, 4, 8))
+        y_3d = x_3d * 0.5 + np.random.random((20, 4, 8))
+        y_3d[:, 1, 1] = 2.
+
+        ds1 = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], x_3d),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': np.arange(20)}).chunk(chunks={'time': 7, 'lat': 2})
+
+        ds2 = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], y_3d),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': np.arange(20)}).chunk(chunks={'time': 5, 'lon': 4})
+
+        correlation = pearson_correlation(ds1, ds2, 'first', 'first')
+        self.assertIsNotNone(correlation['corr_coef'].chunks)
+        corr_coef = correlation['corr_coef'].values
+        p_value = correlation['p_value'].values
+        for i, j in ((0, 0), (2, 5), (3, 7)):
+            cc_sp, pv_sp = pearsonr(x_3d[:, i, j], y_3d[:, i, j])
+            self.assertTrue(np.isclose(corr_coef[i, j], cc_sp))
+            self.assertTrue(np.isclose(p_value[i, j], pv_sp))
+        # Constant time series can not be correlated
+        self.assertTrue(np.isnan(corr_coef[1, 1]))
+
     def test_broadcasting(self):
         """
         Test a (3d, 1d) input pair
@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+from numpy.testing import assert_almost_equal
+
+import cate.ops.resampling as rs
+from cate.ops.regridding import Regridder, get_regridder, _MAX_NUM_REGRIDDERS
+
+from .test_resample_2d import SRC
+
+
+class RegridderTest(unittest.TestCase):
+    def test_regrid(self):
+        src = np.array([SRC, np.array(SRC) * 2.])
+        src[1, 0, 0] = np.nan
+        for ds_method in (rs.DS_FIRST, rs.DS_MEAN, rs.DS_MODE, rs.DS_STD):
+            for us_method in (rs.US_NEAREST, rs.US_LINEAR):
+                regridder = Regridder((4, 4), (2, 8), ds_method, us_method)
+                self.assertEqual(regridder.src_shape, (4, 4))
+                self.assertEqual(regridder.shape, (2, 8))
+                actual = regridder.regrid(src)
+                self.assertEqual(actual.shape, (2, 2, 8))
+                tables = rs.get_resampling_tables(4, 4, 8, 2, ds_method, us_method)
+                assert_almost_equal(actual, rs.resample_3d(src, tables))
+        with self.assertRaises(ValueError):
+            Regridder((4, 4), (2, 2)).regrid(np.zeros((2, 8, 8)))
+
+    def test_get_regridder(self):
+        regridder = get_regridder((4, 4), (2, 2))
+        self.assertIs(get_regridder((4, 4), (2, 2), rs.DS_MEAN, rs.US_LINEAR), regridder)
+        self.assertIsNot(get_regridder((4, 4), (2, 2), rs.DS_MODE), regridder)
+        self.assertIsNot(get_regridder((4, 4), (2, 3)), regridder)
+        assert_almost_equal(regridder.regrid(np.array(SRC)), [[1.0, 2.5], [3.5, 3.0]])
+
+    def test_get_regridder_drops_least_recently_used(self):
+        regridder = get_regridder((4, 4), (2, 2))
+        others = [get_regridder((4, 4), (2, 4 + i)) for i in range(_MAX_NUM_REGRIDDERS - 1)]
+        # Using a regridder again keeps it
+        self.assertIs(get_regridder((4, 4), (2, 2)), regridder)
+        get_regridder((4, 4), (3, 3))
+        self.assertIs(get_regridder((4, 4), (2, 2)), regridder)
+        self.assertIsNot(get_regridder((4, 4), (2, 4)), others[0])
+        self.assertIs(get_regridder((4, 4), (2, 6)), others[2])
@@ -82,3 +82,27 @@ class Resample2dTest(unittest.TestCase):
                           8, 2, rs.DS_MEAN, rs.US_NEAREST,
                           [[1., 1., 1., 1., 2., 2., 3., 3.],
                            [3.5, 3.5, 3.5, 3.5, 3., 3., 3., 3.]])
+
+    def test_resample_3d(self):
+        src = np.array([SRC, np.array(SRC) * 2.])
+        for w, h in ((2, 2), (3, 2), (8, 2), (8, 8), (4, 4)):
+            for ds_method in (rs.DS_FIRST, rs.DS_LAST, rs.DS_MEAN, rs.DS_MODE, rs.DS_VAR, rs.DS_STD):
+                for us_method in (rs.US_NEAREST, rs.US_LINEAR):
+                    tables = rs.get_resampling_tables(4, 4, w, h, ds_method, us_method)
+                    actual = rs.resample_3d(src, tables)
+                    self.assertEqual(actual.shape, (2, h, w))
+                    for i in range(2):
+                        assert_almost_equal(actual[i], rs.resample_2d(src[i], w, h,
+                                                                      ds_method=ds_method,
+                                                                      us_method=us_method))
+
+    def test_resample_3d_invalid(self):
+        src = np.array([SRC])
+        src[0, 0:2, 0:2] = np.nan
+        actual = rs.resample_3d(src, rs.get_resampling_tables(4, 4, 2, 2, rs.DS_MEAN))
+        assert_almost_equal(actual, [[[np.nan, 2.5], [3.5, 3.]]])
+        actual = rs.resample_3d(src, rs.get_resampling_tables(4, 4, 8, 8, us_method=rs.US_NEAREST))
+        self.assertTrue(np.isnan(actual[0, 0:4, 0:4]).all())
+        self.assertFalse(np.isnan(actual[0, 4:, :]).any())
+        with self.assertRaises(ValueError):
+            rs.resample_3d(src, rs.get_resampling_tables(8, 8, 2, 2))
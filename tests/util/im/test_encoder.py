@@ -0,0 +1,73 @@
+import io
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image
+
+from cate.util.im.encoder import TileEncoder, get_tile_encoder, negotiate_tile_encoder, is_format_supported
+
+
+class TileEncoderTest(TestCase):
+    def test_id(self):
+        self.assertEqual('png', TileEncoder().id)
+        self.assertEqual('png-z1', TileEncoder(compress_level=1).id)
+        self.assertEqual('png-p-z1', TileEncoder(compress_level=1, palette=True).id)
+        self.assertEqual('webp-lossless', TileEncoder('WEBP').id)
+        self.assertEqual('webp-q80', TileEncoder('webp', quality=80).id)
+        self.assertEqual('image/webp', TileEncoder('webp').mime_type)
+        self.assertEqual('.png', TileEncoder().ext)
+        with self.assertRaises(ValueError):
+            TileEncoder('GIF')
+        with self.assertRaises(ValueError):
+            TileEncoder(compress_level=10)
+
+    def test_encode_rgba(self):
+        rgba = np.zeros((16, 32, 4), dtype=np.uint8)
+        rgba[:, :, 0] = np.arange(32)
+        for encoder in [TileEncoder(), TileEncoder(compress_level=1), TileEncoder(compress_level=0)]:
+            image = Image.open(io.BytesIO(encoder.encode_rgba(rgba)))
+            self.assertEqual('PNG', image.format)
+            np.testing.assert_equal(np.asarray(image.convert('RGBA')), rgba)
+
+    def test_encode_indexed_as_palette(self):
+        # A categorical color table resampled to 256 colors, followed by the transparent color
+        categories = np.array([[0, 0, 0, 255], [255, 0, 0, 255], [0, 255, 0, 255]], dtype=np.uint8)
+        colors = np.concatenate((np.repeat(categories, [86, 85, 85], axis=0), np.zeros((1, 4), dtype=np.uint8)))
+        indexes = np.array([[0, 100, 200, 256], [255, 86, 85, 256]])
+
+        encoder = TileEncoder(palette=True)
+        image = Image.open(io.BytesIO(encoder.encode_indexed(indexes, colors)))
+        self.assertEqual('P', image.mode)
+        np.testing.assert_equal(np.asarray(image.convert('RGBA')), colors[indexes])
+
+        # Too many distinct colors for a palette
+        colors = np.zeros((300, 4), dtype=np.uint8)
+        colors[:, 0:2] = np.arange(300).reshape((300, 1)).view(np.uint8).reshape((300, -1))[:, 0:2]
+        image = Image.open(io.BytesIO(encoder.encode_indexed(indexes, colors)))
+        self.assertEqual('RGBA', image.mode)
+        np.testing.assert_equal(np.asarray(image), colors[indexes])
+
+    def test_encode_webp(self):
+        encoder = get_tile_encoder('webp')
+        if encoder is None:
+            self.skipTest('Pillow has been built without WebP support')
+        rgba = np.full((16, 16, 4), 128, dtype=np.uint8)
+        image = Image.open(io.BytesIO(encoder.encode_rgba(rgba)))
+        self.assertEqual('WEBP', image.format)
+        np.testing.assert_equal(np.asarray(image.convert('RGBA')), rgba)
+
+
+class NegotiateTileEncoderTest(TestCase):
+    def test_requested_by_name(self):
+        self.assertEqual('png', negotiate_tile_encoder('png', 'image/webp').id)
+        self.assertEqual('png-p-z1', negotiate_tile_encoder('png-fast', None).id)
+        self.assertIsNone(negotiate_tile_encoder('gif', None))
+
+    def test_accept(self):
+        self.assertEqual('png-p-z1', negotiate_tile_encoder(None, None, 'png-fast').id)
+        self.assertEqual('png-p-z1', negotiate_tile_encoder(None, '*/*', 'png-fast').id)
+        self.assertEqual('png', negotiate_tile_encoder(None, 'image/jpeg', 'png-fast').id)
+        if is_format_supported('WEBP'):
+            accept = 'image/webp,image/apng,image/*;q=0.8'
+            self.assertEqual('webp-lossless', negotiate_tile_encoder(None, accept, 'webp, png-fast').id)
+            self.assertEqual('png-p-z1', negotiate_tile_encoder(None, 'image/png', 'webp, png-fast').id)
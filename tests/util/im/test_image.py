@@ -1,10 +1,12 @@
+import io
 from unittest import TestCase
 
+import PIL.Image
 import numpy as np
 
-from cate.util.im import TilingScheme, GeoExtent
+from cate.util.im import TilingScheme, GeoExtent, TileEncoder
 from cate.util.im.image import ImagePyramid, OpImage, create_ndarray_downsampling_image, \
-    TransformArrayImage, FastNdarrayDownsamplingImage
+    TransformArrayImage, FastNdarrayDownsamplingImage, QuantizedTile, ColorMappedRgbaImage
 from cate.util.im.utils import aggregate_ndarray_mean
 
 
@@ -169,6 +171,78 @@ class NdarrayImageTest(TestCase):
                                              [3., 4., 5., np.nan],
                                              [np.nan, np.nan, np.nan, np.nan]]))
 
+    def test_quantize(self):
+        a = np.array([[0.5, np.nan, 1.5, 2.5],
+                      [3.5, 4.5, 5.5, 6.5]], dtype=np.float32)
+        source_image = FastNdarrayDownsamplingImage(a, (2, 2), 0)
+        target_image = TransformArrayImage(source_image, quantize=True)
+
+        tile = target_image.get_tile(0, 0)
+        self.assertIsInstance(tile, QuantizedTile)
+        self.assertEqual((2, 2), tile.shape)
+        self.assertEqual([[False, True], [False, False]], tile.mask.tolist())
+        np.testing.assert_almost_equal(tile.to_array().filled(-1.), np.array([[0.5, -1.], [3.5, 4.5]]), decimal=4)
+
+
+class QuantizedTileTest(TestCase):
+    def test_float(self):
+        a = np.linspace(-10., 30., 100 * 100).reshape((100, 100))
+        tile = QuantizedTile.from_array(a)
+        self.assertEqual(np.uint16, tile.data.dtype)
+        self.assertIsNone(tile.mask)
+        self.assertEqual(100 * 100 * 2, tile.nbytes)
+        self.assertEqual(0, tile.data.min())
+        self.assertEqual(QuantizedTile.MAX_VALUE, tile.data.max())
+        np.testing.assert_allclose(tile.to_array(), a, atol=40. / QuantizedTile.MAX_VALUE)
+
+    def test_int_is_exact(self):
+        a = np.array([[10, 20, 30], [0, 210, 220]], dtype=np.uint8)
+        tile = QuantizedTile.from_array(np.ma.masked_equal(a, 0))
+        self.assertEqual([[False, False, False], [True, False, False]], tile.mask.tolist())
+        self.assertEqual(1.0, tile.scale)
+        self.assertEqual(10.0, tile.offset)
+        self.assertEqual([[10, 20, 30], [0, 210, 220]], tile.to_array().filled(0).astype(np.uint8).tolist())
+
+    def test_all_masked_and_constant(self):
+        tile = QuantizedTile.from_array(np.full((2, 2), np.nan))
+        self.assertTrue(tile.mask.all())
+        tile = QuantizedTile.from_array(np.full((2, 2), 3.0))
+        self.assertIsNone(tile.mask)
+        self.assertEqual([[3., 3.], [3., 3.]], tile.to_array().tolist())
+
+
+class ColorMappedRgbaImageTest(TestCase):
+    def test_quantized_tiles_give_same_colors(self):
+        a = np.linspace(270., 310., 64 * 64, dtype=np.float32).reshape((64, 64))
+        a[10:20, 10:20] = np.nan
+        source_image = FastNdarrayDownsamplingImage(a, (64, 64), 0)
+        for value_range in [(270., 310.), (280., 300.), (290., 290.)]:
+            expected_image = ColorMappedRgbaImage(TransformArrayImage(source_image),
+                                                  value_range=value_range, cmap_name='viridis')
+            actual_image = ColorMappedRgbaImage(TransformArrayImage(source_image, quantize=True),
+                                                value_range=value_range, cmap_name='viridis')
+            expected = np.asarray(expected_image.get_tile(0, 0), dtype=np.int32)
+            actual = np.asarray(actual_image.get_tile(0, 0), dtype=np.int32)
+            self.assertEqual(expected.shape, actual.shape)
+            np.testing.assert_equal(actual[10:20, 10:20, 3], 0)
+            # Quantization may shift values at color boundaries to the neighbouring color
+            self.assertLessEqual(np.abs(expected - actual).max(), 8)
+
+    def test_encoder(self):
+        a = np.array([[10, 20, 210], [220, 10, 0]], dtype=np.uint8)
+        source_image = FastNdarrayDownsamplingImage(a, (3, 2), 0)
+        image = ColorMappedRgbaImage(TransformArrayImage(source_image, no_data_value=0, quantize=True),
+                                     value_range=(0., 220.), cmap_name='land_cover_cci',
+                                     encode=True, encoder=TileEncoder(palette=True))
+        self.assertEqual('PNG', image.format)
+        encoded_image = PIL.Image.open(io.BytesIO(image.get_tile(0, 0)))
+        self.assertEqual('P', encoded_image.mode)
+        rgba = np.asarray(encoded_image.convert('RGBA'))
+        self.assertEqual((2, 3, 4), rgba.shape)
+        np.testing.assert_equal(rgba[0, 0], rgba[1, 1])
+        self.assertEqual(0, rgba[1, 2, 3])
+        self.assertEqual(255, rgba[0, 2, 3])
+
 
 class ImagePyramidTest(TestCase):
     def test_create_from_image(self):
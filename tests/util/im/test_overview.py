@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+
+from cate.util.im import TilingScheme, GeoExtent
+from cate.util.im.image import ImagePyramid
+from cate.util.im.overview import write_overviews, open_overviews
+
+
+class OverviewTest(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'overviews', 'sst.zarr')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_mean(self):
+        array = np.arange(0, 24 * 40, dtype=np.float64).reshape((24, 40))
+        array[0:2, 0:2] = -999.
+        array[0, 2] = np.nan
+        write_overviews(array, self.path, 2, no_data_value=-999.)
+
+        overviews = open_overviews(self.path, shape=array.shape)
+        self.assertEqual(2, len(overviews))
+        self.assertEqual((12, 20), overviews[0].shape)
+        self.assertEqual((6, 10), overviews[1].shape)
+        self.assertEqual(np.float32, overviews[0].dtype)
+
+        overview_1 = overviews[0][...]
+        self.assertTrue(np.isnan(overview_1[0, 0]))
+        self.assertAlmostEqual(np.mean([3., 42., 43.]), overview_1[0, 1], places=4)
+        self.assertAlmostEqual(np.mean([84., 85., 124., 125.]), overview_1[1, 2], places=4)
+        overview_2 = overviews[1][...]
+        self.assertAlmostEqual(np.mean(array[4:8, 4:8]), overview_2[1, 1], places=4)
+
+        self.assertEqual([], [name for name in os.listdir(os.path.dirname(self.path)) if name.startswith('.')])
+
+    def test_mode_with_odd_shape(self):
+        array = np.ones((9, 11), dtype=np.uint8)
+        array[0:2, 0:3] = 5
+        write_overviews(array, self.path, 3, aggregation='mode', no_data_value=0)
+
+        overviews = open_overviews(self.path)
+        self.assertEqual([(4, 5), (2, 2), (1, 1)], [overview.shape for overview in overviews])
+        self.assertEqual(np.uint8, overviews[0].dtype)
+        np.testing.assert_equal(overviews[0][0, :], np.array([5, 5, 1, 1, 1]))
+        self.assertEqual(1, overviews[2][0, 0])
+
+    def test_open_invalid(self):
+        self.assertIsNone(open_overviews(self.path))
+        write_overviews(np.zeros((8, 8)), self.path, 1)
+        self.assertIsNotNone(open_overviews(self.path, shape=(8, 8)))
+        self.assertIsNone(open_overviews(self.path, shape=(8, 16)))
+        with self.assertRaises(ValueError):
+            write_overviews(np.zeros((8, 8)), self.path, 4)
+
+    def test_pyramid_reads_overviews(self):
+        width, height = 2048, 1024
+        array = np.zeros((height, width), dtype=np.float32)
+        array[0::2, :] = 2.
+        tiling_scheme = TilingScheme.create(width, height, 256, 256, geo_extent=GeoExtent())
+        num_levels = tiling_scheme.num_levels
+        self.assertGreater(num_levels, 1)
+        tile_width, tile_height = tiling_scheme.tile_size
+        write_overviews(array, self.path, num_levels - 1)
+
+        pyramid = ImagePyramid.create_from_array(array, tiling_scheme, overviews=open_overviews(self.path))
+        self.assertEqual(pyramid.get_level_image(0).size, (width >> (num_levels - 1), height >> (num_levels - 1)))
+        # Lower levels show the mean, the full resolution level the original values
+        np.testing.assert_equal(pyramid.get_tile(0, 0, 0), np.full((tile_height, tile_width), 1.))
+        np.testing.assert_equal(pyramid.get_tile(0, 0, num_levels - 1)[0:2, 0], np.array([2., 0.]))
+
+        # Without overviews, lower levels are sampled from the full resolution array
+        pyramid = ImagePyramid.create_from_array(array, tiling_scheme)
+        np.testing.assert_equal(pyramid.get_tile(0, 0, 0), np.full((tile_height, tile_width), 2.))
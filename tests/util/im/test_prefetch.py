@@ -0,0 +1,110 @@
+import threading
+import time
+from unittest import TestCase
+
+from cate.util.coalesce import CoalescingExecutor
+from cate.util.im.prefetch import TilePrefetcher, _get_candidates
+
+
+class _LevelImage:
+    def __init__(self, num_tiles):
+        self.num_tiles = num_tiles
+
+
+class _Pyramid:
+    def __init__(self, num_levels=3):
+        self.num_levels = num_levels
+        self.tiles = []
+        self.lock = threading.Lock()
+
+    def get_level_image(self, z_index):
+        return _LevelImage((2 << z_index, 1 << z_index))
+
+    def get_tile(self, tile_x, tile_y, z_index):
+        with self.lock:
+            self.tiles.append((tile_x, tile_y, z_index))
+
+
+class GetCandidatesTest(TestCase):
+    def test_candidates(self):
+        pyramid = _Pyramid()
+        self.assertEqual([(0, 0, 1), (2, 0, 1), (0, 1, 1), (1, 1, 1), (2, 1, 1),
+                          (0, 0, 0),
+                          (2, 0, 2), (3, 0, 2), (2, 1, 2), (3, 1, 2)],
+                         _get_candidates(pyramid, (1, 0, 1)))
+
+    def test_candidates_in_direction_of_movement(self):
+        pyramid = _Pyramid()
+        candidates = _get_candidates(pyramid, (1, 0, 1), last_tile_index=(0, 0, 1))
+        self.assertEqual([(2, 0, 1), (2, 1, 1), (1, 1, 1), (0, 0, 1), (0, 1, 1)], candidates[0:5])
+        # The finest level has no children
+        self.assertEqual((2, 1, 1), _get_candidates(pyramid, (5, 3, 2))[-1])
+
+
+class TilePrefetcherTest(TestCase):
+    def test_prefetch(self):
+        prefetcher = TilePrefetcher(max_pending=4)
+        pyramid = _Pyramid()
+        try:
+            with prefetcher.foreground():
+                prefetcher.notify_request('p', pyramid, 1, 0, 1)
+                prefetcher.notify_request('p', pyramid, 2, 0, 1)
+                # No prefetches while requested tiles are computed
+                time.sleep(0.05)
+                self.assertEqual([], pyramid.tiles)
+                self.assertEqual(4, prefetcher.num_pending)
+
+            for _ in range(100):
+                if prefetcher.num_prefetched == 4:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(4, prefetcher.num_prefetched)
+            self.assertEqual(0, prefetcher.num_pending)
+            # Most recently scheduled tiles first, the oldest are dropped, the requested tiles are never prefetched
+            self.assertEqual([(3, 0, 1), (3, 1, 1), (2, 1, 1), (1, 1, 1)], pyramid.tiles)
+        finally:
+            prefetcher.shutdown()
+
+    def test_prefetch_shares_computations_with_requests(self):
+        executor = CoalescingExecutor(max_workers=2)
+        prefetcher = TilePrefetcher(max_pending=1, executor=executor)
+        pyramid = _Pyramid()
+        pyramid.event = threading.Event()
+        get_tile = pyramid.get_tile
+
+        def get_tile_blocking(tile_x, tile_y, z_index):
+            pyramid.event.wait()
+            return get_tile(tile_x, tile_y, z_index)
+
+        pyramid.get_tile = get_tile_blocking
+        try:
+            with prefetcher.foreground():
+                prefetcher.notify_request('p', pyramid, 1, 0, 1)
+                prefetcher.notify_request('p', pyramid, 2, 0, 1)
+            for _ in range(100):
+                if executor.get_num_computations() == 1:
+                    break
+                time.sleep(0.01)
+            # A request for the tile being prefetched gets the same computation
+            future = executor.submit(('p', 3, 0, 1), get_tile, 3, 0, 1)
+            self.assertEqual(1, executor.get_num_computations())
+            pyramid.event.set()
+            future.result()
+            self.assertEqual([(3, 0, 1)], pyramid.tiles)
+        finally:
+            prefetcher.shutdown()
+            executor.shutdown()
+
+    def test_cancel(self):
+        prefetcher = TilePrefetcher()
+        try:
+            with prefetcher.foreground():
+                prefetcher.notify_request('p1', _Pyramid(), 1, 0, 1)
+                prefetcher.notify_request('p2', _Pyramid(), 1, 0, 1)
+                self.assertEqual(20, prefetcher.num_pending)
+                prefetcher.cancel('p1')
+                self.assertEqual(10, prefetcher.num_pending)
+                prefetcher.cancel()
+                self.assertEqual(0, prefetcher.num_pending)
+        finally:
+            prefetcher.shutdown()
@@ -0,0 +1,112 @@
+import threading
+from unittest import TestCase
+
+from cate.util.im.registry import PyramidRegistry
+
+
+class _Pyramid:
+    def __init__(self, name):
+        self.name = name
+        self.disposed = False
+
+    def dispose(self):
+        self.disposed = True
+
+
+class PyramidRegistryTest(TestCase):
+    def test_get_and_put(self):
+        registry = PyramidRegistry(capacity=100)
+        self.assertIsNone(registry.get('a'))
+        pyramid_a = _Pyramid('a')
+        self.assertIs(registry.put('a', pyramid_a, 10), pyramid_a)
+        self.assertIs(registry.get('a'), pyramid_a)
+        self.assertIn('a', registry)
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.size, 10)
+
+        # An already registered pyramid wins
+        self.assertIs(registry.put('a', _Pyramid('a2'), 10), pyramid_a)
+        self.assertEqual(registry.size, 10)
+
+    def test_lru_eviction(self):
+        registry = PyramidRegistry(capacity=100)
+        pyramids = {key: _Pyramid(key) for key in 'abcd'}
+        registry.put('a', pyramids['a'], 40)
+        registry.put('b', pyramids['b'], 40)
+        # Touch 'a', so 'b' is the least recently used one
+        registry.get('a')
+        registry.put('c', pyramids['c'], 40)
+        self.assertNotIn('b', registry)
+        self.assertIn('a', registry)
+        self.assertIn('c', registry)
+        self.assertEqual(registry.size, 80)
+        # Evicted pyramids are not disposed
+        self.assertFalse(pyramids['b'].disposed)
+
+        # A pyramid exceeding the capacity evicts all others, but is kept itself
+        registry.put('d', pyramids['d'], 200)
+        self.assertEqual(len(registry), 1)
+        self.assertIn('d', registry)
+        self.assertEqual(registry.size, 200)
+
+    def test_invalidate(self):
+        registry = PyramidRegistry(capacity=100)
+        pyramids = {key: _Pyramid(key) for key in 'abc'}
+        registry.put('a', pyramids['a'], 10, group=('ws', 'res_1'))
+        registry.put('b', pyramids['b'], 10, group=('ws', 'res_1'))
+        registry.put('c', pyramids['c'], 10, group=('ws', 'res_2'))
+
+        self.assertEqual(registry.invalidate(('ws', 'res_1')), 2)
+        self.assertEqual(len(registry), 1)
+        self.assertEqual(registry.size, 10)
+        self.assertTrue(pyramids['a'].disposed)
+        self.assertTrue(pyramids['b'].disposed)
+        self.assertFalse(pyramids['c'].disposed)
+        self.assertEqual(registry.invalidate(('ws', 'res_1')), 0)
+
+        registry.put('a', pyramids['a'], 10, group=('ws', 'res_2'))
+        registry.put('a-jet', pyramids['a'], 10, group=('ws', 'res_2'))
+        registry.put('a1-jet', pyramids['b'], 10, group=('ws', 'res_2'))
+        registry.put('ab', pyramids['b'], 10, group=('ws', 'res_2'))
+        self.assertEqual(registry.invalidate(('ws', 'res_2'), base_key='a'), 2)
+        self.assertNotIn('a', registry)
+        self.assertNotIn('a-jet', registry)
+        self.assertIn('a1-jet', registry)
+        self.assertIn('ab', registry)
+        self.assertIn('c', registry)
+
+        registry.clear()
+        self.assertEqual(len(registry), 0)
+        self.assertEqual(registry.size, 0)
+        self.assertFalse(pyramids['c'].disposed)
+
+    def test_get_or_create(self):
+        registry = PyramidRegistry(capacity=100)
+        num_calls = []
+
+        def factory():
+            num_calls.append(1)
+            return _Pyramid('a'), 10
+
+        pyramid = registry.get_or_create('a', factory)
+        self.assertIs(registry.get_or_create('a', factory), pyramid)
+        self.assertEqual(len(num_calls), 1)
+
+    def test_get_or_create_is_thread_safe(self):
+        registry = PyramidRegistry(capacity=100)
+        barrier = threading.Barrier(4)
+        results = []
+
+        def get_or_create():
+            barrier.wait()
+            results.append(registry.get_or_create('a', lambda: (_Pyramid('a'), 10)))
+
+        threads = [threading.Thread(target=get_or_create) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(pyramid is results[0] for pyramid in results))
+        self.assertEqual(registry.size, 10)
@@ -39,6 +39,21 @@ class ArrayTest(TestCase):
                                              [1.1, 1.1, 1.1],
                                              [1.1, 1.1, nan]]))
 
+    def test_aggregate_nanmean(self):
+        nan = np.nan
+        a = np.array([[1., 3., nan, nan],
+                      [nan, 2., nan, nan]])
+        b = utils.downsample_ndarray(a, aggregator=utils.aggregate_ndarray_nanmean)
+        np.testing.assert_equal(b, np.array([[2., nan]]))
+
+    def test_aggregate_mode(self):
+        a = np.array([[10, 20, 10, 20, 10, 20],
+                      [20, 20, 30, 40, 30, 10]], dtype=np.uint8)
+        b = utils.downsample_ndarray(a, aggregator=utils.aggregate_ndarray_mode)
+        self.assertEqual(b.dtype, np.uint8)
+        # majority, tie resolved in favour of the first value, all different
+        np.testing.assert_equal(b, np.array([[20, 10, 10]]))
+
 
 class GetChunkSizeTest(TestCase):
     def test_any_obj(self):
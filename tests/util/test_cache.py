@@ -1,8 +1,14 @@
 import os
 import shutil
+import threading
+import unittest.mock
 from unittest import TestCase
 
-from cate.util.cache import CacheStore, Cache, MemoryCacheStore, FileCacheStore
+import numpy as np
+from PIL import Image
+
+from cate.util.cache import CacheStore, Cache, MemoryCacheStore, FileCacheStore, MemoryBudget, \
+    POLICY_LRU, POLICY_MRU, POLICY_LFU, POLICY_RR, set_memory_budget
 
 
 class MemoryCacheStoreTest(TestCase):
@@ -33,6 +39,22 @@ class MemoryCacheStoreTest(TestCase):
         with self.assertRaises(ValueError):
             self.cache_store.restore_value('e', self.stored_value_b)
 
+    def test_value_sizes(self):
+        def get_size(value):
+            return self.cache_store.store_value('x', value)[1]
+
+        self.assertEqual(get_size(b'\x00' * 1000), 1033)
+        array = np.zeros((100, 200), dtype=np.float32)
+        self.assertEqual(get_size(array), 80000)
+        # A view keeps the whole array
+        self.assertEqual(get_size(array[0:10, 0:10]), 80000)
+        self.assertEqual(get_size(np.ma.masked_invalid(np.zeros((100, 200), dtype=np.float64))), 180000)
+        self.assertEqual(get_size(np.ma.MaskedArray(np.zeros((100, 200), dtype=np.float64))), 160000)
+        self.assertEqual(get_size(Image.new('RGBA', (256, 128))), 131072)
+        self.assertEqual(get_size(Image.new('RGB', (256, 128))), 131072)
+        self.assertEqual(get_size(Image.new('L', (256, 128))), 32768)
+        self.assertEqual(get_size(Image.new('P', (256, 128))), 33792)
+
     def test_discard_value(self):
         self.cache_store.discard_value('a', self.stored_value_a)
         self.cache_store.discard_value('b', self.stored_value_b)
@@ -188,3 +210,154 @@ class CacheTest(TestCase):
         self.assertEqual(cache.get_value('k5'), 'yyyy')
         self.assertEqual(cache.size, 600)
         self.assertEqual(cache_store.trace, 'can_load_from_key(k5);load_from_key(k5);restore(k5, S/yyyy);')
+
+    def test_policies(self):
+        def get_keys(policy):
+            cache = Cache(store=SizedCacheStore(), capacity=3, threshold=1.0, policy=policy)
+            for key in ['k1', 'k2', 'k3']:
+                cache.put_value(key, key)
+            for key in ['k1', 'k1', 'k3', 'k2', 'k3']:
+                cache.get_value(key)
+            cache.put_value('k4', 'k4')
+            cache.put_value('k5', 'k5')
+            self.assertEqual(cache.size, 3)
+            return cache.store.keys
+
+        # Least recently used, k1 then k2
+        self.assertEqual(get_keys(POLICY_LRU), {'k3', 'k4', 'k5'})
+        # Most recently used except the value just stored, k3 then k4
+        self.assertEqual(get_keys(POLICY_MRU), {'k1', 'k2', 'k5'})
+        # Least frequently used except the value just stored, k2 then k4
+        self.assertEqual(get_keys(POLICY_LFU), {'k1', 'k3', 'k5'})
+        # Random replacement never discards the value just stored
+        for _ in range(10):
+            keys = get_keys(POLICY_RR)
+            self.assertEqual(len(keys), 3)
+            self.assertIn('k5', keys)
+        # Any other policy function, here most frequently used first
+        self.assertEqual(get_keys(lambda item: -item.access_count), {'k2', 'k4', 'k5'})
+
+    def test_stats(self):
+        cache = Cache(store=SizedCacheStore(), capacity=2, threshold=1.0)
+        cache.put_value('k1', 'k1')
+        cache.put_value('k2', 'k2')
+        cache.get_value('k1')
+        cache.get_value('k1')
+        cache.get_value('k3')
+        cache.put_value('k3', 'k3')
+        stats = cache.stats
+        self.assertEqual(stats.hits, 2)
+        self.assertEqual(stats.misses, 1)
+        self.assertEqual(stats.evictions, 1)
+        self.assertEqual(stats.evicted_size, 1)
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.size, 2)
+
+    def test_parent_cache(self):
+        parent_cache = Cache(store=SizedCacheStore(), capacity=10, threshold=1.0)
+        cache = Cache(store=SizedCacheStore(), capacity=2, threshold=1.0, parent_cache=parent_cache)
+        for key in ['k1', 'k2', 'k3']:
+            cache.put_value(key, key)
+        self.assertEqual(cache.size, 2)
+        # Evicted values are moved to the parent cache
+        self.assertEqual(parent_cache.size, 1)
+        self.assertEqual(cache.get_value('k1'), 'k1')
+        cache.remove_value('k1')
+        self.assertIsNone(cache.get_value('k1'))
+
+    def test_concurrent_access(self):
+        cache = Cache(store=SizedCacheStore(), capacity=100, threshold=1.0, policy=POLICY_LFU)
+        errors = []
+
+        def run(thread_index):
+            try:
+                for i in range(2000):
+                    key = 'k%d' % ((i * (thread_index + 1)) % 150)
+                    if cache.get_value(key) is None:
+                        cache.put_value(key, key)
+                    elif i % 7 == 0:
+                        cache.remove_value(key)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(thread_index,)) for thread_index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertLessEqual(cache.size, 100)
+        self.assertEqual(cache.size, len(cache.store.keys))
+        self.assertEqual(cache.size, cache.stats.count)
+
+
+class MemoryBudgetTest(TestCase):
+    def tearDown(self):
+        set_memory_budget(None)
+
+    def test_shared_capacity(self):
+        cache_1 = Cache(store=SizedCacheStore(), capacity=10, threshold=1.0)
+        cache_2 = Cache(store=SizedCacheStore(), capacity=5, threshold=1.0)
+        file_cache = Cache(store=TracingCacheStore(), capacity=10, threshold=1.0)
+        set_memory_budget(MemoryBudget(capacity=8))
+
+        for i in range(6):
+            cache_1.put_value('k%d' % i, 'v')
+        file_cache.put_value('k', 'xxxx')
+        self.assertEqual(cache_1.size, 6)
+        self.assertEqual(file_cache.size, 400)
+
+        for i in range(4):
+            cache_2.put_value('k%d' % i, 'v')
+        # cache_2 is under the highest pressure, but its value just stored is kept
+        self.assertEqual(cache_1.size + cache_2.size, 8)
+        self.assertIn('k3', cache_2.store.keys)
+        # Caches of other stores don't count
+        self.assertEqual(file_cache.size, 400)
+
+        cache_1.put_value('k6', 'v')
+        self.assertEqual(cache_1.size + cache_2.size, 8)
+        self.assertIn('k6', cache_1.store.keys)
+
+    def test_max_rss_exceeded_by_other_memory(self):
+        cache_1 = Cache(store=SizedCacheStore(), capacity=10, threshold=1.0)
+        cache_2 = Cache(store=SizedCacheStore(), capacity=10, threshold=1.0)
+        for i in range(4):
+            cache_1.put_value('k%d' % i, 'v')
+            cache_2.put_value('k%d' % i, 'v')
+
+        memory_budget = MemoryBudget(max_rss=1000, rss_check_interval=3600)
+        process = unittest.mock.Mock()
+        # The RSS exceeds the budget by far more than the caches hold
+        process.memory_info.return_value.rss = 1000000
+        memory_budget._process = process
+        set_memory_budget(memory_budget)
+
+        # Not more than the caches' own size is discarded
+        self.assertEqual(memory_budget.relieve(), 8)
+        self.assertEqual(cache_1.size + cache_2.size, 0)
+
+        # Until the RSS is checked again, values are kept
+        for i in range(4):
+            cache_1.put_value('k%d' % i, 'v')
+        self.assertEqual(cache_1.size, 4)
+        self.assertEqual(process.memory_info.call_count, 1)
+
+
+class SizedCacheStore(MemoryCacheStore):
+    """A memory store of values of size one that keeps track of its keys."""
+
+    def __init__(self):
+        self.keys = set()
+        self.lock = threading.Lock()
+
+    def store_value(self, key, value):
+        with self.lock:
+            self.keys.add(key)
+        return [key, value], 1
+
+    def discard_value(self, key, stored_value):
+        super().discard_value(key, stored_value)
+        with self.lock:
+            self.keys.remove(key)
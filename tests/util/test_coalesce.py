@@ -0,0 +1,72 @@
+import threading
+import unittest
+
+from cate.util.coalesce import CoalescingExecutor
+
+
+class CoalescingExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.executor = CoalescingExecutor(max_workers=1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_same_key_is_computed_once(self):
+        event = threading.Event()
+        calls = []
+
+        def compute(value):
+            event.wait(5)
+            calls.append(value)
+            return value * 2
+
+        future1 = self.executor.submit('tile-0-0-0', compute, 21)
+        future2 = self.executor.submit('tile-0-0-0', compute, 21)
+        self.assertIs(future1, future2)
+        self.assertEqual(1, self.executor.get_num_computations())
+        event.set()
+        self.assertEqual(42, future1.result(5))
+        self.assertEqual([21], calls)
+        self.assertEqual(0, self.executor.get_num_computations())
+
+        future3 = self.executor.submit('tile-0-0-0', compute, 21)
+        self.assertIsNot(future1, future3)
+        self.assertEqual(42, future3.result(5))
+        self.assertEqual([21, 21], calls)
+
+    def test_abandoned_computation_is_cancelled(self):
+        started = threading.Event()
+        event = threading.Event()
+
+        def block():
+            started.set()
+            return event.wait(5)
+
+        blocking_future = self.executor.submit('blocking', block)
+        started.wait(5)
+
+        future1 = self.executor.submit('tile-0-0-0', lambda: 'tile')
+        future2 = self.executor.submit('tile-0-0-0', lambda: 'tile')
+        # one caller is still interested
+        self.assertFalse(self.executor.release('tile-0-0-0', future1))
+        self.assertFalse(future2.cancelled())
+        # no callers left
+        self.assertTrue(self.executor.release('tile-0-0-0', future2))
+        self.assertTrue(future2.cancelled())
+
+        # a running computation is not cancelled
+        self.assertFalse(self.executor.release('blocking', blocking_future))
+        event.set()
+        self.assertTrue(blocking_future.result(5))
+        self.assertEqual(0, self.executor.get_num_computations())
+
+    def test_errors_are_shared(self):
+        def compute():
+            raise ValueError('no data')
+
+        future1 = self.executor.submit('tile-0-0-0', compute)
+        future2 = self.executor.submit('tile-0-0-0', compute)
+        with self.assertRaises(ValueError):
+            future1.result(5)
+        with self.assertRaises(ValueError):
+            future2.result(5)
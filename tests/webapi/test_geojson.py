@@ -1,5 +1,7 @@
+import json
 import os.path
 from collections import OrderedDict
+from io import StringIO
 from unittest import TestCase
 
 import fiona
@@ -185,6 +187,67 @@ class WriteFeatureCollectionTest(TestCase):
         num_written = write_feature_collection(collection, string_io, conservation_ratio=0)
         self.assertEqual(num_written, 175)
 
+    def test_batch_equals_single_geometry_transforms(self):
+        geometries = [('Point', (12.0, 53.0)),
+                      ('LineString', [(12.0, 53.0), (13.0, 54.0), (13.1, 54.5), (13.0, 56.0)]),
+                      ('MultiLineString', [[(12.0, 53.0), (13.0, 54.0), (13.0, 56.0)],
+                                           [(16.0, 53.0), (17.0, 54.0), (17.2, 54.1), (17.0, 56.0)]]),
+                      ('MultiPolygon', LARGE_MULTI_POLYGON)]
+
+        for crs, prj in ((None, None), (dict(init='EPSG:3395'), target_prj)):
+            for conservation_ratio in (0.0, 0.5, 1.0):
+                # Reproject from EPSG:3395 back to EPSG:4326
+                features = [dict(type='Feature',
+                                 geometry=dict(type=type_name,
+                                               coordinates=get_geometry_transform(type_name)(
+                                                   source_prj if prj else None, prj, 1.0, coordinates)),
+                                 properties=dict())
+                            for type_name, coordinates in geometries]
+                expected_coordinates = [get_geometry_transform(feature['geometry']['type'])(
+                    prj, source_prj if prj else None, conservation_ratio, feature['geometry']['coordinates'])
+                    for feature in features]
+
+                string_io = StringIO()
+                num_written = write_feature_collection(features, string_io, crs=crs,
+                                                       conservation_ratio=conservation_ratio)
+                self.assertEqual(num_written, len(geometries))
+                actual_features = json.loads(string_io.getvalue())['features']
+                for actual_feature, coordinates in zip(actual_features, expected_coordinates):
+                    np.testing.assert_allclose(np.array(_flatten(actual_feature['geometry']['coordinates'])),
+                                               np.array(_flatten(coordinates)))
+                    if conservation_ratio == 0.0:
+                        self.assertEqual(actual_feature['geometry']['type'], 'Point')
+                    self.assertEqual(actual_feature.get('_simp'), 1 if conservation_ratio < 1.0 else None)
+
+    def test_batches(self):
+        features = [dict(type='Feature',
+                         geometry=dict(type='LineString', coordinates=[(i, 0.0), (i, 0.1), (i + 1, 1.0)]),
+                         properties=dict())
+                    for i in range(2500)]
+        # An empty geometry cannot be converted into a point
+        features[1200]['geometry'] = dict(type='Polygon', coordinates=[])
+
+        string_io = StringIO()
+        num_written = write_feature_collection(features, string_io,
+                                               max_num_display_geometries=1000,
+                                               conservation_ratio=0.5)
+        self.assertEqual(num_written, 2499)
+        actual_features = json.loads(string_io.getvalue())['features']
+        self.assertEqual([feature['_idx'] for feature in actual_features],
+                         [i for i in range(2500) if i != 1200])
+        self.assertEqual(actual_features[2000]['_idx'], 2001)
+        self.assertEqual(actual_features[2000]['geometry']['type'], 'Point')
+        np.testing.assert_allclose(actual_features[2000]['geometry']['coordinates'], [2001 + 1 / 3, 1.1 / 3])
+
+
+def _flatten(coordinates):
+    if isinstance(coordinates[0], (int, float)):
+        return [coordinates]
+    flat_coordinates = []
+    for item in coordinates:
+        flat_coordinates.extend(_flatten(item))
+    return flat_coordinates
+
 
 class SimplifyGeometryTest(TestCase):
     def test_simplify_none(self):
@@ -290,6 +353,18 @@ class SimplifyGeometryTest(TestCase):
         self.assertEqual(list(sx), [1, 3, 1, 1])
         self.assertEqual(list(sy), [1, 3, 3, 1])
 
+    def test_simplify_nan(self):
+        # A line string with a NaN coordinate, triangles with a NaN area are never removed
+        x_data = [1, 2, np.nan, 4, 5, 6]
+        y_data = [1, 2, 3, 4, 5, 6]
+
+        x = np.array(x_data)
+        y = np.array(y_data)
+        sx, sy = simplify_geometry(x, y, 0.0)
+        self.assertEqual((sx.size, sy.size), (5, 5))
+        np.testing.assert_equal(sx, [1, 2, np.nan, 4, 6])
+        np.testing.assert_equal(sy, [1, 2, 3, 4, 6])
+
 
 LARGE_MULTI_POLYGON = [
     [
@@ -0,0 +1,167 @@
+import struct
+from unittest import TestCase
+
+import geopandas as gpd
+from shapely.geometry import box, LineString, Point, Polygon
+
+from cate.util.cache import Cache, MemoryCacheStore
+from cate.webapi.mvt import FeatureTilePyramid, get_tile_bounds
+
+
+def _decode_message(data: bytes):
+    """Decode a Protocol Buffers message into a dict that maps field numbers to lists of values."""
+    fields = {}
+    pos = 0
+
+    def read_varint():
+        nonlocal pos
+        value = 0
+        shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            value |= (b & 0x7f) << shift
+            shift += 7
+            if b < 0x80:
+                return value
+
+    while pos < len(data):
+        key = read_varint()
+        field_number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value = read_varint()
+        elif wire_type == 1:
+            value = struct.unpack('<d', data[pos:pos + 8])[0]
+            pos += 8
+        elif wire_type == 2:
+            length = read_varint()
+            value = data[pos:pos + length]
+            pos += length
+        else:
+            raise ValueError('unexpected wire type %s' % wire_type)
+        fields.setdefault(field_number, []).append(value)
+    return fields
+
+
+def _decode_packed(data: bytes):
+    values = []
+    value = 0
+    shift = 0
+    for b in data:
+        value |= (b & 0x7f) << shift
+        shift += 7
+        if b < 0x80:
+            values.append(value)
+            value = 0
+            shift = 0
+    return values
+
+
+def _decode_tile(data: bytes):
+    layers = []
+    for layer_data in _decode_message(data).get(3, []):
+        layer = _decode_message(layer_data)
+        keys = [key.decode('utf-8') for key in layer.get(3, [])]
+        values = []
+        for value_data in layer.get(4, []):
+            value = _decode_message(value_data)
+            field_number, field_values = next(iter(value.items()))
+            value = field_values[0]
+            if field_number == 1:
+                value = value.decode('utf-8')
+            elif field_number == 6:
+                value = (value >> 1) ^ -(value & 1)
+            values.append(value)
+        features = []
+        for feature_data in layer.get(2, []):
+            feature = _decode_message(feature_data)
+            tags = _decode_packed(feature[2][0]) if 2 in feature else []
+            features.append(dict(id=feature[1][0],
+                                 type=feature[3][0],
+                                 properties={keys[tags[i]]: values[tags[i + 1]] for i in range(0, len(tags), 2)},
+                                 geometry=_decode_packed(feature[4][0])))
+        layers.append(dict(version=layer[15][0],
+                           name=layer[1][0].decode('utf-8'),
+                           extent=layer[5][0],
+                           features=features))
+    return layers
+
+
+class FeatureTilePyramidTest(TestCase):
+    def setUp(self):
+        geometries = [box(0., 0., 90., 45.),
+                      None,
+                      Point(45., 22.5),
+                      LineString([(-10., 10.), (10., 10.)]),
+                      Polygon([(100., 10.), (100.001, 10.), (100.001, 10.001)])]
+        properties = [dict(name='box', area=4050.5),
+                      dict(name='nothing'),
+                      dict(name='point', count=3, valid=True),
+                      dict(name='line', count=-2, other=None),
+                      dict(name='tiny')]
+        self.pyramid = FeatureTilePyramid(geometries, properties, 'test', layer_name='regions')
+
+    def test_tile_bounds(self):
+        self.assertEqual((-180., -90., 0., 90.), get_tile_bounds(0, 0, 0))
+        self.assertEqual((0., 0., 90., 90.), get_tile_bounds(2, 0, 1))
+        self.assertEqual((-90., -90., 0., 0.), get_tile_bounds(1, 1, 1))
+
+    def test_encoding(self):
+        self.assertEqual(4, self.pyramid.num_features)
+        layers = _decode_tile(self.pyramid.get_tile(1, 0, 0))
+        self.assertEqual(1, len(layers))
+        layer = layers[0]
+        self.assertEqual(2, layer['version'])
+        self.assertEqual('regions', layer['name'])
+        self.assertEqual(4096, layer['extent'])
+
+        # The tiny polygon is smaller than a pixel at level zero, the line is clipped
+        features = layer['features']
+        self.assertEqual([0, 2, 3], [feature['id'] for feature in features])
+        self.assertEqual([3, 1, 2], [feature['type'] for feature in features])
+        self.assertEqual(dict(name='box', area=4050.5), features[0]['properties'])
+        self.assertEqual(dict(name='point', count=3, valid=1), features[1]['properties'])
+        self.assertEqual(dict(name='line', count=-2), features[2]['properties'])
+
+        # Exterior ring (0, 2048), (0, 1024), (2048, 1024), (2048, 2048) in clockwise order
+        self.assertEqual([9, 0, 4096, 26, 0, 2047, 4096, 0, 0, 2048, 15], features[0]['geometry'])
+        # Point (1024, 1536)
+        self.assertEqual([9, 2048, 3072], features[1]['geometry'])
+        # Line clipped at 1/64 of the tile size west of the tile
+        self.assertEqual([9, 127, 3640, 10, 584, 0], features[2]['geometry'])
+
+    def test_tiny_features_at_finer_levels(self):
+        layers = _decode_tile(self.pyramid.get_tile(1592, 455, 10))
+        self.assertEqual([4], [feature['id'] for feature in layers[0]['features']])
+
+    def test_invalid_geometries(self):
+        # A self-intersecting polygon and a line with a NaN coordinate, both crossing the tile's border
+        geometries = [Polygon([(-10., 10.), (10., 30.), (10., 10.), (-10., 30.)]),
+                      LineString([(-10., 10.), (float('nan'), 20.), (10., 10.)]),
+                      box(0., 0., 90., 45.)]
+        pyramid = FeatureTilePyramid(geometries, [dict(), dict(), dict()], 'test')
+        layers = _decode_tile(pyramid.get_tile(2, 0, 1))
+        # The polygon is repaired, the line is skipped
+        self.assertEqual([0, 2], [feature['id'] for feature in layers[0]['features']])
+
+    def test_invalid_tile(self):
+        with self.assertRaises(ValueError):
+            self.pyramid.get_tile(2, 0, 0)
+
+    def test_tile_cache(self):
+        tile_cache = Cache(MemoryCacheStore(), capacity=1024 * 1024)
+        pyramid = FeatureTilePyramid([box(0., 0., 90., 45.)], [dict()], 'test', tile_cache=tile_cache)
+        tile = pyramid.get_tile(1, 0, 0)
+        self.assertEqual(tile, tile_cache.get_value('test/0/0/1'))
+        pyramid.dispose()
+        self.assertIsNone(tile_cache.get_value('test/0/0/1'))
+
+    def test_from_geo_data_frame(self):
+        gdf = gpd.GeoDataFrame(dict(name=['a', 'b']),
+                               geometry=[Point(1000000., 1000000.), Point(-1000000., 0.)],
+                               crs={'init': 'epsg:3857'})
+        pyramid = FeatureTilePyramid.from_geo_data_frame(gdf, 'test')
+        layers = _decode_tile(pyramid.get_tile(1, 0, 0))
+        features = layers[0]['features']
+        self.assertEqual(1, len(features))
+        self.assertEqual(dict(name='a'), features[0]['properties'])